@@ -25,6 +25,7 @@ class Config:
 
     # DocuSign Webhook Configuration
     DOCUSIGN_HMAC_KEY = os.getenv('DOCUSIGN_HMAC_KEY')
+    DOCUSIGN_HMAC_KEYS = os.getenv('DOCUSIGN_HMAC_KEYS', '')
     DOCUSIGN_WEBHOOK_EVENTS = [
         'envelope-sent',
         'envelope-delivered',
@@ -134,14 +134,101 @@ def init_app(app):
         DOCUSIGN_PRIVATE_KEY_PATH=os.getenv('DOCUSIGN_PRIVATE_KEY_PATH', 'private.key'),
         DOCUSIGN_WEBHOOK_SECRET=os.getenv('DOCUSIGN_WEBHOOK_SECRET'),
         DOCUSIGN_HMAC_KEY=os.getenv('DOCUSIGN_HMAC_KEY'),
+        # Claves adicionales aceptadas durante una rotación (separadas por comas)
+        DOCUSIGN_HMAC_KEYS=os.getenv('DOCUSIGN_HMAC_KEYS', ''),
         
         # Alcance y duración de tokens
         DOCUSIGN_JWT_SCOPE=os.getenv('DOCUSIGN_JWT_SCOPE', 'signature impersonation'),
         DOCUSIGN_JWT_LIFETIME=int(os.getenv('DOCUSIGN_JWT_LIFETIME', 3600)),
         DOCUSIGN_CACHE_TOKEN=os.getenv('DOCUSIGN_CACHE_TOKEN', 'True').lower() in ('true', '1', 't'),
-        DOCUSIGN_CACHE_DURATION=int(os.getenv('DOCUSIGN_CACHE_DURATION', 3600))
+        DOCUSIGN_CACHE_DURATION=int(os.getenv('DOCUSIGN_CACHE_DURATION', 3600)),
+        # Cuota de API compartida entre workers
+        DOCUSIGN_HOURLY_API_LIMIT=int(os.getenv('DOCUSIGN_HOURLY_API_LIMIT', 3000)),
+        DOCUSIGN_QUOTA_INTERACTIVE_RESERVE=float(
+            os.getenv('DOCUSIGN_QUOTA_INTERACTIVE_RESERVE', 0.2)
+        ),
+        DOCUSIGN_QUOTA_MAX_WAIT=float(os.getenv('DOCUSIGN_QUOTA_MAX_WAIT', 2.0)),
+        DOCUSIGN_QUOTA_STORE=os.getenv('DOCUSIGN_QUOTA_STORE', 'docusign_quota.db'),
+        # Renovación anticipada de tokens OAuth de usuarios
+        DOCUSIGN_TOKEN_REFRESH_WINDOW=int(
+            os.getenv('DOCUSIGN_TOKEN_REFRESH_WINDOW', 600)
+        ),
+        DOCUSIGN_TOKEN_REFRESH_INTERVAL=int(
+            os.getenv('DOCUSIGN_TOKEN_REFRESH_INTERVAL', 60)
+        ),
+        DOCUSIGN_TOKEN_REFRESH_BATCH=int(
+            os.getenv('DOCUSIGN_TOKEN_REFRESH_BATCH', 100)
+        ),
+        DOCUSIGN_TOKEN_REFRESH_WORKERS=int(
+            os.getenv('DOCUSIGN_TOKEN_REFRESH_WORKERS', 4)
+        ),
+        DOCUSIGN_TOKEN_REFRESH_TIMEOUT=float(
+            os.getenv('DOCUSIGN_TOKEN_REFRESH_TIMEOUT', 10)
+        ),
+        # Duración supuesta de un token cuya respuesta no trae expires_in
+        DOCUSIGN_TOKEN_DEFAULT_LIFETIME=int(
+            os.getenv('DOCUSIGN_TOKEN_DEFAULT_LIFETIME', 3600)
+        ),
+        # Outbox de solicitudes de firma
+        DOCUSIGN_OUTBOX_INTERVAL=int(os.getenv('DOCUSIGN_OUTBOX_INTERVAL', 5)),
+        DOCUSIGN_OUTBOX_BATCH=int(os.getenv('DOCUSIGN_OUTBOX_BATCH', 20)),
+        DOCUSIGN_OUTBOX_WORKERS=int(os.getenv('DOCUSIGN_OUTBOX_WORKERS', 4)),
+        DOCUSIGN_OUTBOX_MAX_ATTEMPTS=int(os.getenv('DOCUSIGN_OUTBOX_MAX_ATTEMPTS', 5)),
+        DOCUSIGN_OUTBOX_RETRY_BASE=int(os.getenv('DOCUSIGN_OUTBOX_RETRY_BASE', 30)),
+        DOCUSIGN_OUTBOX_LEASE=int(os.getenv('DOCUSIGN_OUTBOX_LEASE', 300)),
+        # Segundos durante los que un mismo documento
+        # y destinatarios devuelven el mismo envelope
+        DOCUSIGN_IDEMPOTENCY_TTL=int(os.getenv('DOCUSIGN_IDEMPOTENCY_TTL', 3600)),
+        # Firma embebida con URLs pregeneradas
+        DOCUSIGN_EMBEDDED_SIGNING=os.getenv(
+            'DOCUSIGN_EMBEDDED_SIGNING', 'False'
+        ).lower()
+        in ('true', '1', 't'),
+        DOCUSIGN_SIGNING_RETURN_URL=os.getenv('DOCUSIGN_SIGNING_RETURN_URL'),
+        # DocuSign invalida las URLs a los 5 minutos; se sirven con margen
+        DOCUSIGN_SIGNING_URL_TTL=int(os.getenv('DOCUSIGN_SIGNING_URL_TTL', 240)),
+        DOCUSIGN_SIGNING_URL_STORE=os.getenv(
+            'DOCUSIGN_SIGNING_URL_STORE', 'docusign_signing_urls.db'
+        ),
+        # Cola local de webhooks aplicada en segundo plano
+        DOCUSIGN_WEBHOOK_QUEUE_STORE=os.getenv(
+            'DOCUSIGN_WEBHOOK_QUEUE_STORE', 'docusign_webhooks.db'
+        ),
+        DOCUSIGN_WEBHOOK_INTERVAL=int(os.getenv('DOCUSIGN_WEBHOOK_INTERVAL', 1)),
+        DOCUSIGN_WEBHOOK_BATCH=int(os.getenv('DOCUSIGN_WEBHOOK_BATCH', 500)),
+        DOCUSIGN_WEBHOOK_MAX_BATCHES=int(os.getenv('DOCUSIGN_WEBHOOK_MAX_BATCHES', 20)),
+        DOCUSIGN_WEBHOOK_MAX_ATTEMPTS=int(
+            os.getenv('DOCUSIGN_WEBHOOK_MAX_ATTEMPTS', 10)
+        ),
+        DOCUSIGN_WEBHOOK_LEASE=int(os.getenv('DOCUSIGN_WEBHOOK_LEASE', 60)),
+        # Deduplicación de reintentos de Connect y ventana
+        # anti-repetición (segundos, 0 = desactivada)
+        DOCUSIGN_WEBHOOK_REPLAY_WINDOW=int(
+            os.getenv('DOCUSIGN_WEBHOOK_REPLAY_WINDOW', 300)
+        ),
+        DOCUSIGN_WEBHOOK_DEDUP_TTL=int(os.getenv('DOCUSIGN_WEBHOOK_DEDUP_TTL', 172800)),
+        DOCUSIGN_WEBHOOK_DEDUP_CAPACITY=int(
+            os.getenv('DOCUSIGN_WEBHOOK_DEDUP_CAPACITY', 10000)
+        ),
+        DOCUSIGN_WEBHOOK_DEDUP_PURGE_INTERVAL=int(
+            os.getenv('DOCUSIGN_WEBHOOK_DEDUP_PURGE_INTERVAL', 3600)
+        ),
+        # Historial de eventos de envelope: compactación
+        # y retención (0 = conservar siempre), en días
+        DOCUSIGN_EVENT_COMPACT_AFTER_DAYS=int(
+            os.getenv('DOCUSIGN_EVENT_COMPACT_AFTER_DAYS', 7)
+        ),
+        DOCUSIGN_EVENT_RETENTION_DAYS=int(
+            os.getenv('DOCUSIGN_EVENT_RETENTION_DAYS', 0)
+        ),
+        DOCUSIGN_EVENT_MAINTENANCE_INTERVAL=int(
+            os.getenv('DOCUSIGN_EVENT_MAINTENANCE_INTERVAL', 3600)
+        ),
+        # Crear el servicio compartido al arrancar el worker
+        DOCUSIGN_PREWARM_SERVICE=os.getenv('DOCUSIGN_PREWARM_SERVICE', 'False').lower()
+        in ('true', '1', 't'),
     )
-    
+
     # Validar configuración crítica
     validate_docusign_config(app)
     
@@ -1,4 +1,4 @@
-from prometheus_client import start_http_server, Counter, Histogram
+from prometheus_client import start_http_server, Counter, Gauge, Histogram
 
 # Métricas para la API
 REQUEST_COUNT = Counter(
@@ -8,6 +8,90 @@ REQUEST_LATENCY = Histogram(
     'api_request_latency_seconds', 'Tiempo de respuesta de la API', ['endpoint']
 )
 
+# Métricas de la integración con DocuSign
+DOCUSIGN_QUOTA_REMAINING = Gauge(
+    'docusign_api_quota_remaining',
+    'Llamadas a la API de DocuSign disponibles en el bucket',
+    ['account'],
+)
+DOCUSIGN_QUOTA_DEFERRED = Counter(
+    'docusign_api_quota_deferred_total',
+    'Llamadas a DocuSign rechazadas o diferidas por cuota',
+    ['priority'],
+)
+SIGNATURE_OUTBOX_DISPATCHED = Counter(
+    'signature_outbox_dispatched_total',
+    'Entradas del outbox de firmas procesadas',
+    ['result'],
+)
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    'docusign_webhook_queue_depth', 'Eventos de webhook pendientes en la cola local'
+)
+WEBHOOK_QUEUE_LAG = Gauge(
+    'docusign_webhook_queue_lag_seconds',
+    'Antigüedad del evento de webhook más antiguo sin aplicar',
+)
+WEBHOOK_EVENTS_PROCESSED = Counter(
+    'docusign_webhook_events_total', 'Eventos de webhook procesados', ['result']
+)
+SIGNING_URL_REQUESTS = Counter(
+    'docusign_signing_url_requests_total', 'URLs de firma embebida servidas', ['source']
+)
+SSE_CONNECTIONS = Gauge(
+    'document_status_stream_connections',
+    'Conexiones SSE de estado de documentos abiertas en el proceso',
+)
+SSE_EVENTS_PUBLISHED = Counter(
+    'document_status_stream_events_total',
+    'Cambios de estado entregados a conexiones SSE',
+)
+OUTBOUND_WEBHOOK_DELIVERIES = Counter(
+    'outbound_webhook_deliveries_total',
+    'Entregas de webhooks salientes a clientes',
+    ['result'],
+)
+OUTBOUND_WEBHOOK_LATENCY = Histogram(
+    'outbound_webhook_request_seconds',
+    'Duración de las peticiones a las URLs de los clientes',
+)
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    'password_hash_queue_depth',
+    'Operaciones de contraseña en curso o esperando al pool de procesos',
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    'password_hash_seconds',
+    'Duración de hash y verificación de contraseñas, incluida la espera',
+    ['operation'],
+)
+PASSWORD_HASH_REJECTED = Counter(
+    'password_hash_rejected_total',
+    'Operaciones de contraseña rechazadas por pool saturado',
+    ['operation'],
+)
+USER_CACHE_LOOKUPS = Counter(
+    'user_cache_lookups_total', 'Búsquedas de usuario de las rutas con JWT', ['result']
+)
+API_KEY_REQUESTS = Counter(
+    'api_key_requests_total',
+    'Peticiones autenticadas con clave de API por resultado',
+    ['result'],
+)
+JWT_VERIFY_CACHE_LOOKUPS = Counter(
+    'jwt_verify_cache_lookups_total',
+    'Verificaciones de JWT resueltas con la caché de tokens verificados',
+    ['result'],
+)
+LOGIN_LOCKOUT_EVENTS = Counter(
+    'login_lockout_events_total',
+    'Cuentas bloqueadas y logins rechazados por bloqueo',
+    ['event'],
+)
+USER_IMPORT_ROWS = Counter(
+    'user_import_rows_total',
+    'Filas procesadas en altas masivas de usuarios',
+    ['result'],
+)
+
 def start_monitoring_server(port=8000):
     """Inicia un servidor que expone métricas para Prometheus."""
     start_http_server(port)
@@ -80,7 +80,9 @@ def xss_protection(f):
     def decorated_function(*args, **kwargs):
         if request.is_json:
             # Sanitizar datos JSON de entrada
-            request._cached_json = sanitize_input(request.get_json(silent=True))
+            # Werkzeug guarda get_json() como tupla indexada por `silent`
+            sanitized = sanitize_input(request.get_json(silent=True))
+            request._cached_json = (sanitized, sanitized)
         return f(*args, **kwargs)
     return decorated_function
 
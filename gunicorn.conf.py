@@ -0,0 +1,23 @@
+"""
+Configuración de gunicorn para producción: `gunicorn main:app` la carga sola.
+
+Las tareas en segundo plano (colas de DocuSign, webhooks salientes, purgas) se
+activan aquí y no en la app: main.create_app nunca arranca hilos, así que
+importar main desde migraciones, la CLI o el maestro con --preload no los crea.
+Cada worker las arranca cuando ya ha cargado la app, y el lease de cada tarea
+evita que se ejecuten dos veces en el mismo host.
+"""
+import os
+
+os.environ.setdefault('BACKGROUND_TASKS_ENABLED', 'True')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+# El stream SSE (/api/documents/stream) ocupa un hilo por conexión abierta
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 100))
+
+
+def post_worker_init(worker):
+    from main import app, start_tasks
+    start_tasks(app)
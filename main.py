@@ -1,6 +1,6 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
+from services.jwt_signing import CachingJWTManager
 from flask_migrate import Migrate
 from models.database import db, init_app, create_tables
 import os
@@ -57,6 +57,16 @@ def create_app(test_config=None):
         JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY'),
         JWT_ACCESS_TOKEN_EXPIRES=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600)),
         JWT_REFRESH_TOKEN_EXPIRES=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 604800)),
+        # Firma asimétrica (RS256/EdDSA): clave privada PEM
+        # y claves públicas anteriores separadas por comas
+        JWT_ALGORITHM=os.getenv('JWT_ALGORITHM', 'HS256'),
+        JWT_PRIVATE_KEY_FILE=os.getenv('JWT_PRIVATE_KEY_FILE'),
+        JWT_PUBLIC_KEY_FILES=[
+            path.strip()
+            for path in os.getenv('JWT_PUBLIC_KEY_FILES', '').split(',')
+            if path.strip()
+        ],
+        JWT_VERIFY_CACHE_SIZE=int(os.getenv('JWT_VERIFY_CACHE_SIZE', 10000)),
         FLASK_APP='main.py',  # Importante para las migraciones
         MIGRATIONS_DIRECTORY=os.path.join(os.path.dirname(__file__), 'migrations'),  # Ruta absoluta
         # Configuración unificada de sesión
@@ -69,6 +79,87 @@ def create_app(test_config=None):
         SESSION_COOKIE_SECURE=os.getenv('FLASK_ENV') == 'production',
         SESSION_COOKIE_HTTPONLY=True,
         SESSION_COOKIE_SAMESITE='Lax',
+        # Tareas periódicas (renovación de tokens, colas). Las arranca start_tasks en
+        # cada worker (gunicorn.conf.py las activa); con False las colas se drenan con
+        # `flask process-queues`. Nunca arrancan en TESTING
+        BACKGROUND_TASKS_ENABLED=(
+            os.getenv('BACKGROUND_TASKS_ENABLED', 'False').lower() in ('true', '1', 't')
+        ),
+        # Almacén local de PDFs (por defecto instance/blobs)
+        BLOB_STORE_DIR=os.getenv('BLOB_STORE_DIR'),
+        # Stream SSE de estados de documentos
+        STATUS_STREAM_POLL_INTERVAL=float(
+            os.getenv('STATUS_STREAM_POLL_INTERVAL', 1.0)
+        ),
+        STATUS_STREAM_HEARTBEAT=int(os.getenv('STATUS_STREAM_HEARTBEAT', 15)),
+        STATUS_STREAM_BUFFER=int(os.getenv('STATUS_STREAM_BUFFER', 1000)),
+        STATUS_STREAM_SUBSCRIPTION_CAPACITY=int(
+            os.getenv('STATUS_STREAM_SUBSCRIPTION_CAPACITY', 100)
+        ),
+        STATUS_STREAM_GAP_TIMEOUT=float(os.getenv('STATUS_STREAM_GAP_TIMEOUT', 60)),
+        # Webhooks salientes a los clientes
+        OUTBOUND_WEBHOOK_INTERVAL=int(os.getenv('OUTBOUND_WEBHOOK_INTERVAL', 2)),
+        OUTBOUND_WEBHOOK_BATCH=int(os.getenv('OUTBOUND_WEBHOOK_BATCH', 100)),
+        OUTBOUND_WEBHOOK_WORKERS=int(os.getenv('OUTBOUND_WEBHOOK_WORKERS', 8)),
+        OUTBOUND_WEBHOOK_TIMEOUT=float(os.getenv('OUTBOUND_WEBHOOK_TIMEOUT', 5)),
+        OUTBOUND_WEBHOOK_MAX_ATTEMPTS=int(
+            os.getenv('OUTBOUND_WEBHOOK_MAX_ATTEMPTS', 8)
+        ),
+        OUTBOUND_WEBHOOK_RETRY_BASE=int(os.getenv('OUTBOUND_WEBHOOK_RETRY_BASE', 30)),
+        OUTBOUND_WEBHOOK_RETRY_MAX_DELAY=int(
+            os.getenv('OUTBOUND_WEBHOOK_RETRY_MAX_DELAY', 3600)
+        ),
+        OUTBOUND_WEBHOOK_LEASE=int(os.getenv('OUTBOUND_WEBHOOK_LEASE', 300)),
+        OUTBOUND_WEBHOOK_MAX_SUBSCRIPTIONS=int(
+            os.getenv('OUTBOUND_WEBHOOK_MAX_SUBSCRIPTIONS', 10)
+        ),
+        # Hash de contraseñas en un pool de procesos
+        # (0 workers = en el hilo de la petición)
+        PASSWORD_HASH_METHOD=os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'),
+        PASSWORD_HASH_ITERATIONS=int(os.getenv('PASSWORD_HASH_ITERATIONS', 260000)),
+        PASSWORD_HASH_WORKERS=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+        PASSWORD_HASH_MAX_PENDING=int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32)),
+        PASSWORD_HASH_WAIT_TIMEOUT=float(os.getenv('PASSWORD_HASH_WAIT_TIMEOUT', 2.0)),
+        # Revocación de JWT: segundos entre
+        # sincronizaciones entre workers, entre purgas y
+        # durante los que se relee un id que faltaba (commits desordenados)
+        JWT_REVOCATION_SYNC_INTERVAL=float(
+            os.getenv('JWT_REVOCATION_SYNC_INTERVAL', 2.0)
+        ),
+        JWT_REVOCATION_PURGE_INTERVAL=int(
+            os.getenv('JWT_REVOCATION_PURGE_INTERVAL', 3600)
+        ),
+        JWT_REVOCATION_SYNC_GAP_TIMEOUT=float(
+            os.getenv('JWT_REVOCATION_SYNC_GAP_TIMEOUT', 60)
+        ),
+        # Caché de usuarios de las rutas con JWT (por proceso)
+        USER_CACHE_TTL=float(os.getenv('USER_CACHE_TTL', 30)),
+        USER_CACHE_SIZE=int(os.getenv('USER_CACHE_SIZE', 10000)),
+        # Bloqueo de cuentas tras logins fallidos (compartido entre workers del host)
+        LOGIN_LOCKOUT_MAX_ATTEMPTS=int(os.getenv('LOGIN_LOCKOUT_MAX_ATTEMPTS', 10)),
+        LOGIN_LOCKOUT_WINDOW=int(os.getenv('LOGIN_LOCKOUT_WINDOW', 900)),
+        LOGIN_LOCKOUT_DURATION=int(os.getenv('LOGIN_LOCKOUT_DURATION', 900)),
+        LOGIN_LOCKOUT_BUCKET=int(os.getenv('LOGIN_LOCKOUT_BUCKET', 60)),
+        LOGIN_LOCKOUT_MAX_ENTRIES=int(os.getenv('LOGIN_LOCKOUT_MAX_ENTRIES', 100000)),
+        LOGIN_LOCKOUT_PURGE_INTERVAL=int(os.getenv('LOGIN_LOCKOUT_PURGE_INTERVAL', 60)),
+        # Claves de API de integraciones servidor a servidor
+        API_KEY_RATE_LIMIT=os.getenv('API_KEY_RATE_LIMIT', '600 per minute'),
+        API_KEY_FAILURE_LIMIT=os.getenv('API_KEY_FAILURE_LIMIT', '20 per minute'),
+        API_KEY_CACHE_TTL=float(os.getenv('API_KEY_CACHE_TTL', 30)),
+        API_KEY_CACHE_SIZE=int(os.getenv('API_KEY_CACHE_SIZE', 10000)),
+        API_KEY_MAX_PER_USER=int(os.getenv('API_KEY_MAX_PER_USER', 10)),
+        # Alta masiva de usuarios: usuarios autorizados (separados por comas) y límites
+        USER_IMPORT_ADMINS=[
+            name.strip()
+            for name in os.getenv('USER_IMPORT_ADMINS', '').split(',')
+            if name.strip()
+        ],
+        USER_IMPORT_MAX_ROWS=int(os.getenv('USER_IMPORT_MAX_ROWS', 10000)),
+        USER_IMPORT_BATCH_SIZE=int(os.getenv('USER_IMPORT_BATCH_SIZE', 1000)),
+        USER_IMPORT_HASH_WORKERS=int(
+            os.getenv('USER_IMPORT_HASH_WORKERS', 0)
+        ),  # 0 = un proceso por núcleo
+        USER_IMPORT_MAX_CONCURRENT=int(os.getenv('USER_IMPORT_MAX_CONCURRENT', 2)),
     )
     
     # Crear directorio de sesiones si no existe
@@ -85,10 +176,15 @@ def create_app(test_config=None):
     from config.docusign_config import init_app as init_docusign
     init_docusign(app)
     
-    jwt = JWTManager(app)
+    # JWT con HS256 o RS256/EdDSA (claves públicas en
+    # /.well-known/jwks.json) y caché de verificación
+    jwt = CachingJWTManager(app)
 
     # Inicializar Limiter
     limiter.init_app(app)
+    # Las rutas llamadas con clave de API se limitan por clave, no por IP
+    from services.api_keys import is_api_key_request
+    limiter.request_filter(is_api_key_request)
 
     # Configurar headers de seguridad
     configure_security_headers(app)
@@ -99,6 +195,8 @@ def create_app(test_config=None):
         from routes.protected import protected_bp
         from routes.api import bp as api_bp
         from routes.docusign import docusign_bp
+        from routes.webhooks import webhooks_bp
+        from routes.api_keys import api_keys_bp
         
         app.register_blueprint(base_bp)
         app.register_blueprint(api_bp, url_prefix='/api')
@@ -106,16 +204,17 @@ def create_app(test_config=None):
         app.register_blueprint(protected_bp, url_prefix='/api/pdf')
         # Registrar el blueprint de DocuSign con prefijo /api/docusign
         app.register_blueprint(docusign_bp, url_prefix='/api/docusign')
+        # Suscripciones de los clientes a los cambios de estado de sus documentos
+        app.register_blueprint(webhooks_bp, url_prefix='/api/webhooks')
+        # Claves de API para integraciones servidor a servidor
+        app.register_blueprint(api_keys_bp, url_prefix='/api/api-keys')
         
         # Solo crear tablas si estamos en modo testing
         if app.config.get('TESTING', False) or app.config.get('ENV') == 'testing':
             create_tables(app)
 
     # Configuración de JWT
-    @jwt.token_in_blocklist_loader
-    def check_if_token_revoked(jwt_header, jwt_payload):
-        from services.auth_service import AuthService
-        return AuthService.is_token_blacklisted(jwt_payload["jti"])
+    _register_jwt_loaders(app, jwt)
 
     # Configuración adicional
     app.config.update({
@@ -126,9 +225,19 @@ def create_app(test_config=None):
     if app.config.get("ENV") == "production":
         start_monitoring_server(port=8000)  # Se exponen las métricas en el puerto 8000
 
+    # Crear el servicio DocuSign compartido fuera del camino de las peticiones
+    from services.docusign_registry import warm_up
+    warm_up(app)
+
+    _register_commands(app)
+
     @app.before_request
     def validate_request_data():
         """Validación y sanitización global de datos de entrada."""
+        # El webhook verifica la firma sobre el cuerpo crudo leyéndolo por bloques;
+        # parsearlo aquí lo cargaría entero en memoria antes de comprobar la firma
+        if request.endpoint == 'docusign.docusign_webhook':
+            return None
         if request.is_json:
             try:
                 # Ya se ejecutará la sanitización en xss_protection
@@ -140,6 +249,103 @@ def create_app(test_config=None):
 
     return app
 
+
+def _register_jwt_loaders(app, jwt):
+    """Revocación, carga del usuario y respuesta a tokens revocados."""
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        from services.auth_service import AuthService
+        return AuthService.is_token_revoked(jwt_payload)
+
+    @jwt.user_lookup_loader
+    def load_user_from_token(jwt_header, jwt_payload):
+        # Caché por petición y por proceso: las rutas
+        # usan current_user sin consultar la tabla user
+        from services.user_cache import load_user
+        return load_user(jwt_payload[app.config.get('JWT_IDENTITY_CLAIM', 'sub')])
+
+    @jwt.revoked_token_loader
+    def revoked_token_response(jwt_header, jwt_payload):
+        # Un refresh token ya rotado que vuelve a
+        # usarse indica robo: se revoca toda la sesión
+        if jwt_payload.get('type') == 'refresh' and jwt_payload.get('fam'):
+            from services.auth_service import AuthService
+            from config.security import log_security_event
+            if AuthService.revoke_family(
+                jwt_payload['fam'], identity=jwt_payload.get('sub')
+            ):
+                log_security_event(
+                    'refresh_token_reuse',
+                    {'family': jwt_payload['fam']},
+                    user_id=jwt_payload.get('sub'),
+                )
+        return jsonify({"msg": "Token has been revoked"}), 401
+
+
+def _register_commands(app):
+    """Comandos de la CLI de flask."""
+    @app.cli.command('process-queues')
+    def process_queues():
+        """
+        Drena una vez las colas de trabajo (cron con BACKGROUND_TASKS_ENABLED=False).
+        """
+        from services.signature_outbox import dispatch_pending_signatures
+        from services.webhook_processor import process_webhook_events
+        from services.outbound_webhooks import deliver_webhooks
+        envelopes = dispatch_pending_signatures()
+        events = process_webhook_events()
+        deliveries = deliver_webhooks()
+        app.logger.info(
+            f"Colas drenadas: {envelopes} envelopes "
+            f"enviados, {events} eventos de DocuSign, "
+            f"{deliveries} webhooks entregados"
+        )
+
+
+def start_tasks(app):
+    """
+    Arranca las tareas periódicas en este proceso
+    si BACKGROUND_TASKS_ENABLED está activo.
+
+    create_app no las arranca: importar main (migraciones, comandos de la CLI,
+    el maestro de gunicorn con --preload) no debe crear hilos. gunicorn.conf.py
+    la llama en cada worker tras el fork; el lease de cada tarea evita que dos
+    workers del host la ejecuten a la vez.
+    """
+    if not app.config.get('BACKGROUND_TASKS_ENABLED') or app.config.get('TESTING'):
+        return
+    from services.background import start_background_tasks
+    from services.docusign_token_refresher import refresh_expiring_tokens
+    from services.signature_outbox import dispatch_pending_signatures
+    from services.signing_urls import purge_signing_urls
+    from services.webhook_processor import process_webhook_events
+    from services.webhook_dedup import purge_processed_webhook_events
+    from services.envelope_events import maintain_envelope_events
+    from services.outbound_webhooks import deliver_webhooks
+    from services.token_revocation import purge_revoked_tokens
+    from services.login_lockout import purge_login_failures
+    config = app.config
+    start_background_tasks(app, [
+        ('docusign_token_refresh', refresh_expiring_tokens,
+         config['DOCUSIGN_TOKEN_REFRESH_INTERVAL']),
+        ('docusign_outbox', dispatch_pending_signatures,
+         config['DOCUSIGN_OUTBOX_INTERVAL']),
+        ('docusign_signing_url_purge', purge_signing_urls,
+         config['DOCUSIGN_SIGNING_URL_TTL']),
+        ('docusign_webhook_queue', process_webhook_events,
+         config['DOCUSIGN_WEBHOOK_INTERVAL']),
+        ('docusign_webhook_dedup_purge', purge_processed_webhook_events,
+         config['DOCUSIGN_WEBHOOK_DEDUP_PURGE_INTERVAL']),
+        ('docusign_envelope_events', maintain_envelope_events,
+         config['DOCUSIGN_EVENT_MAINTENANCE_INTERVAL']),
+        ('outbound_webhooks', deliver_webhooks, config['OUTBOUND_WEBHOOK_INTERVAL']),
+        ('jwt_revocation_purge', purge_revoked_tokens,
+         config['JWT_REVOCATION_PURGE_INTERVAL']),
+        ('login_lockout_purge', purge_login_failures,
+         config['LOGIN_LOCKOUT_PURGE_INTERVAL']),
+    ])
+
+
 # Crear la aplicación
 app = create_app()
 
@@ -149,4 +355,5 @@ def not_found(error):
     return jsonify({'error': '404 - Not Found'}), 404
 
 if __name__ == "__main__":
+    start_tasks(app)
     app.run(debug=True, use_reloader=False)  # Evita la doble inicialización
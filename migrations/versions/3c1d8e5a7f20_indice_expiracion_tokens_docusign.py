@@ -0,0 +1,25 @@
+"""Índice sobre la expiración de tokens DocuSign
+
+Revision ID: 3c1d8e5a7f20
+Revises: baf9b98b9ff7
+Create Date: 2026-10-19 09:12:41.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3c1d8e5a7f20'
+down_revision = 'baf9b98b9ff7'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_user_docusign_token_expires', ['docusign_token_expires'], unique=False
+        )
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_docusign_token_expires')
@@ -0,0 +1,50 @@
+"""Outbox de solicitudes de firma
+
+Revision ID: 5e9f3a7c2b18
+Revises: 7a4e2b9c1d36
+Create Date: 2026-10-19 11:41:06.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5e9f3a7c2b18'
+down_revision = '7a4e2b9c1d36'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('signature_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recipients', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('claim_token', sa.String(length=32), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('envelope_request_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['document.id'], ),
+        sa.ForeignKeyConstraint(['envelope_request_id'], ['envelope_request.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_signature_outbox_status_next_attempt', 'signature_outbox',
+                    ['status', 'next_attempt_at'], unique=False)
+    with op.batch_alter_table('envelope_request', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('document_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_envelope_request_document_id', 'document', ['document_id'], ['id']
+        )
+
+def downgrade():
+    with op.batch_alter_table('envelope_request', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_envelope_request_document_id', type_='foreignkey')
+        batch_op.drop_column('document_id')
+    op.drop_index(
+        'ix_signature_outbox_status_next_attempt', table_name='signature_outbox'
+    )
+    op.drop_table('signature_outbox')
@@ -0,0 +1,34 @@
+"""Tabla de idempotencia para envelopes
+
+Revision ID: 7a4e2b9c1d36
+Revises: 3c1d8e5a7f20
+Create Date: 2026-10-19 10:03:17.552901
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a4e2b9c1d36'
+down_revision = '3c1d8e5a7f20'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('envelope_request',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=64), nullable=False),
+        sa.Column('document_hash', sa.String(length=64), nullable=False),
+        sa.Column('recipients_hash', sa.String(length=64), nullable=False),
+        sa.Column('envelope_id', sa.String(length=100), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('status_datetime', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key')
+    )
+
+def downgrade():
+    op.drop_table('envelope_request')
@@ -0,0 +1,25 @@
+"""Copia local del documento firmado
+
+Revision ID: 9b2d6f4e8a51
+Revises: 5e9f3a7c2b18
+Create Date: 2026-10-19 12:27:44.903115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9b2d6f4e8a51'
+down_revision = '5e9f3a7c2b18'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('signed_file_path', sa.String(length=512), nullable=True)
+        )
+
+def downgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_column('signed_file_path')
@@ -0,0 +1,34 @@
+"""Tokens JWT revocados
+
+Revision ID: a7d4e9b3c508
+Revises: f5c3b8d2e614
+Create Date: 2026-10-19 17:02:15.864301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7d4e9b3c508'
+down_revision = 'f5c3b8d2e614'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('revoked_token',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('jti', sa.String(length=36), nullable=False),
+        sa.Column('token_type', sa.String(length=10), nullable=True),
+        sa.Column('identity', sa.String(length=64), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('jti')
+    )
+    op.create_index(
+        'ix_revoked_token_expires_at', 'revoked_token', ['expires_at'], unique=False
+    )
+
+def downgrade():
+    op.drop_index('ix_revoked_token_expires_at', table_name='revoked_token')
+    op.drop_table('revoked_token')
@@ -0,0 +1,37 @@
+"""Claves de API
+
+Revision ID: b3e8f1c6d725
+Revises: a7d4e9b3c508
+Create Date: 2026-10-19 18:24:51.417093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8f1c6d725'
+down_revision = 'a7d4e9b3c508'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('api_key',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('prefix', sa.String(length=16), nullable=False),
+        sa.Column('key_hash', sa.String(length=64), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('scopes', sa.String(length=255), nullable=False),
+        sa.Column('rate_limit', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('prefix')
+    )
+    op.create_index('ix_api_key_user_id', 'api_key', ['user_id'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_api_key_user_id', table_name='api_key')
+    op.drop_table('api_key')
@@ -0,0 +1,39 @@
+"""Deduplicación de eventos de webhook
+
+Revision ID: c4e7a1d9f326
+Revises: 9b2d6f4e8a51
+Create Date: 2026-10-19 13:52:10.417382
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a1d9f326'
+down_revision = '9b2d6f4e8a51'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('processed_webhook_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dedup_key', sa.String(length=80), nullable=False),
+        sa.Column('envelope_id', sa.String(length=100), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dedup_key')
+    )
+    op.create_index(
+        op.f('ix_processed_webhook_event_expires_at'),
+        'processed_webhook_event',
+        ['expires_at'],
+        unique=False,
+    )
+
+def downgrade():
+    op.drop_index(
+        op.f('ix_processed_webhook_event_expires_at'),
+        table_name='processed_webhook_event',
+    )
+    op.drop_table('processed_webhook_event')
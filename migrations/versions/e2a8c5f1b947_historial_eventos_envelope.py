@@ -0,0 +1,37 @@
+"""Historial de eventos de envelope
+
+Revision ID: e2a8c5f1b947
+Revises: c4e7a1d9f326
+Create Date: 2026-10-19 15:06:44.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e2a8c5f1b947'
+down_revision = 'c4e7a1d9f326'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('envelope_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('envelope_id', sa.String(length=100), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('event', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('compacted', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_envelope_event_envelope_occurred', 'envelope_event',
+                    ['envelope_id', 'occurred_at', 'id'], unique=False)
+    op.create_index('ix_envelope_event_day_compacted', 'envelope_event',
+                    ['day', 'compacted'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_envelope_event_day_compacted', table_name='envelope_event')
+    op.drop_index('ix_envelope_event_envelope_occurred', table_name='envelope_event')
+    op.drop_table('envelope_event')
@@ -0,0 +1,78 @@
+"""Suscripciones de webhooks salientes
+
+Revision ID: f5c3b8d2e614
+Revises: e2a8c5f1b947
+Create Date: 2026-10-19 16:21:37.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f5c3b8d2e614'
+down_revision = 'e2a8c5f1b947'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('webhook_subscription',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('url', sa.String(length=500), nullable=False),
+        sa.Column('secret', sa.String(length=64), nullable=False),
+        sa.Column('events', sa.String(length=255), nullable=True),
+        sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_webhook_subscription_user_id',
+        'webhook_subscription',
+        ['user_id'],
+        unique=False,
+    )
+    op.create_table('webhook_delivery',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.String(length=32), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('claim_token', sa.String(length=32), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('subscription_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['subscription_id'], ['webhook_subscription.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_webhook_delivery_status_next_attempt', 'webhook_delivery',
+                    ['status', 'next_attempt_at'], unique=False)
+    op.create_table('webhook_dead_letter',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.String(length=32), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('failed_at', sa.DateTime(), nullable=True),
+        sa.Column('subscription_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['subscription_id'], ['webhook_subscription.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_webhook_dead_letter_subscription_id', 'webhook_dead_letter',
+                    ['subscription_id'], unique=False)
+
+def downgrade():
+    op.drop_index(
+        'ix_webhook_dead_letter_subscription_id', table_name='webhook_dead_letter'
+    )
+    op.drop_table('webhook_dead_letter')
+    op.drop_index(
+        'ix_webhook_delivery_status_next_attempt', table_name='webhook_delivery'
+    )
+    op.drop_table('webhook_delivery')
+    op.drop_index('ix_webhook_subscription_user_id', table_name='webhook_subscription')
+    op.drop_table('webhook_subscription')
@@ -2,5 +2,30 @@ from .database import db
 from .user import User
 from .agreement import Agreement
 from .document import Document
+from .envelope_request import EnvelopeRequest
+from .signature_outbox import SignatureOutbox
+from .processed_webhook_event import ProcessedWebhookEvent
+from .envelope_event import EnvelopeEvent
+from .webhook_subscription import (
+    WebhookSubscription,
+    WebhookDelivery,
+    WebhookDeadLetter,
+)
+from .revoked_token import RevokedToken
+from .api_key import ApiKey
 
-__all__ = ['db', 'User', 'Agreement', 'Document']
+__all__ = [
+    'db',
+    'User',
+    'Agreement',
+    'Document',
+    'EnvelopeRequest',
+    'SignatureOutbox',
+    'ProcessedWebhookEvent',
+    'EnvelopeEvent',
+    'WebhookSubscription',
+    'WebhookDelivery',
+    'WebhookDeadLetter',
+    'RevokedToken',
+    'ApiKey',
+]
@@ -0,0 +1,46 @@
+from .database import db
+from datetime import datetime
+
+class ApiKey(db.Model):
+    """Clave de API de una integración servidor a servidor"""
+
+    __tablename__ = 'api_key'
+
+    id = db.Column(db.Integer, primary_key=True)
+    prefix = db.Column(
+        db.String(16), unique=True, nullable=False
+    )  # Parte pública de la clave: búsqueda por índice
+    key_hash = db.Column(
+        db.String(64), nullable=False
+    )  # SHA-256 del secreto (aleatorio, no hace falta PBKDF2)
+    name = db.Column(db.String(100), nullable=False)
+    scopes = db.Column(db.String(255), nullable=False)  # Permisos separados por comas
+    rate_limit = db.Column(
+        db.String(50)
+    )  # p. ej. "600 per minute"; vacío = API_KEY_RATE_LIMIT
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime)
+    revoked_at = db.Column(db.DateTime)
+
+    # Relaciones
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('user.id'), nullable=False, index=True
+    )
+    user = db.relationship('User', backref=db.backref('api_keys', lazy=True))
+
+    def get_scopes(self):
+        return [scope for scope in (self.scopes or '').split(',') if scope]
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'prefix': self.prefix,
+            'name': self.name,
+            'scopes': self.get_scopes(),
+            'rate_limit': self.rate_limit,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+    def __repr__(self):
+        return f'<ApiKey {self.prefix}>'
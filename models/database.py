@@ -5,6 +5,7 @@ import logging
 from contextlib import contextmanager
 from sqlalchemy.exc import SQLAlchemyError
 from pathlib import Path
+from datetime import datetime, timedelta
 import os
 
 db = SQLAlchemy()
@@ -49,6 +50,17 @@ def init_app(app):
 from .user import User
 from .agreement import Agreement
 from .document import Document
+from .envelope_request import EnvelopeRequest
+from .signature_outbox import SignatureOutbox
+from .processed_webhook_event import ProcessedWebhookEvent
+from .envelope_event import EnvelopeEvent
+from .webhook_subscription import (
+    WebhookSubscription,
+    WebhookDelivery,
+    WebhookDeadLetter,
+)
+from .revoked_token import RevokedToken
+from .api_key import ApiKey
 
 def create_tables(app):
     """
@@ -153,7 +165,22 @@ def get_agreement(agreement_id: int):
     from .agreement import Agreement
     return Agreement.query.get(agreement_id)
 
-def save_docusign_tokens(user_id: int, access_token: str, refresh_token: str):
+
+def docusign_token_expiry(expires_in=None):
+    """
+    Fecha de expiración de un token de DocuSign a partir de su `expires_in`.
+
+    Si la respuesta no lo trae se usa DOCUSIGN_TOKEN_DEFAULT_LIFETIME: con None el
+    usuario no volvería a entrar en la renovación anticipada.
+    """
+    if not expires_in:
+        expires_in = current_app.config.get('DOCUSIGN_TOKEN_DEFAULT_LIFETIME', 3600)
+    return datetime.utcnow() + timedelta(seconds=int(expires_in))
+
+
+def save_docusign_tokens(
+    user_id: int, access_token: str, refresh_token: str, expires_in: int = None
+):
     """Guarda o actualiza los tokens de DocuSign para un usuario"""
     try:
         user = User.query.get(user_id)
@@ -162,11 +189,13 @@ def save_docusign_tokens(user_id: int, access_token: str, refresh_token: str):
         
         user.docusign_access_token = access_token
         user.docusign_refresh_token = refresh_token
+        user.docusign_token_expires = docusign_token_expiry(expires_in)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         raise ValueError(f"Error guardando tokens: {str(e)}")
 
+
 def get_document(document_id: int):
     """Obtener documento por ID"""
     return Document.query.get(document_id)
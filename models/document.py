@@ -7,8 +7,13 @@ class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(512))
+    signed_file_path = db.Column(
+        db.String(512)
+    )  # Clave en el almacén de blobs del PDF firmado
     envelope_id = db.Column(db.String(100), unique=True)
-    status = db.Column(db.String(50), default='draft')  # draft, sent, delivered, signed, completed, declined
+    status = db.Column(
+        db.String(50), default='draft'
+    )  # draft, queued, sent, delivered, signed, completed, declined, error
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -0,0 +1,37 @@
+from .database import db
+
+class EnvelopeEvent(db.Model):
+    """Historial inmutable de eventos de Connect por envelope (auditoría y disputas)"""
+
+    __tablename__ = 'envelope_event'
+    __table_args__ = (
+        # La línea temporal de un envelope es un
+        # único recorrido de rango sobre este índice
+        db.Index(
+            'ix_envelope_event_envelope_occurred', 'envelope_id', 'occurred_at', 'id'
+        ),
+        # Cubo diario: la compactación y la retención trabajan día a día
+        db.Index('ix_envelope_event_day_compacted', 'day', 'compacted'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    envelope_id = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # Día UTC de occurred_at
+    event = db.Column(
+        db.String(50)
+    )  # Nombre del evento de Connect (envelope-completed, ...)
+    status = db.Column(db.String(20), nullable=False)
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False)
+    compacted = db.Column(db.Boolean, default=False, nullable=False)
+
+    def to_dict(self):
+        return {
+            'event': self.event,
+            'status': self.status,
+            'occurred_at': self.occurred_at.isoformat(),
+            'received_at': self.received_at.isoformat(),
+        }
+
+    def __repr__(self):
+        return f'<EnvelopeEvent {self.envelope_id} {self.status}>'
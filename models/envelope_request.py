@@ -0,0 +1,32 @@
+from .database import db
+from datetime import datetime
+
+class EnvelopeRequest(db.Model):
+    """Registro de idempotencia para la creación de envelopes en DocuSign"""
+
+    __tablename__ = 'envelope_request'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # SHA-256 de la Idempotency-Key del cliente o del documento + destinatarios
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=False)
+    document_hash = db.Column(db.String(64), nullable=False)
+    recipients_hash = db.Column(db.String(64), nullable=False)
+    envelope_id = db.Column(db.String(100))
+    status = db.Column(db.String(50), default='pending')  # pending, queued, sent
+    status_datetime = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'))
+
+    def to_result(self):
+        """Respuesta equivalente a la de send_document_for_signature"""
+        return {
+            "document_id": self.document_id,
+            "envelope_id": self.envelope_id,
+            "status": self.status,
+            "status_datetime": self.status_datetime
+        }
+
+    def __repr__(self):
+        return f'<EnvelopeRequest {self.idempotency_key[:12]}>'
@@ -0,0 +1,17 @@
+from .database import db
+from datetime import datetime
+
+class ProcessedWebhookEvent(db.Model):
+    """Eventos de webhook de DocuSign ya aplicados (deduplicación de reintentos)"""
+
+    __tablename__ = 'processed_webhook_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # ID del evento de Connect o SHA-256 del payload
+    dedup_key = db.Column(db.String(80), unique=True, nullable=False)
+    envelope_id = db.Column(db.String(100))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ProcessedWebhookEvent {self.dedup_key[:16]}>'
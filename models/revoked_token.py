@@ -0,0 +1,21 @@
+from .database import db
+from datetime import datetime
+
+class RevokedToken(db.Model):
+    """Tokens JWT revocados antes de su expiración"""
+
+    __tablename__ = 'revoked_token'
+
+    id = db.Column(
+        db.Integer, primary_key=True
+    )  # Los workers sincronizan por id (ver id_watermark)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10))  # access, refresh
+    identity = db.Column(db.String(64))
+    expires_at = db.Column(
+        db.DateTime, nullable=False, index=True
+    )  # `exp` del token: después ya no hace falta
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
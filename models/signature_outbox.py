@@ -0,0 +1,44 @@
+from .database import db
+from datetime import datetime
+import json
+
+class SignatureOutbox(db.Model):
+    """Solicitudes de firma pendientes de enviar a DocuSign (patrón outbox)"""
+
+    __tablename__ = 'signature_outbox'
+    __table_args__ = (
+        db.Index(
+            'ix_signature_outbox_status_next_attempt', 'status', 'next_attempt_at'
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipients = db.Column(
+        db.Text, nullable=False
+    )  # JSON con email y nombre de cada destinatario
+    status = db.Column(
+        db.String(20), default='pending', nullable=False
+    )  # pending, processing, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(32))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    # Relaciones
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
+    document = db.relationship(
+        'Document', backref=db.backref('outbox_entries', lazy=True)
+    )
+    envelope_request_id = db.Column(db.Integer, db.ForeignKey('envelope_request.id'))
+    envelope_request = db.relationship('EnvelopeRequest')
+
+    def get_recipients(self):
+        return json.loads(self.recipients)
+
+    def __repr__(self):
+        return f'<SignatureOutbox {self.id} {self.status}>'
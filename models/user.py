@@ -1,5 +1,5 @@
 from .database import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.password_hashing import get_password_hasher
 from datetime import datetime
 
 class User(db.Model):
@@ -14,15 +14,21 @@ class User(db.Model):
     # Campos para DocuSign
     docusign_access_token = db.Column(db.String(500), nullable=True)
     docusign_refresh_token = db.Column(db.String(500), nullable=True)
-    docusign_token_expires = db.Column(db.DateTime, nullable=True)
+    docusign_token_expires = db.Column(db.DateTime, nullable=True, index=True)
     
     def set_password(self, password):
-        """Establece el hash de la contraseña."""
-        self.password_hash = generate_password_hash(password)
+        """Establece el hash de la contraseña (se calcula en el pool de hash)."""
+        self.password_hash = get_password_hasher().hash(password)
     
     def check_password(self, password):
         """Verifica si la contraseña coincide con el hash."""
-        return check_password_hash(self.password_hash, password)
+        return get_password_hasher().verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """
+        Indica si el hash se creó con un factor de trabajo distinto del configurado.
+        """
+        return get_password_hasher().needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.username}>'
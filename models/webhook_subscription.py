@@ -0,0 +1,114 @@
+from .database import db
+from datetime import datetime
+
+class WebhookSubscription(db.Model):
+    """URL de un cliente que recibe los cambios de estado de sus documentos"""
+
+    __tablename__ = 'webhook_subscription'
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), nullable=False)
+    secret = db.Column(
+        db.String(64), nullable=False
+    )  # Clave HMAC con la que se firma cada entrega
+    events = db.Column(db.String(255))  # Estados separados por comas; vacío = todos
+    active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    # Relaciones
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('user.id'), nullable=False, index=True
+    )
+    user = db.relationship(
+        'User', backref=db.backref('webhook_subscriptions', lazy=True)
+    )
+
+    def get_events(self):
+        return [event for event in (self.events or '').split(',') if event]
+
+    def wants(self, status):
+        events = self.get_events()
+        return not events or status in events
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'events': self.get_events(),
+            'active': self.active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f'<WebhookSubscription {self.id} {self.url}>'
+
+
+class WebhookDelivery(db.Model):
+    """Entrega pendiente a una suscripción (outbox con reintentos)"""
+
+    __tablename__ = 'webhook_delivery'
+    __table_args__ = (
+        db.Index(
+            'ix_webhook_delivery_status_next_attempt', 'status', 'next_attempt_at'
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(
+        db.String(32), nullable=False
+    )  # Igual en todos los reintentos: el cliente deduplica con él
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(
+        db.String(20), default='pending', nullable=False
+    )  # pending, processing
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(32))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relaciones
+    subscription_id = db.Column(
+        db.Integer, db.ForeignKey('webhook_subscription.id'), nullable=False
+    )
+    subscription = db.relationship('WebhookSubscription')
+
+    def __repr__(self):
+        return f'<WebhookDelivery {self.id} {self.status}>'
+
+
+class WebhookDeadLetter(db.Model):
+    """Entregas que agotaron sus reintentos, conservadas para reenviarlas a mano"""
+
+    __tablename__ = 'webhook_dead_letter'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(32), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)  # Momento en que se generó el evento
+    failed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relaciones
+    subscription_id = db.Column(
+        db.Integer, db.ForeignKey('webhook_subscription.id'), nullable=False, index=True
+    )
+    subscription = db.relationship('WebhookSubscription')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'event_id': self.event_id,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'failed_at': self.failed_at.isoformat() if self.failed_at else None,
+        }
+
+    def __repr__(self):
+        return f'<WebhookDeadLetter {self.id} {self.event_id}>'
@@ -1,16 +1,44 @@
-from flask import Blueprint, jsonify, request, current_app, send_file, session, redirect
+from flask import (
+    Blueprint,
+    jsonify,
+    request,
+    current_app,
+    send_file,
+    session,
+    redirect,
+    Response,
+    stream_with_context,
+)
 from flask_jwt_extended import (
-    jwt_required, create_access_token, 
-    create_refresh_token, get_jwt_identity,
-    get_jwt
+    jwt_required, get_jwt_identity,
+    get_jwt, decode_token, current_user
 )
 from marshmallow import ValidationError
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import secure_filename
 from models.database import db, add_user, get_user, get_document, get_document_by_envelope
 from models import Document
 from services.docusign_hmac import DocuSignHMACValidator
 from services.docusign_service import DocuSignService
 from services.auth_service import AuthService
+from services.signed_documents import (
+    local_signed_document_path,
+    open_signed_document_stream,
+)
+from services.envelope_events import envelope_timeline
+from services.status_stream import get_status_broker, stream_status_changes
+from services.docusign_quota import DocuSignQuotaExceeded
+from services.password_hashing import PasswordHashingBusy
+from services.login_lockout import get_login_lockout
+from services.api_keys import (
+    api_key_or_jwt_required,
+    get_current_identity,
+    get_current_user,
+)
+from services.user_import import (
+    UserImportError, validate_user_fields, parse_rows, import_users,
+    USERNAME_TAKEN, EMAIL_TAKEN
+)
 from datetime import datetime, timedelta
 import logging
 import time
@@ -28,7 +56,6 @@ import requests
 from dotenv import load_dotenv
 from services.docusign_pkce import DocuSignPKCE
 from .protected import protected_bp
-import re
 from models.user import User
 from config.rate_limiting import limiter  # Agregado para definir "limiter"
 from config.security import xss_protection, sanitize_input, log_security_event
@@ -39,6 +66,14 @@ load_dotenv()
 bp = Blueprint('api', __name__)
 pdf_bp = protected_bp
 
+def _password_hashing_busy(error):
+    """Respuesta 503 cuando el pool de hash de contraseñas está saturado."""
+    response = jsonify(
+        {"error": "Servicio saturado, inténtalo de nuevo en unos segundos"}
+    )
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
 @bp.route('/register', methods=['POST'])
 @xss_protection
 def register():
@@ -53,32 +88,19 @@ def register():
         if not data:
             return jsonify({"error": "No se recibieron datos JSON"}), 400
             
-        # Validar datos requeridos
-        required_fields = ['username', 'password', 'email']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Falta el campo obligatorio '{field}'"}), 400
-        
-        # Validaciones básicas
-        if len(data['username']) < 3:
-            return jsonify({"error": "El nombre de usuario debe tener al menos 3 caracteres"}), 400
-            
-        if len(data['password']) < 6:
-            return jsonify({"error": "La contraseña debe tener al menos 6 caracteres"}), 400
-            
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, data['email']):
-            return jsonify({"error": "El formato del email es inválido"}), 400
-        
-        # Verificar si el usuario ya existe
-        existing_user = User.query.filter_by(username=data['username']).first()
-        if existing_user:
-            return jsonify({"error": "Nombre de usuario ya existe"}), 400
+        # Mismas reglas que el alta masiva
+        error = validate_user_fields(data)
+        if error:
+            return jsonify({"error": error}), 400
         
-        # Verificar si el email ya existe
-        existing_email = User.query.filter_by(email=data['email']).first()
-        if existing_email:
-            return jsonify({"error": "Email ya está registrado"}), 400
+        # Nombre de usuario y email en una sola consulta
+        existing = User.query.filter(
+            db.or_(User.username == data['username'], User.email == data['email'])
+        ).all()
+        if any(user.username == data['username'] for user in existing):
+            return jsonify({"error": USERNAME_TAKEN}), 400
+        if existing:
+            return jsonify({"error": EMAIL_TAKEN}), 400
         
         # Crear nuevo usuario
         new_user = User(
@@ -106,11 +128,53 @@ def register():
             }
         }), 201
         
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return _password_hashing_busy(e)
     except Exception as e:
         current_app.logger.error(f"Error en registro: {str(e)}")
         db.session.rollback()  # Asegurar rollback en caso de error
         return jsonify({"error": "Error al procesar el registro", "details": str(e)}), 400
 
+def _authenticate(username, password):
+    """
+    Comprueba las credenciales de un login teniendo en cuenta el bloqueo de la cuenta.
+
+    Returns:
+        tuple: (usuario, None) si son válidas o (None, respuesta de error)
+    """
+    # Cuenta bloqueada por fallos recientes: se rechaza sin verificar la contraseña
+    lockout = get_login_lockout()
+    locked_for = lockout.locked_for(username)
+    if locked_for:
+        log_security_event('login_locked', {'username': username}, user_id=None)
+        response = jsonify({"error": "Cuenta bloqueada temporalmente"})
+        response.headers['Retry-After'] = str(int(locked_for) + 1)
+        return None, (response, 429)
+
+    # Buscar el usuario en la base de datos
+    user = User.query.filter_by(username=username).first()
+
+    # Verificar si el usuario existe y la contraseña es correcta
+    if not user or not user.check_password(password):
+        lockout.record_failure(username)
+        log_security_event('failed_login_attempt', {'username': username}, user_id=None)
+        return None, (jsonify({"error": "Credenciales inválidas"}), 401)
+    lockout.reset(user.username)
+
+    # Hash creado con un factor de trabajo anterior:
+    # se actualiza ahora que conocemos la contraseña
+    if user.password_needs_rehash():
+        try:
+            user.set_password(password)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(
+                f"No se pudo actualizar el hash de {user.username}: {str(e)}"
+            )
+    return user, None
+
 @bp.route('/login', methods=['POST'])
 @limiter.limit("5 per minute")  # Limitar a 5 login por minuto
 @xss_protection
@@ -140,19 +204,12 @@ def login():
                 "details": f"Faltan campos requeridos: {', '.join(missing_fields)}"
             }), 400
         
-        # Buscar el usuario en la base de datos
-        user = User.query.filter_by(username=data['username']).first()
+        user, error_response = _authenticate(data['username'], data['password'])
+        if error_response:
+            return error_response
         
-        # Verificar si el usuario existe y la contraseña es correcta
-        if not user or not user.check_password(data['password']):
-            log_security_event('failed_login_attempt', 
-                              {'username': data['username']}, 
-                              user_id=None)
-            return jsonify({"error": "Credenciales inválidas"}), 401
-        
-        # Generar tokens JWT
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        # Generar tokens JWT de una nueva sesión
+        access_token, refresh_token = AuthService.issue_tokens(user.id)
         
         # Registrar el token para seguimiento (opcional)
         try:
@@ -176,6 +233,8 @@ def login():
             }
         }), 200
         
+    except PasswordHashingBusy as e:
+        return _password_hashing_busy(e)
     except Exception as e:
         current_app.logger.error(f"Error en login: {str(e)}")
         return jsonify({
@@ -183,6 +242,103 @@ def login():
             "details": str(e)
         }), 400
 
+@bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """
+    Renueva la sesión con el refresh token, sin volver a enviar la contraseña.
+
+    Rotación: el refresh token presentado queda revocado y se devuelve un par
+    nuevo de la misma sesión. Si un refresh token ya rotado vuelve a usarse,
+    se revoca la sesión completa (ver revoked_token_loader en main.py).
+    """
+    claims = get_jwt()
+    current_user_id = get_jwt_identity()
+    family = claims.get('fam')
+    if not AuthService.revoke_token(claims):
+        # Otra petición lo rotó a la vez: es una reutilización
+        if family:
+            AuthService.revoke_family(family, identity=current_user_id)
+        log_security_event(
+            'refresh_token_reuse', {'family': family}, user_id=current_user_id
+        )
+        return jsonify({"msg": "Token has been revoked"}), 401
+
+    access_token, refresh_token = AuthService.issue_tokens(
+        current_user_id, family=family
+    )
+    return jsonify({
+        "access_token": access_token,
+        "refresh_token": refresh_token
+    }), 200
+
+@bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """
+    Revoca el access token de la petición y, si se envía, el refresh token.
+
+    Acepta opcionalmente un JSON con: refresh_token. Los tokens quedan
+    rechazados en todos los workers hasta su expiración.
+    """
+    current_user_id = get_jwt_identity()
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    refresh_claims = None
+    if refresh_token:
+        try:
+            refresh_claims = decode_token(refresh_token, allow_expired=True)
+        except Exception:
+            return jsonify({"error": "refresh_token inválido"}), 400
+        same_user = str(refresh_claims.get('sub')) == str(current_user_id)
+        if refresh_claims.get('type') != 'refresh' or not same_user:
+            return jsonify({"error": "refresh_token inválido"}), 400
+
+    claims = get_jwt()
+    AuthService.revoke_token(claims)
+    if refresh_claims is not None:
+        AuthService.revoke_token(refresh_claims)
+    if claims.get('fam'):
+        # Cierra también los refresh tokens de la sesión aunque el cliente no los envíe
+        AuthService.revoke_family(claims['fam'], identity=current_user_id)
+    log_security_event(
+        'logout',
+        {'refresh_revoked': refresh_claims is not None},
+        user_id=current_user_id,
+    )
+    return jsonify({"message": "Sesión cerrada exitosamente"}), 200
+
+@bp.route('/users/import', methods=['POST'])
+@api_key_or_jwt_required('users:import')
+def import_users_file():
+    """
+    Alta masiva de usuarios para el onboarding de un sello.
+    
+    Cuerpo: CSV con cabecera (text/csv) o NDJSON (application/x-ndjson) con
+    username, password y email por fila. Solo para los usuarios de USER_IMPORT_ADMINS.
+    """
+    user = get_current_user()
+    if user.username not in current_app.config.get('USER_IMPORT_ADMINS', []):
+        log_security_event('bulk_user_import_denied', {}, user_id=user.id)
+        return jsonify({"error": "No autorizado para dar de alta usuarios"}), 403
+    try:
+        rows = parse_rows(request.get_data(as_text=True), request.mimetype)
+        report = import_users(rows)
+    except UserImportError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return _password_hashing_busy(e)
+    except Exception as e:
+        current_app.logger.error(f"Error en alta masiva de usuarios: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Error al procesar el alta masiva"}), 500
+    
+    log_security_event('bulk_user_import',
+                       {'created': report['created'], 'failed': report['failed']},
+                       user_id=user.id)
+    return jsonify(report), 200
+
 @bp.route('/test_protected', methods=['GET'])
 @jwt_required()
 def test_protected():
@@ -191,16 +347,12 @@ def test_protected():
     Requiere un token JWT válido.
     """
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if not user:
-        return jsonify({"error": "Usuario no encontrado"}), 404
-    
+    # Resuelto por user_lookup_loader: un token de un usuario borrado ya recibe 401
     return jsonify({
         "status": "success",
         "message": "Acceso autorizado",
         "user_id": current_user_id,
-        "username": user.username
+        "username": current_user.username
     }), 200
 
 @bp.route('/dashboard', methods=['GET'])
@@ -227,7 +379,7 @@ def docusign_auth():
             }), 500
 
         # Usar la clase DocuSignService para manejar la autenticación
-        docusign_service = DocuSignService()
+        docusign_service = DocuSignService.create_instance()
         
         # Generar y almacenar el code_verifier
         code_verifier, code_challenge = DocuSignPKCE.generate_pkce_pair()
@@ -296,3 +448,104 @@ def generate_pdf():
     c.save()
     buffer.seek(0)
     return send_file(buffer, mimetype='application/pdf', as_attachment=True, attachment_filename="output.pdf")
+
+@bp.route('/documents/<int:document_id>/signed', methods=['GET'])
+@api_key_or_jwt_required('documents:read')
+def download_signed_document(document_id):
+    """
+    Descarga el PDF firmado de un documento completado.
+
+    La primera descarga se retransmite desde DocuSign mientras se guarda en
+    local; las siguientes se sirven desde disco sin llamar a DocuSign.
+    """
+    current_user_id = get_current_identity()
+    document = Document.query.get(document_id)
+    if not document or str(document.user_id) != str(current_user_id):
+        return jsonify({"error": "Documento no encontrado"}), 404
+
+    if document.status != 'completed':
+        return jsonify({
+            "error": "Documento no disponible",
+            "details": f"El documento está en estado '{document.status}'"
+        }), 409
+
+    filename = f"{secure_filename(document.title) or 'documento'}_firmado.pdf"
+
+    local_path = local_signed_document_path(document)
+    if local_path:
+        # send_file con una ruta usa wsgi.file_wrapper
+        # (sendfile) y admite peticiones condicionales y rangos
+        return send_file(local_path, mimetype='application/pdf', as_attachment=True,
+                         download_name=filename, conditional=True, max_age=0)
+
+    try:
+        chunks, content_length = open_signed_document_stream(document)
+    except DocuSignQuotaExceeded as e:
+        response = jsonify({"error": "Servicio de firma saturado, inténtalo de nuevo"})
+        response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+        return response, 503
+    except Exception as e:
+        current_app.logger.exception(
+            f"Error descargando documento firmado {document_id}: {str(e)}"
+        )
+        return (
+            jsonify({"error": "Error al descargar el documento", "details": str(e)}),
+            502,
+        )
+
+    response = Response(stream_with_context(chunks), mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if content_length:
+        response.headers['Content-Length'] = str(content_length)
+    return response
+
+@bp.route('/documents/stream', methods=['GET'])
+@jwt_required()
+def document_status_stream():
+    """
+    Stream SSE con los cambios de estado de los documentos del usuario.
+
+    Sustituye al sondeo periódico de los endpoints de estado. Una conexión nueva
+    empieza con un evento `resync` (recargar el estado una vez); los clientes que
+    reconectan envían `Last-Event-ID` para recibir lo que se perdieron.
+    """
+    current_user_id = get_jwt_identity()
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription, replay, resync = get_status_broker().subscribe(
+        current_user_id, last_event_id
+    )
+
+    response = Response(
+        stream_status_changes(
+            subscription,
+            replay,
+            resync,
+            current_app.config.get('STATUS_STREAM_HEARTBEAT', 15),
+        ),
+        mimetype='text/event-stream',
+    )
+    # Si el cliente se va antes de empezar a leer, el generador nunca llega a ejecutarse
+    response.call_on_close(subscription.close)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/documents/<int:document_id>/events', methods=['GET'])
+@api_key_or_jwt_required('documents:read')
+def document_events(document_id):
+    """Historial de eventos de DocuSign de un documento, en orden cronológico."""
+    current_user_id = get_current_identity()
+    document = Document.query.get(document_id)
+    if not document or str(document.user_id) != str(current_user_id):
+        return jsonify({"error": "Documento no encontrado"}), 404
+
+    events = envelope_timeline(document.envelope_id) if document.envelope_id else []
+    return jsonify({
+        "status": "success",
+        "data": {
+            "document_id": document.id,
+            "envelope_id": document.envelope_id,
+            "events": [event.to_dict() for event in events]
+        }
+    }), 200
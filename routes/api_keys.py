@@ -0,0 +1,160 @@
+import logging
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from limits import parse_many
+from models.database import db
+from models.api_key import ApiKey
+from services.api_keys import SCOPES, generate_key, get_api_key_cache
+from config.security import log_security_event
+
+# Blueprint de las claves de API de integraciones servidor a servidor
+api_keys_bp = Blueprint('api_keys', __name__)
+
+logger = logging.getLogger(__name__)
+
+
+def _own_key(key_id):
+    """Clave vigente del usuario autenticado o None."""
+    api_key = ApiKey.query.get(key_id)
+    if (
+        api_key is None
+        or api_key.revoked_at is not None
+        or str(api_key.user_id) != str(get_jwt_identity())
+    ):
+        return None
+    return api_key
+
+
+def _validate_rate_limit(value):
+    """Devuelve el motivo por el que el límite no es válido, o None."""
+    if value is None:
+        return None
+    try:
+        if not isinstance(value, str) or len(value) > 50 or len(parse_many(value)) != 1:
+            raise ValueError(value)
+    except ValueError:
+        return "El límite debe tener la forma '600 per minute'"
+    return None
+
+
+@api_keys_bp.route('', methods=['GET'])
+@jwt_required()
+def list_keys():
+    """Claves de API vigentes del usuario (sin el secreto)."""
+    keys = (
+        ApiKey.query
+        .filter_by(user_id=get_jwt_identity(), revoked_at=None)
+        .order_by(ApiKey.id)
+        .all()
+    )
+    return (
+        jsonify({"status": "success", "data": [api_key.to_dict() for api_key in keys]}),
+        200,
+    )
+
+
+@api_keys_bp.route('', methods=['POST'])
+@jwt_required()
+def create_key():
+    """
+    Crea una clave de API para una integración del usuario.
+
+    Espera un JSON con: name, scopes (lista) y, opcionalmente, rate_limit y
+    expires_in_days. La clave completa solo se devuelve en esta respuesta.
+    """
+    current_user_id = get_jwt_identity()
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No se recibieron datos JSON"}), 400
+
+    name = data.get('name')
+    if not isinstance(name, str) or not name.strip() or len(name) > 100:
+        return (
+            jsonify(
+                {"error": "El nombre es obligatorio y no puede superar 100 caracteres"}
+            ),
+            400,
+        )
+
+    scopes = data.get('scopes')
+    if (
+        not isinstance(scopes, list)
+        or not scopes
+        or any(scope not in SCOPES for scope in scopes)
+    ):
+        return jsonify({
+            "error": "Permisos inválidos",
+            "details": f"Permisos admitidos: {', '.join(SCOPES)}"
+        }), 400
+
+    rate_limit = data.get('rate_limit')
+    error = _validate_rate_limit(rate_limit)
+    if error:
+        return jsonify({"error": "Límite inválido", "details": error}), 400
+
+    expires_in_days = data.get('expires_in_days')
+    if expires_in_days is not None and (
+        not isinstance(expires_in_days, int) or expires_in_days < 1
+    ):
+        return jsonify({"error": "expires_in_days debe ser un entero positivo"}), 400
+
+    active = ApiKey.query.filter_by(user_id=current_user_id, revoked_at=None).count()
+    if active >= current_app.config.get('API_KEY_MAX_PER_USER', 10):
+        return jsonify({"error": "Se alcanzó el máximo de claves de API"}), 409
+
+    raw_key, prefix, key_hash = generate_key()
+    api_key = ApiKey(
+        user_id=current_user_id,
+        prefix=prefix,
+        key_hash=key_hash,
+        name=name.strip(),
+        scopes=','.join(dict.fromkeys(scopes)),
+        rate_limit=rate_limit,
+        expires_at=(
+            datetime.utcnow() + timedelta(days=expires_in_days)
+            if expires_in_days
+            else None
+        ),
+    )
+    try:
+        db.session.add(api_key)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error creando la clave de API: {str(e)}")
+        return jsonify({"error": "Error al crear la clave de API"}), 500
+
+    log_security_event(
+        'api_key_created',
+        {'prefix': prefix, 'scopes': api_key.get_scopes()},
+        user_id=current_user_id,
+    )
+    return (
+        jsonify({"status": "success", "data": dict(api_key.to_dict(), key=raw_key)}),
+        201,
+    )
+
+
+@api_keys_bp.route('/<int:key_id>', methods=['DELETE'])
+@jwt_required()
+def revoke_key(key_id):
+    """Revoca una clave de API."""
+    api_key = _own_key(key_id)
+    if api_key is None:
+        return jsonify({"error": "Clave de API no encontrada"}), 404
+
+    try:
+        api_key.revoked_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error revocando la clave de API {key_id}: {str(e)}")
+        return jsonify({"error": "Error al revocar la clave de API"}), 500
+
+    # Los demás workers dejan de aceptarla tras API_KEY_CACHE_TTL
+    get_api_key_cache().invalidate(api_key.prefix)
+    log_security_event(
+        'api_key_revoked', {'prefix': api_key.prefix}, user_id=get_jwt_identity()
+    )
+    return jsonify({"status": "success"}), 200
@@ -1,7 +1,19 @@
 from flask import Blueprint, jsonify
+from services.jwt_signing import get_signing_keys
 
 bp = Blueprint('base', __name__)
 
 @bp.route('/')
 def index():
     return jsonify({"status": "API funcionando"})
+
+@bp.route('/.well-known/jwks.json')
+def jwks():
+    """Claves públicas para que otros servicios verifiquen nuestros JWT."""
+    keys = get_signing_keys()
+    if keys is None:
+        # Tokens firmados con secreto compartido: no hay nada que publicar
+        return jsonify({"error": "JWKS no disponible con firma HMAC"}), 404
+    response = jsonify({"keys": keys.jwks})
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
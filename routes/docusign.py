@@ -1,16 +1,27 @@
-import os
+import json
 import requests
 import logging
 import time  # Añadir esta importación
 from flask import Blueprint, request, jsonify, current_app, session, redirect, url_for, abort
 from werkzeug.exceptions import BadRequest
 from services.docusign_service import DocuSignService
+from models.database import db, save_docusign_tokens
+from services.docusign_idempotency import IdempotencyKeyConflict
+from services.signature_outbox import enqueue_signature_request
+from services.signing_urls import (
+    get_signing_url,
+    signing_recipients,
+    document_recipients,
+    FINAL_STATUSES,
+)
+from services.webhook_queue import get_webhook_queue
+from services.webhook_dedup import within_replay_window
+from services.docusign_hmac import get_hmac_validator
+from services.connect_parser import parse_connect_payload, ConnectPayloadError
+from services.blob_store import get_blob_store
+from services.docusign_quota import DocuSignQuotaExceeded
 from config.security import xss_protection, log_security_event, is_secure_origin
-from flask_jwt_extended import jwt_required, get_jwt_identity
-import hmac
-import base64
-import hashlib
-from datetime import datetime
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 
 # Crear el blueprint para DocuSign
 docusign_bp = Blueprint('docusign', __name__)
@@ -18,37 +29,6 @@ docusign_bp = Blueprint('docusign', __name__)
 # Configuración de logging
 logger = logging.getLogger(__name__)
 
-# Añadir clase para validación HMAC
-class DocuSignHMACValidator:
-    """Validador de firmas HMAC para webhooks de DocuSign."""
-    
-    def __init__(self, hmac_key):
-        self.hmac_key = hmac_key
-    
-    def validate_request(self, request):
-        """Valida la firma HMAC de una solicitud webhook de DocuSign."""
-        # Extraer firma de headers
-        signature = request.headers.get('X-DocuSign-Signature-1')
-        if not signature:
-            return False
-        
-        # Obtener cuerpo de la solicitud
-        body = request.get_data()
-        
-        # Calcular HMAC-SHA256
-        expected_hmac = hmac.new(
-            self.hmac_key.encode(),
-            body,
-            hashlib.sha256
-        ).digest()
-        
-        # Comparación segura para prevenir timing attacks
-        try:
-            received_hmac = base64.b64decode(signature)
-            return hmac.compare_digest(expected_hmac, received_hmac)
-        except Exception:
-            return False
-
 @docusign_bp.route('/auth', methods=['GET'])
 @jwt_required()
 def docusign_auth():
@@ -60,6 +40,9 @@ def docusign_auth():
     """
     current_user_id = get_jwt_identity()
     
+    # Recordar el usuario para persistir sus tokens al volver del callback
+    session['docusign_user_id'] = current_user_id
+    
     # Logging del inicio de flujo OAuth
     log_security_event('docusign_auth_init', 
                       {'user_id': current_user_id}, 
@@ -110,7 +93,7 @@ def docusign_auth():
         # Inicializar el servicio DocuSign con más información de diagnóstico
         try:
             logger.debug(f"Configuración: INTEGRATION_KEY={integration_key[:8]}..., AUTH_SERVER={auth_server}, REDIRECT_URI={redirect_uri}")
-            docusign = DocuSignService()
+            docusign = DocuSignService.create_instance()
         except Exception as e:
             logger.error(f"Error creando DocuSignService: {str(e)}")
             return jsonify({
@@ -168,6 +151,20 @@ def docusign_auth():
             "traceback": f"{type(e).__name__}: {str(e)}"
         }), 500
 
+def _persist_tokens(user_id, tokens):
+    """Guarda los tokens del callback en el usuario que inició el flujo OAuth."""
+    if not user_id:
+        return
+    try:
+        save_docusign_tokens(
+            user_id,
+            tokens.get('access_token'),
+            tokens.get('refresh_token'),
+            tokens.get('expires_in')
+        )
+    except ValueError as e:
+        logger.error(f"No se pudieron persistir los tokens de DocuSign: {str(e)}")
+
 @docusign_bp.route('/callback', methods=['GET'])
 def docusign_callback():
     """
@@ -267,7 +264,7 @@ def docusign_callback():
         session.pop('code_verifier_timestamp', None)
         
         # Inicializar el servicio DocuSign
-        docusign = DocuSignService()
+        docusign = DocuSignService.create_instance()
         
         # Intercambiar código por token con mejor manejo de errores
         try:
@@ -307,6 +304,10 @@ def docusign_callback():
         session['docusign_refresh_token'] = tokens.get('refresh_token')
         session['docusign_token_expiry'] = tokens.get('expires_in')
         
+        # Persistir los tokens para que la renovación
+        # en segundo plano los mantenga vigentes
+        _persist_tokens(session.pop('docusign_user_id', None), tokens)
+
         logger.info("Token de DocuSign obtenido exitosamente")
         
         # Para tests, devolver JSON en lugar de redirigir
@@ -373,9 +374,6 @@ def send_for_signature():
                 "details": f"Faltan campos requeridos: {', '.join(missing_fields)}"
             }), 400
 
-        # Usar el método de clase para crear la instancia
-        docusign_service = DocuSignService.create_instance()
-        
         # Preparar destinatarios
         recipients = [{
             "email": data.get("recipient_email"),
@@ -386,16 +384,37 @@ def send_for_signature():
         # Por ahora usamos un PDF de ejemplo
         pdf_bytes = b"PDF content here"  # Reemplazar con el PDF real
 
-        # Enviar para firma
-        result = docusign_service.send_document_for_signature(
-            pdf_bytes=pdf_bytes,
-            recipients=recipients
-        )
+        # El envío a DocuSign lo hace el despachador del outbox; aquí solo se
+        # confirma el documento y la entrada del outbox en una transacción.
+        # Reintentos y dobles clics devuelven la solicitud ya registrada.
+        try:
+            envelope_request, created = enqueue_signature_request(
+                current_user_id,
+                data.get("title") or "Split Sheet",
+                pdf_bytes,
+                recipients,
+                client_key=request.headers.get('Idempotency-Key'),
+                # El document_id del cliente identifica el
+                # documento en la clave de idempotencia
+                reference=data.get('document_id'),
+            )
+        except IdempotencyKeyConflict as e:
+            return (
+                jsonify({"error": "Conflicto de idempotencia", "details": str(e)}),
+                422,
+            )
+
+        if not created:
+            return jsonify({
+                "status": "success" if envelope_request.envelope_id else "queued",
+                "data": envelope_request.to_result(),
+                "idempotent_replay": True
+            }), 200 if envelope_request.envelope_id else 202
 
         return jsonify({
-            "status": "success",
-            "data": result
-        }), 200
+            "status": "queued",
+            "data": envelope_request.to_result()
+        }), 202
 
     except Exception as e:
         logger.exception(f"Error al enviar documento para firma: {str(e)}")
@@ -408,36 +427,104 @@ def send_for_signature():
 def docusign_webhook():
     """Recibe y procesa webhooks de DocuSign."""
     # Validar firma HMAC
-    hmac_key = current_app.config.get('DOCUSIGN_HMAC_KEY', os.getenv('DOCUSIGN_HMAC_KEY', ''))
-    validator = DocuSignHMACValidator(hmac_key)
-    is_valid = validator.validate_request(request)
-    
+    validator = get_hmac_validator()
+    if validator is None:
+        current_app.logger.error("Webhook recibido sin DOCUSIGN_HMAC_KEY configurada")
+        return jsonify({"error": "Firma inválida"}), 401
+
+    is_valid, error = validator.validate_request(request)
     if not is_valid:
-        current_app.logger.warning("Webhook con firma inválida recibido")
+        current_app.logger.warning(f"Webhook con firma inválida recibido: {error}")
         return jsonify({"error": "Firma inválida"}), 401
-    
-    # Procesar eventos
-    data = request.get_json()
-    envelope_id = data.get('envelopeId')
-    status = data.get('status')
-    
-    current_app.logger.info(f"Webhook DocuSign recibido: envelope={envelope_id}, status={status}")
-    
-    # Actualizar estado del documento si existe
-    from models.database import db
+
+    # El timestamp va dentro de la firma: una entrega sin él o antigua es una repetición
+    timestamp = request.headers.get('X-DocuSign-Signature-Timestamp')
+    if not within_replay_window(
+        timestamp, current_app.config.get('DOCUSIGN_WEBHOOK_REPLAY_WINDOW', 300)
+    ):
+        log_security_event(
+            'docusign_webhook_replay',
+            {'timestamp': timestamp, 'ip': request.remote_addr},
+        )
+        return (
+            jsonify({"error": "Timestamp ausente o fuera de la ventana permitida"}),
+            400,
+        )
+
+    # Los documentos embebidos van al almacén de blobs; se encolan solo los metadatos
+    try:
+        data = parse_connect_payload(request.stream, get_blob_store())
+    except ConnectPayloadError as e:
+        current_app.logger.warning(f"Webhook con payload inválido: {str(e)}")
+        return jsonify({"error": "Payload inválido", "details": str(e)}), 400
+    payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    # El evento se aplica en segundo plano (services/webhook_processor)
+    try:
+        event_id = get_webhook_queue().enqueue(payload, {
+            'X-DocuSign-Signature-Timestamp': timestamp
+        })
+    except Exception as e:
+        # Sin 2xx DocuSign Connect reintenta la entrega
+        current_app.logger.error(f"No se pudo encolar el webhook: {str(e)}")
+        return jsonify({"error": "No se pudo registrar el evento"}), 503
+
+    return jsonify({"status": "accepted", "event_id": event_id}), 202
+
+
+@docusign_bp.route('/signing_url/<int:document_id>', methods=['GET'])
+@jwt_required()
+def signing_url(document_id):
+    """Devuelve la URL de firma embebida del usuario actual para un documento."""
     from models import Document
-    
+
+    if not current_app.config.get('DOCUSIGN_EMBEDDED_SIGNING'):
+        return jsonify({"error": "La firma embebida no está habilitada"}), 400
+
+    user = current_user
+    document = Document.query.get(document_id)
+    if not document:
+        return jsonify({"error": "Documento no encontrado"}), 404
+
+    if not document.envelope_id:
+        return jsonify({
+            "error": "Documento pendiente de envío",
+            "details": "El envelope aún no se ha creado en DocuSign"
+        }), 409
+
+    if document.status in FINAL_STATUSES:
+        return (
+            jsonify(
+                {"error": "El documento ya no admite firmas", "status": document.status}
+            ),
+            409,
+        )
+
+    recipient = next(
+        (r for r in signing_recipients(document_recipients(document))
+         if r['email'].lower() == user.email.lower()),
+        None
+    )
+    if recipient is None:
+        log_security_event(
+            'signing_url_forbidden', {'document_id': document_id}, user_id=user.id
+        )
+        return jsonify({"error": "No eres firmante de este documento"}), 403
+
     try:
-        document = Document.query.filter_by(envelope_id=envelope_id).first()
-        if document:
-            document.status = status
-            document.updated_at = datetime.utcnow()
-            db.session.commit()
-            current_app.logger.info(f"Documento actualizado: id={document.id}, status={status}")
-        else:
-            current_app.logger.warning(f"Webhook para envelope desconocido: {envelope_id}")
+        url, cached = get_signing_url(document.envelope_id, recipient)
+    except DocuSignQuotaExceeded as e:
+        response = jsonify({"error": "Servicio de firma saturado, inténtalo de nuevo"})
+        response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+        return response, 503
     except Exception as e:
-        current_app.logger.error(f"Error procesando webhook: {str(e)}")
-    
-    # Siempre responder con éxito, incluso si no se encontró el documento
-    return jsonify({"status": "success"})
+        logger.exception(f"Error generando URL de firma: {str(e)}")
+        return (
+            jsonify({"error": "Error al generar la URL de firma", "details": str(e)}),
+            500,
+        )
+
+    response = jsonify({"url": url, "cached": cached})
+    # La URL es de un solo uso: no debe quedar en cachés intermedias
+    response.headers['Cache-Control'] = 'no-store'
+    return response
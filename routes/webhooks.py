@@ -0,0 +1,222 @@
+import secrets
+import logging
+from urllib.parse import urlparse
+from flask import Blueprint, request, jsonify, current_app
+from models.database import db
+from models.webhook_subscription import (
+    WebhookSubscription,
+    WebhookDelivery,
+    WebhookDeadLetter,
+)
+from services.envelope_lifecycle import STATUS_RANK
+from services.outbound_webhooks import (
+    replay_dead_letters,
+    check_destination,
+    UnsafeDestination,
+)
+from services.api_keys import api_key_or_jwt_required, get_current_identity
+from config.security import log_security_event
+
+# Blueprint de las suscripciones de webhooks salientes
+webhooks_bp = Blueprint('webhooks', __name__)
+
+logger = logging.getLogger(__name__)
+
+
+def _own_subscription(subscription_id):
+    """Suscripción activa del usuario autenticado o None."""
+    subscription = WebhookSubscription.query.get(subscription_id)
+    if (
+        subscription is None
+        or not subscription.active
+        or str(subscription.user_id) != str(get_current_identity())
+    ):
+        return None
+    return subscription
+
+
+def _validate_url(url):
+    """Devuelve el motivo por el que la URL no es válida, o None."""
+    if not isinstance(url, str) or len(url) > 500:
+        return "La URL es obligatoria y no puede superar 500 caracteres"
+    parsed = urlparse(url)
+    allowed = (
+        ('https',)
+        if current_app.config.get('ENV') == 'production'
+        else ('https', 'http')
+    )
+    if parsed.scheme not in allowed or not parsed.hostname:
+        return f"La URL debe ser absoluta y usar {' o '.join(allowed)}"
+    try:
+        check_destination(url)
+    except UnsafeDestination as e:
+        return str(e)
+    return None
+
+
+@webhooks_bp.route('', methods=['GET'])
+@api_key_or_jwt_required('webhooks:manage')
+def list_subscriptions():
+    """Suscripciones activas del usuario."""
+    subscriptions = (
+        WebhookSubscription.query
+        .filter_by(user_id=get_current_identity(), active=True)
+        .order_by(WebhookSubscription.id)
+        .all()
+    )
+    return (
+        jsonify(
+            {
+                "status": "success",
+                "data": {
+                    "subscriptions": [
+                        subscription.to_dict() for subscription in subscriptions
+                    ]
+                },
+            }
+        ),
+        200,
+    )
+
+
+@webhooks_bp.route('', methods=['POST'])
+@api_key_or_jwt_required('webhooks:manage')
+def create_subscription():
+    """
+    Registra una URL que recibirá los cambios de estado de los documentos del usuario.
+
+    Espera un JSON con: url y, opcionalmente, events (lista de estados).
+    La clave de firma solo se devuelve en esta respuesta.
+    """
+    current_user_id = get_current_identity()
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No se recibieron datos JSON"}), 400
+
+    url = data.get('url')
+    error = _validate_url(url)
+    if error:
+        return jsonify({"error": "URL inválida", "details": error}), 400
+
+    events = data.get('events') or []
+    if not isinstance(events, list) or any(
+        event not in STATUS_RANK for event in events
+    ):
+        return jsonify({
+            "error": "Eventos inválidos",
+            "details": f"Estados admitidos: {', '.join(STATUS_RANK)}"
+        }), 400
+
+    active = WebhookSubscription.query.filter_by(
+        user_id=current_user_id, active=True
+    ).count()
+    if active >= current_app.config.get('OUTBOUND_WEBHOOK_MAX_SUBSCRIPTIONS', 10):
+        return jsonify({"error": "Se alcanzó el máximo de suscripciones"}), 409
+
+    subscription = WebhookSubscription(
+        user_id=current_user_id,
+        url=url,
+        secret=secrets.token_hex(32),
+        events=','.join(dict.fromkeys(events)) or None
+    )
+    try:
+        db.session.add(subscription)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error creando la suscripción de webhook: {str(e)}")
+        return jsonify({"error": "Error al crear la suscripción"}), 500
+
+    log_security_event(
+        'webhook_subscription_created',
+        {'subscription_id': subscription.id, 'url': url},
+        user_id=current_user_id,
+    )
+    return jsonify({
+        "status": "success",
+        "data": dict(subscription.to_dict(), secret=subscription.secret)
+    }), 201
+
+
+@webhooks_bp.route('/<int:subscription_id>', methods=['DELETE'])
+@api_key_or_jwt_required('webhooks:manage')
+def delete_subscription(subscription_id):
+    """Desactiva una suscripción y descarta sus entregas pendientes."""
+    subscription = _own_subscription(subscription_id)
+    if subscription is None:
+        return jsonify({"error": "Suscripción no encontrada"}), 404
+
+    try:
+        subscription.active = False
+        # Las entregas en curso ven la suscripción
+        # desactivada y acaban como dead letters
+        WebhookDelivery.query.filter(
+            WebhookDelivery.subscription_id == subscription.id,
+            WebhookDelivery.status == 'pending'
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(
+            f"Error desactivando la suscripción de webhook {subscription_id}: {str(e)}"
+        )
+        return jsonify({"error": "Error al eliminar la suscripción"}), 500
+
+    log_security_event(
+        'webhook_subscription_deleted',
+        {'subscription_id': subscription.id},
+        user_id=get_current_identity(),
+    )
+    return jsonify({"status": "success"}), 200
+
+
+@webhooks_bp.route('/<int:subscription_id>/dead-letters', methods=['GET'])
+@api_key_or_jwt_required('webhooks:manage')
+def list_dead_letters(subscription_id):
+    """Entregas de la suscripción que agotaron sus reintentos."""
+    subscription = _own_subscription(subscription_id)
+    if subscription is None:
+        return jsonify({"error": "Suscripción no encontrada"}), 404
+
+    dead_letters = (
+        WebhookDeadLetter.query
+        .filter(WebhookDeadLetter.subscription_id == subscription.id)
+        .order_by(WebhookDeadLetter.id.desc())
+        .limit(min(request.args.get('limit', 100, type=int), 1000))
+        .all()
+    )
+    return (
+        jsonify(
+            {
+                "status": "success",
+                "data": {
+                    "dead_letters": [
+                        dead_letter.to_dict() for dead_letter in dead_letters
+                    ]
+                },
+            }
+        ),
+        200,
+    )
+
+
+@webhooks_bp.route('/<int:subscription_id>/dead-letters/replay', methods=['POST'])
+@api_key_or_jwt_required('webhooks:manage')
+def replay_subscription_dead_letters(subscription_id):
+    """
+    Vuelve a encolar entregas descartadas.
+
+    Acepta opcionalmente un JSON con ids; sin él se reenvían todas.
+    """
+    subscription = _own_subscription(subscription_id)
+    if subscription is None:
+        return jsonify({"error": "Suscripción no encontrada"}), 404
+
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if ids is not None and (
+        not isinstance(ids, list) or not all(isinstance(value, int) for value in ids)
+    ):
+        return jsonify({"error": "ids debe ser una lista de enteros"}), 400
+
+    replayed = replay_dead_letters(subscription, ids)
+    return jsonify({"status": "success", "data": {"replayed": replayed}}), 202
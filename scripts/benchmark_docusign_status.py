@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Compara el coste por llamada de leer el estado de un envelope con los modelos
+generados de docusign_esign frente al camino ligero de services/docusign_lean.
+
+No hace llamadas de red: mide solo la deserialización de una respuesta JSON
+representativa, que es lo que cambia entre ambos caminos.
+
+Uso:
+    python scripts/benchmark_docusign_status.py [--iterations 5000]
+"""
+import sys
+import json
+import uuid
+import timeit
+import argparse
+import tracemalloc
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from docusign_esign import ApiClient
+from services.docusign_lean import EnvelopeStatus, RecipientStatus
+
+
+class _Response:
+    """Imita el RESTResponse que recibe ApiClient.deserialize."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _sample_envelope():
+    """Respuesta de GET /envelopes/{id} con los campos habituales."""
+    now = '2026-10-19T10:00:00.0000000Z'
+    return json.dumps(
+        {
+            'allowComments': 'true',
+            'allowMarkup': 'false',
+            'allowReassign': 'true',
+            'anySigner': None,
+            'autoNavigation': 'true',
+            'brandLock': 'false',
+            'burnDefaultTabData': 'false',
+            'certificateUri': '/envelopes/x/documents/certificate',
+            'completedDateTime': now,
+            'createdDateTime': now,
+            'customFieldsUri': '/envelopes/x/custom_fields',
+            'documentsCombinedUri': '/envelopes/x/documents/combined',
+            'documentsUri': '/envelopes/x/documents',
+            'emailSubject': 'Firma requerida: Split Sheet',
+            'enableWetSign': 'true',
+            'envelopeId': str(uuid.uuid4()),
+            'envelopeIdStamping': 'true',
+            'envelopeLocation': 'current_site',
+            'envelopeMetadata': {
+                'allowAdvancedCorrect': 'true',
+                'enableSignWithNotary': 'false',
+                'allowCorrect': 'true',
+            },
+            'envelopeUri': '/envelopes/x',
+            'expireAfter': '120',
+            'expireDateTime': now,
+            'expireEnabled': 'true',
+            'hasComments': 'false',
+            'hasFormDataChanged': 'false',
+            'initialSentDateTime': now,
+            'is21CFRPart11': 'false',
+            'isSignatureProviderEnvelope': 'false',
+            'lastModifiedDateTime': now,
+            'notificationUri': '/envelopes/x/notification',
+            'purgeState': 'unpurged',
+            'recipientsUri': '/envelopes/x/recipients',
+            'sender': {
+                'accountId': str(uuid.uuid4()),
+                'email': 'sender@example.com',
+                'userId': str(uuid.uuid4()),
+                'userName': 'Sender',
+            },
+            'sentDateTime': now,
+            'signerCanSignOnMobile': 'true',
+            'signingLocation': 'online',
+            'status': 'completed',
+            'statusChangedDateTime': now,
+            'templatesUri': '/envelopes/x/templates',
+        }
+    ).encode('utf-8')
+
+
+def _sample_recipients(count=4):
+    """Respuesta de GET /envelopes/{id}/recipients sin pestañas."""
+    signers = [
+        {
+            'creationReason': 'sender',
+            'deliveredDateTime': '2026-10-19T10:00:00Z',
+            'deliveryMethod': 'email',
+            'email': f'firmante{i}@example.com',
+            'isBulkRecipient': 'false',
+            'name': f'Firmante {i}',
+            'recipientId': str(i),
+            'recipientIdGuid': str(uuid.uuid4()),
+            'requireIdLookup': 'false',
+            'routingOrder': '1',
+            'sentDateTime': '2026-10-19T10:00:00Z',
+            'signedDateTime': '2026-10-19T10:05:00Z',
+            'status': 'completed',
+            'userId': str(uuid.uuid4()),
+            'clientUserId': str(i),
+        }
+        for i in range(1, count + 1)
+    ]
+    return json.dumps(
+        {'signers': signers, 'recipientCount': str(count), 'currentRoutingOrder': '1'}
+    ).encode('utf-8')
+
+
+def _measure(label, func, iterations):
+    func()  # Calentar cachés de importación y de clases
+    seconds = min(timeit.repeat(func, number=iterations, repeat=3)) / iterations
+
+    # Pico de memoria de una llamada aislada (mediana de varias mediciones)
+    tracemalloc.start()
+    peaks = []
+    for _ in range(50):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    tracemalloc.stop()
+    peak = sorted(peaks)[len(peaks) // 2]
+
+    print(
+        f"{label:<32} {seconds * 1e6:9.1f} µs/llamada "
+        f"  pico {peak / 1024:7.1f} KiB/llamada"
+    )
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--iterations', type=int, default=5000)
+    args = parser.parse_args()
+
+    api_client = ApiClient()
+    envelope = _sample_envelope()
+    recipients = _sample_recipients()
+
+    print(f"Iteraciones: {args.iterations}\n")
+    sdk = _measure(
+        'Envelope (docusign_esign)',
+        lambda: api_client.deserialize(_Response(envelope), 'Envelope').status,
+        args.iterations,
+    )
+    lean = _measure(
+        'Envelope (EnvelopeStatus)',
+        lambda: EnvelopeStatus.from_json(json.loads(envelope)).status,
+        args.iterations,
+    )
+    print(f"{'':<32} {sdk / lean:9.1f}x más rápido\n")
+
+    sdk = _measure(
+        'Recipients (docusign_esign)',
+        lambda: api_client.deserialize(_Response(recipients), 'Recipients').signers,
+        args.iterations,
+    )
+    lean = _measure(
+        'Recipients (RecipientStatus)',
+        lambda: [
+            RecipientStatus.from_json(s) for s in json.loads(recipients)['signers']
+        ],
+        args.iterations,
+    )
+    print(f"{'':<32} {sdk / lean:9.1f}x más rápido")
+
+
+if __name__ == "__main__":
+    main()
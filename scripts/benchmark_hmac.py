@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Compara el coste de verificar la firma HMAC de una entrega de DocuSign Connect
+construyendo el HMAC desde la clave en cada llamada frente a copiar el estado
+precalculado de services/docusign_hmac, con una y con dos claves activas.
+
+Para los cuerpos grandes mide además el pico de memoria de leer el cuerpo
+entero frente a verificarlo por bloques desde un stream.
+
+Uso:
+    python scripts/benchmark_hmac.py [--iterations 20000]
+"""
+import io
+import os
+import sys
+import hmac
+import base64
+import timeit
+import hashlib
+import argparse
+import tracemalloc
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from services.docusign_hmac import DocuSignHMACValidator, CHUNK_SIZE
+
+KEYS = [
+    base64.b64encode(os.urandom(32)).decode(),
+    base64.b64encode(os.urandom(32)).decode(),
+]
+
+
+def _headers(body, keys):
+    return {
+        f"X-DocuSign-Signature-{index}": base64.b64encode(
+            hmac.new(key.encode(), body, hashlib.sha256).digest()
+        ).decode()
+        for index, key in enumerate(keys, start=1)
+    }
+
+
+def _naive(body, headers, keys):
+    """Verificación previa: un hmac.new por clave y cabecera en cada llamada."""
+    for index in range(1, len(keys) + 1):
+        signature = base64.b64decode(headers[f"X-DocuSign-Signature-{index}"])
+        for key in keys:
+            if hmac.compare_digest(
+                hmac.new(key.encode(), body, hashlib.sha256).digest(), signature
+            ):
+                return True
+    return False
+
+
+def _measure(label, func, iterations):
+    func()
+    seconds = min(timeit.repeat(func, number=iterations, repeat=3)) / iterations
+    print(f"{label:<40} {seconds * 1e6:10.1f} µs/llamada")
+    return seconds
+
+
+def _peak(func):
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    for keys in (KEYS[:1], KEYS):
+        validator = DocuSignHMACValidator(keys)
+        for size in (2 * 1024, 256 * 1024):
+            body = os.urandom(size)
+            headers = _headers(body, keys)
+            iterations = max(args.iterations * 2048 // size, 50)
+            print(
+                f"Cuerpo de {size // 1024} KiB, {len(keys)} "
+                f"clave(s), {iterations} iteraciones"
+            )
+            naive = _measure(
+                '  hmac.new por llamada',
+                lambda: _naive(body, headers, keys),
+                iterations,
+            )
+            fast = _measure(
+                '  estado precalculado (verify)',
+                lambda: validator.verify(body, headers),
+                iterations,
+            )
+            print(f"{'':<40} {naive / fast:10.1f}x más rápido\n")
+
+    # Memoria: cuerpo completo frente a verificación por bloques
+    validator = DocuSignHMACValidator(KEYS[:1])
+    body = os.urandom(8 * 1024 * 1024)
+    signatures = validator.signatures(_headers(body, KEYS[:1]))
+
+    def whole():
+        # Equivale a request.get_data(): acumula todo el stream antes de verificar
+        stream = io.BytesIO(body)
+        data = b''.join(iter(lambda: stream.read(CHUNK_SIZE), b''))
+        assert validator.verify_chunks((data,), signatures)
+
+    def chunked():
+        stream = io.BytesIO(body)
+        assert validator.verify_chunks(
+            iter(lambda: stream.read(CHUNK_SIZE), b''), signatures
+        )
+
+    print("Cuerpo de 8 MiB")
+    print(f"{'  leído entero':<40} pico {_peak(whole) / 1024:10.1f} KiB")
+    print(f"{'  por bloques':<40} pico {_peak(chunked) / 1024:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,32 @@
 """
 Script para probar el manejo de webhooks de DocuSign.
 Simula distintos tipos de notificaciones para verificar el procesamiento.
+
+Con --load actúa como generador de carga: reproduce el ciclo de vida completo
+de N envelopes (sent, delivered y completed, declined o voided) a un ritmo
+objetivo y con la concurrencia indicada, y muestra el throughput, los
+percentiles de latencia y el desglose de errores.
+
+Uso:
+    python scripts/test_docusign_webhook.py
+    python scripts/test_docusign_webhook.py --load
+    --envelopes 500 --rate 200 --concurrency 32
 """
 import os
 import sys
 import json
+import math
+import time
+import random
+import argparse
+import threading
 import requests
 import base64
 import hmac
 import hashlib
 import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import dotenv
 from pathlib import Path
@@ -74,12 +91,22 @@ def create_test_envelope():
     """Crea un ID de sobre (envelope) de prueba."""
     return str(uuid.uuid4())
 
-def sign_payload(payload, hmac_key):
-    """Firma el payload con HMAC-SHA256."""
-    payload_json = json.dumps(payload)
+def sign_payload(payload, hmac_key, timestamp=None):
+    """
+    Firma el payload (dict o cuerpo ya serializado) con HMAC-SHA256.
+
+    Con `timestamp` se firma `timestamp\npayload\n`, como cuando la entrega
+    lleva la cabecera X-DocuSign-Signature-Timestamp.
+    """
+    if isinstance(payload, dict):
+        payload = json.dumps(payload)
+    if isinstance(payload, str):
+        payload = payload.encode()
+    if timestamp is not None:
+        payload = timestamp.encode() + b'\n' + payload + b'\n'
     signature = hmac.new(
         hmac_key.encode(),
-        payload_json.encode(),
+        payload,
         hashlib.sha256
     ).digest()
     return base64.b64encode(signature).decode()
@@ -89,13 +116,15 @@ def simulate_webhook(payload, hmac_key, webhook_url):
     # Convertir payload a JSON
     payload_json = json.dumps(payload)
     
-    # Firmar payload
-    signature = sign_payload(payload, hmac_key)
+    # Firmar payload junto con el timestamp (lo exige la ventana anti-repetición)
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    signature = sign_payload(payload, hmac_key, timestamp)
     
     # Preparar headers
     headers = {
         'Content-Type': 'application/json',
-        'X-DocuSign-Signature-1': signature
+        'X-DocuSign-Signature-1': signature,
+        'X-DocuSign-Signature-Timestamp': timestamp
     }
     
     print_info(f"Enviando webhook a {webhook_url}")
@@ -110,8 +139,8 @@ def simulate_webhook(payload, hmac_key, webhook_url):
             timeout=10
         )
         
-        # Verificar respuesta
-        if response.status_code == 200:
+        # Verificar respuesta (el endpoint encola el evento y responde 202)
+        if response.status_code in (200, 202):
             print_success(f"Webhook aceptado: HTTP {response.status_code}")
             try:
                 print_info(f"Respuesta: {response.json()}")
@@ -209,12 +238,14 @@ def test_invalid_signature():
     
     # Firmar con clave diferente
     invalid_key = "invalid_key_123"
-    signature = sign_payload(payload, invalid_key)
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    signature = sign_payload(payload, invalid_key, timestamp)
     
     # Preparar headers
     headers = {
         'Content-Type': 'application/json',
-        'X-DocuSign-Signature-1': signature
+        'X-DocuSign-Signature-1': signature,
+        'X-DocuSign-Signature-Timestamp': timestamp
     }
     
     # Enviar solicitud
@@ -238,6 +269,204 @@ def test_invalid_signature():
         print_error(f"Error enviando webhook: {str(e)}")
         return False
 
+# Ciclos de vida simulados en modo carga y su peso relativo
+LIFECYCLES = (
+    (('sent', 'delivered', 'completed'), 0.8),
+    (('sent', 'delivered', 'declined'), 0.1),
+    (('sent', 'voided'), 0.1),
+)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+def create_connect_event(envelope_id, status, document_bytes=None):
+    """Crea un evento en formato Connect 2.1 para un cambio de estado del envelope."""
+    current_time = datetime.utcnow().isoformat() + 'Z'
+    summary = {
+        "status": status,
+        "emailSubject": "Test Split Sheet",
+        "sentDateTime": current_time,
+        "statusChangedDateTime": current_time,
+        "recipients": {
+            "signers": [{
+                "recipientId": "1",
+                "name": "Test User",
+                "email": "test@example.com",
+                "status": status
+            }]
+        }
+    }
+    if document_bytes and status == 'completed':
+        summary["envelopeDocuments"] = [{
+            "documentId": "1",
+            "name": "split_sheet.pdf",
+            "type": "content",
+            "PDFBytes": base64.b64encode(document_bytes).decode()
+        }]
+    return {
+        "event": f"envelope-{status}",
+        "eventId": str(uuid.uuid4()),
+        "apiVersion": "v2.1",
+        "generatedDateTime": current_time,
+        "data": {
+            "envelopeId": envelope_id,
+            "envelopeSummary": summary
+        }
+    }
+
+def build_load_plan(envelopes, document_kb=0, seed=None):
+    """
+    Genera los eventos de N envelopes en rondas: la ronda k contiene el k-ésimo
+    evento de cada envelope, así cada envelope avanza en orden mientras sus
+    eventos se intercalan con los del resto.
+
+    Returns:
+        list[bytes]: Cuerpos serializados en orden de envío
+    """
+    rng = random.Random(seed)
+    document_bytes = os.urandom(document_kb * 1024) if document_kb else None
+    weights = [weight for _, weight in LIFECYCLES]
+    lifecycles = [
+        (create_test_envelope(), rng.choices(LIFECYCLES, weights=weights)[0][0])
+        for _ in range(envelopes)
+    ]
+    plan = []
+    for step in range(max((len(statuses) for _, statuses in lifecycles), default=0)):
+        batch = [
+            json.dumps(
+                create_connect_event(envelope_id, statuses[step], document_bytes)
+            ).encode()
+            for envelope_id, statuses in lifecycles
+            if step < len(statuses)
+        ]
+        rng.shuffle(batch)
+        plan.extend(batch)
+    return plan
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_load_test(
+    webhook_url,
+    hmac_key,
+    envelopes,
+    rate,
+    concurrency,
+    document_kb=0,
+    timeout=10,
+    seed=None,
+):
+    """
+    Envía el plan de carga a ritmo constante (lazo abierto).
+
+    La latencia se mide desde el instante en que el evento debía enviarse, no
+    desde que un hilo queda libre: si el cliente o el servidor se saturan, la
+    espera aparece en los percentiles en lugar de ocultarse.
+
+    Returns:
+        dict: Resumen con throughput, percentiles y errores
+    """
+    plan = build_load_plan(envelopes, document_kb, seed)
+    local = threading.local()
+    results = []
+    results_lock = threading.Lock()
+
+    def send(body, scheduled):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        headers = {
+            'Content-Type': 'application/json',
+            'X-DocuSign-Signature-1': sign_payload(body, hmac_key, timestamp),
+            'X-DocuSign-Signature-Timestamp': timestamp
+        }
+        try:
+            response = session.post(
+                webhook_url, data=body, headers=headers, timeout=timeout
+            )
+            outcome = response.status_code
+        except requests.exceptions.RequestException as e:
+            outcome = type(e).__name__
+        finished = time.perf_counter()
+        with results_lock:
+            results.append((finished - scheduled, outcome, finished))
+
+    print_info(f"Enviando {len(plan)} eventos de {envelopes} envelopes a {webhook_url}")
+    print_info(
+        f"Ritmo objetivo: {rate or 'sin límite'} ev/s, concurrencia: {concurrency}"
+    )
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index, body in enumerate(plan):
+            scheduled = started + index / rate if rate else time.perf_counter()
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, body, scheduled)
+    # Sin resultados (--envelopes 0 o fallos antes de registrar) la duración es 0
+    elapsed = max((finished for _, _, finished in results), default=started) - started
+
+    latencies = sorted(
+        latency * 1000 for latency, outcome, _ in results if outcome in (200, 202)
+    )
+    errors = Counter(
+        f"HTTP {outcome}" if isinstance(outcome, int) else outcome
+        for _, outcome, _ in results if outcome not in (200, 202)
+    )
+    return {
+        'sent': len(results),
+        'ok': len(latencies),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1] if latencies else 0.0,
+        'latencies': latencies,
+        'errors': errors,
+    }
+
+
+def print_load_report(summary):
+    """Muestra el resumen de una prueba de carga con un histograma de latencias."""
+    print_header("RESULTADO DE LA PRUEBA DE CARGA")
+    print(f"Eventos enviados:   {summary['sent']}")
+    print(f"Aceptados (2xx):    {summary['ok']}")
+    print(f"Duración:           {summary['elapsed']:.2f} s")
+    print(f"Throughput:         {summary['throughput']:.1f} ev/s")
+    print(f"Latencia p50/p95/p99/máx: {summary['p50']:.1f} / {summary['p95']:.1f} / "
+          f"{summary['p99']:.1f} / {summary['max']:.1f} ms")
+
+    latencies = summary['latencies']
+    if latencies:
+        print("\nHistograma de latencias:")
+        counts = Counter()
+        for latency in latencies:
+            bucket = next(
+                (limit for limit in LATENCY_BUCKETS_MS if latency <= limit), None
+            )
+            counts[bucket] += 1
+        widest = max(counts.values())
+        lower = 0
+        for limit in LATENCY_BUCKETS_MS + (None,):
+            count = counts.get(limit, 0)
+            label = f"{lower}-{limit} ms" if limit is not None else f"> {lower} ms"
+            bar = '#' * max(1 if count else 0, round(40 * count / widest))
+            print(f"  {label:>14} {count:7d} {bar}")
+            lower = limit
+
+    if summary['errors']:
+        print_header("ERRORES")
+        for error, count in summary['errors'].most_common():
+            print_error(f"{error}: {count}")
+    else:
+        print_success("Sin errores")
+
 def run_all_tests():
     """Ejecuta todas las pruebas de webhook."""
     print_header("PRUEBA DE WEBHOOKS DOCUSIGN")
@@ -290,5 +519,52 @@ def run_all_tests():
     
     return all_passed
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        '--load', action='store_true', help='Ejecuta el generador de carga'
+    )
+    parser.add_argument(
+        '--envelopes', type=int, default=100, help='Envelopes simulados'
+    )
+    parser.add_argument(
+        '--rate', type=float, default=50.0, help='Eventos por segundo (0 = sin límite)'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=16, help='Peticiones simultáneas máximas'
+    )
+    parser.add_argument(
+        '--document-kb',
+        type=int,
+        default=0,
+        help='Tamaño del PDF embebido en los eventos completed (0 = sin documento)',
+    )
+    parser.add_argument(
+        '--timeout', type=float, default=10.0, help='Timeout por petición en segundos'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Semilla para reproducir el plan de carga',
+    )
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.load:
+        summary = run_load_test(
+            get_webhook_url(),
+            get_hmac_key(),
+            args.envelopes,
+            args.rate,
+            args.concurrency,
+            args.document_kb,
+            args.timeout,
+            args.seed,
+        )
+        print_load_report(summary)
+        sys.exit(0 if not summary['errors'] else 1)
     run_all_tests()
@@ -0,0 +1,314 @@
+"""
+Claves de API para integraciones servidor a servidor.
+
+Los back-office de los sellos llaman a la API desde procesos por lotes. Con
+usuario y contraseña chocaban con el límite de 5 logins por minuto y pagaban
+PBKDF2 en cada sesión. Una clave tiene la forma `ssk_<prefijo>_<secreto>`:
+
+- El prefijo es público y único. La clave se busca por él con un índice y el
+  resultado se guarda en una caché LRU por proceso con TTL
+  (API_KEY_CACHE_TTL), incluidas las búsquedas de prefijos inexistentes.
+- El secreto tiene 256 bits aleatorios, así que basta un SHA-256 y una
+  comparación en tiempo constante. Nunca se llama a User.check_password.
+- Cada clave tiene permisos (SCOPES) sobre rutas concretas y su propio límite
+  de peticiones (API_KEY_RATE_LIMIT), contado en el almacén de Flask-Limiter.
+  Una petición con una clave válida a una ruta que la admite queda fuera de los
+  límites globales por IP; con una clave inválida se cuentan como cualquier otra.
+- Los fallos de autenticación se limitan además por IP (API_KEY_FAILURE_LIMIT).
+
+La clave no crea un contexto JWT: las rutas protegidas con
+api_key_or_jwt_required obtienen el usuario con get_current_identity() y
+get_current_user(), que sirven para ambos casos.
+
+Una clave revocada deja de valer al momento en el proceso que la revoca y, como
+mucho, tras API_KEY_CACHE_TTL segundos en los demás workers.
+"""
+import time
+import hmac
+import hashlib
+import logging
+import secrets
+import threading
+from datetime import datetime
+from functools import wraps, lru_cache
+from collections import OrderedDict
+from flask import current_app, request, jsonify, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, current_user
+from flask_limiter.util import get_remote_address
+from limits import parse as parse_limit
+from config.monitoring import API_KEY_REQUESTS
+from config.rate_limiting import limiter
+from config.security import log_security_event
+from models.api_key import ApiKey
+from services.user_cache import load_user
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-API-Key'
+KEY_TYPE = 'ssk'
+
+# Permisos que se pueden conceder a una clave y rutas en las que se usan
+SCOPES = {
+    'documents:read': "Historial de estados y descarga de documentos firmados",
+    'users:import': "Alta masiva de usuarios (requiere ser administrador de altas)",
+    'webhooks:manage': "Suscripciones de webhooks salientes",
+}
+
+
+def hash_secret(secret):
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+
+def generate_key():
+    """
+    Genera una clave nueva.
+
+    Returns:
+        tuple: (clave completa, prefijo, hash del secreto)
+    """
+    prefix = secrets.token_hex(6)
+    secret = secrets.token_urlsafe(32)
+    return f"{KEY_TYPE}_{prefix}_{secret}", prefix, hash_secret(secret)
+
+
+def _split_key(raw_key):
+    parts = raw_key.split('_', 2)
+    if len(parts) != 3 or parts[0] != KEY_TYPE or not parts[1] or not parts[2]:
+        return None, None
+    return parts[1], parts[2]
+
+
+@lru_cache(maxsize=64)
+def _rate_limit_item(value):
+    return parse_limit(value)
+
+
+class ApiKeyRecord:
+    """Copia de solo lectura de los campos de una clave necesarios para autenticar."""
+
+    __slots__ = (
+        'id',
+        'prefix',
+        'key_hash',
+        'user_id',
+        'scopes',
+        'rate_limit',
+        'expires_at',
+    )
+
+    def __init__(self, api_key):
+        self.id = api_key.id
+        self.prefix = api_key.prefix
+        self.key_hash = api_key.key_hash
+        self.user_id = api_key.user_id
+        self.scopes = frozenset(api_key.get_scopes())
+        self.rate_limit = api_key.rate_limit
+        self.expires_at = api_key.expires_at
+
+    def expired(self):
+        return self.expires_at is not None and self.expires_at <= datetime.utcnow()
+
+
+class ApiKeyCache:
+    """
+    LRU con caducidad de claves por prefijo (None = prefijo inexistente o revocado).
+    """
+
+    def __init__(self, ttl=30, capacity=10000):
+        """
+        Args:
+            ttl (float): Segundos que una entrada es válida
+            capacity (int): Prefijos máximos en memoria
+        """
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, prefix):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(prefix)
+                return entry[1]
+
+        api_key = ApiKey.query.filter_by(prefix=prefix).first()
+        record = (
+            ApiKeyRecord(api_key)
+            if api_key is not None and api_key.revoked_at is None
+            else None
+        )
+        with self._lock:
+            self._entries[prefix] = (now + self.ttl, record)
+            self._entries.move_to_end(prefix)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return record
+
+    def invalidate(self, prefix):
+        with self._lock:
+            self._entries.pop(prefix, None)
+
+
+def get_api_key_cache(app=None):
+    """
+    Devuelve la caché de claves de API de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('api_key_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('api_key_cache', ApiKeyCache(
+            ttl=app.config.get('API_KEY_CACHE_TTL', 30),
+            capacity=app.config.get('API_KEY_CACHE_SIZE', 10000)
+        ))
+    return cache
+
+
+def authenticate(raw_key):
+    """
+    Returns:
+        ApiKeyRecord: La clave, o None si no existe, está
+            revocada, caducada o el secreto no coincide
+    """
+    prefix, secret = _split_key(raw_key)
+    if prefix is None:
+        return None
+    record = get_api_key_cache().get(prefix)
+    if record is None or record.expired():
+        return None
+    if not hmac.compare_digest(hash_secret(secret), record.key_hash):
+        return None
+    return record
+
+
+def _request_key(raw_key):
+    """authenticate() una sola vez por petición (filtro del limitador y decorador)."""
+    cached = request.environ.get('api_key.auth')
+    if cached is None or cached[0] != raw_key:
+        cached = request.environ['api_key.auth'] = (raw_key, authenticate(raw_key))
+    return cached[1]
+
+
+def is_api_key_request():
+    """
+    Filtro de Flask-Limiter: las rutas que aceptan clave y reciben una válida no
+    cuentan para los límites globales por IP; las limita la propia clave. Una
+    clave inválida no exime de nada.
+    """
+    raw_key = request.headers.get(HEADER)
+    view = current_app.view_functions.get(request.endpoint)
+    if raw_key is None or not hasattr(view, 'api_key_scope'):
+        return False
+    return _request_key(raw_key) is not None
+
+
+def get_current_identity():
+    """
+    Identidad del usuario de la petición en rutas con api_key_or_jwt_required:
+    el dueño de la clave de API o el `sub` del JWT.
+    """
+    user = g.get('api_key_user')
+    return user.id if user is not None else get_jwt_identity()
+
+
+def get_current_user():
+    """Usuario de la petición (dueño de la clave de API o current_user del JWT)."""
+    user = g.get('api_key_user')
+    return user if user is not None else current_user
+
+
+def _limited(limit, *identifiers, hit=True):
+    """Segundos hasta que se libera el límite, o 0 si la petición cabe."""
+    if not limiter.enabled:
+        return 0
+    item = _rate_limit_item(limit)
+    allowed = (
+        limiter.limiter.hit(item, *identifiers)
+        if hit
+        else limiter.limiter.test(item, *identifiers)
+    )
+    if allowed:
+        return 0
+    reset_at, _ = limiter.limiter.get_window_stats(item, *identifiers)
+    return max(1, int(reset_at - time.time()))
+
+
+def _error(message, status, result, retry_after=None):
+    API_KEY_REQUESTS.labels(result=result).inc()
+    response = jsonify({"error": message})
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response, status
+
+
+def _authenticate_request(raw_key, scope):
+    failure_limit = current_app.config.get('API_KEY_FAILURE_LIMIT', '20 per minute')
+    remote = get_remote_address()
+    retry_after = _limited(failure_limit, 'api_key_failures', remote, hit=False)
+    if retry_after:
+        return _error(
+            "Demasiados intentos con claves inválidas", 429, 'blocked', retry_after
+        )
+
+    record = _request_key(raw_key)
+    user = load_user(record.user_id) if record is not None else None
+    if user is None:
+        _limited(failure_limit, 'api_key_failures', remote)
+        log_security_event(
+            'api_key_rejected', {'prefix': _split_key(raw_key)[0]}, user_id=None
+        )
+        return _error("Clave de API inválida", 401, 'invalid')
+    if scope not in record.scopes:
+        return _error(
+            f"La clave de API no tiene el permiso '{scope}'", 403, 'forbidden'
+        )
+
+    retry_after = _limited(
+        record.rate_limit
+        or current_app.config.get('API_KEY_RATE_LIMIT', '600 per minute'),
+        'api_key',
+        record.prefix,
+    )
+    if retry_after:
+        return _error(
+            "Límite de peticiones de la clave de API superado",
+            429,
+            'limited',
+            retry_after,
+        )
+
+    g.api_key = record
+    g.api_key_user = user
+    API_KEY_REQUESTS.labels(result='ok').inc()
+    return None
+
+
+def api_key_or_jwt_required(scope):
+    """
+    Como jwt_required(), pero admite también una clave de API con el permiso `scope`
+    en la cabecera X-API-Key. La ruta obtiene el usuario con get_current_identity()
+    y get_current_user(), no con get_jwt_identity() ni current_user.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"Permiso de clave de API desconocido: {scope}")
+
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            raw_key = request.headers.get(HEADER)
+            g.api_key = g.api_key_user = None
+            if raw_key is None:
+                verify_jwt_in_request()
+            else:
+                error = _authenticate_request(raw_key, scope)
+                if error is not None:
+                    return error
+            return current_app.ensure_sync(fn)(*args, **kwargs)
+
+        decorator.api_key_scope = scope
+        return decorator
+    return wrapper
@@ -1,21 +1,19 @@
 import logging
 from datetime import datetime, timedelta
-from flask_jwt_extended import create_access_token, create_refresh_token
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask import current_app
+from .token_revocation import get_revocation_store, purge_revoked_tokens
+from .login_lockout import get_login_lockout
 import time
+import uuid
 
 # Simulación de base de datos en memoria
 users_db = {}
-failed_attempts = {}
-blacklisted_tokens = set()
 
 class AuthService:
     """Servicio para gestionar la autenticación y tokens JWT"""
     
-    # Almacén simple de tokens revocados (en producción, usar Redis o base de datos)
-    _blacklisted_tokens = set()
-    
     @classmethod
     def register_token(cls, token):
         """
@@ -26,6 +24,60 @@ class AuthService:
         # En esta implementación simple, no hacemos nada con el token
         # Este método existe para evitar el error de que no existe el atributo
         return True
+
+    @classmethod
+    def issue_tokens(cls, identity, family=None):
+        """
+        Emite un par access/refresh de la misma sesión.
+
+        Todos los tokens de una sesión llevan el claim `fam`; revocar la
+        familia invalida la sesión completa (ver revoke_family).
+
+        Returns:
+            tuple: (access_token, refresh_token)
+        """
+        claims = {'fam': family or uuid.uuid4().hex}
+        return (
+            create_access_token(identity=identity, additional_claims=claims),
+            create_refresh_token(identity=identity, additional_claims=claims)
+        )
+
+    @classmethod
+    def revoke_family(cls, family, identity=None):
+        """Revoca todos los tokens emitidos y por emitir de una sesión."""
+        # Ningún refresh token de la familia puede expirar después de esto
+        lifetime = current_app.config.get('JWT_REFRESH_TOKEN_EXPIRES', 604800)
+        expires_at = datetime.utcnow() + timedelta(seconds=lifetime)
+        return get_revocation_store().revoke(
+            f"fam:{family}", expires_at, token_type='family', identity=identity
+        )
+
+    @classmethod
+    def is_token_revoked(cls, decoded_token):
+        """
+        True si el token o su sesión están revocados. No hace I/O en el caso habitual.
+        """
+        store = get_revocation_store()
+        family = decoded_token.get('fam')
+        return store.is_revoked(decoded_token['jti']) or (
+            family is not None and store.is_revoked(f"fam:{family}")
+        )
+
+    @classmethod
+    def revoke_token(cls, decoded_token):
+        """
+        Revoca un token ya decodificado hasta su expiración.
+
+        Args:
+            decoded_token (dict): Payload del JWT (jti, exp, type, sub)
+        """
+        identity_claim = current_app.config.get('JWT_IDENTITY_CLAIM', 'sub')
+        return get_revocation_store().revoke(
+            decoded_token['jti'],
+            datetime.utcfromtimestamp(decoded_token['exp']),
+            token_type=decoded_token.get('type'),
+            identity=decoded_token.get(identity_claim)
+        )
     
     @classmethod
     def blacklist_token(cls, jti, expires_delta=None):
@@ -34,9 +86,14 @@ class AuthService:
         
         Args:
             jti: Identificador único del token JWT
-            expires_delta: Tiempo hasta que expire (para limpiezas futuras)
+            expires_delta: Tiempo hasta que expire (por
+                defecto, la vida de un refresh token)
         """
-        cls._blacklisted_tokens.add(jti)
+        if expires_delta is None:
+            expires_delta = timedelta(
+                seconds=current_app.config.get('JWT_REFRESH_TOKEN_EXPIRES', 604800)
+            )
+        get_revocation_store().revoke(jti, datetime.utcnow() + expires_delta)
         current_app.logger.info(f"Token revocado: {jti}")
         return True
     
@@ -51,18 +108,17 @@ class AuthService:
         Returns:
             bool: True si el token está revocado
         """
-        return jti in cls._blacklisted_tokens
+        return get_revocation_store().is_revoked(jti)
     
     @classmethod
     def clean_blacklist(cls):
         """
         Limpia tokens revocados que ya han expirado.
-        En una implementación real, esto se haría periódicamente.
+        La tarea en segundo plano `jwt_revocation_purge` lo hace periódicamente.
         """
-        # En esta implementación simple, simplemente vaciamos la lista
-        # En una implementación real, deberíamos verificar las fechas de expiración
-        cls._blacklisted_tokens.clear()
-        current_app.logger.debug("Lista de tokens revocados limpiada")
+        deleted = purge_revoked_tokens()
+        current_app.logger.debug(f"Tokens revocados expirados eliminados: {deleted}")
+        return deleted
 
     @staticmethod
     def register_user(username: str, password: str) -> dict:
@@ -79,27 +135,21 @@ class AuthService:
 
     @staticmethod
     def login_user(username: str, password: str) -> dict:
-        if username in failed_attempts:
-            attempts, timestamp = failed_attempts[username]
-            if attempts >= current_app.config['MAX_LOGIN_ATTEMPTS']:
-                if time.time() - timestamp < current_app.config['LOGIN_TIMEOUT']:
-                    raise ValueError("Cuenta bloqueada temporalmente")
-                failed_attempts.pop(username)
-
-        if username not in users_db:
-            AuthService._record_failed_attempt(username)
-            raise ValueError("Usuario o contraseña incorrectos")
+        lockout = get_login_lockout()
+        if lockout.locked_for(username):
+            raise ValueError("Cuenta bloqueada temporalmente")
 
-        if not check_password_hash(users_db[username]['password'], password):
-            AuthService._record_failed_attempt(username)
+        if username not in users_db or not check_password_hash(
+            users_db[username]['password'], password
+        ):
+            lockout.record_failure(username)
             raise ValueError("Usuario o contraseña incorrectos")
 
         # Éxito - generar tokens
         access_token = create_access_token(identity=username)
         refresh_token = create_refresh_token(identity=username)
 
-        if username in failed_attempts:
-            failed_attempts.pop(username)
+        lockout.reset(username)
 
         return {
             "access_token": access_token,
@@ -108,14 +158,5 @@ class AuthService:
 
     @staticmethod
     def logout_user(token: str) -> dict:
-        blacklisted_tokens.add(token)
+        AuthService.revoke_token(decode_token(token, allow_expired=True))
         return {"message": "Sesión cerrada exitosamente"}
-
-    @staticmethod
-    def is_token_blacklisted(token: str) -> bool:
-        return token in blacklisted_tokens
-
-    @staticmethod
-    def _record_failed_attempt(username: str):
-        attempts, _ = failed_attempts.get(username, (0, 0))
-        failed_attempts[username] = (attempts + 1, time.time())
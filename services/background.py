@@ -0,0 +1,126 @@
+"""
+Tareas periódicas en segundo plano.
+
+Cada worker arranca sus propios hilos, pero una tarea solo se ejecuta en el
+worker que posee su lease en el almacén local, de modo que un host con varios
+workers de gunicorn no repite el mismo trabajo.
+"""
+import os
+import time
+import uuid
+import threading
+import logging
+from .local_store import LocalStore, local_store_path
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS task_lease (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+)
+
+# Hilos arrancados en este proceso, por nombre de tarea
+_started = {}
+_started_pid = None
+_started_lock = threading.Lock()
+
+
+class TaskLease:
+    """Lease por tarea compartido entre los procesos del host."""
+
+    def __init__(self, store):
+        self.store = store
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def acquire(self, name, ttl):
+        """
+        Obtiene o renueva el lease de una tarea.
+
+        Returns:
+            bool: True si este proceso debe ejecutar la tarea
+        """
+        now = time.time()
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                'SELECT owner, expires_at FROM task_lease WHERE name = ?', (name,)
+            ).fetchone()
+            if row and row[0] != self.owner and row[1] > now:
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO task_lease (name, '
+                'owner, expires_at) VALUES (?, ?, ?)',
+                (name, self.owner, now + ttl),
+            )
+        return True
+
+
+class PeriodicTask(threading.Thread):
+    """Ejecuta una función cada `interval` segundos dentro del contexto de la app."""
+
+    def __init__(self, app, name, func, interval, lease):
+        super().__init__(name=f"task-{name}", daemon=True)
+        self.app = app
+        self.task_name = name
+        self.func = func
+        self.interval = interval
+        self.lease = lease
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                # El lease dura dos intervalos para tolerar retrasos puntuales
+                if not self.lease.acquire(self.task_name, self.interval * 2):
+                    continue
+                with self.app.app_context():
+                    self.func()
+            except Exception as e:
+                logger.exception(
+                    f"Error en tarea en segundo plano {self.task_name}: {str(e)}"
+                )
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_background_tasks(app, tasks):
+    """
+    Arranca las tareas periódicas de la aplicación en este proceso.
+
+    Es idempotente por proceso: tras un fork los hilos del padre no existen,
+    así que se vuelven a arrancar.
+
+    Args:
+        app (Flask): La aplicación Flask
+        tasks (list): Tuplas (nombre, función, intervalo en segundos)
+    """
+    global _started_pid
+    with _started_lock:
+        if _started_pid != os.getpid():
+            _started.clear()
+            _started_pid = os.getpid()
+
+        lease = TaskLease(
+            LocalStore(local_store_path(app, 'background_leases.db'), schema=_SCHEMA)
+        )
+        for name, func, interval in tasks:
+            if name in _started:
+                continue
+            task = PeriodicTask(app, name, func, interval, lease)
+            task.start()
+            _started[name] = task
+            logger.info(f"Tarea en segundo plano iniciada: {name} (cada {interval}s)")
+    return dict(_started)
+
+
+def stop_background_tasks():
+    """Detiene las tareas arrancadas en este proceso."""
+    with _started_lock:
+        for task in _started.values():
+            task.stop()
+        _started.clear()
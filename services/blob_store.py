@@ -0,0 +1,111 @@
+"""
+Almacén local de ficheros (PDFs) direccionado por contenido.
+
+Los ficheros se guardan bajo BLOB_STORE_DIR con su SHA-256 como nombre,
+repartidos en subdirectorios por prefijo. Las escrituras se hacen sobre un
+fichero temporal que se renombra atómicamente al terminar, de modo que un
+lector nunca ve un fichero a medio escribir.
+"""
+import os
+import hashlib
+import tempfile
+import logging
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class BlobWriter:
+    """Escritura incremental de un blob; el nombre se conoce al confirmar."""
+
+    def __init__(self, store):
+        self.store = store
+        self._hash = hashlib.sha256()
+        self.size = 0
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir, suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+        self.key = None
+
+    def write(self, data):
+        self._file.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+    def commit(self):
+        """Cierra el fichero y lo mueve a su ruta definitiva. Devuelve la clave."""
+        self._file.close()
+        self.key = self._hash.hexdigest()
+        final_path = self.store.path(self.key)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(self._tmp_path, final_path)
+        return self.key
+
+    def abort(self):
+        """Descarta lo escrito."""
+        try:
+            self._file.close()
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        elif self.key is None:
+            self.commit()
+        return False
+
+
+class BlobStore:
+    """Almacén de blobs sobre el sistema de ficheros local."""
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, key):
+        """Ruta en disco del blob con la clave indicada."""
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key):
+        return bool(key) and os.path.exists(self.path(key))
+
+    def put(self, data):
+        """
+        Guarda un blob completo.
+
+        Returns:
+            str: Clave (SHA-256) del blob
+        """
+        with self.writer() as writer:
+            writer.write(data)
+        return writer.key
+
+    def writer(self):
+        """Devuelve un BlobWriter para escrituras por trozos."""
+        return BlobWriter(self)
+
+    def read(self, key):
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+
+def get_blob_store(app=None):
+    """
+    Devuelve el almacén de blobs de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    store = app.extensions.get('blob_store')
+    if store is None:
+        root = app.config.get('BLOB_STORE_DIR') or os.path.join(
+            app.instance_path, 'blobs'
+        )
+        store = app.extensions.setdefault('blob_store', BlobStore(root))
+    return store
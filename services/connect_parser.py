@@ -0,0 +1,375 @@
+"""
+Parser incremental de las entregas JSON de DocuSign Connect.
+
+Con "Include Documents" activado, Connect incluye cada documento del envelope
+en base64 (`PDFBytes` o `documentBase64`), así que una entrega puede pesar
+varios megabytes. Parsearla con `json.loads` materializa el cuerpo, la cadena
+base64 y el PDF decodificado a la vez.
+
+Este parser lee el cuerpo por bloques y construye el árbol JSON de los
+metadatos, pero el contenido de los documentos no llega a acumularse: se
+decodifica por trozos y se escribe directamente en el almacén de blobs, y en el
+árbol queda una referencia `{"blob_key": ..., "size": ...}`. La memoria por
+entrega no depende del tamaño de los documentos.
+"""
+import io
+import re
+import json
+import base64
+import codecs
+import binascii
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Campos cuyo valor es el contenido de un documento en base64
+DOCUMENT_CONTENT_KEYS = frozenset(('PDFBytes', 'documentBase64'))
+CHUNK_SIZE = 64 * 1024
+# Caracteres base64 acumulados antes de decodificar y escribir
+DECODE_BATCH = 64 * 1024
+MAX_DEPTH = 64
+
+_WHITESPACE = ' \t\r\n'
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[\s,\]}]')
+_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class ConnectPayloadError(ValueError):
+    """La entrega de Connect no es un JSON válido."""
+
+
+class _Base64Sink:
+    """Decodifica base64 recibido por trozos y lo escribe en un BlobWriter."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._parts = []
+        self._size = 0
+        self._pending = ''
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= DECODE_BATCH:
+            self._flush()
+
+    def _flush(self):
+        text = self._pending + ''.join(''.join(self._parts).split())
+        self._parts = []
+        self._size = 0
+        usable = len(text) - len(text) % 4
+        if usable:
+            try:
+                self.writer.write(base64.b64decode(text[:usable], validate=True))
+            except (binascii.Error, ValueError) as e:
+                raise ConnectPayloadError(f"Contenido base64 inválido: {str(e)}")
+        self._pending = text[usable:]
+
+    def close(self):
+        self._flush()
+        if self._pending:
+            raise ConnectPayloadError("Contenido base64 truncado")
+
+
+class _Parser:
+    """Parser JSON de descenso recursivo sobre un stream leído por bloques."""
+
+    def __init__(self, stream, blob_store, chunk_size):
+        self._stream = stream
+        self._blob_store = blob_store
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._eof = False
+        self.buf = ''
+        self.pos = 0
+
+    def _fill(self):
+        """
+        Añade el siguiente bloque al buffer descartando lo ya consumido. False al final.
+        """
+        while not self._eof:
+            data = self._stream.read(self._chunk_size)
+            if data:
+                text = self._decoder.decode(data)
+            else:
+                self._eof = True
+                text = self._decoder.decode(b'', final=True)
+            if text:
+                self.buf = self.buf[self.pos:] + text
+                self.pos = 0
+                return True
+        return False
+
+    def _ensure(self, count):
+        while len(self.buf) - self.pos < count:
+            if not self._fill():
+                raise ConnectPayloadError("Fin inesperado del payload")
+
+    def peek(self):
+        """Siguiente carácter significativo sin consumirlo ('' al final)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def next(self):
+        char = self.peek()
+        if not char:
+            raise ConnectPayloadError("Fin inesperado del payload")
+        self.pos += 1
+        return char
+
+    def expect(self, expected):
+        char = self.next()
+        if char != expected:
+            raise ConnectPayloadError(
+                f"Se esperaba '{expected}' y se encontró '{char}'"
+            )
+
+    def value(self, key=None, depth=0):
+        if depth > MAX_DEPTH:
+            raise ConnectPayloadError("Anidamiento excesivo")
+        char = self.peek()
+        if char == '{':
+            return self._object(depth)
+        if char == '[':
+            return self._array(depth)
+        if char == '"':
+            self.pos += 1
+            if key in DOCUMENT_CONTENT_KEYS:
+                return self._document()
+            return self.string()
+        if not char:
+            raise ConnectPayloadError("Fin inesperado del payload")
+        return self._scalar()
+
+    def _object(self, depth):
+        self.pos += 1
+        result = {}
+        if self.peek() == '}':
+            self.pos += 1
+            return result
+        while True:
+            self.expect('"')
+            key = self.string()
+            self.expect(':')
+            result[key] = self.value(key, depth + 1)
+            separator = self.next()
+            if separator == '}':
+                return result
+            if separator != ',':
+                raise ConnectPayloadError(
+                    f"Separador inesperado '{separator}' en objeto"
+                )
+
+    def _array(self, depth):
+        self.pos += 1
+        result = []
+        if self.peek() == ']':
+            self.pos += 1
+            return result
+        while True:
+            result.append(self.value(None, depth + 1))
+            separator = self.next()
+            if separator == ']':
+                return result
+            if separator != ',':
+                raise ConnectPayloadError(
+                    f"Separador inesperado '{separator}' en lista"
+                )
+
+    def string(self, sink=None):
+        """
+        Lee una cadena ya abierta. Sin sink la devuelve; con sink le pasa los
+        trozos según llegan y no acumula nada.
+        """
+        parts = []
+        emit = parts.append if sink is None else sink
+        while True:
+            match = _STRING_SPECIAL.search(self.buf, self.pos)
+            if match is None:
+                if self.pos < len(self.buf):
+                    emit(self.buf[self.pos:])
+                    self.pos = len(self.buf)
+                if not self._fill():
+                    raise ConnectPayloadError("Cadena sin terminar")
+                continue
+            start = match.start()
+            if start > self.pos:
+                emit(self.buf[self.pos:start])
+            self.pos = start + 1
+            if self.buf[start] == '"':
+                return ''.join(parts) if sink is None else None
+            emit(self._escape())
+
+    def _escape(self):
+        self._ensure(1)
+        char = self.buf[self.pos]
+        self.pos += 1
+        if char in _ESCAPES:
+            return _ESCAPES[char]
+        if char != 'u':
+            raise ConnectPayloadError(f"Secuencia de escape inválida '\\{char}'")
+        code = self._hex4()
+        # Pares suplentes: caracteres fuera del plano básico
+        if 0xD800 <= code < 0xDC00:
+            while len(self.buf) - self.pos < 6 and self._fill():
+                pass
+            if self.buf.startswith('\\u', self.pos):
+                self.pos += 2
+                low = self._hex4()
+                if 0xDC00 <= low < 0xE000:
+                    return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00))
+                return chr(code) + chr(low)
+        return chr(code)
+
+    def _hex4(self):
+        self._ensure(4)
+        digits = self.buf[self.pos:self.pos + 4]
+        self.pos += 4
+        try:
+            return int(digits, 16)
+        except ValueError:
+            raise ConnectPayloadError(f"Escape unicode inválido '\\u{digits}'")
+
+    def _scalar(self):
+        while True:
+            match = _SCALAR_END.search(self.buf, self.pos)
+            if match is not None or not self._fill():
+                break
+        end = match.start() if match is not None else len(self.buf)
+        token = self.buf[self.pos:end]
+        self.pos = end
+        if token == 'true':
+            return True
+        if token == 'false':
+            return False
+        if token == 'null':
+            return None
+        try:
+            return json.loads(token)
+        except ValueError:
+            raise ConnectPayloadError(f"Valor inesperado '{token[:20]}'")
+
+    def _document(self):
+        writer = self._blob_store.writer()
+        try:
+            sink = _Base64Sink(writer)
+            self.string(sink.write)
+            sink.close()
+            key = writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+        return {'blob_key': key, 'size': writer.size}
+
+
+def parse_connect_payload(source, blob_store, chunk_size=CHUNK_SIZE):
+    """
+    Parsea una entrega de Connect guardando los
+    documentos embebidos en el almacén de blobs.
+
+    Args:
+        source (bytes | file): Cuerpo crudo o stream binario del que leer
+        blob_store (BlobStore): Almacén donde escribir los documentos decodificados
+        chunk_size (int): Bytes leídos por bloque
+
+    Returns:
+        dict: Árbol JSON con cada documento sustituido por {"blob_key", "size"}
+
+    Raises:
+        ConnectPayloadError: Si el cuerpo no es un objeto JSON válido
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    parser = _Parser(source, blob_store, chunk_size)
+    try:
+        data = parser.value()
+    except UnicodeDecodeError as e:
+        raise ConnectPayloadError(f"Codificación inválida: {str(e)}")
+    if parser.peek():
+        raise ConnectPayloadError("Contenido inesperado tras el objeto JSON")
+    if not isinstance(data, dict):
+        raise ConnectPayloadError("El payload no es un objeto JSON")
+    return data
+
+
+def envelope_fields(data):
+    """
+    Extrae el envelope y su estado de una entrega, en formato plano o de Connect 2.1.
+
+    Returns:
+        tuple: (envelope_id, status) o (None, None)
+    """
+    if not isinstance(data, dict):
+        return None, None
+    nested = data.get('data') if isinstance(data.get('data'), dict) else {}
+    summary = (
+        nested.get('envelopeSummary')
+        if isinstance(nested.get('envelopeSummary'), dict)
+        else {}
+    )
+
+    envelope_id = (
+        data.get('envelopeId') or nested.get('envelopeId') or summary.get('envelopeId')
+    )
+    status = data.get('status') or summary.get('status')
+    event = data.get('event')
+    if not status and isinstance(event, str) and event.startswith('envelope-'):
+        status = event[len('envelope-'):]
+    if not isinstance(envelope_id, str) or not isinstance(status, str):
+        return None, None
+    return envelope_id, status.lower()
+
+
+def embedded_documents(data):
+    """
+    Documentos guardados por el parser: [{documentId, name, type, blob_key, size}].
+    """
+    documents = []
+    pending = [data]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(reversed(node))
+        elif isinstance(node, dict):
+            for key in DOCUMENT_CONTENT_KEYS:
+                content = node.get(key)
+                if isinstance(content, dict) and 'blob_key' in content:
+                    documents.append({
+                        'documentId': node.get('documentId'),
+                        'name': node.get('name'),
+                        'type': node.get('type'),
+                        'blob_key': content['blob_key'],
+                        'size': content.get('size'),
+                    })
+            pending.extend(reversed([
+                value for key, value in node.items()
+                if key not in DOCUMENT_CONTENT_KEYS and isinstance(value, (dict, list))
+            ]))
+    return documents
+
+
+def signed_document_key(data):
+    """
+    Blob del documento firmado de la entrega, si contiene exactamente un
+    documento aparte del certificado de finalización.
+    """
+    documents = [
+        document for document in embedded_documents(data)
+        if document['documentId'] != 'certificate' and document['type'] != 'summary'
+    ]
+    return documents[0]['blob_key'] if len(documents) == 1 else None
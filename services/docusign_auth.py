@@ -1,6 +1,7 @@
 import os
 import jwt
 import time
+import threading
 import requests
 import logging
 from flask import current_app
@@ -14,6 +15,7 @@ class DocuSignAuth:
         self._token: Optional[str] = None
         self._token_expiration: float = 0
         self._jwt_token: Optional[str] = None
+        self._lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
 
     def _generate_jwt(self) -> str:
@@ -59,10 +61,18 @@ class DocuSignAuth:
         """
         current_time = time.time()
 
-        # Verificar si necesitamos un nuevo token
-        if (not self._token or 
-            current_time >= self._token_expiration or 
-            force_refresh):
+        # Camino rápido sin bloqueo: token vigente
+        if self._token and current_time < self._token_expiration and not force_refresh:
+            return self._token
+
+        # Solo un hilo renueva el token; el resto reutiliza el resultado
+        with self._lock:
+            if (
+                self._token
+                and time.time() < self._token_expiration
+                and not force_refresh
+            ):
+                return self._token
             
             try:
                 jwt_token = self._generate_jwt()
@@ -1,9 +1,56 @@
+"""
+Verificación de las firmas HMAC de DocuSign Connect.
+
+DocuSign firma el cuerpo crudo de cada entrega con HMAC-SHA256 y envía la firma
+en base64 en `X-DocuSign-Signature-1`. Si la entrega trae
+`X-DocuSign-Signature-Timestamp`, el mensaje firmado es `timestamp\ncuerpo\n`,
+de modo que el timestamp también queda autenticado y se puede usar para
+rechazar repeticiones. Durante una rotación de claves Connect
+firma con todas las claves activas y añade `X-DocuSign-Signature-2..N`, así que
+una entrega es válida si cualquiera de sus firmas corresponde a alguna de las
+claves configuradas.
+
+El estado HMAC inicializado con cada clave se calcula una sola vez y se copia
+por petición, y los cuerpos grandes se verifican por bloques leyendo del stream
+de la petición en lugar de cargarlos enteros en memoria.
+"""
+import io
 import hmac
 import hashlib
 import base64
-import json
+import binascii
+import tempfile
 from flask import current_app, Request, abort
-from typing import Tuple
+from typing import Iterable, List, Optional, Tuple
+
+SIGNATURE_HEADER_PREFIX = 'X-DocuSign-Signature-'
+TIMESTAMP_HEADER = 'X-DocuSign-Signature-Timestamp'
+# DocuSign admite hasta 100 claves HMAC por cuenta
+MAX_SIGNATURE_HEADERS = 100
+# Por debajo de este tamaño el cuerpo se lee de una vez
+STREAM_THRESHOLD = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+# Los cuerpos verificados por bloques se guardan
+# en memoria hasta este tamaño y después en disco
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def configured_keys(app=None) -> List[str]:
+    """
+    Claves HMAC configuradas: DOCUSIGN_HMAC_KEYS
+        (separadas por comas) y DOCUSIGN_HMAC_KEY.
+    """
+    app = app or current_app
+    keys = [
+        key.strip() for key in (app.config.get('DOCUSIGN_HMAC_KEYS') or '').split(',')
+    ]
+    keys.append(app.config.get('DOCUSIGN_HMAC_KEY') or '')
+    unique = []
+    for key in keys:
+        if key and key not in unique:
+            unique.append(key)
+    return unique
+
 
 class DocuSignHMACValidator:
     """
@@ -11,63 +58,177 @@ class DocuSignHMACValidator:
     Implementa la verificación de seguridad según la especificación de DocuSign.
     """
 
-    def __init__(self):
-        """Inicializa el validador obteniendo la clave HMAC de la configuración"""
-        self.hmac_key = current_app.config['DOCUSIGN_HMAC_KEY'].encode('utf-8')
-        if not self.hmac_key:
+    def __init__(self, hmac_keys=None):
+        """
+        Args:
+            hmac_keys (str | list[str]): Clave o claves
+                activas (por defecto, las de la configuración)
+        """
+        if hmac_keys is None:
+            hmac_keys = configured_keys()
+        elif isinstance(hmac_keys, (str, bytes)):
+            hmac_keys = [hmac_keys]
+        keys = [
+            key.encode('utf-8') if isinstance(key, str) else key
+            for key in hmac_keys
+            if key
+        ]
+        if not keys:
             raise ValueError("DOCUSIGN_HMAC_KEY no está configurada")
+        # Estado HMAC con la clave ya procesada: por petición solo se copia
+        self._states = [hmac.new(key, digestmod=hashlib.sha256) for key in keys]
+
+    @staticmethod
+    def signatures(headers) -> List[bytes]:
+        """Firmas decodificadas de las cabeceras X-DocuSign-Signature-1..N."""
+        decoded = []
+        for index in range(1, MAX_SIGNATURE_HEADERS + 1):
+            value = headers.get(f"{SIGNATURE_HEADER_PREFIX}{index}")
+            if not value:
+                break
+            try:
+                decoded.append(base64.b64decode(value, validate=True))
+            except (binascii.Error, ValueError):
+                continue
+        return decoded
+
+    @staticmethod
+    def _framing(timestamp: Optional[str]) -> Tuple[bytes, bytes]:
+        """
+        Prefijo y sufijo del mensaje firmado:
+        `timestamp\n` + cuerpo + `\n` si hay timestamp.
+        """
+        if timestamp is None:
+            return b'', b''
+        return timestamp.encode('utf-8') + b'\n', b'\n'
+
+    def verify_chunks(self, chunks: Iterable[bytes], signatures: List[bytes],
+                      timestamp: Optional[str] = None) -> bool:
+        """
+        Verifica un cuerpo recibido por bloques contra las firmas de la entrega.
+
+        Cada bloque alimenta a la vez el estado de todas las claves, así que el
+        cuerpo se recorre una sola vez.
+
+        Args:
+            chunks: Bloques del cuerpo en orden
+            signatures: Firmas decodificadas (ver signatures)
+            timestamp: Cabecera X-DocuSign-Signature-Timestamp, si la entrega la trae
+        """
+        if not signatures:
+            return False
+        prefix, suffix = self._framing(timestamp)
+        states = [state.copy() for state in self._states]
+        for state in states:
+            state.update(prefix)
+        for chunk in chunks:
+            for state in states:
+                state.update(chunk)
+        for state in states:
+            state.update(suffix)
+        return any(self._matches(state.digest(), signatures) for state in states)
+
+    def verify(self, body: bytes, headers) -> bool:
+        """
+        Verifica un cuerpo completo contra las firmas (y el timestamp) de las cabeceras.
+        """
+        signatures = self.signatures(headers)
+        if not signatures:
+            return False
+        prefix, suffix = self._framing(headers.get(TIMESTAMP_HEADER))
+        message = prefix + body + suffix
+        # Con el cuerpo en memoria se prueba clave a
+        # clave y se para en la primera que coincide
+        for state in self._states:
+            state = state.copy()
+            state.update(message)
+            if self._matches(state.digest(), signatures):
+                return True
+        return False
+
+    @staticmethod
+    def _matches(digest: bytes, signatures: List[bytes]) -> bool:
+        # Comparación en tiempo constante contra todas las firmas de la entrega
+        valid = False
+        for signature in signatures:
+            valid |= hmac.compare_digest(digest, signature)
+        return valid
+
+    def validate_request(self, request: Request) -> Tuple[bool, str]:
+        """
+        Valida la firma HMAC de una solicitud webhook de DocuSign.
+
+        Los cuerpos grandes se leen del stream por bloques y se guardan en un
+        fichero temporal que sustituye al stream. En ambos casos, tras validar,
+        `request.get_data()` y `request.stream` devuelven el cuerpo completo.
+
+        Returns:
+            Tuple[bool, str]: (es_válido, mensaje_error)
+        """
+        signatures = self.signatures(request.headers)
+        if not signatures:
+            return False, "Faltan cabeceras de firma requeridas"
+
+        content_length = request.content_length
+        already_read = request.__dict__.get('_cached_data') is not None
+        if already_read or content_length is None or content_length <= STREAM_THRESHOLD:
+            body = request.get_data()
+            valid = self.verify(body, request.headers)
+            request.__dict__['stream'] = io.BytesIO(body)
+        else:
+            spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+            def chunks():
+                while True:
+                    chunk = request.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    spool.write(chunk)
+                    yield chunk
+
+            valid = self.verify_chunks(
+                chunks(), signatures, request.headers.get(TIMESTAMP_HEADER)
+            )
+            spool.seek(0)
+            # `stream` es una propiedad cacheada de
+            # werkzeug: se sustituye por el cuerpo ya leído
+            request.__dict__['stream'] = spool
+            request.__dict__.pop('_cached_data', None)
+
+        if not valid:
+            return False, "Firma HMAC inválida"
+        return True, ""
 
     def validate_or_abort(self, request: Request) -> None:
         """
         Valida la firma HMAC de una solicitud y aborta con 403 si es inválida.
-        
+
         Args:
             request: Objeto Request de Flask
-            
+
         Raises:
             Abort(403): Si la validación falla
         """
-        is_valid, error = self._validate_request(request)
+        is_valid, error = self.validate_request(request)
         if not is_valid:
             current_app.logger.error(f"Validación HMAC fallida: {error}")
             abort(403, description=f"Firma inválida: {error}")
 
-    def _validate_request(self, request: Request) -> Tuple[bool, str]:
-        """
-        Implementación interna de la validación HMAC.
-        
-        Args:
-            request: Objeto Request de Flask
-            
-        Returns:
-            Tuple[bool, str]: (es_válido, mensaje_error)
-        """
-        try:
-            # Obtener y validar cabeceras requeridas
-            signature = request.headers.get('X-DocuSign-Signature-1')
-            timestamp = request.headers.get('X-DocuSign-Signature-Timestamp')
-            
-            if not signature or not timestamp:
-                return False, "Faltan cabeceras de firma requeridas"
-
-            # Obtener payload y construir mensaje
-            payload = request.get_data()
-            message = timestamp.encode('utf-8') + b'\n' + payload + b'\n'
-
-            # Calcular HMAC usando SHA256
-            calculated_hmac = hmac.new(
-                self.hmac_key,
-                message,
-                hashlib.sha256
-            )
-            calculated_signature = base64.b64encode(calculated_hmac.digest()).decode()
-
-            # Comparación segura contra timing attacks
-            if not hmac.compare_digest(calculated_signature, signature):
-                return False, "Firma HMAC inválida"
 
-            return True, ""
+def get_hmac_validator(app=None):
+    """
+    Devuelve el validador de la aplicación,
+    reconstruido si cambian las claves configuradas.
 
-        except Exception as e:
-            current_app.logger.error(f"Error en validación HMAC: {str(e)}")
-            return False, f"Error validando firma HMAC: {str(e)}"
+    Returns:
+        DocuSignHMACValidator | None: None si no hay ninguna clave configurada
+    """
+    app = app or current_app._get_current_object()
+    keys = tuple(configured_keys(app))
+    if not keys:
+        return None
+    cached = app.extensions.get('docusign_hmac')
+    if cached is None or cached[0] != keys:
+        cached = (keys, DocuSignHMACValidator(list(keys)))
+        app.extensions['docusign_hmac'] = cached
+    return cached[1]
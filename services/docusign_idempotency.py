@@ -0,0 +1,231 @@
+"""
+Idempotencia en la creación de envelopes.
+
+Cada solicitud de firma se identifica por la Idempotency-Key enviada por el
+cliente o, en su defecto, por el SHA-256 del PDF, su título y la referencia
+del documento en el sistema del cliente (`document_id`), más la lista
+normalizada de destinatarios. Los reintentos y dobles clics encuentran el
+envelope existente con una única consulta sobre un índice único en lugar de
+crear uno nuevo.
+
+Las claves derivadas del contenido caducan a los DOCUSIGN_IDEMPOTENCY_TTL
+segundos: pasado ese tiempo, volver a enviar el mismo documento a los mismos
+destinatarios (por ejemplo, tras anularlo o rechazarlo) crea un envelope nuevo.
+Las Idempotency-Key del cliente no caducan.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from models.database import db
+from models.envelope_request import EnvelopeRequest
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyConflict(Exception):
+    """La Idempotency-Key del cliente ya se usó con otro documento o destinatarios."""
+
+
+def normalize_recipients(recipients):
+    """
+    Normaliza los destinatarios para que el orden, las mayúsculas del email
+    o los espacios del nombre no cambien la clave.
+
+    Returns:
+        str: Representación JSON canónica
+    """
+    normalized = sorted(
+        (
+            (recipient.get('email') or '').strip().lower(),
+            ' '.join((recipient.get('name') or '').split())
+        )
+        for recipient in recipients
+    )
+    return json.dumps(normalized, separators=(',', ':'), ensure_ascii=False)
+
+
+def compute_hashes(pdf_bytes, recipients, title=None, reference=None):
+    """
+    Args:
+        title (str): Título del documento
+        reference (str): Identificador del documento en el sistema del cliente
+
+    Returns:
+        tuple: (sha256 del documento, su título y referencia;
+            sha256 de los destinatarios normalizados)
+    """
+    document = hashlib.sha256(pdf_bytes)
+    if title:
+        document.update(b'\0' + ' '.join(title.split()).encode('utf-8'))
+    if reference:
+        document.update(b'\0ref:' + str(reference).strip().encode('utf-8'))
+    recipients_hash = hashlib.sha256(
+        normalize_recipients(recipients).encode('utf-8')
+    ).hexdigest()
+    return document.hexdigest(), recipients_hash
+
+
+def compute_idempotency_key(user_id, document_hash, recipients_hash, client_key=None):
+    """
+    Calcula la clave de idempotencia de una solicitud de firma.
+
+    La clave siempre incluye al usuario para que dos usuarios no colisionen.
+
+    Args:
+        user_id: Usuario que envía el documento
+        document_hash (str): SHA-256 del PDF, su título y su referencia
+        recipients_hash (str): SHA-256 de los destinatarios normalizados
+        client_key (str): Cabecera Idempotency-Key opcional
+    """
+    if client_key:
+        material = f"client:{user_id}:{client_key.strip()}"
+    else:
+        material = f"content:{user_id}:{document_hash}:{recipients_hash}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def _lookup(user_id, pdf_bytes, recipients, client_key, title, reference):
+    """
+    Returns:
+        tuple: (document_hash, recipients_hash, clave, EnvelopeRequest o None)
+
+    Raises:
+        IdempotencyKeyConflict: Si la clave del cliente se reutiliza con otro contenido
+    """
+    document_hash, recipients_hash = compute_hashes(
+        pdf_bytes, recipients, title, reference
+    )
+    key = compute_idempotency_key(user_id, document_hash, recipients_hash, client_key)
+    existing = EnvelopeRequest.query.filter_by(idempotency_key=key).first()
+    if (
+        existing is not None
+        and client_key
+        and (
+            existing.document_hash != document_hash
+            or existing.recipients_hash != recipients_hash
+        )
+    ):
+        raise IdempotencyKeyConflict(
+            "La Idempotency-Key ya se utilizó con "
+            "un documento o destinatarios distintos"
+        )
+    return document_hash, recipients_hash, key, existing
+
+
+def _expired(record, client_key):
+    """
+    Las claves derivadas del contenido dejan de valer pasado DOCUSIGN_IDEMPOTENCY_TTL.
+    """
+    if client_key or record.created_at is None:
+        return False
+    ttl = current_app.config.get('DOCUSIGN_IDEMPOTENCY_TTL', 3600)
+    return record.created_at <= datetime.utcnow() - timedelta(seconds=ttl)
+
+
+def find_envelope_request(
+    user_id, pdf_bytes, recipients, client_key=None, title=None, reference=None
+):
+    """
+    Busca una solicitud previa equivalente.
+
+    Returns:
+        EnvelopeRequest o None
+
+    Raises:
+        IdempotencyKeyConflict: Si la clave del cliente se reutiliza con otro contenido
+    """
+    existing = _lookup(user_id, pdf_bytes, recipients, client_key, title, reference)[3]
+    if existing is None or _expired(existing, client_key):
+        return None
+    return existing
+
+
+def claim_envelope_request(
+    user_id,
+    pdf_bytes,
+    recipients,
+    client_key=None,
+    commit=True,
+    title=None,
+    reference=None,
+):
+    """
+    Busca la solicitud existente o reserva una nueva.
+
+    Args:
+        commit (bool): Si es False la reserva solo se vuelca a la sesión y el
+            llamador la confirma junto con el resto de su transacción
+        title (str): Título del documento, parte de su identidad
+        reference (str): Identificador del documento en
+            el sistema del cliente, parte de su identidad
+
+    Returns:
+        tuple: (EnvelopeRequest, creado: bool)
+
+    Raises:
+        IdempotencyKeyConflict: Si la clave del cliente se reutiliza con otro contenido
+    """
+    document_hash, recipients_hash, key, existing = _lookup(
+        user_id, pdf_bytes, recipients, client_key, title, reference
+    )
+    if existing is not None:
+        if not _expired(existing, client_key):
+            return existing, False
+        # La fila caducada se conserva (el outbox la
+        # referencia) con una clave que ya no se calcula
+        existing.idempotency_key = hashlib.sha256(
+            f"expired:{existing.id}:{key}".encode('utf-8')
+        ).hexdigest()
+
+    record = EnvelopeRequest(
+        idempotency_key=key,
+        document_hash=document_hash,
+        recipients_hash=recipients_hash,
+        user_id=user_id,
+        status='pending'
+    )
+    db.session.add(record)
+    try:
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+        return record, True
+    except IntegrityError:
+        # Otra petición concurrente reservó la misma clave
+        db.session.rollback()
+        return (
+            find_envelope_request(
+                user_id, pdf_bytes, recipients, client_key, title, reference
+            ),
+            False,
+        )
+
+
+def complete_envelope_request(record, result, commit=True):
+    """Asocia el envelope creado a la solicitud reservada."""
+    record.envelope_id = result.get('envelope_id')
+    record.status = result.get('status') or 'sent'
+    record.status_datetime = (
+        str(result.get('status_datetime')) if result.get('status_datetime') else None
+    )
+    if commit:
+        db.session.commit()
+
+
+def release_envelope_request(record, commit=True):
+    """Libera la reserva tras un fallo para que el cliente pueda reintentar."""
+    if not commit:
+        db.session.delete(record)
+        return
+    try:
+        db.session.delete(record)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(
+            f"No se pudo liberar la reserva de idempotencia {record.id}: {str(e)}"
+        )
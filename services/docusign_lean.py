@@ -0,0 +1,182 @@
+"""
+Lecturas ligeras de la API de DocuSign.
+
+Los modelos generados de docusign_esign deserializan el envelope completo en
+decenas de objetos (y validan cada atributo) aunque solo se lean tres campos.
+Para las lecturas frecuentes (estado del envelope y de sus destinatarios) se
+hace la petición directamente sobre el pool urllib3 del ApiClient compartido,
+se piden solo los datos necesarios y el JSON se convierte en registros
+pequeños con __slots__.
+
+scripts/benchmark_docusign_status.py compara el coste por llamada de ambos
+caminos.
+"""
+import json
+from urllib.parse import quote, urlencode
+from docusign_esign.client.api_exception import ApiException
+
+
+class EnvelopeStatus:
+    """Estado de un envelope."""
+
+    __slots__ = (
+        'envelope_id',
+        'status',
+        'created_date',
+        'completed_date',
+        'status_changed_date',
+    )
+
+    def __init__(
+        self,
+        envelope_id,
+        status,
+        created_date=None,
+        completed_date=None,
+        status_changed_date=None,
+    ):
+        self.envelope_id = envelope_id
+        self.status = status
+        self.created_date = created_date
+        self.completed_date = completed_date
+        self.status_changed_date = status_changed_date
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data.get('envelopeId'),
+            data.get('status'),
+            data.get('createdDateTime'),
+            data.get('completedDateTime'),
+            data.get('statusChangedDateTime')
+        )
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "completed_date": self.completed_date,
+            "created_date": self.created_date
+        }
+
+    def __repr__(self):
+        return f'<EnvelopeStatus {self.envelope_id} {self.status}>'
+
+
+class RecipientStatus:
+    """Estado de un firmante de un envelope."""
+
+    __slots__ = (
+        'recipient_id',
+        'email',
+        'name',
+        'status',
+        'routing_order',
+        'client_user_id',
+        'signed_date',
+    )
+
+    def __init__(
+        self,
+        recipient_id,
+        email,
+        name,
+        status,
+        routing_order=None,
+        client_user_id=None,
+        signed_date=None,
+    ):
+        self.recipient_id = recipient_id
+        self.email = email
+        self.name = name
+        self.status = status
+        self.routing_order = routing_order
+        self.client_user_id = client_user_id
+        self.signed_date = signed_date
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data.get('recipientId'),
+            data.get('email'),
+            data.get('name'),
+            data.get('status'),
+            data.get('routingOrder'),
+            data.get('clientUserId'),
+            data.get('signedDateTime')
+        )
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f'<RecipientStatus {self.email} {self.status}>'
+
+
+class LeanEnvelopeReader:
+    """
+    Peticiones GET de solo lectura que devuelven
+    JSON sin pasar por los modelos generados.
+    """
+
+    def __init__(self, api_client, account_id, timeout=10):
+        """
+        Args:
+            api_client (ApiClient): Cliente compartido
+                (aporta host, cabeceras y pool de conexiones)
+            account_id (str): Cuenta de DocuSign
+            timeout (float): Timeout de cada petición en segundos
+        """
+        self.api_client = api_client
+        self.account_id = account_id
+        self.timeout = timeout
+
+    def _get_json(self, path, query=None):
+        account = quote(self.account_id or '', safe='')
+        url = f"{self.api_client.host}/v2.1/accounts/{account}{path}"
+        if query:
+            url = f"{url}?{urlencode(query)}"
+        headers = dict(self.api_client.default_headers)
+        headers['Accept'] = 'application/json'
+        response = self.api_client.rest_client.pool_manager.request(
+            'GET', url, headers=headers, timeout=self.timeout
+        )
+        if not 200 <= response.status <= 299:
+            error = ApiException(status=response.status, reason=response.reason)
+            error.body = response.data
+            error.headers = dict(response.headers)
+            raise error
+        return json.loads(response.data)
+
+    def envelope_status(self, envelope_id):
+        """
+        Returns:
+            EnvelopeStatus
+        """
+        return EnvelopeStatus.from_json(
+            self._get_json(f"/envelopes/{quote(envelope_id, safe='')}")
+        )
+
+    def envelope_statuses(self, envelope_ids):
+        """
+        Estado de varios envelopes con una sola llamada.
+
+        Returns:
+            list[EnvelopeStatus]
+        """
+        if not envelope_ids:
+            return []
+        data = self._get_json('/envelopes', {'envelope_ids': ','.join(envelope_ids)})
+        return [EnvelopeStatus.from_json(item) for item in data.get('envelopes') or ()]
+
+    def recipient_statuses(self, envelope_id):
+        """
+        Estado de los firmantes, sin pestañas ni datos extendidos.
+
+        Returns:
+            list[RecipientStatus]
+        """
+        data = self._get_json(
+            f"/envelopes/{quote(envelope_id, safe='')}/recipients",
+            {'include_tabs': 'false', 'include_extended': 'false'}
+        )
+        return [RecipientStatus.from_json(item) for item in data.get('signers') or ()]
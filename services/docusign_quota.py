@@ -0,0 +1,179 @@
+"""
+Gobernador de cuota de llamadas a la API de DocuSign.
+
+DocuSign limita el número de llamadas por hora y por cuenta. Este módulo
+implementa un token bucket persistido en un almacén SQLite local para que todos
+los workers del host compartan el mismo presupuesto. Las llamadas interactivas
+(originadas por un usuario) tienen prioridad: el trabajo en segundo plano no
+puede consumir la reserva destinada a ellas y se difiere en su lugar.
+"""
+import time
+import logging
+from flask import current_app
+from config.monitoring import DOCUSIGN_QUOTA_REMAINING, DOCUSIGN_QUOTA_DEFERRED
+from .local_store import LocalStore, local_store_path
+
+logger = logging.getLogger(__name__)
+
+# Prioridades de llamada
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS quota_bucket (
+        account TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+)
+
+
+class DocuSignQuotaExceeded(Exception):
+    """Se lanza cuando no hay presupuesto de API disponible para la llamada."""
+
+    def __init__(self, account, priority, retry_after):
+        self.account = account
+        self.priority = priority
+        self.retry_after = retry_after
+        super().__init__(
+            f"Cuota de API DocuSign agotada para la cuenta {account} "
+            f"(prioridad {priority}). Reintentar en {retry_after:.1f} segundos"
+        )
+
+
+class DocuSignQuotaGovernor:
+    """Token bucket por cuenta compartido entre procesos a través de SQLite."""
+
+    def __init__(self, store, hourly_limit=3000, interactive_reserve=0.2, max_wait=2.0):
+        """
+        Args:
+            store (LocalStore): Almacén local compartido
+            hourly_limit (int): Llamadas permitidas por hora y cuenta
+            interactive_reserve (float): Fracción del
+                bucket reservada a llamadas interactivas
+            max_wait (float): Segundos que una llamada interactiva puede esperar a que
+                se rellene el bucket
+        """
+        self.store = store
+        self.capacity = float(hourly_limit)
+        self.refill_rate = self.capacity / 3600.0
+        self.reserve = self.capacity * interactive_reserve
+        self.max_wait = max_wait
+
+    def _refill(self, row, now):
+        if row is None:
+            return self.capacity
+        tokens, updated_at = row
+        return min(
+            self.capacity, tokens + max(0.0, now - updated_at) * self.refill_rate
+        )
+
+    def try_acquire(self, account, priority=INTERACTIVE, cost=1):
+        """
+        Intenta consumir `cost` llamadas del bucket de la cuenta.
+
+        Returns:
+            tuple: (concedido: bool, segundos hasta que haya presupuesto: float)
+        """
+        floor = self.reserve if priority == BACKGROUND else 0.0
+        now = time.time()
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM quota_bucket WHERE account = ?',
+                (account,)
+            ).fetchone()
+            tokens = self._refill(row, now)
+            granted = tokens - cost >= floor
+            if granted:
+                tokens -= cost
+            conn.execute(
+                'INSERT OR REPLACE INTO quota_bucket (account, tokens, updated_at) '
+                'VALUES (?, ?, ?)',
+                (account, tokens, now),
+            )
+
+        DOCUSIGN_QUOTA_REMAINING.labels(account=account).set(max(0.0, tokens))
+        if granted:
+            return True, 0.0
+        return False, (floor + cost - tokens) / self.refill_rate
+
+    def acquire(self, account, priority=INTERACTIVE, cost=1):
+        """
+        Consume presupuesto o lanza DocuSignQuotaExceeded.
+
+        Las llamadas interactivas esperan hasta `max_wait` segundos a que el
+        bucket se rellene; las de segundo plano nunca esperan, para que el
+        llamador las difiera.
+        """
+        deadline = time.monotonic() + (
+            self.max_wait if priority == INTERACTIVE else 0.0
+        )
+        while True:
+            granted, retry_after = self.try_acquire(account, priority, cost)
+            if granted:
+                return
+            remaining_wait = deadline - time.monotonic()
+            if retry_after > remaining_wait:
+                DOCUSIGN_QUOTA_DEFERRED.labels(priority=priority).inc()
+                raise DocuSignQuotaExceeded(account, priority, retry_after)
+            time.sleep(retry_after)
+
+    def exhaust(self, account, retry_after=None):
+        """
+        Vacía el bucket tras recibir un 429 de DocuSign.
+
+        Args:
+            account (str): Cuenta afectada
+            retry_after (float): Segundos indicados por DocuSign antes de reintentar
+        """
+        tokens = -float(retry_after) * self.refill_rate if retry_after else 0.0
+        with self.store.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO quota_bucket (account, tokens, updated_at) '
+                'VALUES (?, ?, ?)',
+                (account, tokens, time.time()),
+            )
+        DOCUSIGN_QUOTA_REMAINING.labels(account=account).set(0)
+        logger.warning(
+            f"Cuota DocuSign agotada por respuesta 429 para la cuenta {account}"
+        )
+
+    def remaining(self, account):
+        """Devuelve el presupuesto disponible sin consumirlo."""
+        row = self.store.connection().execute(
+            'SELECT tokens, updated_at FROM quota_bucket WHERE account = ?',
+            (account,)
+        ).fetchone()
+        tokens = max(0.0, self._refill(row, time.time()))
+        DOCUSIGN_QUOTA_REMAINING.labels(account=account).set(tokens)
+        return tokens
+
+
+def get_quota_governor(app=None):
+    """
+    Devuelve el gobernador de cuota de la aplicación, creándolo si no existe.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    governor = app.extensions.get('docusign_quota')
+    if governor is None:
+        store = LocalStore(
+            local_store_path(
+                app, app.config.get('DOCUSIGN_QUOTA_STORE', 'docusign_quota.db')
+            ),
+            schema=_SCHEMA,
+        )
+        governor = DocuSignQuotaGovernor(
+            store,
+            hourly_limit=app.config.get('DOCUSIGN_HOURLY_API_LIMIT', 3000),
+            interactive_reserve=app.config.get(
+                'DOCUSIGN_QUOTA_INTERACTIVE_RESERVE', 0.2
+            ),
+            max_wait=app.config.get('DOCUSIGN_QUOTA_MAX_WAIT', 2.0),
+        )
+        app.extensions['docusign_quota'] = governor
+    return governor
@@ -0,0 +1,108 @@
+"""
+Registro de instancias de DocuSignService de larga vida.
+
+Construir el servicio implica leer la configuración, crear un ApiClient (con su
+propio pool de conexiones urllib3) y autenticarse contra DocuSign. El registro
+crea una instancia por cuenta y URL base la primera vez que se necesita y la
+comparte entre todos los hilos del worker.
+"""
+import os
+import threading
+import logging
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class DocuSignServiceRegistry:
+    """Instancias de DocuSignService por (account_id, base_url) dentro de un proceso."""
+
+    def __init__(self):
+        self._services = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def key_for(app):
+        """Clave de registro derivada de la configuración de la aplicación."""
+        return (
+            app.config.get('DOCUSIGN_ACCOUNT_ID') or os.getenv('DOCUSIGN_ACCOUNT_ID'),
+            app.config.get('DOCUSIGN_BASE_URL') or os.getenv('DOCUSIGN_BASE_URL')
+        )
+
+    def get(self, app=None):
+        """
+        Devuelve el servicio para la configuración actual, creándolo una sola vez.
+
+        Args:
+            app (Flask): La aplicación Flask (por defecto current_app)
+
+        Returns:
+            DocuSignService: Instancia compartida
+        """
+        from .docusign_service import DocuSignService
+
+        app = app or current_app._get_current_object()
+        self._reset_after_fork()
+        key = self.key_for(app)
+
+        service = self._services.get(key)
+        if service is not None:
+            return service
+
+        with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                with app.app_context():
+                    service = DocuSignService()
+                self._services[key] = service
+                logger.info(
+                    "DocuSignService registrado para "
+                    f"cuenta={key[0]}, base_url={key[1]}"
+                )
+        return service
+
+    def _reset_after_fork(self):
+        # Los pools de conexiones no deben compartirse entre procesos
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._services.clear()
+                    self._pid = os.getpid()
+
+    def clear(self):
+        """Descarta todas las instancias registradas."""
+        with self._lock:
+            self._services.clear()
+
+
+def get_docusign_service(app=None):
+    """
+    Devuelve la instancia compartida de DocuSignService de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    registry = app.extensions.get('docusign_services')
+    if registry is None:
+        registry = app.extensions.setdefault(
+            'docusign_services', DocuSignServiceRegistry()
+        )
+    return registry.get(app)
+
+
+def warm_up(app):
+    """
+    Crea por adelantado el servicio de la aplicación
+    para sacarlo del camino de las peticiones.
+
+    Solo con DOCUSIGN_PREWARM_SERVICE y fuera de TESTING. Los fallos se
+    registran pero no impiden arrancar: la primera petición volverá a intentarlo.
+    """
+    if not app.config.get('DOCUSIGN_PREWARM_SERVICE') or app.config.get('TESTING'):
+        return
+    try:
+        get_docusign_service(app)
+    except Exception as e:
+        logger.warning(f"No se pudo precalentar DocuSignService: {str(e)}")
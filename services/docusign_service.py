@@ -4,10 +4,24 @@ import hashlib
 import secrets
 import requests
 import logging
+import time
+import threading
 from flask import current_app, session
-from docusign_esign import ApiClient, EnvelopesApi, EnvelopeDefinition, Document, Signer, SignHere, Tabs
+from docusign_esign import (
+    ApiClient,
+    EnvelopesApi,
+    EnvelopeDefinition,
+    Document,
+    Recipients,
+    RecipientViewRequest,
+    Signer,
+    SignHere,
+    Tabs,
+)
 from docusign_esign.client.api_exception import ApiException
 from .docusign_auth import DocuSignAuth
+from .docusign_quota import get_quota_governor, INTERACTIVE
+from .docusign_lean import LeanEnvelopeReader
 
 class DocuSignService:
     """Servicio para manejar la integración con DocuSign."""
@@ -21,31 +35,83 @@ class DocuSignService:
         self.base_url = current_app.config.get('DOCUSIGN_BASE_URL', os.getenv("DOCUSIGN_BASE_URL"))
         self.token_url = f"https://{self.auth_server}/oauth/token"
         self.api_client = ApiClient()
-        self.account_id = os.getenv('DOCUSIGN_ACCOUNT_ID')
+        self.account_id = current_app.config.get('DOCUSIGN_ACCOUNT_ID') or os.getenv(
+            'DOCUSIGN_ACCOUNT_ID'
+        )
         self.auth_service = DocuSignAuth()
+        self._access_token = None
+        self._auth_lock = threading.Lock()
+        self.quota = get_quota_governor()
+        self.quota_account = self.account_id or self.integration_key or 'default'
+        self.reader = LeanEnvelopeReader(self.api_client, self.account_id)
         self._configure_auth()
 
     def _configure_auth(self):
         """Configura la autenticación usando el servicio de auth"""
         try:
             access_token = self.auth_service.get_access_token()
-            self.api_client.host = os.getenv('DOCUSIGN_BASE_URL')
+            self.api_client.host = self.base_url or os.getenv('DOCUSIGN_BASE_URL')
             self.api_client.set_default_header(
                 "Authorization",
                 f"Bearer {access_token}"
             )
+            self._access_token = access_token
         except Exception as e:
             current_app.logger.error(
                 f"Error configurando autenticación DocuSign: {str(e)}"
             )
             raise
 
+    def _ensure_auth(self):
+        """
+        Actualiza la cabecera de autorización si el token JWT se ha renovado.
+
+        La instancia es compartida entre hilos (ver docusign_registry), así que
+        el token cacheado por DocuSignAuth puede haber caducado desde que se
+        configuró el ApiClient.
+        """
+        access_token = self.auth_service.get_access_token()
+        if access_token != self._access_token:
+            with self._auth_lock:
+                if access_token != self._access_token:
+                    self.api_client.set_default_header(
+                        "Authorization", f"Bearer {access_token}"
+                    )
+                    self._access_token = access_token
+
+    def _call_api(self, priority, func, *args, **kwargs):
+        """
+        Ejecuta una llamada a la API de DocuSign descontándola de la cuota compartida.
+
+        Args:
+            priority (str): INTERACTIVE o BACKGROUND
+            func (callable): Llamada a realizar
+
+        Raises:
+            DocuSignQuotaExceeded: Si no hay presupuesto disponible
+        """
+        self.quota.acquire(self.quota_account, priority)
+        self._ensure_auth()
+        try:
+            return func(*args, **kwargs)
+        except ApiException as e:
+            if e.status == 429:
+                retry_after = None
+                reset = (e.headers or {}).get('X-RateLimit-Reset')
+                if reset:
+                    retry_after = max(0, int(reset) - int(time.time()))
+                self.quota.exhaust(self.quota_account, retry_after)
+            raise
+
     @staticmethod
     def create_instance():
-        """Factory method para crear instancias del servicio"""
-        return DocuSignService()
+        """Factory method que devuelve la instancia compartida del worker"""
+        from .docusign_registry import get_docusign_service
+        return get_docusign_service()
 
-    def send_document_for_signature(self, pdf_bytes: bytes, recipients: list, **kwargs) -> dict:
+    def send_document_for_signature(
+        self, pdf_bytes: bytes, recipients: list, priority=INTERACTIVE, **kwargs
+    ) -> dict:
         """Envía un documento para firma"""
         try:
             # Validar parámetros requeridos
@@ -60,8 +126,12 @@ class DocuSignService:
             self._validate_config()
 
             # Crear envelope y enviar
-            envelope_definition = self._create_envelope(pdf_bytes, recipients)
-            result = self.api_client.envelopes.create(envelope_definition)
+            envelope_definition = self._create_envelope(pdf_bytes, recipients, **kwargs)
+            envelopes_api = EnvelopesApi(self.api_client)
+            result = self._call_api(
+                priority, envelopes_api.create_envelope, self.account_id,
+                envelope_definition=envelope_definition
+            )
 
             return {
                 "envelope_id": result.envelope_id,
@@ -76,19 +146,73 @@ class DocuSignService:
             current_app.logger.error(f"Error enviando documento: {str(e)}")
             raise
 
-    def get_signature_status(self, envelope_id: str) -> dict:
+    def get_signature_status(self, envelope_id: str, priority=INTERACTIVE) -> dict:
         try:
-            envelopes_api = EnvelopesApi(self.api_client)
-            result = envelopes_api.get_envelope(self.account_id, envelope_id)
-            
-            return {
-                "status": result.status,
-                "completed_date": result.completed_date,
-                "created_date": result.created_date
-            }
+            # Camino ligero: JSON directo a un registro
+            # con __slots__ (ver docusign_lean)
+            result = self._call_api(priority, self.reader.envelope_status, envelope_id)
+            return result.to_dict()
         except ApiException as e:
             raise Exception(f"Error al obtener estado: {str(e)}")
 
+    def get_envelope_statuses(self, envelope_ids: list, priority=INTERACTIVE) -> list:
+        """Estado de varios envelopes en una sola llamada (lista de EnvelopeStatus)"""
+        return self._call_api(
+            priority, self.reader.envelope_statuses, list(envelope_ids)
+        )
+
+    def get_recipient_statuses(self, envelope_id: str, priority=INTERACTIVE) -> list:
+        """Estado de los firmantes de un envelope (lista de RecipientStatus)"""
+        return self._call_api(priority, self.reader.recipient_statuses, envelope_id)
+
+    def create_recipient_view(
+        self, envelope_id: str, recipient: dict, return_url: str, priority=INTERACTIVE
+    ) -> str:
+        """
+        Genera la URL de firma embebida de un destinatario.
+
+        Args:
+            envelope_id (str): ID del envelope
+            recipient (dict): email, name y client_user_id del firmante
+            return_url (str): URL a la que DocuSign redirige al terminar
+
+        Returns:
+            str: URL de firma (de un solo uso y válida unos minutos)
+        """
+        envelopes_api = EnvelopesApi(self.api_client)
+        view_request = RecipientViewRequest(
+            authentication_method='none',
+            client_user_id=recipient['client_user_id'],
+            email=recipient['email'],
+            user_name=recipient['name'],
+            return_url=return_url
+        )
+        result = self._call_api(
+            priority, envelopes_api.create_recipient_view, self.account_id, envelope_id,
+            recipient_view_request=view_request
+        )
+        return result.url
+
+    def open_signed_document(self, envelope_id: str, priority=INTERACTIVE):
+        """
+        Abre la descarga del PDF combinado (documentos
+        firmados + certificado) sin leerlo.
+
+        Returns:
+            urllib3.HTTPResponse: Respuesta sin consumir; el llamador debe leerla
+            con stream() y liberarla con release_conn()
+        """
+        envelopes_api = EnvelopesApi(self.api_client)
+        return self._call_api(
+            priority,
+            envelopes_api.get_document,
+            self.account_id,
+            'combined',
+            envelope_id,
+            _preload_content=False,
+            _request_timeout=current_app.config.get('DOCUSIGN_DOWNLOAD_TIMEOUT', 60),
+        )
+
     def get_document_status(self, document_id: str, recipient_email: str = None) -> dict:
         """
         Obtiene el estado de un documento.
@@ -118,10 +242,44 @@ class DocuSignService:
             current_app.logger.error(f"Error obteniendo estado del documento: {str(e)}")
             raise
 
-    def _create_envelope(self, pdf_bytes: bytes, recipients: list) -> EnvelopeDefinition:
-        # Crear definición del envelope con el documento y los firmantes
-        # Esta es una implementación básica que deberías expandir
-        pass
+    def _create_envelope(
+        self,
+        pdf_bytes: bytes,
+        recipients: list,
+        document_name: str = 'Split Sheet',
+        email_subject: str = None,
+        **kwargs,
+    ) -> EnvelopeDefinition:
+        """
+        Crea la definición del envelope con el documento y un firmante por destinatario
+        """
+        document = Document(
+            document_base64=base64.b64encode(pdf_bytes).decode('ascii'),
+            name=document_name,
+            file_extension='pdf',
+            document_id='1'
+        )
+        embedded = current_app.config.get('DOCUSIGN_EMBEDDED_SIGNING', False)
+        signers = []
+        for recipient_id, recipient in enumerate(recipients, start=1):
+            sign_here = SignHere(anchor_string='/firma/', anchor_units='pixels',
+                                 anchor_x_offset='0', anchor_y_offset='0')
+            signers.append(Signer(
+                email=recipient['email'],
+                name=recipient['name'],
+                recipient_id=str(recipient_id),
+                # Todos los firmantes firman en paralelo
+                routing_order='1',
+                # Con client_user_id DocuSign no envía email: la firma se hace embebida
+                client_user_id=str(recipient_id) if embedded else None,
+                tabs=Tabs(sign_here_tabs=[sign_here])
+            ))
+        return EnvelopeDefinition(
+            email_subject=email_subject or f"Firma requerida: {document_name}",
+            documents=[document],
+            recipients=Recipients(signers=signers),
+            status='sent'
+        )
 
     def _validate_config(self):
         """Valida la configuración de DocuSign"""
@@ -282,15 +440,19 @@ class DocuSignService:
             self.logger.error(f"Error inesperado en exchange_code_for_token: {str(e)}")
             raise
 
-    def refresh_access_token(self, refresh_token):
+    def refresh_access_token(self, refresh_token, priority=INTERACTIVE):
         """
         Actualiza un token de acceso usando el refresh token.
         
         Args:
             refresh_token (str): Token de actualización
+            priority (str): INTERACTIVE o BACKGROUND, para la cuota compartida
             
         Returns:
             dict: Nuevo token de acceso y metadata
+
+        Raises:
+            DocuSignQuotaExceeded: Si no hay presupuesto disponible
         """
         # Obtener client_secret de la configuración
         client_secret = current_app.config.get('DOCUSIGN_CLIENT_SECRET')
@@ -308,7 +470,11 @@ class DocuSignService:
         
         self.logger.debug("Refrescando token de acceso")
         
-        response = requests.post(self.token_url, data=payload)
+        self.quota.acquire(self.quota_account, priority)
+        response = requests.post(
+            self.token_url, data=payload,
+            timeout=current_app.config.get('DOCUSIGN_TOKEN_REFRESH_TIMEOUT', 10)
+        )
         response.raise_for_status()
         
         return response.json()
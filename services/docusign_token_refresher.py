@@ -0,0 +1,141 @@
+"""
+Renovación anticipada y en bloque de los tokens OAuth de DocuSign de los usuarios.
+
+Los tokens se persisten en la tabla `user` con su fecha de expiración indexada.
+Esta tarea se ejecuta en segundo plano y renueva, antes de que caduquen, todos
+los tokens próximos a expirar, para que ninguna petición de usuario tenga que
+esperar a un refresco en línea. Cada renovación consume cuota de DocuSign con
+prioridad BACKGROUND y tiene un timeout (DOCUSIGN_TOKEN_REFRESH_TIMEOUT), así
+que una llamada colgada no bloquea un hilo del pool; sin cuota, los tokens
+pendientes se renuevan en la siguiente ejecución.
+"""
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from flask import current_app
+from models.database import db, docusign_token_expiry
+from models.user import User
+from services.docusign_quota import DocuSignQuotaExceeded, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+def _collect(futures, refresh_tokens):
+    """
+    Recoge las renovaciones a medida que terminan.
+
+    Returns:
+        tuple: (filas para bulk_update_mappings,
+            renovaciones diferidas por falta de cuota)
+    """
+    updates = []
+    deferred = 0
+    for future in as_completed(futures):
+        user_id = futures[future]
+        try:
+            tokens = future.result()
+        except DocuSignQuotaExceeded:
+            deferred += 1
+            continue
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status in (400, 401):
+                # Refresh token revocado o caducado: el usuario debe volver a autorizar
+                logger.warning(
+                    "Refresh token de DocuSign inválido "
+                    f"para el usuario {user_id}, se descarta"
+                )
+                updates.append({
+                    'id': user_id,
+                    'docusign_access_token': None,
+                    'docusign_refresh_token': None,
+                    'docusign_token_expires': None
+                })
+            else:
+                logger.error(
+                    "Error HTTP renovando token DocuSign "
+                    f"del usuario {user_id}: {str(e)}"
+                )
+            continue
+        except Exception as e:
+            logger.error(
+                f"Error renovando token DocuSign del usuario {user_id}: {str(e)}"
+            )
+            continue
+
+        updates.append(
+            {
+                'id': user_id,
+                'docusign_access_token': tokens.get('access_token'),
+                # DocuSign puede rotar el refresh token;
+                # si no lo hace se conserva el anterior
+                'docusign_refresh_token': tokens.get('refresh_token')
+                or refresh_tokens[user_id],
+                'docusign_token_expires': docusign_token_expiry(
+                    tokens.get('expires_in')
+                ),
+            }
+        )
+    return updates, deferred
+
+
+def refresh_expiring_tokens(window=None, batch_size=None, max_workers=None):
+    """
+    Renueva los tokens de DocuSign que expiran dentro de la ventana indicada.
+
+    Args:
+        window (int): Segundos de antelación con que se renuevan los tokens
+        batch_size (int): Máximo de usuarios procesados por ejecución
+        max_workers (int): Renovaciones concurrentes contra DocuSign
+
+    Returns:
+        int: Número de usuarios actualizados
+    """
+    from services.docusign_service import DocuSignService
+
+    app = current_app._get_current_object()
+    window = window or app.config.get('DOCUSIGN_TOKEN_REFRESH_WINDOW', 600)
+    batch_size = batch_size or app.config.get('DOCUSIGN_TOKEN_REFRESH_BATCH', 100)
+    max_workers = max_workers or app.config.get('DOCUSIGN_TOKEN_REFRESH_WORKERS', 4)
+
+    cutoff = datetime.utcnow() + timedelta(seconds=window)
+    rows = (
+        db.session.query(User.id, User.docusign_refresh_token)
+        .filter(User.docusign_refresh_token.isnot(None))
+        .filter(User.docusign_token_expires <= cutoff)
+        .order_by(User.docusign_token_expires)
+        .limit(batch_size)
+        .all()
+    )
+    if not rows:
+        return 0
+
+    service = DocuSignService.create_instance()
+    refresh_tokens = {row.id: row.docusign_refresh_token for row in rows}
+
+    def _refresh(refresh_token):
+        with app.app_context():
+            return service.refresh_access_token(refresh_token, priority=BACKGROUND)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_refresh, refresh_token): user_id
+            for user_id, refresh_token in refresh_tokens.items()
+        }
+        updates, deferred = _collect(futures, refresh_tokens)
+
+    if updates:
+        try:
+            db.session.bulk_update_mappings(User, updates)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    if deferred:
+        logger.info(
+            f"Renovación de {deferred} tokens DocuSign diferida por falta de cuota"
+        )
+    logger.info(f"Tokens DocuSign renovados: {len(updates)} de {len(rows)} candidatos")
+    return len(updates)
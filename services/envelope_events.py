@@ -0,0 +1,199 @@
+"""
+Historial de eventos de envelope (solo inserción).
+
+`Document.status` solo guarda el último estado; para auditorías y disputas cada
+evento de Connect aplicado se añade también a `envelope_event`, por lotes y en
+la misma transacción que el cambio de estado.
+
+Las filas llevan su día UTC (`day`) como cubo: la compactación recorre los
+días ya cerrados y deja solo las transiciones de estado, y la retención borra
+días completos con un DELETE por rango sobre el índice, sin recorrer la tabla.
+La línea temporal de un envelope se lee con un único recorrido del índice
+(envelope_id, occurred_at, id).
+"""
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from models.database import db
+from models.envelope_event import EnvelopeEvent
+from .webhook_dedup import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Filas por INSERT o DELETE
+WRITE_CHUNK_SIZE = 500
+# Envelopes compactados por consulta
+COMPACT_CHUNK_SIZE = 200
+
+
+def event_occurred_at(data, fallback):
+    """Momento del evento según Connect; si no viene en el payload, el de recepción."""
+    nested = data.get('data') if isinstance(data.get('data'), dict) else {}
+    summary = (
+        nested.get('envelopeSummary')
+        if isinstance(nested.get('envelopeSummary'), dict)
+        else {}
+    )
+    for value in (
+        summary.get('statusChangedDateTime'),
+        data.get('statusChangedDateTime'),
+        data.get('generatedDateTime'),
+    ):
+        if isinstance(value, str):
+            occurred_at = parse_timestamp(value)
+            if occurred_at is not None:
+                return occurred_at
+    return fallback
+
+
+def record_events(entries):
+    """
+    Añade eventos al historial en la sesión actual (el commit lo hace quien llama).
+
+    Args:
+        entries (list[dict]): envelope_id, status, event, occurred_at, received_at
+    """
+    rows = [
+        dict(entry, day=entry['occurred_at'].date(), compacted=False)
+        for entry in entries
+    ]
+    for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+        db.session.bulk_insert_mappings(
+            EnvelopeEvent, rows[start : start + WRITE_CHUNK_SIZE]
+        )
+
+
+def envelope_timeline(envelope_id):
+    """
+    Eventos de un envelope en orden cronológico.
+
+    Returns:
+        list[EnvelopeEvent]
+    """
+    return (
+        EnvelopeEvent.query
+        .filter(EnvelopeEvent.envelope_id == envelope_id)
+        .order_by(EnvelopeEvent.occurred_at, EnvelopeEvent.id)
+        .all()
+    )
+
+
+def _compact_day(day):
+    """
+    Deja solo las transiciones de estado del día
+    indicado. Devuelve las filas eliminadas.
+    """
+    envelope_ids = [
+        row.envelope_id for row in
+        db.session.query(EnvelopeEvent.envelope_id)
+        .filter(EnvelopeEvent.day == day, EnvelopeEvent.compacted.is_(False))
+        .distinct()
+    ]
+    deleted = 0
+    for start in range(0, len(envelope_ids), COMPACT_CHUNK_SIZE):
+        chunk = envelope_ids[start:start + COMPACT_CHUNK_SIZE]
+        # Los días anteriores ya están compactados: su historial es corto
+        rows = (
+            db.session.query(
+                EnvelopeEvent.id,
+                EnvelopeEvent.envelope_id,
+                EnvelopeEvent.status,
+                EnvelopeEvent.day,
+            )
+            .filter(EnvelopeEvent.envelope_id.in_(chunk), EnvelopeEvent.day <= day)
+            .order_by(
+                EnvelopeEvent.envelope_id, EnvelopeEvent.occurred_at, EnvelopeEvent.id
+            )
+            .all()
+        )
+        redundant = []
+        previous = (None, None)
+        for row in rows:
+            if row.day == day and previous == (row.envelope_id, row.status):
+                redundant.append(row.id)
+            else:
+                previous = (row.envelope_id, row.status)
+        for offset in range(0, len(redundant), WRITE_CHUNK_SIZE):
+            deleted += EnvelopeEvent.query.filter(
+                EnvelopeEvent.id.in_(redundant[offset : offset + WRITE_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+    (
+        EnvelopeEvent.query
+        .filter(EnvelopeEvent.day == day, EnvelopeEvent.compacted.is_(False))
+        .update({'compacted': True}, synchronize_session=False)
+    )
+    return deleted
+
+
+def compact_envelope_events(after_days=None, max_days=7):
+    """
+    Compacta los días cerrados más antiguos pendientes, uno por transacción.
+
+    Args:
+        after_days (int): Días que un cubo se conserva completo antes de compactarlo
+        max_days (int): Cubos máximos por ejecución
+
+    Returns:
+        int: Filas eliminadas
+    """
+    if after_days is None:
+        after_days = current_app.config.get('DOCUSIGN_EVENT_COMPACT_AFTER_DAYS', 7)
+    cutoff = datetime.utcnow().date() - timedelta(days=after_days)
+    days = [
+        row.day for row in
+        db.session.query(EnvelopeEvent.day)
+        .filter(EnvelopeEvent.day < cutoff, EnvelopeEvent.compacted.is_(False))
+        .distinct()
+        .order_by(EnvelopeEvent.day)
+        .limit(max_days)
+    ]
+    deleted = 0
+    for day in days:
+        try:
+            removed = _compact_day(day)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        deleted += removed
+        logger.info(
+            f"Historial de envelopes del {day.isoformat()} "
+            f"compactado: {removed} eventos redundantes"
+        )
+    return deleted
+
+
+def drop_expired_envelope_events(retention_days=None):
+    """
+    Borra los cubos diarios más antiguos que la retención (0 = conservar siempre).
+
+    Returns:
+        int: Filas eliminadas
+    """
+    if retention_days is None:
+        retention_days = current_app.config.get('DOCUSIGN_EVENT_RETENTION_DAYS', 0)
+    if not retention_days:
+        return 0
+    cutoff = datetime.utcnow().date() - timedelta(days=retention_days)
+    try:
+        deleted = (
+            EnvelopeEvent.query
+            .filter(EnvelopeEvent.day < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if deleted:
+        logger.info(
+            "Eventos de envelope anteriores al "
+            f"{cutoff.isoformat()} eliminados: {deleted}"
+        )
+    return deleted
+
+
+def maintain_envelope_events():
+    """Tarea periódica: compactación y retención del historial."""
+    compact_envelope_events()
+    drop_expired_envelope_events()
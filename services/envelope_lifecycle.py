@@ -0,0 +1,41 @@
+"""
+Orden del ciclo de vida de un envelope de DocuSign.
+
+Los eventos de Connect pueden llegar desordenados (un `delivered` reintentado
+después de `completed`). Un estado solo puede sustituir a otro de rango menor;
+los estados finales comparten rango para que ninguno sobrescriba a otro.
+"""
+
+STATUS_RANK = {
+    'draft': 0,
+    'created': 1,
+    'queued': 1,
+    'error': 1,
+    'sent': 2,
+    'delivered': 3,
+    'signed': 4,
+    'completed': 5,
+    'declined': 5,
+    'voided': 5,
+}
+
+
+def rank(status):
+    """Rango del estado o None si no forma parte del ciclo de vida conocido."""
+    return STATUS_RANK.get(status)
+
+
+def is_advance(current, new):
+    """Indica si `new` hace avanzar un documento que está en `current`."""
+    new_rank = rank(new)
+    if new_rank is None:
+        return False
+    current_rank = rank(current)
+    return current_rank is None or new_rank > current_rank
+
+
+def lower_statuses(status):
+    """Estados que `status` puede sustituir."""
+    status_rank = rank(status)
+    return tuple(name for name, value in STATUS_RANK.items() if value < status_rank)
+
@@ -0,0 +1,72 @@
+"""
+Lectura incremental por id de tablas en las que los ids pueden confirmarse desordenados.
+
+En PostgreSQL el id de una secuencia se reserva al insertar, no al confirmar:
+una transacción con el id 41 puede confirmarse después de que otro proceso ya
+haya leído el 42. Leer solo `id > último visto` perdería el 41 para siempre.
+
+IdWatermark recuerda los huecos que quedan por debajo del último id leído y los
+vuelve a pedir en cada lectura durante `gap_timeout` segundos. Pasado ese
+tiempo el hueco se da por definitivo (un INSERT deshecho también consume un id
+de la secuencia). Los huecos recordados están acotados por `max_gaps`.
+"""
+import time
+from sqlalchemy import or_
+
+
+class IdWatermark:
+    """Último id leído de una tabla más los huecos pendientes por debajo de él."""
+
+    def __init__(self, gap_timeout=60.0, max_gaps=10000):
+        """
+        Args:
+            gap_timeout (float): Segundos durante los que se vuelve a pedir un hueco
+            max_gaps (int): Huecos recordados como
+                máximo (se conservan los más recientes)
+        """
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+        self.last_id = None
+        self._gaps = {}  # id -> instante (monotonic) a partir del cual se abandona
+
+    def reset(self, last_id=None):
+        """Empieza de nuevo desde `last_id` (None = sin inicializar), sin huecos."""
+        self.last_id = last_id
+        self._gaps.clear()
+
+    def gaps(self):
+        """Huecos pendientes, descartando los que ya caducaron."""
+        now = time.monotonic()
+        for gap in [gap for gap, deadline in self._gaps.items() if deadline <= now]:
+            del self._gaps[gap]
+        return sorted(self._gaps)
+
+    def clause(self, column):
+        """
+        Filtro SQLAlchemy de las filas aún no leídas: nuevas o en un hueco pendiente.
+        """
+        gaps = self.gaps()
+        if not gaps:
+            return column > self.last_id
+        return or_(column > self.last_id, column.in_(gaps))
+
+    def advance(self, ids):
+        """
+        Registra los ids leídos con `clause`.
+
+        Los que faltan entre el último id anterior y el mayor leído pasan a ser
+        huecos; los huecos que aparecen dejan de serlo.
+        """
+        ids = set(ids)
+        for found in ids & self._gaps.keys():
+            del self._gaps[found]
+        top = max(ids, default=self.last_id)
+        if self.last_id is not None and top > self.last_id:
+            deadline = time.monotonic() + self.gap_timeout
+            start = max(self.last_id + 1, top - self.max_gaps)
+            for missing in range(start, top):
+                if missing not in ids:
+                    self._gaps[missing] = deadline
+            while len(self._gaps) > self.max_gaps:
+                del self._gaps[min(self._gaps)]
+        self.last_id = top
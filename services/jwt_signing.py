@@ -0,0 +1,243 @@
+"""
+Firma de los JWT y caché de verificación.
+
+Por defecto los tokens se firman con HS256 y JWT_SECRET_KEY, lo que obliga a
+compartir el secreto con cualquier servicio que quiera verificarlos. Con
+JWT_ALGORITHM=RS256 o EdDSA se firman con la clave privada de
+JWT_PRIVATE_KEY_FILE y los demás servicios verifican con las claves públicas
+publicadas en /.well-known/jwks.json. Cada token lleva en la cabecera el `kid`
+de su clave (huella RFC 7638), y JWT_PUBLIC_KEY_FILES admite claves públicas
+anteriores para que los tokens ya emitidos sigan validando durante una rotación.
+
+Verificar una firma RSA o Ed25519 cuesta bastante más que un HMAC, y un mismo
+token llega en muchas peticiones. Por eso los claims de cada token verificado
+se guardan en una LRU acotada (JWT_VERIFY_CACHE_SIZE) indexada por la firma
+hasta su `exp`. Un acierto solo compara el token completo con el guardado. La
+revocación no depende de la caché: el blocklist se consulta en cada petición
+después de decodificar.
+"""
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from flask import current_app
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.default_callbacks import (
+    default_encode_key_callback,
+    default_decode_key_callback,
+)
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519, ed448
+from jwt.algorithms import RSAAlgorithm, OKPAlgorithm
+from config.monitoring import JWT_VERIFY_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = {
+    'RS256': (rsa.RSAPrivateKey, rsa.RSAPublicKey),
+    'RS384': (rsa.RSAPrivateKey, rsa.RSAPublicKey),
+    'RS512': (rsa.RSAPrivateKey, rsa.RSAPublicKey),
+    'EdDSA': ((ed25519.Ed25519PrivateKey, ed448.Ed448PrivateKey),
+              (ed25519.Ed25519PublicKey, ed448.Ed448PublicKey)),
+}
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def public_jwk(public_key, algorithm):
+    """
+    Representación JWK de una clave pública, con su huella RFC 7638 como `kid`.
+
+    Returns:
+        dict: JWK con kid, use y alg
+    """
+    if isinstance(public_key, rsa.RSAPublicKey):
+        jwk = json.loads(RSAAlgorithm.to_jwk(public_key))
+        required = ('e', 'kty', 'n')
+    else:
+        jwk = json.loads(OKPAlgorithm.to_jwk(public_key))
+        required = ('crv', 'kty', 'x')
+    canonical = json.dumps(
+        {name: jwk[name] for name in required}, separators=(',', ':'), sort_keys=True
+    )
+    jwk.update(
+        kid=_b64url(hashlib.sha256(canonical.encode('utf-8')).digest()),
+        use='sig',
+        alg=algorithm,
+    )
+    return jwk
+
+
+class SigningKeys:
+    """Clave privada activa y claves públicas aceptadas, indexadas por kid."""
+
+    def __init__(self, algorithm, private_key, previous_public_keys=()):
+        """
+        Args:
+            algorithm (str): RS256, RS384, RS512 o EdDSA
+            private_key: Clave privada de cryptography con la que se firma
+            previous_public_keys (iterable): Claves
+                públicas retiradas que aún se aceptan
+
+        Raises:
+            ValueError: Si el tipo de clave no corresponde al algoritmo
+        """
+        private_type, public_type = ASYMMETRIC_ALGORITHMS[algorithm]
+        if not isinstance(private_key, private_type):
+            raise ValueError(f"La clave privada no es válida para {algorithm}")
+        self.algorithm = algorithm
+        self.private_key = private_key
+        self.public_keys = {}
+        self.jwks = []
+        for public_key in (private_key.public_key(), *previous_public_keys):
+            if not isinstance(public_key, public_type):
+                raise ValueError(f"Una clave pública no es válida para {algorithm}")
+            jwk = public_jwk(public_key, algorithm)
+            self.public_keys[jwk['kid']] = public_key
+            self.jwks.append(jwk)
+        self.kid = self.jwks[0]['kid']
+
+    @classmethod
+    def from_files(cls, algorithm, private_key_file, public_key_files=()):
+        with open(private_key_file, 'rb') as f:
+            private_key = serialization.load_pem_private_key(f.read(), password=None)
+        public_keys = []
+        for path in public_key_files:
+            with open(path, 'rb') as f:
+                public_keys.append(serialization.load_pem_public_key(f.read()))
+        return cls(algorithm, private_key, public_keys)
+
+    def public_pem(self):
+        return self.private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('ascii')
+
+
+class VerifiedTokenCache:
+    """LRU de claims de tokens ya verificados, indexada por firma, hasta su exp."""
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        signature = token.rpartition('.')[2]
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                return None
+            cached_token, claims = entry
+            # La firma solo vale para su cabecera y payload: se exige el token idéntico
+            if cached_token != token or claims['exp'] <= time.time():
+                del self._entries[signature]
+                return None
+            self._entries.move_to_end(signature)
+        return dict(claims)
+
+    def put(self, token, claims):
+        if not self.capacity or 'exp' not in claims:
+            return
+        with self._lock:
+            self._entries[token.rpartition('.')[2]] = (token, dict(claims))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager con firma asimétrica opcional y caché de verificación.
+
+    Sustituye a `_decode_jwt_from_config` de Flask-JWT-Extended 4.3: la
+    extensión no ofrece un hook público que evite verificar la firma. Es un
+    método privado, así que la versión está fijada en requirements.txt y la
+    clase se niega a cargarse si el método desaparece, en lugar de quedarse sin
+    caché en silencio. El resto del flujo (blocklist, user loader, errores) no
+    cambia.
+    """
+
+    if not callable(getattr(JWTManager, '_decode_jwt_from_config', None)):
+        raise ImportError(
+            "Flask-JWT-Extended sin _decode_jwt_from_config: revisa la versión fijada "
+            "en requirements.txt antes de actualizarla"
+        )
+
+    def init_app(self, app):
+        algorithm = app.config.get('JWT_ALGORITHM', 'HS256')
+        if algorithm in ASYMMETRIC_ALGORITHMS:
+            keys = SigningKeys.from_files(
+                algorithm,
+                app.config['JWT_PRIVATE_KEY_FILE'],
+                app.config.get('JWT_PUBLIC_KEY_FILES', ())
+            )
+            app.extensions['jwt_signing_keys'] = keys
+            # Solo el algoritmo configurado: evita
+            # tokens HS256 firmados con la clave pública
+            app.config['JWT_DECODE_ALGORITHMS'] = [algorithm]
+            app.config.setdefault('JWT_PUBLIC_KEY', keys.public_pem())
+            logger.info(f"JWT firmados con {algorithm}, kid {keys.kid}")
+        app.extensions['jwt_verify_cache'] = VerifiedTokenCache(
+            app.config.get('JWT_VERIFY_CACHE_SIZE', 10000)
+        )
+        super().init_app(app)
+        # Objetos de clave ya cargados: sin parsear PEM en cada firma o verificación
+        self.encode_key_loader(_encode_key)
+        self.decode_key_loader(_decode_key)
+        self.additional_headers_loader(_kid_header)
+
+    def _decode_jwt_from_config(
+        self, encoded_token, csrf_value=None, allow_expired=False
+    ):
+        if allow_expired or csrf_value:
+            return super()._decode_jwt_from_config(
+                encoded_token, csrf_value, allow_expired
+            )
+        cache = current_app.extensions['jwt_verify_cache']
+        claims = cache.get(encoded_token)
+        if claims is not None:
+            JWT_VERIFY_CACHE_LOOKUPS.labels(result='hit').inc()
+            return claims
+        JWT_VERIFY_CACHE_LOOKUPS.labels(result='miss').inc()
+        claims = super()._decode_jwt_from_config(
+            encoded_token, csrf_value, allow_expired
+        )
+        cache.put(encoded_token, claims)
+        return claims
+
+
+def get_signing_keys(app=None):
+    """
+    Devuelve las claves de firma asimétrica de la aplicación.
+
+    Returns:
+        SigningKeys: None si los tokens se firman con JWT_SECRET_KEY
+    """
+    app = app or current_app._get_current_object()
+    return app.extensions.get('jwt_signing_keys')
+
+
+def _encode_key(identity):
+    keys = get_signing_keys()
+    return keys.private_key if keys else default_encode_key_callback(identity)
+
+
+def _decode_key(jwt_header, jwt_data):
+    keys = get_signing_keys()
+    if keys is None:
+        return default_decode_key_callback(jwt_header, jwt_data)
+    # kid desconocido: se verifica con la clave activa, que lo rechazará
+    return keys.public_keys.get(jwt_header.get('kid'), keys.public_keys[keys.kid])
+
+
+def _kid_header(identity):
+    keys = get_signing_keys()
+    return {'kid': keys.kid} if keys else {}
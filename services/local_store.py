@@ -0,0 +1,110 @@
+"""
+Almacén SQLite local compartido entre los procesos de un mismo host.
+
+Los workers de gunicorn no comparten memoria, así que el estado que debe ser
+común a todos ellos (cuotas, colas, contadores) se guarda en un fichero SQLite
+en modo WAL dentro del directorio de instancia de la aplicación.
+"""
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def local_store_path(app, filename):
+    """
+    Devuelve la ruta de un fichero de almacén local para la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask
+        filename (str): Nombre del fichero SQLite
+
+    Returns:
+        str: Ruta absoluta del fichero
+    """
+    base_dir = app.config.get('LOCAL_STORE_DIR') or app.instance_path
+    os.makedirs(base_dir, exist_ok=True)
+    return os.path.join(base_dir, filename)
+
+
+class LocalStore:
+    """
+    Envoltorio mínimo sobre un fichero SQLite compartido entre procesos.
+
+    Cada hilo de cada proceso mantiene su propia conexión; las conexiones
+    nunca se reutilizan después de un fork.
+    """
+
+    def __init__(self, path, schema=(), busy_timeout=5.0):
+        """
+        Args:
+            path (str): Ruta del fichero SQLite
+            schema (iterable): Sentencias DDL idempotentes a ejecutar al abrir
+            busy_timeout (float): Segundos de espera ante bloqueos de escritura
+        """
+        self.path = path
+        self.schema = tuple(schema)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self):
+        """Devuelve la conexión del hilo actual, creándola si es necesario."""
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != pid:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,  # Transacciones gestionadas explícitamente
+                check_same_thread=False
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = pid
+            self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            for statement in self.schema:
+                conn.execute(statement)
+            self._schema_ready = True
+
+    @contextmanager
+    def transaction(self, immediate=True):
+        """
+        Abre una transacción sobre la conexión del hilo actual.
+
+        Args:
+            immediate (bool): Si es True toma el bloqueo de escritura al inicio,
+                lo que serializa las operaciones de lectura-modificación-escritura
+                entre procesos.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def close(self):
+        """Cierra la conexión del hilo actual."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Error cerrando almacén local {self.path}: {str(e)}")
+            self._local.conn = None
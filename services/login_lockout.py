@@ -0,0 +1,249 @@
+"""
+Bloqueo temporal de cuentas tras logins fallidos, compartido entre workers.
+
+Los fallos se cuentan por usuario en cubos de LOGIN_LOCKOUT_BUCKET segundos
+guardados en un almacén SQLite local, de modo que todos los workers del host
+ven los mismos contadores. Registrar un fallo actualiza un cubo y suma los de
+la ventana (un número fijo de filas por clave primaria); comprobar un bloqueo es
+una lectura por clave primaria. Ninguna de las dos operaciones depende del
+número de usuarios registrados.
+
+Los cubos fuera de la ventana y los bloqueos vencidos dejan de contar en cuanto
+caducan y una tarea periódica los borra. El número de cubos se lleva en una
+tabla de una fila que mantienen dos triggers, así que registrar un fallo
+comprueba LOGIN_LOCKOUT_MAX_ENTRIES sin contar la tabla: si un ataque con
+millones de usuarios distintos supera el límite, se descartan en ese momento los
+cubos más antiguos, haya o no tareas en segundo plano. Los nombres de usuario
+se guardan como hash de tamaño fijo.
+
+Si el almacén falla, el login no se bloquea: el límite por IP sigue activo.
+"""
+import time
+import sqlite3
+import hashlib
+import logging
+from flask import current_app
+from config.monitoring import LOGIN_LOCKOUT_EVENTS
+from .local_store import LocalStore, local_store_path
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS login_failures (
+        key TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (key, bucket)
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS ix_login_failures_bucket ON login_failures (bucket)',
+    """
+    CREATE TABLE IF NOT EXISTS login_failures_size (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        rows INTEGER NOT NULL
+    )
+    """,
+    'INSERT OR IGNORE INTO login_failures_size (id, '
+    'rows) SELECT 0, COUNT(*) FROM login_failures',
+    """
+    CREATE TRIGGER IF NOT EXISTS login_failures_inserted AFTER INSERT ON login_failures
+    BEGIN UPDATE login_failures_size SET rows = rows + 1 WHERE id = 0; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS login_failures_deleted AFTER DELETE ON login_failures
+    BEGIN UPDATE login_failures_size SET rows = rows - 1 WHERE id = 0; END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS login_lockouts (
+        key TEXT PRIMARY KEY,
+        locked_until REAL NOT NULL
+    )
+    """,
+)
+
+
+def _key(username):
+    return hashlib.blake2b(str(username).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class LoginLockout:
+    """Contadores de fallos por usuario en cubos de tiempo sobre SQLite."""
+
+    def __init__(
+        self,
+        store,
+        max_attempts=10,
+        window=900,
+        duration=900,
+        bucket_seconds=60,
+        max_entries=100000,
+    ):
+        """
+        Args:
+            store (LocalStore): Almacén local compartido
+            max_attempts (int): Fallos dentro de la ventana que bloquean la cuenta
+            window (int): Segundos durante los que cuenta un fallo
+            duration (int): Segundos de bloqueo
+            bucket_seconds (int): Resolución de los contadores
+            max_entries (int): Filas de contadores máximas
+        """
+        self.store = store
+        self.max_attempts = max_attempts
+        self.duration = duration
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = max(1, -(-window // bucket_seconds))
+        self.max_entries = max_entries
+
+    def _bucket(self, now):
+        return int(now // self.bucket_seconds)
+
+    def _trim(self, conn):
+        """Descarta los cubos más antiguos que excedan max_entries."""
+        excess = (
+            conn.execute(
+                'SELECT rows FROM login_failures_size WHERE id = 0'
+            ).fetchone()[0]
+            - self.max_entries
+        )
+        if excess <= 0:
+            return 0
+        return conn.execute(
+            'DELETE FROM login_failures WHERE rowid IN '
+            '(SELECT rowid FROM login_failures ORDER BY bucket LIMIT ?)',
+            (excess,)
+        ).rowcount
+
+    def locked_for(self, username):
+        """
+        Returns:
+            float: Segundos de bloqueo restantes (0 si la cuenta no está bloqueada)
+        """
+        try:
+            row = (
+                self.store.connection()
+                .execute(
+                    'SELECT locked_until FROM login_lockouts WHERE key = ?',
+                    (_key(username),),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo consultar el bloqueo de login: {str(e)}")
+            return 0
+        remaining = row[0] - time.time() if row else 0
+        if remaining > 0:
+            LOGIN_LOCKOUT_EVENTS.labels(event='rejected').inc()
+            return remaining
+        return 0
+
+    def record_failure(self, username):
+        """
+        Cuenta un login fallido y bloquea la cuenta al alcanzar max_attempts.
+
+        Returns:
+            bool: True si este fallo ha bloqueado la cuenta
+        """
+        key = _key(username)
+        now = time.time()
+        bucket = self._bucket(now)
+        try:
+            with self.store.transaction() as conn:
+                conn.execute(
+                    'INSERT INTO login_failures (key, bucket, count) VALUES (?, ?, 1) '
+                    'ON CONFLICT (key, bucket) DO UPDATE SET count = count + 1',
+                    (key, bucket)
+                )
+                self._trim(conn)
+                failures = conn.execute(
+                    'SELECT COALESCE(SUM(count), 0) FROM login_failures WHERE key = ? '
+                    'AND bucket > ?',
+                    (key, bucket - self.window_buckets),
+                ).fetchone()[0]
+                if failures < self.max_attempts:
+                    return False
+                conn.execute(
+                    'INSERT OR REPLACE INTO login_lockouts '
+                    '(key, locked_until) VALUES (?, ?)',
+                    (key, now + self.duration),
+                )
+                # Tras el bloqueo se empieza a contar de cero
+                conn.execute('DELETE FROM login_failures WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo registrar el login fallido: {str(e)}")
+            return False
+        LOGIN_LOCKOUT_EVENTS.labels(event='locked').inc()
+        logger.warning(
+            f"Cuenta bloqueada {self.duration}s tras {failures} logins fallidos"
+        )
+        return True
+
+    def reset(self, username):
+        """Olvida los fallos de un usuario tras un login correcto."""
+        key = _key(username)
+        try:
+            with self.store.transaction() as conn:
+                conn.execute('DELETE FROM login_failures WHERE key = ?', (key,))
+                conn.execute('DELETE FROM login_lockouts WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudieron reiniciar los fallos de login: {str(e)}")
+
+    def purge(self):
+        """
+        Borra los cubos fuera de la ventana y los bloqueos vencidos.
+
+        Returns:
+            int: Filas eliminadas
+        """
+        now = time.time()
+        with self.store.transaction() as conn:
+            deleted = conn.execute(
+                'DELETE FROM login_failures WHERE bucket <= ?',
+                (self._bucket(now) - self.window_buckets,)
+            ).rowcount
+            deleted += conn.execute(
+                'DELETE FROM login_lockouts WHERE locked_until <= ?', (now,)
+            ).rowcount
+            # Corrige cualquier desviación del contador
+            # (p. ej. filas anteriores a los triggers)
+            conn.execute(
+                'UPDATE login_failures_size SET rows = (SELECT COUNT(*) FROM '
+                'login_failures) WHERE id = 0'
+            )
+            deleted += self._trim(conn)
+        return deleted
+
+
+def get_login_lockout(app=None):
+    """
+    Devuelve el control de bloqueo de logins de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    lockout = app.extensions.get('login_lockout')
+    if lockout is None:
+        store = LocalStore(
+            local_store_path(
+                app, app.config.get('LOGIN_LOCKOUT_STORE', 'login_lockout.db')
+            ),
+            schema=_SCHEMA,
+        )
+        lockout = app.extensions.setdefault('login_lockout', LoginLockout(
+            store,
+            max_attempts=app.config.get('LOGIN_LOCKOUT_MAX_ATTEMPTS', 10),
+            window=app.config.get('LOGIN_LOCKOUT_WINDOW', 900),
+            duration=app.config.get('LOGIN_LOCKOUT_DURATION', 900),
+            bucket_seconds=app.config.get('LOGIN_LOCKOUT_BUCKET', 60),
+            max_entries=app.config.get('LOGIN_LOCKOUT_MAX_ENTRIES', 100000)
+        ))
+    return lockout
+
+
+def purge_login_failures():
+    """Tarea periódica: elimina contadores y bloqueos caducados."""
+    deleted = get_login_lockout().purge()
+    if deleted:
+        logger.info(f"Contadores de login fallido eliminados: {deleted}")
+    return deleted
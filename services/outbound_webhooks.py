@@ -0,0 +1,506 @@
+"""
+Webhooks salientes: reenvío de cambios de estado a las URLs de los clientes.
+
+Al aplicar los eventos de Connect (ver webhook_processor) se añade una entrega
+por suscripción interesada en la misma transacción que el cambio de estado; el
+endpoint de DocuSign no hace nada más que antes, así que un cliente lento no le
+afecta. Un despachador en segundo plano reclama las entregas por lotes y las
+envía con un pool acotado de hilos: las de una misma suscripción van en orden y
+se detienen en el primer fallo, así que un endpoint caído consume como mucho un
+timeout por lote y no bloquea al resto.
+
+Cada entrega se firma con HMAC-SHA256 sobre `<timestamp>.<cuerpo>` con la clave
+de la suscripción (cabecera `X-Webhook-Signature: t=...,v1=...`). Los fallos se
+reintentan con espera exponencial; al agotar los intentos la entrega pasa a la
+tabla de dead letters, desde donde el cliente puede reenviarla.
+
+Las URLs las elige el cliente y las peticiones salen desde nuestra red, así que
+el host se resuelve al crear la suscripción y otra vez antes de cada lote de
+entregas: si alguna de sus direcciones es de loopback, enlace local, privada,
+reservada o multicast, la suscripción se rechaza o la entrega falla sin llegar a
+enviarse. La sesión de entregas no deja que requests vuelva a resolver el host
+al conectar (el DNS podría responder otra cosa, DNS rebinding): su adaptador
+valida las direcciones y abre la conexión contra una de ellas, comprobando el
+certificado y el SNI contra el nombre del host.
+"""
+import hmac
+import json
+import time
+import uuid
+import random
+import socket
+import hashlib
+import logging
+import ipaddress
+from collections import defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from flask import current_app
+from sqlalchemy import and_, or_
+from config.monitoring import OUTBOUND_WEBHOOK_DELIVERIES, OUTBOUND_WEBHOOK_LATENCY
+from models.database import db
+from models.document import Document
+from models.webhook_subscription import (
+    WebhookSubscription,
+    WebhookDelivery,
+    WebhookDeadLetter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Máximo de envelopes por cláusula IN
+QUERY_CHUNK_SIZE = 500
+
+
+def sign_payload(secret, timestamp, body):
+    """
+    Firma de una entrega.
+
+    Args:
+        secret (str): Clave de la suscripción
+        timestamp (int): Segundos desde epoch del envío
+        body (bytes): Cuerpo exacto que se envía
+
+    Returns:
+        str: HMAC-SHA256 en hexadecimal
+    """
+    message = str(timestamp).encode() + b'.' + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def signature_header(secret, body, timestamp=None):
+    """Valor de la cabecera X-Webhook-Signature."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    return f"t={timestamp},v1={sign_payload(secret, timestamp, body)}"
+
+
+def enqueue_deliveries(events):
+    """
+    Crea en la sesión actual las entregas de los eventos para las suscripciones activas.
+
+    El commit lo hace quien llama, junto con el cambio de estado.
+
+    Args:
+        events (list[dict]): envelope_id, status, event, occurred_at
+
+    Returns:
+        int: Entregas creadas
+    """
+    envelope_ids = list({event['envelope_id'] for event in events})
+    targets = defaultdict(list)
+    for start in range(0, len(envelope_ids), QUERY_CHUNK_SIZE):
+        rows = (
+            db.session.query(Document.envelope_id, Document.id, WebhookSubscription)
+            .join(WebhookSubscription, WebhookSubscription.user_id == Document.user_id)
+            .filter(
+                Document.envelope_id.in_(envelope_ids[start : start + QUERY_CHUNK_SIZE])
+            )
+            .filter(WebhookSubscription.active.is_(True))
+            .all()
+        )
+        for envelope_id, document_id, subscription in rows:
+            targets[envelope_id].append((document_id, subscription))
+    if not targets:
+        return 0
+
+    now = datetime.utcnow()
+    deliveries = []
+    for event in events:
+        for document_id, subscription in targets.get(event['envelope_id'], ()):
+            if not subscription.wants(event['status']):
+                continue
+            event_id = uuid.uuid4().hex
+            deliveries.append(
+                {
+                    'subscription_id': subscription.id,
+                    'event_id': event_id,
+                    'payload': json.dumps(
+                        {
+                            'id': event_id,
+                            'type': 'document.status_changed',
+                            'created_at': now.isoformat(),
+                            'data': {
+                                'document_id': document_id,
+                                'envelope_id': event['envelope_id'],
+                                'status': event['status'],
+                                'event': event.get('event'),
+                                'occurred_at': (
+                                    event['occurred_at'].isoformat()
+                                    if event.get('occurred_at')
+                                    else None
+                                ),
+                            },
+                        },
+                        separators=(',', ':'),
+                    ),
+                    'status': 'pending',
+                    'attempts': 0,
+                    'next_attempt_at': now,
+                    'created_at': now,
+                }
+            )
+    for start in range(0, len(deliveries), QUERY_CHUNK_SIZE):
+        db.session.bulk_insert_mappings(
+            WebhookDelivery, deliveries[start : start + QUERY_CHUNK_SIZE]
+        )
+    return len(deliveries)
+
+
+def _claim_batch(batch_size, lease):
+    """Reclama un lote de entregas con un UPDATE condicional (ver signature_outbox)."""
+    now = datetime.utcnow()
+    claimable = or_(
+        and_(
+            WebhookDelivery.status == 'pending', WebhookDelivery.next_attempt_at <= now
+        ),
+        and_(
+            WebhookDelivery.status == 'processing',
+            WebhookDelivery.locked_at < now - timedelta(seconds=lease),
+        ),
+    )
+    candidate_ids = [
+        row.id for row in
+        db.session.query(WebhookDelivery.id)
+        .filter(claimable)
+        .order_by(WebhookDelivery.next_attempt_at, WebhookDelivery.id)
+        .limit(batch_size)
+        .all()
+    ]
+    if not candidate_ids:
+        return []
+
+    claim_token = uuid.uuid4().hex
+    (
+        db.session.query(WebhookDelivery)
+        .filter(WebhookDelivery.id.in_(candidate_ids))
+        .filter(claimable)
+        .update(
+            {'status': 'processing', 'claim_token': claim_token, 'locked_at': now},
+            synchronize_session=False
+        )
+    )
+    db.session.commit()
+    return (
+        WebhookDelivery.query
+        .filter_by(claim_token=claim_token)
+        .order_by(WebhookDelivery.id)
+        .populate_existing()
+        .all()
+    )
+
+
+class UnsafeDestination(ValueError):
+    """La URL de un webhook no resuelve o apunta a una dirección no pública."""
+
+
+def resolve_host(hostname, port):
+    """Direcciones IP a las que resuelve un host."""
+    return {
+        info[4][0]
+        for info in socket.getaddrinfo(hostname, port, type=socket.SOCK_STREAM)
+    }
+
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_destination(url):
+    """
+    Comprueba que todas las direcciones del host de la URL son públicas.
+
+    Returns:
+        set: Direcciones validadas del host
+
+    Raises:
+        UnsafeDestination: Si el host no resuelve o alguna dirección no es pública
+    """
+    parsed = urlparse(url)
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        addresses = resolve_host(parsed.hostname, port)
+    except (OSError, UnicodeError, ValueError) as e:
+        raise UnsafeDestination(f"No se pudo resolver {parsed.hostname}") from e
+    blocked = sorted(address for address in addresses if not _is_public(address))
+    if not addresses or blocked:
+        raise UnsafeDestination(
+            f"{parsed.hostname} resuelve a direcciones "
+            f"no públicas: {', '.join(blocked)}"
+        )
+    return addresses
+
+
+class PinnedAddressAdapter(requests.adapters.HTTPAdapter):
+    """
+    Adaptador HTTP que conecta a una dirección validada por check_destination.
+
+    Cada conexión resuelve y valida el host una sola vez y usa esa misma IP; el
+    nombre del host viaja en la cabecera Host y, en https, en el SNI y en la
+    comprobación del certificado. Los proxies del entorno no se usan.
+    """
+
+    def get_connection(self, url, proxies=None):
+        parsed = urlparse(url)
+        # IPv4 primero: no todos los hosts tienen salida IPv6
+        address = sorted(
+            check_destination(url), key=lambda address: (':' in address, address)
+        )[0]
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        pool_kwargs = {}
+        if parsed.scheme == 'https':
+            pool_kwargs = {
+                'server_hostname': parsed.hostname,
+                'assert_hostname': parsed.hostname,
+            }
+        return self.poolmanager.connection_from_host(
+            address, port, parsed.scheme, pool_kwargs=pool_kwargs
+        )
+
+    def add_headers(self, request, **kwargs):
+        parsed = urlparse(request.url)
+        host = f"[{parsed.hostname}]" if ':' in parsed.hostname else parsed.hostname
+        request.headers['Host'] = f"{host}:{parsed.port}" if parsed.port else host
+
+
+def get_delivery_session(app=None):
+    """
+    Sesión HTTP compartida por el despachador,
+    con un pool del tamaño de la concurrencia.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    session = app.extensions.get('outbound_webhook_session')
+    if session is None:
+        workers = app.config.get('OUTBOUND_WEBHOOK_WORKERS', 8)
+        session = requests.Session()
+        session.trust_env = False
+        adapter = PinnedAddressAdapter(pool_connections=workers, pool_maxsize=workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = 'docusign-integration-webhooks/1.0'
+        session = app.extensions.setdefault('outbound_webhook_session', session)
+    return session
+
+
+def _post(session, url, secret, event_id, payload, timeout):
+    """
+    Envía una entrega. Devuelve None si el cliente la aceptó o el error en otro caso.
+    """
+    body = payload.encode()
+    started = time.monotonic()
+    try:
+        response = session.post(
+            url,
+            data=body,
+            timeout=timeout,
+            allow_redirects=False,
+            headers={
+                'Content-Type': 'application/json',
+                'X-Webhook-Id': event_id,
+                'X-Webhook-Signature': signature_header(secret, body),
+            },
+        )
+    except UnsafeDestination as e:
+        return str(e)
+    except requests.RequestException as e:
+        return f"{type(e).__name__}: {str(e)}"
+    finally:
+        OUTBOUND_WEBHOOK_LATENCY.observe(time.monotonic() - started)
+    if 200 <= response.status_code < 300:
+        return None
+    return f"HTTP {response.status_code}"
+
+
+def retry_delay(attempts, base, max_delay):
+    """Espera exponencial con un ±20% de jitter para no reintentar todos a la vez."""
+    delay = min(max_delay, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _jobs(by_subscription):
+    """
+    Datos de envío por suscripción, leídos antes
+    de salir de la sesión de la base de datos.
+    """
+    return {
+        subscription_id: (
+            items[0].subscription.url,
+            items[0].subscription.secret,
+            items[0].subscription.active,
+            [(delivery.id, delivery.event_id, delivery.payload) for delivery in items],
+        )
+        for subscription_id, items in by_subscription.items()
+    }
+
+
+def _send(session, job, timeout):
+    """
+    Envía las entregas de una suscripción.
+
+    En orden y sin seguir tras el primer fallo: un endpoint caído cuesta un timeout.
+
+    Returns:
+        dict: id de entrega -> None si se confirmó o el error;
+            las que faltan no se intentaron
+    """
+    url, secret, active, items = job
+    if not active:
+        return {items[0][0]: 'Suscripción desactivada'}
+    try:
+        check_destination(url)
+    except UnsafeDestination as e:
+        return {items[0][0]: str(e)}
+    results = {}
+    for delivery_id, event_id, payload in items:
+        error = _post(session, url, secret, event_id, payload, timeout)
+        results[delivery_id] = error
+        if error is not None:
+            break
+    return results
+
+
+def _settle(delivery, results, now, max_attempts, retry_base, max_delay):
+    """
+    Actualiza una entrega en la sesión según el resultado de su envío.
+
+    Returns:
+        str: Resultado para la métrica (delivered, dead, retry o deferred)
+    """
+    delivery.claim_token = None
+    delivery.locked_at = None
+    if delivery.id not in results:
+        # No se intentó: vuelve a la cola sin consumir intento
+        delivery.status = 'pending'
+        delivery.next_attempt_at = now
+        return 'deferred'
+    error = results[delivery.id]
+    delivery.attempts += 1
+    if error is None:
+        db.session.delete(delivery)
+        return 'delivered'
+    if delivery.attempts >= max_attempts or not delivery.subscription.active:
+        logger.error(
+            f"Webhook saliente {delivery.event_id} a "
+            f"la suscripción {delivery.subscription_id} "
+            f"descartado tras {delivery.attempts} intentos: {error}"
+        )
+        db.session.add(WebhookDeadLetter(
+            subscription_id=delivery.subscription_id,
+            event_id=delivery.event_id,
+            payload=delivery.payload,
+            attempts=delivery.attempts,
+            last_error=error[:2000],
+            created_at=delivery.created_at,
+        ))
+        db.session.delete(delivery)
+        return 'dead'
+    delivery.status = 'pending'
+    delivery.last_error = error[:2000]
+    delivery.next_attempt_at = now + timedelta(
+        seconds=retry_delay(delivery.attempts, retry_base, max_delay)
+    )
+    return 'retry'
+
+
+def deliver_webhooks(batch_size=None, max_workers=None):
+    """
+    Envía las entregas pendientes a las URLs de los clientes.
+
+    Args:
+        batch_size (int): Máximo de entregas reclamadas por ejecución
+        max_workers (int): Suscripciones atendidas en paralelo
+
+    Returns:
+        int: Entregas confirmadas por los clientes
+    """
+    app = current_app._get_current_object()
+    batch_size = batch_size or app.config.get('OUTBOUND_WEBHOOK_BATCH', 100)
+    max_workers = max_workers or app.config.get('OUTBOUND_WEBHOOK_WORKERS', 8)
+    max_attempts = app.config.get('OUTBOUND_WEBHOOK_MAX_ATTEMPTS', 8)
+    retry_base = app.config.get('OUTBOUND_WEBHOOK_RETRY_BASE', 30)
+    max_delay = app.config.get('OUTBOUND_WEBHOOK_RETRY_MAX_DELAY', 3600)
+    timeout = app.config.get('OUTBOUND_WEBHOOK_TIMEOUT', 5)
+    lease = app.config.get('OUTBOUND_WEBHOOK_LEASE', 300)
+
+    deliveries = _claim_batch(batch_size, lease)
+    if not deliveries:
+        return 0
+
+    by_subscription = defaultdict(list)
+    for delivery in deliveries:
+        by_subscription[delivery.subscription_id].append(delivery)
+    jobs = _jobs(by_subscription)
+    session = get_delivery_session(app)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            subscription_id: executor.submit(_send, session, job, timeout)
+            for subscription_id, job in jobs.items()
+        }
+
+    delivered = 0
+    now = datetime.utcnow()
+    try:
+        for subscription_id, items in by_subscription.items():
+            try:
+                results = futures[subscription_id].result()
+            except Exception as e:
+                results = {items[0].id: str(e)}
+            for delivery in items:
+                result = _settle(
+                    delivery, results, now, max_attempts, retry_base, max_delay
+                )
+                OUTBOUND_WEBHOOK_DELIVERIES.labels(result=result).inc()
+                delivered += result == 'delivered'
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(
+        f"Webhooks salientes: {delivered} de {len(deliveries)} entregas confirmadas"
+    )
+    return delivered
+
+
+def replay_dead_letters(subscription, dead_letter_ids=None):
+    """
+    Vuelve a encolar entregas descartadas de una suscripción, con los intentos a cero.
+
+    Args:
+        subscription (WebhookSubscription): Suscripción del usuario
+        dead_letter_ids (list[int]): Entregas a reenviar (por defecto todas)
+
+    Returns:
+        int: Entregas encoladas de nuevo
+    """
+    query = WebhookDeadLetter.query.filter(
+        WebhookDeadLetter.subscription_id == subscription.id
+    )
+    if dead_letter_ids is not None:
+        query = query.filter(WebhookDeadLetter.id.in_(dead_letter_ids))
+    now = datetime.utcnow()
+    replayed = 0
+    try:
+        for dead_letter in query.all():
+            db.session.add(WebhookDelivery(
+                subscription_id=subscription.id,
+                event_id=dead_letter.event_id,
+                payload=dead_letter.payload,
+                next_attempt_at=now,
+                created_at=dead_letter.created_at,
+            ))
+            db.session.delete(dead_letter)
+            replayed += 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return replayed
@@ -0,0 +1,216 @@
+"""
+Hash y verificación de contraseñas fuera del hilo de la petición.
+
+PBKDF2 con cientos de miles de iteraciones ocupa la CPU decenas de
+milisegundos y, al ejecutarse en el hilo de la petición, retiene el GIL del
+worker: una ráfaga de logins frena todas las demás peticiones del proceso. Aquí
+cada operación se envía a un pool de procesos acotado. Si hay demasiadas
+operaciones en espera, la petición falla rápido con PasswordHashingBusy en lugar
+de acumular latencia, lo que mantiene predecible el p99 del login.
+
+El factor de trabajo es configurable (PASSWORD_HASH_METHOD e
+PASSWORD_HASH_ITERATIONS); los hashes creados con parámetros anteriores se
+detectan con needs_rehash y se actualizan en el siguiente login correcto.
+"""
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+from config.monitoring import (
+    PASSWORD_HASH_QUEUE_DEPTH,
+    PASSWORD_HASH_SECONDS,
+    PASSWORD_HASH_REJECTED,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METHOD = 'pbkdf2:sha256'
+DEFAULT_ITERATIONS = 260000
+
+
+class PasswordHashingBusy(Exception):
+    """Se lanza cuando el pool de hash no admite más operaciones en espera."""
+
+    def __init__(self, retry_after=1):
+        self.retry_after = retry_after
+        super().__init__(
+            "Demasiadas operaciones de contraseña en curso. Reintentar más tarde"
+        )
+
+
+def hash_method(method=DEFAULT_METHOD, iterations=DEFAULT_ITERATIONS):
+    """Método en el formato de Werkzeug, con las iteraciones explícitas."""
+    return f"{method}:{iterations}"
+
+
+def _hash_chunk(passwords, method):
+    # Se ejecuta en el proceso del pool: un envío por bloque, no por contraseña
+    return [generate_password_hash(password, method) for password in passwords]
+
+
+def needs_rehash(pwhash, method):
+    """
+    Indica si el hash se creó con un método o factor de trabajo distinto del actual.
+    """
+    return not pwhash or pwhash.split('$', 1)[0] != method
+
+
+class PasswordHasher:
+    """Pool de procesos acotado para hashear y verificar contraseñas."""
+
+    def __init__(self, method, workers=2, max_pending=32, wait_timeout=2.0):
+        """
+        Args:
+            method (str): Método de Werkzeug con iteraciones (ver hash_method)
+            workers (int): Procesos del pool; 0 ejecuta en el hilo que llama
+            max_pending (int): Operaciones en curso o en espera admitidas
+            wait_timeout (float): Segundos que se espera un hueco antes de rechazar
+        """
+        self.method = method
+        self.workers = workers
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Tras un fork el pool del padre no sirve en el hijo
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # forkserver: hacer fork de un worker con hilos en marcha puede dejar
+                # locks tomados en el hijo
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('forkserver'),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    @contextmanager
+    def _slot(self, operation):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            PASSWORD_HASH_REJECTED.labels(operation=operation).inc()
+            raise PasswordHashingBusy()
+        PASSWORD_HASH_QUEUE_DEPTH.inc()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+            PASSWORD_HASH_SECONDS.labels(operation=operation).observe(
+                time.monotonic() - started
+            )
+            self._slots.release()
+
+    def _submit(self, call):
+        executor = self._get_executor()
+        try:
+            return call(executor)
+        except BrokenProcessPool:
+            # Un proceso murió: el siguiente intento crea un pool nuevo
+            logger.error("Pool de hash de contraseñas roto, se recreará")
+            self._reset(executor)
+            raise
+
+    def _run(self, operation, func, *args):
+        with self._slot(operation):
+            if not self.workers:
+                return func(*args)
+            return self._submit(lambda executor: executor.submit(func, *args).result())
+
+    def hash(self, password):
+        """
+        Returns:
+            str: Hash de la contraseña con el método configurado
+
+        Raises:
+            PasswordHashingBusy: Si el pool está saturado
+        """
+        return self._run('hash', generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """
+        Hashea un lote repartiéndolo entre todos los procesos del pool.
+
+        El lote cuenta como una sola operación frente a max_pending.
+
+        Returns:
+            list: Hashes en el mismo orden que las contraseñas
+
+        Raises:
+            PasswordHashingBusy: Si el pool está saturado
+        """
+        passwords = list(passwords)
+        if not passwords:
+            return []
+        with self._slot('hash_many'):
+            if not self.workers:
+                return _hash_chunk(passwords, self.method)
+            # Unos cuatro bloques por proceso: reparto
+            # equilibrado sin un envío por contraseña
+            size = max(1, -(-len(passwords) // (self.workers * 4)))
+            chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+            hashed = self._submit(
+                lambda executor: list(
+                    executor.map(_hash_chunk, chunks, [self.method] * len(chunks))
+                )
+            )
+        return [pwhash for chunk in hashed for pwhash in chunk]
+
+    def verify(self, pwhash, password):
+        """
+        Returns:
+            bool: True si la contraseña corresponde al hash
+
+        Raises:
+            PasswordHashingBusy: Si el pool está saturado
+        """
+        if not pwhash:
+            return False
+        return self._run('verify', check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return needs_rehash(pwhash, self.method)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def get_password_hasher(app=None):
+    """
+    Devuelve el pool de hash de contraseñas de la aplicación.
+
+    Fuera de un contexto de aplicación (scripts) se hashea en el hilo actual.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    if app is None and not has_app_context():
+        return PasswordHasher(hash_method(), workers=0)
+    app = app or current_app._get_current_object()
+    hasher = app.extensions.get('password_hasher')
+    if hasher is None:
+        hasher = app.extensions.setdefault('password_hasher', PasswordHasher(
+            hash_method(app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+                        app.config.get('PASSWORD_HASH_ITERATIONS', DEFAULT_ITERATIONS)),
+            workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+            max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 32),
+            wait_timeout=app.config.get('PASSWORD_HASH_WAIT_TIMEOUT', 2.0)
+        ))
+    return hasher
@@ -0,0 +1,298 @@
+"""
+Outbox transaccional de solicitudes de firma.
+
+La petición HTTP solo guarda el PDF en el almacén de blobs y confirma en una
+única transacción el `Document`, la reserva de idempotencia y la entrada del
+outbox. Un despachador en segundo plano reclama las entradas pendientes por
+lotes y crea los envelopes en DocuSign con un pool de hilos. El resultado de
+cada envío se confirma en cuanto llega, así que la ventana en la que un
+envelope creado aún no consta en la base de datos es la de un solo commit. Si
+el proceso cae a mitad de un envío, el lease de la entrada caduca y otro ciclo
+la vuelve a reclamar.
+
+La petición nunca envía a DocuSign. Con BACKGROUND_TASKS_ENABLED=False el
+outbox lo despacha `flask process-queues`, desde cron o un proceso aparte.
+"""
+import json
+import uuid
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from config.monitoring import SIGNATURE_OUTBOX_DISPATCHED
+from models.database import db
+from models.document import Document
+from models.signature_outbox import SignatureOutbox
+from .blob_store import get_blob_store
+from .signing_urls import prefetch_signing_urls
+from .docusign_quota import DocuSignQuotaExceeded, BACKGROUND
+from .docusign_idempotency import (
+    claim_envelope_request,
+    find_envelope_request,
+    complete_envelope_request,
+    release_envelope_request,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_signature_request(
+    user_id, title, pdf_bytes, recipients, client_key=None, reference=None
+):
+    """
+    Registra una solicitud de firma para envío asíncrono.
+
+    Args:
+        reference (str): Identificador del documento en el sistema del cliente;
+            dos referencias distintas nunca comparten clave de idempotencia
+
+    Returns:
+        tuple: (EnvelopeRequest, creado: bool)
+
+    Raises:
+        IdempotencyKeyConflict: Si la clave del cliente se reutiliza con otro contenido
+    """
+    existing = find_envelope_request(
+        user_id, pdf_bytes, recipients, client_key, title=title, reference=reference
+    )
+    if existing is not None:
+        return existing, False
+
+    # El blob se direcciona por contenido: escribirlo
+    # fuera de la transacción es idempotente
+    blob_key = get_blob_store().put(pdf_bytes)
+
+    envelope_request, created = claim_envelope_request(
+        user_id,
+        pdf_bytes,
+        recipients,
+        client_key=client_key,
+        commit=False,
+        title=title,
+        reference=reference,
+    )
+    if not created:
+        return envelope_request, False
+
+    try:
+        document = Document(
+            title=title, file_path=blob_key, status='queued', user_id=user_id
+        )
+        db.session.add(document)
+        db.session.flush()
+
+        envelope_request.document_id = document.id
+        envelope_request.status = 'queued'
+        db.session.add(SignatureOutbox(
+            document_id=document.id,
+            envelope_request_id=envelope_request.id,
+            recipients=json.dumps(recipients, ensure_ascii=False)
+        ))
+        db.session.commit()
+    except IntegrityError:
+        # Otra petición concurrente confirmó la misma clave antes que nosotros
+        db.session.rollback()
+        return (
+            find_envelope_request(
+                user_id,
+                pdf_bytes,
+                recipients,
+                client_key,
+                title=title,
+                reference=reference,
+            ),
+            False,
+        )
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return envelope_request, True
+
+
+def _claim_batch(batch_size, lease):
+    """
+    Reclama un lote de entradas con un UPDATE condicional.
+
+    Solo las filas cuyo estado no cambió entre la lectura y el UPDATE quedan
+    marcadas con nuestro claim_token, así que dos despachadores nunca envían
+    la misma entrada.
+    """
+    now = datetime.utcnow()
+    claimable = or_(
+        and_(
+            SignatureOutbox.status == 'pending', SignatureOutbox.next_attempt_at <= now
+        ),
+        and_(
+            SignatureOutbox.status == 'processing',
+            SignatureOutbox.locked_at < now - timedelta(seconds=lease),
+        ),
+    )
+    candidate_ids = [
+        row.id for row in
+        db.session.query(SignatureOutbox.id)
+        .filter(claimable)
+        .order_by(SignatureOutbox.next_attempt_at)
+        .limit(batch_size)
+        .all()
+    ]
+    if not candidate_ids:
+        return []
+
+    claim_token = uuid.uuid4().hex
+    (
+        db.session.query(SignatureOutbox)
+        .filter(SignatureOutbox.id.in_(candidate_ids))
+        .filter(claimable)
+        .update(
+            {'status': 'processing', 'claim_token': claim_token, 'locked_at': now},
+            synchronize_session=False
+        )
+    )
+    db.session.commit()
+    # El UPDATE masivo no sincroniza la sesión: recargar las filas reclamadas
+    return (
+        SignatureOutbox.query.filter_by(claim_token=claim_token)
+        .populate_existing()
+        .all()
+    )
+
+
+def _apply_result(entry, future, max_attempts, retry_base):
+    """
+    Aplica a la sesión el resultado del envío de una entrada (sin commit).
+
+    Returns:
+        bool: True si se creó el envelope
+    """
+    document = entry.document
+    now = datetime.utcnow()
+    entry.claim_token = None
+    entry.locked_at = None
+    try:
+        result = future.result()
+    except DocuSignQuotaExceeded as e:
+        # Sin cuota no es un fallo del envío: se reprograma sin consumir intento
+        entry.status = 'pending'
+        entry.next_attempt_at = now + timedelta(seconds=max(1, int(e.retry_after)))
+        SIGNATURE_OUTBOX_DISPATCHED.labels(result='deferred').inc()
+        return False
+    except Exception as e:
+        entry.attempts += 1
+        entry.last_error = str(e)[:2000]
+        if entry.attempts >= max_attempts:
+            logger.error(
+                f"Outbox {entry.id}: envío descartado "
+                f"tras {entry.attempts} intentos: {str(e)}"
+            )
+            entry.status = 'failed'
+            document.status = 'error'
+            if entry.envelope_request is not None:
+                # Liberar la reserva permite que el cliente vuelva a enviar el documento
+                record = entry.envelope_request
+                entry.envelope_request = None
+                release_envelope_request(record, commit=False)
+            SIGNATURE_OUTBOX_DISPATCHED.labels(result='failed').inc()
+        else:
+            entry.status = 'pending'
+            entry.next_attempt_at = now + timedelta(
+                seconds=retry_base * 2 ** (entry.attempts - 1)
+            )
+            logger.warning(
+                f"Outbox {entry.id}: intento {entry.attempts} "
+                f"fallido, se reintentará: {str(e)}"
+            )
+            SIGNATURE_OUTBOX_DISPATCHED.labels(result='retry').inc()
+        return False
+
+    entry.attempts += 1
+    entry.status = 'sent'
+    entry.last_error = None
+    document.envelope_id = result.get('envelope_id')
+    document.status = 'sent'
+    if entry.envelope_request is not None:
+        complete_envelope_request(entry.envelope_request, result, commit=False)
+    SIGNATURE_OUTBOX_DISPATCHED.labels(result='sent').inc()
+    return True
+
+
+def dispatch_pending_signatures(batch_size=None, max_workers=None):
+    """
+    Envía a DocuSign las solicitudes pendientes del outbox.
+
+    Args:
+        batch_size (int): Máximo de entradas reclamadas por ejecución
+        max_workers (int): Envíos concurrentes contra DocuSign
+
+    Returns:
+        int: Número de envelopes creados
+    """
+    from services.docusign_service import DocuSignService
+
+    app = current_app._get_current_object()
+    batch_size = batch_size or app.config.get('DOCUSIGN_OUTBOX_BATCH', 20)
+    max_workers = max_workers or app.config.get('DOCUSIGN_OUTBOX_WORKERS', 4)
+    max_attempts = app.config.get('DOCUSIGN_OUTBOX_MAX_ATTEMPTS', 5)
+    retry_base = app.config.get('DOCUSIGN_OUTBOX_RETRY_BASE', 30)
+    lease = app.config.get('DOCUSIGN_OUTBOX_LEASE', 300)
+
+    entries = _claim_batch(batch_size, lease)
+    if not entries:
+        return 0
+
+    service = DocuSignService.create_instance()
+    blob_store = get_blob_store(app)
+    jobs = {
+        entry.id: (
+            entry.document.file_path,
+            entry.get_recipients(),
+            entry.document.title,
+        )
+        for entry in entries
+    }
+
+    def _send(job):
+        blob_key, recipients, title = job
+        with app.app_context():
+            return service.send_document_for_signature(
+                pdf_bytes=blob_store.read(blob_key),
+                recipients=recipients,
+                priority=BACKGROUND,
+                document_name=title
+            )
+
+    def _prefetch(envelope_id, recipients):
+        with app.app_context():
+            try:
+                # Dejar listas las URLs de firma antes de que el usuario las pida
+                prefetch_signing_urls(envelope_id, recipients, service=service)
+            except Exception as e:
+                logger.warning(f"No se pudieron pregenerar las URLs de firma: {str(e)}")
+
+    sent = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_send, jobs[entry.id]): entry for entry in entries}
+        # Cada resultado se confirma en cuanto llega: un envelope ya creado nunca
+        # espera al resto del lote ni depende de su commit
+        for future in as_completed(futures):
+            entry = futures[future]
+            try:
+                created = _apply_result(entry, future, max_attempts, retry_base)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(
+                    f"Outbox {entry.id}: no se pudo registrar "
+                    f"el resultado del envío: {str(e)}"
+                )
+                continue
+            if created:
+                sent += 1
+                executor.submit(
+                    _prefetch, future.result().get('envelope_id'), jobs[entry.id][1]
+                )
+
+    logger.info(f"Outbox de firmas: {sent} de {len(entries)} envelopes creados")
+    return sent
@@ -0,0 +1,80 @@
+"""
+Descarga de documentos firmados.
+
+La primera descarga de un documento completado se retransmite desde DocuSign
+al cliente por trozos, escribiendo a la vez cada trozo en el almacén de blobs;
+nunca se guarda el PDF entero en memoria. Cuando la copia local está completa
+se anota en `Document.signed_file_path` y las descargas siguientes se sirven
+desde disco sin volver a llamar a DocuSign.
+"""
+import logging
+from flask import current_app
+from models.database import db
+from models.document import Document
+from .blob_store import get_blob_store
+
+logger = logging.getLogger(__name__)
+
+
+def local_signed_document_path(document):
+    """Ruta de la copia local del PDF firmado, o None si aún no existe."""
+    store = get_blob_store()
+    if document.signed_file_path and store.exists(document.signed_file_path):
+        return store.path(document.signed_file_path)
+    return None
+
+
+def open_signed_document_stream(document):
+    """
+    Abre la descarga desde DocuSign y devuelve un generador de trozos.
+
+    La llamada a DocuSign se hace antes de devolver el generador para que los
+    errores (cuota, 404, credenciales) se puedan responder con su código HTTP
+    en lugar de cortar una respuesta ya empezada.
+
+    Returns:
+        tuple: (generador de bytes, Content-Length o None)
+    """
+    from services.docusign_service import DocuSignService
+
+    chunk_size = current_app.config.get('SIGNED_DOCUMENT_CHUNK_SIZE', 64 * 1024)
+    document_id = document.id
+    upstream = DocuSignService.create_instance().open_signed_document(
+        document.envelope_id
+    )
+    # Con compresión el Content-Length de DocuSign no coincide con los bytes servidos
+    content_length = (
+        None
+        if upstream.headers.get('Content-Encoding')
+        else upstream.headers.get('Content-Length')
+    )
+
+    def _generate():
+        writer = get_blob_store().writer()
+        try:
+            for chunk in upstream.stream(chunk_size, decode_content=True):
+                writer.write(chunk)
+                yield chunk
+        except BaseException:
+            # Error de DocuSign o cliente desconectado
+            # (GeneratorExit): no dejar copias parciales
+            writer.abort()
+            raise
+        finally:
+            upstream.release_conn()
+
+        key = writer.commit()
+        try:
+            Document.query.get(document_id).signed_file_path = key
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(
+                "No se pudo registrar la copia local "
+                f"del documento {document_id}: {str(e)}"
+            )
+        logger.info(
+            f"Documento firmado {document_id} guardado localmente ({writer.size} bytes)"
+        )
+
+    return _generate(), int(content_length) if content_length else None
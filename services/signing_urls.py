@@ -0,0 +1,263 @@
+"""
+URLs de firma embebida generadas por adelantado.
+
+Generar la URL de firma (recipient view) cuesta una llamada completa a
+DocuSign. Para que el usuario no la espere al pulsar "Firmar", las URLs de los
+firmantes pendientes se generan en segundo plano cuando se envía el envelope o
+llega un webhook, y se guardan durante su ventana de validez en un almacén
+SQLite local compartido por los workers del host. Las URLs son de un solo uso:
+al servirlas se eliminan de la caché.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from config.monitoring import SIGNING_URL_REQUESTS
+from .local_store import LocalStore, local_store_path
+from .docusign_quota import DocuSignQuotaExceeded, BACKGROUND, INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS signing_url (
+        envelope_id TEXT NOT NULL,
+        email TEXT NOT NULL,
+        url TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (envelope_id, email)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_signing_url_expires_at ON signing_url (expires_at)",
+)
+
+# Estados del envelope en los que ya no se puede firmar
+FINAL_STATUSES = ('completed', 'declined', 'voided')
+
+
+class SigningUrlCache:
+    """Caché de URLs de firma de un solo uso con caducidad."""
+
+    def __init__(self, store, ttl=240):
+        """
+        Args:
+            store (LocalStore): Almacén local compartido
+            ttl (int): Segundos que se sirve una URL tras generarla
+        """
+        self.store = store
+        self.ttl = ttl
+
+    def put(self, envelope_id, email, url):
+        with self.store.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO signing_url (envelope_id, email, url, '
+                'expires_at) VALUES (?, ?, ?, ?)',
+                (envelope_id, email.lower(), url, time.time() + self.ttl),
+            )
+
+    def contains(self, envelope_id, email):
+        row = (
+            self.store.connection()
+            .execute(
+                'SELECT 1 FROM signing_url WHERE envelope_id '
+                '= ? AND email = ? AND expires_at > ?',
+                (envelope_id, email.lower(), time.time()),
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    def pop(self, envelope_id, email):
+        """Devuelve y elimina la URL vigente del firmante, o None."""
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                'SELECT url, expires_at FROM signing_url '
+                'WHERE envelope_id = ? AND email = ?',
+                (envelope_id, email.lower()),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'DELETE FROM signing_url WHERE envelope_id = ? AND email = ?',
+                (envelope_id, email.lower())
+            )
+        url, expires_at = row
+        return url if expires_at > time.time() else None
+
+    def invalidate(self, envelope_id):
+        with self.store.transaction() as conn:
+            conn.execute(
+                'DELETE FROM signing_url WHERE envelope_id = ?', (envelope_id,)
+            )
+
+    def purge_expired(self):
+        with self.store.transaction() as conn:
+            return conn.execute(
+                'DELETE FROM signing_url WHERE expires_at <= ?', (time.time(),)
+            ).rowcount
+
+
+def get_signing_url_cache(app=None):
+    """
+    Devuelve la caché de URLs de firma de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('signing_url_cache')
+    if cache is None:
+        store = LocalStore(
+            local_store_path(
+                app,
+                app.config.get(
+                    'DOCUSIGN_SIGNING_URL_STORE', 'docusign_signing_urls.db'
+                ),
+            ),
+            schema=_SCHEMA,
+        )
+        cache = app.extensions.setdefault(
+            'signing_url_cache',
+            SigningUrlCache(store, ttl=app.config.get('DOCUSIGN_SIGNING_URL_TTL', 240))
+        )
+    return cache
+
+
+def signing_recipients(recipients):
+    """
+    Añade a cada destinatario el client_user_id con el que se creó el envelope.
+
+    Debe coincidir con el que asigna DocuSignService._create_envelope.
+    """
+    return [
+        {
+            'email': recipient['email'],
+            'name': recipient['name'],
+            'client_user_id': str(recipient_id),
+        }
+        for recipient_id, recipient in enumerate(recipients, start=1)
+    ]
+
+
+def document_recipients(document):
+    """Destinatarios con los que se creó el envelope de un Document."""
+    entry = document.outbox_entries[0] if document.outbox_entries else None
+    return entry.get_recipients() if entry else []
+
+
+def _return_url(app):
+    return app.config.get('DOCUSIGN_SIGNING_RETURN_URL') or app.config.get(
+        'DOCUSIGN_REDIRECT_URI'
+    )
+
+
+def prefetch_signing_urls(envelope_id, recipients, service=None):
+    """
+    Genera y guarda las URLs de firma de los destinatarios que no tengan una vigente.
+
+    Returns:
+        int: Número de URLs generadas
+    """
+    from services.docusign_service import DocuSignService
+
+    app = current_app._get_current_object()
+    if not app.config.get('DOCUSIGN_EMBEDDED_SIGNING'):
+        return 0
+
+    cache = get_signing_url_cache(app)
+    service = service or DocuSignService.create_instance()
+    generated = 0
+    for recipient in signing_recipients(recipients):
+        if cache.contains(envelope_id, recipient['email']):
+            continue
+        try:
+            url = service.create_recipient_view(
+                envelope_id, recipient, _return_url(app), priority=BACKGROUND
+            )
+        except DocuSignQuotaExceeded:
+            # Sin cuota de fondo: el usuario obtendrá la URL en línea al pulsar
+            logger.info(
+                "Pregeneración de URLs de firma aplazada "
+                f"por cuota: envelope={envelope_id}"
+            )
+            break
+        except Exception as e:
+            # El firmante puede haber firmado ya; no es un error del envelope
+            logger.debug(
+                "No se pudo pregenerar la URL de firma "
+                f"de {recipient['email']}: {str(e)}"
+            )
+            continue
+        cache.put(envelope_id, recipient['email'], url)
+        generated += 1
+    return generated
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def schedule_prefetch(envelope_id, recipients):
+    """Lanza prefetch_signing_urls en segundo plano sin bloquear la petición."""
+    global _executor, _executor_pid
+
+    app = current_app._get_current_object()
+    if not app.config.get('DOCUSIGN_EMBEDDED_SIGNING'):
+        return None
+
+    with _executor_lock:
+        # Los hilos del executor no sobreviven a un fork
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix='signing-url-prefetch'
+            )
+            _executor_pid = os.getpid()
+        executor = _executor
+
+    def _run():
+        with app.app_context():
+            try:
+                return prefetch_signing_urls(envelope_id, recipients)
+            except Exception as e:
+                logger.error(
+                    f"Error pregenerando URLs de firma de {envelope_id}: {str(e)}"
+                )
+                return 0
+
+    return executor.submit(_run)
+
+
+def get_signing_url(envelope_id, recipient):
+    """
+    Devuelve la URL de firma del destinatario, desde caché o generándola en línea.
+
+    Args:
+        recipient (dict): email, name y client_user_id del firmante
+
+    Returns:
+        tuple: (url, desde_cache: bool)
+    """
+    from services.docusign_service import DocuSignService
+
+    app = current_app._get_current_object()
+    url = get_signing_url_cache(app).pop(envelope_id, recipient['email'])
+    if url:
+        SIGNING_URL_REQUESTS.labels(source='cache').inc()
+        return url, True
+
+    SIGNING_URL_REQUESTS.labels(source='live').inc()
+    service = DocuSignService.create_instance()
+    return (
+        service.create_recipient_view(
+            envelope_id, recipient, _return_url(app), priority=INTERACTIVE
+        ),
+        False,
+    )
+
+
+def purge_signing_urls():
+    """Tarea periódica: elimina las URLs caducadas que nadie llegó a usar."""
+    return get_signing_url_cache().purge_expired()
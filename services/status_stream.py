@@ -0,0 +1,326 @@
+"""
+Difusión de cambios de estado de documentos por Server-Sent Events.
+
+Los webhooks se aplican en un único worker (ver webhook_processor), pero las
+conexiones SSE viven en cualquier worker. Cada proceso tiene un StatusBroker
+con un único hilo que sigue el historial `envelope_event` por id (una consulta
+por intervalo para todo el proceso, no una por conexión) y reparte cada cambio
+a las suscripciones del usuario propietario del documento.
+
+Cada conexión abierta ocupa un hilo del worker mientras espera en un Event, sin
+consumir CPU ni consultas: gunicorn.conf.py usa workers gthread y la capacidad
+es GUNICORN_WORKERS × GUNICORN_THREADS conexiones (más las peticiones normales).
+Con workers sync cada conexión bloquearía un worker entero.
+
+Los ids del historial sirven como `id:` de SSE. El seguimiento empieza al
+registrar la primera conexión, y una conexión nueva (sin `Last-Event-ID`)
+recibe primero un `resync`: lo ocurrido entre la carga de la página y la
+conexión no se pierde. Un cliente que reconecta con `Last-Event-ID` recibe lo
+que se perdió mientras siga en el buffer circular, y si no, también `resync`.
+Los ids del historial pueden confirmarse desordenados (ver id_watermark).
+"""
+import os
+import json
+import logging
+import threading
+from collections import deque
+from flask import current_app
+from config.monitoring import SSE_CONNECTIONS, SSE_EVENTS_PUBLISHED
+from models.database import db
+from models.document import Document
+from models.envelope_event import EnvelopeEvent
+from .id_watermark import IdWatermark
+
+logger = logging.getLogger(__name__)
+
+
+class StatusChange:
+    """Cambio de estado de un documento listo para enviarse."""
+
+    __slots__ = ('id', 'user_id', 'document_id', 'envelope_id', 'status', 'occurred_at')
+
+    def __init__(self, id, user_id, document_id, envelope_id, status, occurred_at):
+        self.id = id
+        self.user_id = user_id
+        self.document_id = document_id
+        self.envelope_id = envelope_id
+        self.status = status
+        self.occurred_at = occurred_at
+
+    def to_sse(self):
+        data = json.dumps({
+            'document_id': self.document_id,
+            'envelope_id': self.envelope_id,
+            'status': self.status,
+            'occurred_at': self.occurred_at.isoformat() if self.occurred_at else None,
+        })
+        return f"id: {self.id}\nevent: status\ndata: {data}\n\n"
+
+
+class Subscription:
+    """Buzón de una conexión SSE."""
+
+    def __init__(self, broker, user_id, capacity):
+        self.broker = broker
+        self.user_id = str(user_id)
+        self._pending = deque()
+        self._capacity = capacity
+        self._ready = threading.Event()
+        self._last_status = {}
+        self._closed = False
+        self.overflowed = False
+
+    def push(self, change):
+        # Un cliente que no lee no puede hacer crecer
+        # la memoria: se le pide resincronizar
+        if len(self._pending) >= self._capacity:
+            self.overflowed = True
+        else:
+            self._pending.append(change)
+        self._ready.set()
+
+    def wait(self, timeout):
+        """
+        Espera cambios nuevos.
+
+        Returns:
+            list[StatusChange]: Cambios pendientes, sin repetir estados ya enviados
+        """
+        self._ready.wait(timeout)
+        self._ready.clear()
+        changes = []
+        while self._pending:
+            change = self._pending.popleft()
+            if self._last_status.get(change.document_id) == change.status:
+                continue
+            self._last_status[change.document_id] = change.status
+            changes.append(change)
+        return changes
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.broker.unsubscribe(self)
+
+
+class StatusBroker:
+    """Reparto por usuario de los cambios de estado de documentos en este proceso."""
+
+    def __init__(
+        self,
+        app,
+        buffer_size=1000,
+        poll_interval=1.0,
+        subscription_capacity=100,
+        gap_timeout=60.0,
+    ):
+        """
+        Args:
+            app (Flask): La aplicación Flask
+            buffer_size (int): Cambios recientes conservados para reconexiones
+            poll_interval (float): Segundos entre lecturas del historial
+            subscription_capacity (int): Cambios pendientes
+                por conexión antes de pedir resincronizar
+            gap_timeout (float): Segundos durante los que se
+                vuelve a leer un id del historial que faltaba
+        """
+        self.app = app
+        self.poll_interval = poll_interval
+        self.subscription_capacity = subscription_capacity
+        self._recent = deque(maxlen=buffer_size)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._generation = 0
+        self.watermark = IdWatermark(gap_timeout=gap_timeout)
+
+    def subscribe(self, user_id, last_event_id=None):
+        """
+        Registra una conexión del usuario.
+
+        Returns:
+            tuple: (Subscription, cambios a reenviar, necesita resincronizar)
+        """
+        subscription = Subscription(self, user_id, self.subscription_capacity)
+        top = None
+        if self.watermark.last_id is None:
+            top = db.session.query(db.func.max(EnvelopeEvent.id)).scalar() or 0
+        with self._lock:
+            # Primera conexión: se sigue el historial
+            # desde ahora, no desde el primer sondeo
+            if self.watermark.last_id is None:
+                self.watermark.reset(top)
+            self._subscribers.setdefault(subscription.user_id, set()).add(subscription)
+            replay, resync = self._replay(subscription.user_id, last_event_id)
+        SSE_CONNECTIONS.inc()
+        self._ensure_running()
+        return subscription, replay, resync
+
+    def _replay(self, user_id, last_event_id):
+        # Conexión nueva: lo ocurrido desde que el
+        # cliente cargó el estado es desconocido
+        if last_event_id is None:
+            return [], True
+        if last_event_id >= self.watermark.last_id:
+            return [], False
+        # Solo se puede reenviar si el buffer cubre
+        # todo lo posterior a lo que vio el cliente
+        if self._recent and self._recent[0].id <= last_event_id:
+            return [change for change in self._recent
+                    if change.id > last_event_id and change.user_id == user_id], False
+        return [], True
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+            if not self._subscribers:
+                # Sin conexiones no se sigue el historial:
+                # lo publicado deja de ser continuo
+                self._recent.clear()
+                self.watermark.reset()
+                self._generation += 1
+        SSE_CONNECTIONS.dec()
+
+    def publish(self, changes):
+        """Añade cambios al buffer y los entrega a las conexiones de cada usuario."""
+        delivered = 0
+        with self._lock:
+            for change in changes:
+                self._recent.append(change)
+                for subscription in self._subscribers.get(change.user_id, ()):
+                    subscription.push(change)
+                    delivered += 1
+        SSE_EVENTS_PUBLISHED.inc(delivered)
+
+    def poll(self, batch_size=1000):
+        """
+        Lee del historial los eventos nuevos y
+        publica el estado actual de sus documentos.
+        """
+        with self._lock:
+            if self.watermark.last_id is None:
+                return 0
+            pending = self.watermark.clause(EnvelopeEvent.id)
+            generation = self._generation
+        rows = (
+            db.session.query(
+                EnvelopeEvent.id,
+                EnvelopeEvent.envelope_id,
+                EnvelopeEvent.occurred_at,
+                Document.id,
+                Document.user_id,
+                Document.status,
+            )
+            .join(Document, Document.envelope_id == EnvelopeEvent.envelope_id)
+            .filter(pending)
+            .order_by(EnvelopeEvent.id)
+            .limit(batch_size)
+            .all()
+        )
+        with self._lock:
+            # Si se cerró la última conexión durante la consulta, el resultado no vale
+            if generation != self._generation:
+                return 0
+            self.watermark.advance(row[0] for row in rows)
+        if not rows:
+            return 0
+        self.publish([
+            StatusChange(event_id, str(user), document, envelope, status, occurred_at)
+            for event_id, envelope, occurred_at, document, user, status in rows
+        ])
+        return len(rows)
+
+    def _ensure_running(self):
+        # Tras un fork el hilo del padre no existe en el hijo
+        if (
+            self._thread is not None
+            and self._thread.is_alive()
+            and self._pid == os.getpid()
+        ):
+            self._wakeup.set()
+            return
+        with self._lock:
+            if (
+                self._thread is None
+                or not self._thread.is_alive()
+                or self._pid != os.getpid()
+            ):
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name='status-stream', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # Sin conexiones abiertas el hilo no consulta la base de datos
+            if not self._subscribers:
+                self._wakeup.wait()
+                self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    while self.poll() and self._subscribers:
+                        pass
+            except Exception as e:
+                logger.warning(
+                    f"Error leyendo el historial de envelopes para SSE: {str(e)}"
+                )
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+def get_status_broker(app=None):
+    """
+    Devuelve el broker de estados de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    broker = app.extensions.get('status_broker')
+    if broker is None:
+        broker = app.extensions.setdefault(
+            'status_broker',
+            StatusBroker(
+                app,
+                buffer_size=app.config.get('STATUS_STREAM_BUFFER', 1000),
+                poll_interval=app.config.get('STATUS_STREAM_POLL_INTERVAL', 1.0),
+                subscription_capacity=app.config.get(
+                    'STATUS_STREAM_SUBSCRIPTION_CAPACITY', 100
+                ),
+                gap_timeout=app.config.get('STATUS_STREAM_GAP_TIMEOUT', 60.0),
+            ),
+        )
+    return broker
+
+
+def stream_status_changes(subscription, replay=(), resync=False, heartbeat=15):
+    """
+    Generador SSE de una conexión: reenvía lo perdido y después los cambios nuevos.
+
+    Los comentarios de heartbeat mantienen abiertos los proxies y permiten
+    detectar que el cliente se ha ido.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        if resync:
+            yield "event: resync\ndata: {}\n\n"
+        for change in replay:
+            yield change.to_sse()
+        while True:
+            changes = subscription.wait(heartbeat)
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield "event: resync\ndata: {}\n\n"
+            if not changes:
+                yield ": heartbeat\n\n"
+            for change in changes:
+                yield change.to_sse()
+    finally:
+        subscription.close()
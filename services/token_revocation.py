@@ -0,0 +1,206 @@
+"""
+Revocación de tokens JWT compartida entre workers.
+
+`token_in_blocklist_loader` se ejecuta en cada petición con `@jwt_required`, así
+que la respuesta habitual ("no revocado") no puede costar una consulta. Los
+tokens revocados se guardan en la tabla `revoked_token` con su `exp`, y cada
+proceso mantiene en memoria el conjunto de los que aún no han expirado. El
+conjunto se pone al día leyendo solo las filas nuevas (por id) como mucho una
+vez cada JWT_REVOCATION_SYNC_INTERVAL segundos; una revocación hecha en este
+mismo proceso se aplica al instante, y en los demás tras ese intervalo. Los ids
+pueden confirmarse desordenados, así que los huecos se vuelven a leer durante
+JWT_REVOCATION_SYNC_GAP_TIMEOUT segundos (ver id_watermark).
+
+Un token expirado ya lo rechaza la propia validación del JWT, así que las
+filas caducadas se descartan de la memoria y se borran de la tabla. El borrado
+lo hace la tarea periódica cuando BACKGROUND_TASKS_ENABLED está activo y, en
+cualquier caso, la propia revocación como mucho una vez cada
+JWT_REVOCATION_PURGE_INTERVAL segundos por proceso: la tabla solo crece con las
+revocaciones, así que queda acotada aunque no haya tareas en segundo plano.
+"""
+import time
+import logging
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from models.database import db
+from models.revoked_token import RevokedToken
+from .id_watermark import IdWatermark
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 5000
+
+
+class TokenRevocationStore:
+    """Conjunto en memoria de JTIs revocados, sincronizado con la base de datos."""
+
+    def __init__(self, sync_interval=2.0, purge_interval=3600, gap_timeout=60.0):
+        """
+        Args:
+            sync_interval (float): Segundos máximos entre
+                lecturas de revocaciones de otros workers
+            purge_interval (float): Segundos mínimos
+                entre borrados de revocaciones expiradas
+                al revocar (0 = en cada revocación)
+            gap_timeout (float): Segundos durante los
+                que se vuelve a leer un id que faltaba
+        """
+        self.sync_interval = sync_interval
+        self.purge_interval = purge_interval
+        self._purged_at = None
+        self._revoked = {}  # jti -> expiración (datetime UTC)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+        self.watermark = IdWatermark(gap_timeout=gap_timeout)
+
+    def revoke(self, jti, expires_at, token_type=None, identity=None):
+        """
+        Revoca un token hasta su expiración.
+
+        Args:
+            jti (str): Identificador del token
+            expires_at (datetime): `exp` del token (UTC)
+            token_type (str): access o refresh
+            identity: Identidad del token, para auditoría
+
+        Returns:
+            bool: False si ya estaba revocado
+        """
+        created = True
+        try:
+            db.session.add(RevokedToken(
+                jti=jti, token_type=token_type, expires_at=expires_at,
+                identity=str(identity)[:64] if identity is not None else None
+            ))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            created = False
+        with self._lock:
+            self._revoked[jti] = expires_at
+        self._maybe_purge()
+        return created
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = now
+        try:
+            # Lote completo: quedan filas pendientes y se sigue en la próxima revocación
+            if purge_revoked_tokens(PURGE_BATCH_SIZE) >= PURGE_BATCH_SIZE:
+                self._purged_at = None
+        except Exception as e:
+            logger.warning(
+                f"No se pudieron borrar los tokens revocados expirados: {str(e)}"
+            )
+
+    def is_revoked(self, jti):
+        """Consulta en memoria; sincroniza antes si el conjunto está desactualizado."""
+        if (
+            self._synced_at is None
+            or time.monotonic() - self._synced_at >= self.sync_interval
+        ):
+            self._try_sync()
+        return jti in self._revoked
+
+    def _try_sync(self):
+        # Si otro hilo ya está sincronizando, se responde con lo que hay en memoria
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self.sync()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"No se pudieron sincronizar los tokens revocados: {str(e)}")
+        finally:
+            # También tras un error: no se reintenta en cada petición
+            self._synced_at = time.monotonic()
+            self._sync_lock.release()
+
+    def sync(self):
+        """
+        Incorpora las revocaciones nuevas y descarta las ya expiradas.
+
+        Returns:
+            int: Revocaciones leídas
+        """
+        now = datetime.utcnow()
+        query = db.session.query(
+            RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at
+        )
+        if self.watermark.last_id is None:
+            # Carga inicial: solo las que siguen vigentes
+            top = db.session.query(db.func.max(RevokedToken.id)).scalar() or 0
+            rows = query.filter(
+                RevokedToken.id <= top, RevokedToken.expires_at > now
+            ).all()
+            self.watermark.reset(top)
+        else:
+            rows = (
+                query.filter(self.watermark.clause(RevokedToken.id))
+                .order_by(RevokedToken.id)
+                .all()
+            )
+            self.watermark.advance(row.id for row in rows)
+        with self._lock:
+            for row in rows:
+                self._revoked[row.jti] = row.expires_at
+            expired = [
+                jti for jti, expires_at in self._revoked.items() if expires_at <= now
+            ]
+            for jti in expired:
+                del self._revoked[jti]
+        return len(rows)
+
+
+def get_revocation_store(app=None):
+    """
+    Devuelve el almacén de revocaciones de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    store = app.extensions.get('token_revocation')
+    if store is None:
+        store = app.extensions.setdefault('token_revocation', TokenRevocationStore(
+            sync_interval=app.config.get('JWT_REVOCATION_SYNC_INTERVAL', 2.0),
+            purge_interval=app.config.get('JWT_REVOCATION_PURGE_INTERVAL', 3600),
+            gap_timeout=app.config.get('JWT_REVOCATION_SYNC_GAP_TIMEOUT', 60.0)
+        ))
+    return store
+
+
+def purge_revoked_tokens(batch_size=PURGE_BATCH_SIZE):
+    """
+    Borra por lotes las revocaciones de tokens ya expirados (tarea periódica y
+    TokenRevocationStore.revoke).
+
+    Returns:
+        int: Filas eliminadas
+    """
+    now = datetime.utcnow()
+    ids = [
+        row.id for row in
+        db.session.query(RevokedToken.id)
+        .filter(RevokedToken.expires_at <= now)
+        .limit(batch_size)
+    ]
+    if not ids:
+        return 0
+    try:
+        deleted = (
+            RevokedToken.query
+            .filter(RevokedToken.id.in_(ids))
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(f"Revocaciones de tokens expirados eliminadas: {deleted}")
+    return deleted
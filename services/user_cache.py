@@ -0,0 +1,164 @@
+"""
+Caché de usuarios para las rutas protegidas con JWT.
+
+El `user_lookup_loader` de JWTManager resuelve la identidad del token a través
+de esta caché: primero un diccionario en `g` (una sola búsqueda por petición
+aunque el JWT se verifique dos veces, como en protected_bp) y después una caché
+LRU con TTL compartida por los hilos del proceso. Se guarda una copia inmutable
+con los campos públicos del usuario, nunca la instancia ORM (está ligada a la
+sesión de otra petición) ni los tokens de DocuSign.
+
+Los cambios en la tabla `user` hechos desde este proceso invalidan la entrada al
+confirmarse la transacción (eventos de SQLAlchemy); los de otros workers se
+ven, como mucho, tras USER_CACHE_TTL segundos.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from config.monitoring import USER_CACHE_LOOKUPS
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class CachedUser:
+    """Copia de solo lectura de los campos públicos de un usuario."""
+
+    __slots__ = ('id', 'username', 'email', 'created_at')
+
+    def __init__(self, id, username, email, created_at):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email, user.created_at)
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+class UserCache:
+    """LRU con caducidad de usuarios por id."""
+
+    def __init__(self, ttl=30, capacity=10000):
+        """
+        Args:
+            ttl (float): Segundos que una entrada es válida
+            capacity (int): Usuarios máximos en memoria
+        """
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Devuelve el usuario, consultando la base de datos solo si no está en caché.
+
+        Returns:
+            CachedUser: None si el usuario no existe
+        """
+        key = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                USER_CACHE_LOOKUPS.labels(result='hit').inc()
+                return entry[1]
+
+        USER_CACHE_LOOKUPS.labels(result='miss').inc()
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        cached = CachedUser.from_user(user)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, cached)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_user_cache(app=None):
+    """
+    Devuelve la caché de usuarios de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('user_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('user_cache', UserCache(
+            ttl=app.config.get('USER_CACHE_TTL', 30),
+            capacity=app.config.get('USER_CACHE_SIZE', 10000)
+        ))
+    return cache
+
+
+def load_user(identity):
+    """Usuario de la identidad del JWT, una sola búsqueda por petición."""
+    loaded = g.setdefault('_loaded_users', {})
+    key = str(identity)
+    if key not in loaded:
+        loaded[key] = get_user_cache().get(identity)
+    return loaded[key]
+
+
+# Invalidación: las entradas se descartan al hacer flush y otra vez al confirmar,
+# para no volver a cachear la fila antigua leída por otra petición entre medias
+def _pending(session):
+    return session.info.setdefault('user_cache_invalidate', set())
+
+
+def _invalidate(user_ids):
+    if user_ids and has_app_context():
+        cache = get_user_cache()
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _pending(session).add(target.id)
+    _invalidate([target.id])
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    _invalidate(session.info.pop('user_cache_invalidate', None))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    session.info.pop('user_cache_invalidate', None)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _after_bulk(update_context):
+    # Un UPDATE/DELETE masivo no dice qué filas tocó: se vacía la caché
+    entities = {
+        column.get('entity') for column in update_context.query.column_descriptions
+    }
+    if User in entities and has_app_context():
+        get_user_cache().clear()
@@ -0,0 +1,272 @@
+"""
+Alta masiva de usuarios para el onboarding de sellos.
+
+`/api/register` da de alta un usuario por petición: dos consultas de
+existencia, un hash y un commit. Aquí se procesa un fichero completo (CSV con
+cabecera o NDJSON) en tres pasos:
+
+1. Validación de cada fila con las mismas reglas que el registro, incluidos
+   los duplicados dentro del propio fichero.
+2. Una consulta por bloque (`username IN (...) OR email IN (...)`) para
+   detectar los que ya existen en la base de datos.
+3. Hash de todas las contraseñas en un pool de procesos dedicado, del tamaño
+   de los núcleos disponibles, e inserción con `executemany` por bloques.
+
+Los errores se devuelven por fila (número de línea del fichero) sin detener el
+resto del alta. Si otra petición registra uno de los usuarios entre la
+comprobación y la inserción, ese bloque se reintenta fila a fila.
+"""
+import os
+import re
+import csv
+import json
+import logging
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from config.monitoring import USER_IMPORT_ROWS
+from config.security import sanitize_input
+from models.database import db
+from models.user import User
+from services.password_hashing import (
+    PasswordHasher,
+    hash_method,
+    DEFAULT_METHOD,
+    DEFAULT_ITERATIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('username', 'password', 'email')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+USERNAME_TAKEN = "Nombre de usuario ya existe"
+EMAIL_TAKEN = "Email ya está registrado"
+
+
+class UserImportError(Exception):
+    """Error que invalida el fichero completo (formato, tamaño)."""
+    pass
+
+
+def validate_user_fields(data):
+    """
+    Valida los datos de alta de un usuario.
+
+    Args:
+        data (dict): username, password y email
+
+    Returns:
+        str: Mensaje de error, o None si los datos son válidos
+    """
+    for field in FIELDS:
+        if not isinstance(data.get(field), str) or not data[field]:
+            return f"Falta el campo obligatorio '{field}'"
+    if len(data['username']) < 3:
+        return "El nombre de usuario debe tener al menos 3 caracteres"
+    max_length = User.username.type.length
+    if len(data['username']) > max_length:
+        return f"El nombre de usuario no puede superar {max_length} caracteres"
+    if len(data['password']) < 6:
+        return "La contraseña debe tener al menos 6 caracteres"
+    email = data['email']
+    if len(email) > User.email.type.length or not EMAIL_PATTERN.match(email):
+        return "El formato del email es inválido"
+    return None
+
+
+def parse_rows(body, mimetype):
+    """
+    Lee las filas del fichero de alta.
+
+    Args:
+        body (str): Contenido del fichero
+        mimetype (str): text/csv o application/x-ndjson
+
+    Yields:
+        tuple: (línea, fila o None, error o None)
+
+    Raises:
+        UserImportError: Si el formato no está soportado o falta una columna
+    """
+    if mimetype == 'text/csv':
+        reader = csv.DictReader(body.splitlines())
+        missing = [field for field in FIELDS if field not in (reader.fieldnames or ())]
+        if missing:
+            raise UserImportError(f"Faltan columnas en el CSV: {', '.join(missing)}")
+        for row in reader:
+            yield reader.line_num, row, None
+    elif mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line, text in enumerate(body.splitlines(), 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                yield line, None, "JSON inválido"
+                continue
+            if not isinstance(row, dict):
+                yield line, None, "Cada línea debe ser un objeto JSON"
+                continue
+            yield line, row, None
+    else:
+        raise UserImportError(
+            "Formato no soportado: usar text/csv o application/x-ndjson"
+        )
+
+
+def get_import_hasher(app=None):
+    """
+    Devuelve el pool de hash de las altas masivas.
+
+    Es independiente del pool de login y registro para que un alta de miles de
+    usuarios no retrase los logins; admite USER_IMPORT_MAX_CONCURRENT altas a la vez.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    hasher = app.extensions.get('user_import_hasher')
+    if hasher is None:
+        hasher = app.extensions.setdefault('user_import_hasher', PasswordHasher(
+            hash_method(app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+                        app.config.get('PASSWORD_HASH_ITERATIONS', DEFAULT_ITERATIONS)),
+            workers=app.config.get('USER_IMPORT_HASH_WORKERS') or os.cpu_count() or 1,
+            max_pending=app.config.get('USER_IMPORT_MAX_CONCURRENT', 2),
+            wait_timeout=0
+        ))
+    return hasher
+
+
+def import_users(rows, hasher=None, batch_size=None, max_rows=None):
+    """
+    Da de alta los usuarios válidos y devuelve el resultado por fila.
+
+    Args:
+        rows: Filas de parse_rows
+        hasher (PasswordHasher): Pool de hash (por defecto get_import_hasher())
+        batch_size (int): Filas por consulta de conflictos e inserción
+        max_rows (int): Filas máximas admitidas en un fichero
+
+    Returns:
+        dict: created, failed y errors ([{line, username, error}])
+
+    Raises:
+        UserImportError: Si el fichero supera max_rows
+        PasswordHashingBusy: Si ya hay demasiadas altas en curso (no se inserta nada)
+    """
+    hasher = hasher or get_import_hasher()
+    batch_size = batch_size or current_app.config.get('USER_IMPORT_BATCH_SIZE', 1000)
+    max_rows = max_rows or current_app.config.get('USER_IMPORT_MAX_ROWS', 10000)
+
+    errors = []
+    valid = _valid_rows(rows, max_rows, errors)
+
+    pending = []
+    for start in range(0, len(valid), batch_size):
+        pending.extend(_without_conflicts(valid[start:start + batch_size], errors))
+
+    created = 0
+    if pending:
+        hashes = hasher.hash_many(row['password'] for _, row in pending)
+        now = datetime.utcnow()
+        values = [
+            {
+                'username': row['username'],
+                'email': row['email'],
+                'password_hash': pwhash,
+                'created_at': now,
+            }
+            for (_, row), pwhash in zip(pending, hashes)
+        ]
+        for start in range(0, len(values), batch_size):
+            created += _insert_batch(
+                pending[start : start + batch_size],
+                values[start : start + batch_size],
+                errors,
+            )
+
+    errors.sort(key=lambda error: error['line'])
+    USER_IMPORT_ROWS.labels(result='created').inc(created)
+    USER_IMPORT_ROWS.labels(result='failed').inc(len(errors))
+    logger.info(f"Alta masiva de usuarios: {created} creados, {len(errors)} con error")
+    return {'created': created, 'failed': len(errors), 'errors': errors}
+
+
+def _valid_rows(rows, max_rows, errors):
+    # Validación de cada fila y de duplicados dentro del propio fichero
+    valid = []
+    usernames, emails = set(), set()
+    for count, (line, row, error) in enumerate(rows, 1):
+        if count > max_rows:
+            raise UserImportError(f"El fichero supera el máximo de {max_rows} filas")
+        if error is None:
+            # Mismo saneado que aplica xss_protection al registro y al login
+            row = sanitize_input({field: row.get(field) for field in FIELDS})
+            error = validate_user_fields(row) or _repeated(row, usernames, emails)
+        if error is not None:
+            errors.append(
+                {'line': line, 'username': (row or {}).get('username'), 'error': error}
+            )
+            continue
+        usernames.add(row['username'])
+        emails.add(row['email'])
+        valid.append((line, row))
+    return valid
+
+
+def _repeated(row, usernames, emails):
+    if row['username'] in usernames:
+        return "Nombre de usuario repetido en el fichero"
+    if row['email'] in emails:
+        return "Email repetido en el fichero"
+    return None
+
+
+def _without_conflicts(batch, errors):
+    # Una sola consulta por bloque para los nombres y emails ya registrados
+    taken = (
+        db.session.query(User.username, User.email)
+        .filter(or_(
+            User.username.in_([row['username'] for _, row in batch]),
+            User.email.in_([row['email'] for _, row in batch])
+        ))
+        .all()
+    )
+    taken_usernames = {user.username for user in taken}
+    taken_emails = {user.email for user in taken}
+    accepted = []
+    for line, row in batch:
+        if row['username'] in taken_usernames:
+            errors.append(
+                {'line': line, 'username': row['username'], 'error': USERNAME_TAKEN}
+            )
+        elif row['email'] in taken_emails:
+            errors.append(
+                {'line': line, 'username': row['username'], 'error': EMAIL_TAKEN}
+            )
+        else:
+            accepted.append((line, row))
+    return accepted
+
+
+def _insert_batch(batch, values, errors):
+    try:
+        db.session.execute(User.__table__.insert(), values)
+        db.session.commit()
+        return len(values)
+    except IntegrityError:
+        db.session.rollback()
+    # Otra petición registró alguno entre la consulta y el insert: fila a fila
+    created = 0
+    for (line, row), value in zip(batch, values):
+        try:
+            db.session.execute(User.__table__.insert(), [value])
+            db.session.commit()
+            created += 1
+        except IntegrityError:
+            db.session.rollback()
+            errors.append({'line': line, 'username': row['username'],
+                           'error': "Nombre de usuario o email ya registrado"})
+    return created
@@ -0,0 +1,223 @@
+"""
+Deduplicación y protección contra repetición de eventos de webhook.
+
+DocuSign Connect reintenta las entregas, así que el mismo evento puede llegar
+varias veces. Cada evento se identifica por su ID de Connect o, si no lo trae,
+por el SHA-256 del payload. Ninguna cabecera entra en la clave: solo el cuerpo
+está firmado de extremo a extremo con el propio evento.
+
+Las claves ya aplicadas se guardan en la tabla `processed_webhook_event`
+(índice único sobre la clave, caducidad indexada) y, delante de ella, en una
+LRU en memoria: un reintento reciente se descarta en O(1) sin tocar la base de
+datos. Las claves nuevas se insertan en la misma transacción que el cambio de
+estado, de modo que un lote fallido no deja eventos marcados como aplicados.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from models.database import db
+from models.processed_webhook_event import ProcessedWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Máximo de claves por cláusula IN
+LOOKUP_CHUNK_SIZE = 500
+
+
+def dedup_key(payload, data):
+    """
+    Clave de deduplicación de un evento.
+
+    Args:
+        payload (bytes): Cuerpo crudo
+        data (dict): Payload ya decodificado
+    """
+    event_id = data.get('eventId') if isinstance(data, dict) else None
+    if event_id:
+        return f"evt:{event_id}"[:80]
+    return f"sha:{hashlib.sha256(payload).hexdigest()}"
+
+
+def parse_timestamp(value):
+    """
+    Convierte la cabecera de timestamp (ISO 8601 o segundos epoch) a datetime UTC naive.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return datetime.utcfromtimestamp(float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def within_replay_window(timestamp, window, now=None):
+    """
+    Comprueba que el timestamp de la entrega está dentro de la ventana permitida.
+
+    El timestamp solo está autenticado si la firma HMAC lo incluye (ver
+    services/docusign_hmac), así que esta comprobación va después de validarla.
+    Con `window` a 0 la protección está desactivada; si está activa, una entrega
+    sin cabecera o con una cabecera ilegible se rechaza.
+    """
+    if not window:
+        return True
+    if not timestamp:
+        return False
+    sent_at = parse_timestamp(timestamp)
+    if sent_at is None:
+        return False
+    now = now or datetime.utcnow()
+    return abs((now - sent_at).total_seconds()) <= window
+
+
+class WebhookDeduplicator:
+    """LRU en memoria delante de la tabla processed_webhook_event."""
+
+    def __init__(self, capacity=10000, ttl=172800):
+        """
+        Args:
+            capacity (int): Claves recordadas en memoria
+            ttl (int): Segundos durante los que se recuerda un evento en la tabla
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _seen_recently(self, key):
+        with self._lock:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                return True
+        return False
+
+    def remember(self, keys):
+        """Añade claves a la LRU (llamar tras confirmar la transacción)."""
+        with self._lock:
+            for key in keys:
+                self._recent[key] = True
+                self._recent.move_to_end(key)
+            while len(self._recent) > self.capacity:
+                self._recent.popitem(last=False)
+
+    def filter_new(self, keyed_items):
+        """
+        Descarta los elementos ya aplicados y registra los nuevos en la sesión actual.
+
+        Args:
+            keyed_items (list): Tuplas (clave, envelope_id, ...) en orden de llegada
+
+        Returns:
+            tuple: (elementos nuevos, claves nuevas)
+        """
+        candidates = []
+        batch_keys = set()
+        for item in keyed_items:
+            key = item[0]
+            # Duplicados recientes o dentro del mismo lote: O(1), sin base de datos
+            if key in batch_keys or self._seen_recently(key):
+                continue
+            batch_keys.add(key)
+            candidates.append(item)
+        if not candidates:
+            return [], []
+
+        now = datetime.utcnow()
+        keys = [item[0] for item in candidates]
+        known, expired = set(), []
+        for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+            for row in db.session.query(
+                ProcessedWebhookEvent.id,
+                ProcessedWebhookEvent.dedup_key,
+                ProcessedWebhookEvent.expires_at,
+            ).filter(ProcessedWebhookEvent.dedup_key.in_(chunk)):
+                if row.expires_at > now:
+                    known.add(row.dedup_key)
+                else:
+                    expired.append(row.id)
+        if known:
+            self.remember(known)
+        # Una clave caducada que la purga aún no borró se sustituye: el índice es único
+        for start in range(0, len(expired), LOOKUP_CHUNK_SIZE):
+            (
+                ProcessedWebhookEvent.query.filter(
+                    ProcessedWebhookEvent.id.in_(
+                        expired[start : start + LOOKUP_CHUNK_SIZE]
+                    )
+                ).delete(synchronize_session=False)
+            )
+
+        fresh = [item for item in candidates if item[0] not in known]
+        expires_at = now + timedelta(seconds=self.ttl)
+        db.session.bulk_insert_mappings(
+            ProcessedWebhookEvent,
+            [
+                {
+                    'dedup_key': item[0],
+                    'envelope_id': item[1],
+                    'expires_at': expires_at,
+                    'created_at': now,
+                }
+                for item in fresh
+            ],
+        )
+        return fresh, [item[0] for item in fresh]
+
+
+def get_webhook_deduplicator(app=None):
+    """
+    Devuelve el deduplicador de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    deduplicator = app.extensions.get('webhook_dedup')
+    if deduplicator is None:
+        deduplicator = app.extensions.setdefault('webhook_dedup', WebhookDeduplicator(
+            capacity=app.config.get('DOCUSIGN_WEBHOOK_DEDUP_CAPACITY', 10000),
+            ttl=app.config.get('DOCUSIGN_WEBHOOK_DEDUP_TTL', 172800)
+        ))
+    return deduplicator
+
+
+def purge_processed_webhook_events(batch_size=5000):
+    """
+    Tarea periódica: borra por lotes las claves caducadas.
+
+    Returns:
+        int: Filas eliminadas
+    """
+    now = datetime.utcnow()
+    ids = [
+        row.id for row in
+        db.session.query(ProcessedWebhookEvent.id)
+        .filter(ProcessedWebhookEvent.expires_at <= now)
+        .limit(batch_size)
+    ]
+    if not ids:
+        return 0
+    try:
+        deleted = (
+            ProcessedWebhookEvent.query
+            .filter(ProcessedWebhookEvent.id.in_(ids))
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(f"Claves de deduplicación de webhooks caducadas eliminadas: {deleted}")
+    return deleted
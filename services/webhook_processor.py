@@ -0,0 +1,320 @@
+"""
+Aplicación en segundo plano de los eventos de webhook de DocuSign.
+
+Drena la cola local (webhook_queue) por lotes. Los eventos de un lote se
+agrupan por envelope quedándose con el estado más avanzado del ciclo de vida
+(ver envelope_lifecycle) y se aplican con un UPDATE condicional por estado
+destino y un único commit, en lugar de una consulta y un commit por evento.
+Los reintentos de Connect se descartan antes de aplicarse (ver webhook_dedup) y
+cada evento nuevo queda en el historial del envelope (ver envelope_events). Los
+que hacen avanzar el documento se reenvían además a las suscripciones de
+webhooks de su propietario (ver outbound_webhooks).
+
+El endpoint del webhook nunca procesa la cola. Con BACKGROUND_TASKS_ENABLED=False
+la drena `flask process-queues`, desde cron o un proceso aparte.
+"""
+import logging
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import or_
+from config.monitoring import (
+    WEBHOOK_QUEUE_DEPTH,
+    WEBHOOK_QUEUE_LAG,
+    WEBHOOK_EVENTS_PROCESSED,
+)
+from models.database import db
+from models.document import Document
+from .webhook_queue import get_webhook_queue
+from .signing_urls import (
+    get_signing_url_cache,
+    schedule_prefetch,
+    document_recipients,
+    FINAL_STATUSES,
+)
+from .envelope_lifecycle import rank, is_advance, lower_statuses
+from .webhook_dedup import dedup_key, get_webhook_deduplicator
+from .connect_parser import envelope_fields, signed_document_key
+from .envelope_events import event_occurred_at, record_events
+from .outbound_webhooks import enqueue_deliveries
+
+logger = logging.getLogger(__name__)
+
+# Máximo de envelopes por cláusula IN
+UPDATE_CHUNK_SIZE = 500
+
+
+class ParsedEvent(
+    namedtuple(
+        'ParsedEvent', 'key envelope_id status signed_key event occurred_at received_at'
+    )
+):
+    """Evento de la cola ya interpretado; `key` es la clave de deduplicación."""
+
+    __slots__ = ()
+
+
+def _parse(event):
+    """Devuelve el ParsedEvent del evento o None si no es válido."""
+    try:
+        data = event.json()
+    except ValueError:
+        return None
+    envelope_id, status = envelope_fields(data)
+    if not envelope_id or not status:
+        return None
+    received_at = datetime.utcfromtimestamp(event.received_at)
+    return ParsedEvent(
+        key=dedup_key(event.payload, data),
+        envelope_id=envelope_id,
+        status=status,
+        signed_key=signed_document_key(data),
+        event=data.get('event') if isinstance(data.get('event'), str) else None,
+        occurred_at=event_occurred_at(data, received_at),
+        received_at=received_at,
+    )
+
+
+def _prefetch_signing_urls(documents):
+    """Pregenera las URLs de firma de los envelopes pendientes de firma."""
+    for document in documents:
+        try:
+            schedule_prefetch(document.envelope_id, document_recipients(document))
+        except Exception as e:
+            logger.warning(
+                "No se pudieron pregenerar las URLs de "
+                f"firma de {document.envelope_id}: {str(e)}"
+            )
+
+
+def coalesce(parsed):
+    """
+    Reduce los eventos a un estado por envelope: el más avanzado del ciclo de vida.
+
+    Returns:
+        dict: {estado: [envelope_id, ...]}
+    """
+    latest = {}
+    for envelope_id, status in parsed:
+        if rank(status) is None:
+            logger.info(f"Estado de envelope no reconocido ignorado: {status}")
+            continue
+        if is_advance(latest.get(envelope_id), status):
+            latest[envelope_id] = status
+
+    by_status = defaultdict(list)
+    for envelope_id, status in latest.items():
+        by_status[status].append(envelope_id)
+    return by_status
+
+
+def _entry(item):
+    return {
+        'envelope_id': item.envelope_id,
+        'status': item.status,
+        'event': item.event[:50] if item.event else None,
+        'occurred_at': item.occurred_at,
+        'received_at': item.received_at,
+    }
+
+
+def _advancing(fresh):
+    """
+    Eventos que hicieron avanzar su documento, en orden de llegada.
+
+    Se comparan con el estado anterior al UPDATE (bloqueando las filas hasta el
+    commit) y con los eventos previos del mismo lote, así que un `delivered`
+    atrasado tras un `completed` no se reenvía a los clientes.
+    """
+    envelope_ids = list({item.envelope_id for item in fresh})
+    current = {}
+    for start in range(0, len(envelope_ids), UPDATE_CHUNK_SIZE):
+        current.update(
+            db.session.query(Document.envelope_id, Document.status)
+            .filter(
+                Document.envelope_id.in_(
+                    envelope_ids[start : start + UPDATE_CHUNK_SIZE]
+                )
+            )
+            .with_for_update()
+            .all()
+        )
+    advancing = []
+    for item in fresh:
+        if item.envelope_id in current and is_advance(
+            current[item.envelope_id], item.status
+        ):
+            current[item.envelope_id] = item.status
+            advancing.append(item)
+    return advancing
+
+
+def _parse_all(events):
+    """Eventos interpretables del lote; los demás se descartan con un aviso."""
+    parsed = []
+    for event in events:
+        item = _parse(event)
+        if item is None:
+            logger.warning(
+                f"Evento de webhook {event.id} descartado: "
+                "payload sin envelopeId o status"
+            )
+            WEBHOOK_EVENTS_PROCESSED.labels(result='invalid').inc()
+        else:
+            parsed.append(item)
+    return parsed
+
+
+def _update_statuses(by_status, now):
+    """UPDATE condicional por estado destino. Devuelve cuántos documentos avanzaron."""
+    applied = 0
+    for status, envelope_ids in by_status.items():
+        for start in range(0, len(envelope_ids), UPDATE_CHUNK_SIZE):
+            chunk = envelope_ids[start:start + UPDATE_CHUNK_SIZE]
+            applied += (
+                Document.query.filter(Document.envelope_id.in_(chunk))
+                .filter(
+                    or_(
+                        Document.status.is_(None),
+                        Document.status.in_(lower_statuses(status)),
+                    )
+                )
+                .update(
+                    {'status': status, 'updated_at': now}, synchronize_session=False
+                )
+            )
+    return applied
+
+
+def _attach_signed_pdfs(fresh):
+    # Si Connect incluyó el PDF firmado, ya está en
+    # el almacén de blobs: no habrá que descargarlo
+    signed = {
+        item.envelope_id: item.signed_key
+        for item in fresh
+        if item.signed_key and item.status == 'completed'
+    }
+    for envelope_id, blob_key in signed.items():
+        (
+            Document.query
+            .filter(Document.envelope_id == envelope_id)
+            .filter(Document.signed_file_path.is_(None))
+            .update({'signed_file_path': blob_key}, synchronize_session=False)
+        )
+
+
+def _invalidate_signing_urls(by_status):
+    for status in FINAL_STATUSES:
+        for envelope_id in by_status.get(status, ()):
+            try:
+                get_signing_url_cache().invalidate(envelope_id)
+            except Exception as e:
+                logger.warning(
+                    "No se pudieron invalidar las URLs "
+                    f"de firma de {envelope_id}: {str(e)}"
+                )
+
+
+def apply_events(events):
+    """
+    Aplica un lote de eventos con un UPDATE condicional por estado destino y un commit.
+
+    Un documento solo avanza en el ciclo de vida: el UPDATE exige que el estado
+    actual sea de rango menor, así que un evento atrasado no deshace uno posterior.
+
+    Returns:
+        list[Document]: Documentos que quedaron en un estado
+            que requiere pregenerar URLs de firma
+    """
+    parsed = _parse_all(events)
+    if not parsed:
+        return []
+
+    # Las claves nuevas se registran en la misma transacción que los cambios de estado
+    deduplicator = get_webhook_deduplicator()
+    fresh, keys = deduplicator.filter_new(parsed)
+    WEBHOOK_EVENTS_PROCESSED.labels(result='duplicate').inc(len(parsed) - len(fresh))
+    if not fresh:
+        return []
+
+    # Antes del UPDATE: solo lo que cambia el estado se reenvía a los clientes
+    advancing = _advancing(fresh)
+    by_status = coalesce((item.envelope_id, item.status) for item in fresh)
+    applied = _update_statuses(by_status, datetime.utcnow())
+    _attach_signed_pdfs(fresh)
+
+    # Todos los eventos nuevos van al historial,
+    # también los que no hicieron avanzar el estado
+    record_events([_entry(item) for item in fresh])
+    # Las entregas a los clientes se confirman
+    # con el cambio de estado y se envían aparte
+    enqueue_deliveries([_entry(item) for item in advancing])
+    db.session.commit()
+    deduplicator.remember(keys)
+
+    WEBHOOK_EVENTS_PROCESSED.labels(result='applied').inc(applied)
+    WEBHOOK_EVENTS_PROCESSED.labels(result='skipped').inc(len(fresh) - applied)
+
+    _invalidate_signing_urls(by_status)
+
+    # Solo los envelopes que realmente quedaron pendientes de firma necesitan URLs
+    pending = [
+        envelope_id
+        for status in ('sent', 'delivered')
+        for envelope_id in by_status.get(status, ())
+    ]
+    if not pending:
+        return []
+    return (
+        Document.query
+        .filter(Document.envelope_id.in_(pending))
+        .filter(Document.status.in_(('sent', 'delivered')))
+        .all()
+    )
+
+
+def process_webhook_events(batch_size=None, max_batches=None):
+    """
+    Drena la cola de webhooks.
+
+    Args:
+        batch_size (int): Eventos por lote
+        max_batches (int): Lotes máximos por ejecución, para ceder el hilo
+
+    Returns:
+        int: Número de eventos procesados
+    """
+    app = current_app._get_current_object()
+    batch_size = batch_size or app.config.get('DOCUSIGN_WEBHOOK_BATCH', 500)
+    max_batches = max_batches or app.config.get('DOCUSIGN_WEBHOOK_MAX_BATCHES', 20)
+    max_attempts = app.config.get('DOCUSIGN_WEBHOOK_MAX_ATTEMPTS', 10)
+    queue = get_webhook_queue(app)
+
+    processed = 0
+    for _ in range(max_batches):
+        events = queue.claim(batch_size)
+        if not events:
+            break
+        try:
+            documents = apply_events(events)
+        except Exception as e:
+            db.session.rollback()
+            # Los eventos que ya agotaron sus intentos
+            # se descartan para no bloquear la cola
+            retry = [event.id for event in events if event.attempts < max_attempts]
+            dropped = [event.id for event in events if event.attempts >= max_attempts]
+            logger.error(f"Error aplicando {len(events)} eventos de webhook "
+                         f"({len(dropped)} descartados): {str(e)}")
+            queue.release(retry)
+            queue.ack(dropped)
+            WEBHOOK_EVENTS_PROCESSED.labels(result='dropped').inc(len(dropped))
+            break
+
+        queue.ack([event.id for event in events])
+        _prefetch_signing_urls(documents)
+        processed += len(events)
+
+    depth, lag = queue.stats()
+    WEBHOOK_QUEUE_DEPTH.set(depth)
+    WEBHOOK_QUEUE_LAG.set(lag)
+    return processed
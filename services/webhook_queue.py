@@ -0,0 +1,172 @@
+"""
+Cola local y persistente de eventos de webhook de DocuSign.
+
+El endpoint del webhook solo verifica la firma y añade el cuerpo crudo a esta
+cola (un INSERT en un fichero SQLite local en modo WAL), de modo que responde
+en milisegundos aunque llegue una ráfaga de eventos de Connect. Los eventos
+se aplican después, por lotes, en segundo plano (ver webhook_processor).
+
+Cada lote se reclama con un lease: si el worker que lo procesa muere, los
+eventos vuelven a estar disponibles cuando el lease caduca.
+"""
+import json
+import time
+import uuid
+import logging
+from flask import current_app
+from .local_store import LocalStore, local_store_path
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS webhook_event (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        received_at REAL NOT NULL,
+        payload BLOB NOT NULL,
+        headers TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        claim_token TEXT,
+        claimed_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_webhook_event_claimed_at "
+    "ON webhook_event (claimed_at)",
+)
+
+
+class QueuedEvent:
+    """Evento reclamado de la cola."""
+
+    __slots__ = ('id', 'received_at', 'payload', 'headers', 'attempts')
+
+    def __init__(self, id, received_at, payload, headers, attempts):
+        self.id = id
+        self.received_at = received_at
+        self.payload = payload
+        self.headers = json.loads(headers) if headers else {}
+        self.attempts = attempts
+
+    def json(self):
+        return json.loads(self.payload)
+
+
+class WebhookQueue:
+    """
+    Cola FIFO de eventos sobre un almacén SQLite compartido por los workers del host.
+    """
+
+    def __init__(self, store, lease=60):
+        """
+        Args:
+            store (LocalStore): Almacén local compartido
+            lease (int): Segundos tras los que un lote
+                reclamado y no confirmado vuelve a la cola
+        """
+        self.store = store
+        self.lease = lease
+
+    def enqueue(self, payload, headers=None):
+        """
+        Añade un evento a la cola.
+
+        Args:
+            payload (bytes): Cuerpo crudo de la petición
+            headers (dict): Cabeceras relevantes para el procesado posterior
+
+        Returns:
+            int: ID del evento en la cola
+        """
+        cursor = self.store.connection().execute(
+            'INSERT INTO webhook_event (received_at, '
+            'payload, headers) VALUES (?, ?, ?)',
+            (time.time(), payload, json.dumps(headers) if headers else None),
+        )
+        return cursor.lastrowid
+
+    def claim(self, batch_size):
+        """
+        Reclama los eventos más antiguos disponibles.
+
+        Returns:
+            list[QueuedEvent]
+        """
+        now = time.time()
+        claim_token = uuid.uuid4().hex
+        with self.store.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE webhook_event SET claim_token = ?,
+                claimed_at = ?, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM webhook_event
+                    WHERE claimed_at IS NULL OR claimed_at < ?
+                    ORDER BY id LIMIT ?
+                )
+                """,
+                (claim_token, now, now - self.lease, batch_size),
+            )
+            rows = conn.execute(
+                'SELECT id, received_at, payload, headers, attempts FROM webhook_event '
+                'WHERE claim_token = ? ORDER BY id',
+                (claim_token,)
+            ).fetchall()
+        return [QueuedEvent(*row) for row in rows]
+
+    def ack(self, event_ids):
+        """Elimina los eventos ya aplicados."""
+        if not event_ids:
+            return
+        with self.store.transaction() as conn:
+            conn.executemany(
+                'DELETE FROM webhook_event WHERE id = ?',
+                [(event_id,) for event_id in event_ids],
+            )
+
+    def release(self, event_ids):
+        """Devuelve eventos a la cola para reintentarlos en el siguiente ciclo."""
+        if not event_ids:
+            return
+        with self.store.transaction() as conn:
+            conn.executemany(
+                'UPDATE webhook_event SET claim_token '
+                '= NULL, claimed_at = NULL WHERE id = ?',
+                [(event_id,) for event_id in event_ids],
+            )
+
+    def stats(self):
+        """
+        Returns:
+            tuple: (eventos en cola, segundos de antigüedad del más antiguo)
+        """
+        conn = self.store.connection()
+        depth = conn.execute('SELECT COUNT(*) FROM webhook_event').fetchone()[0]
+        # Los IDs crecen con la llegada: el más antiguo se obtiene por la clave primaria
+        oldest = conn.execute(
+            'SELECT received_at FROM webhook_event ORDER BY id LIMIT 1'
+        ).fetchone()
+        return depth, (time.time() - oldest[0]) if oldest else 0.0
+
+
+def get_webhook_queue(app=None):
+    """
+    Devuelve la cola de webhooks de la aplicación.
+
+    Args:
+        app (Flask): La aplicación Flask (por defecto current_app)
+    """
+    app = app or current_app._get_current_object()
+    queue = app.extensions.get('webhook_queue')
+    if queue is None:
+        store = LocalStore(
+            local_store_path(
+                app,
+                app.config.get('DOCUSIGN_WEBHOOK_QUEUE_STORE', 'docusign_webhooks.db'),
+            ),
+            schema=_SCHEMA,
+        )
+        queue = app.extensions.setdefault(
+            'webhook_queue',
+            WebhookQueue(store, lease=app.config.get('DOCUSIGN_WEBHOOK_LEASE', 60))
+        )
+    return queue
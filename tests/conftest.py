@@ -1,15 +1,21 @@
 import pytest
 import json
+import hmac
+import base64
+import hashlib
 import os
 import sys
 import time
 import random
+import tempfile
 from datetime import datetime
 from pathlib import Path
 from flask import Flask, current_app, _app_ctx_stack, _request_ctx_stack, has_app_context, has_request_context
 from config import Config
 from models.database import db, init_app, session_scope  # Eliminar init_db
+from config.rate_limiting import limiter
 from .test_utils import TestReporter
+
 from main import app as production_app, create_app
 import logging
 from sqlalchemy.orm import scoped_session, sessionmaker
@@ -39,15 +45,31 @@ def initialize_reports():  # ⚠️ Se empuja el contexto pero nunca se hace pop
 def app():
     """Fixture de aplicación base para pruebas."""
     app = create_app()
-    app.config.update({
-        'TESTING': True,
-        'DOCUSIGN_INTEGRATION_KEY': 'test_integration_key',
-        'DOCUSIGN_CLIENT_SECRET': 'test_client_secret',
-        'DOCUSIGN_AUTH_SERVER': 'account-d.docusign.com',
-        'DOCUSIGN_REDIRECT_URI': 'http://localhost:5000/api/docusign/callback'
-    })
+    app.config.update(
+        {
+            'TESTING': True,
+            # Almacenes SQLite locales (cuotas, colas,
+            # bloqueos de login) nuevos en cada sesión
+            'LOCAL_STORE_DIR': tempfile.mkdtemp(prefix='split_sheet_stores_'),
+            'DOCUSIGN_INTEGRATION_KEY': 'test_integration_key',
+            'DOCUSIGN_CLIENT_SECRET': 'test_client_secret',
+            'DOCUSIGN_AUTH_SERVER': 'account-d.docusign.com',
+            'DOCUSIGN_REDIRECT_URI': 'http://localhost:5000/api/docusign/callback',
+        }
+    )
     return app
 
+@pytest.fixture(autouse=True)
+def fresh_login_limits(app):
+    """
+    Cada test empieza sin consumo de los límites
+    por IP ni fallos de login de otros tests
+    """
+    limiter.reset()
+    app.config['LOGIN_LOCKOUT_STORE'] = f"login_lockout_{time.time_ns()}.db"
+    app.extensions.pop('login_lockout', None)
+    yield
+
 @pytest.fixture(scope="function")
 def app_context(app):
     """Fixture que provee un contexto de aplicación fresco para cada test."""
@@ -348,6 +370,21 @@ def docusign_config(app):
     })
     return app.config
 
+@pytest.fixture
+def sign_webhook():
+    """Cabeceras de una entrega de DocuSign Connect firmada con timestamp actual"""
+    def sign(key, body, timestamp=None):
+        timestamp = timestamp or datetime.utcnow().isoformat() + 'Z'
+        message = timestamp.encode() + b'\n' + body + b'\n'
+        signature = base64.b64encode(
+            hmac.new(key.encode(), message, hashlib.sha256).digest()
+        ).decode()
+        return {
+            'X-DocuSign-Signature-1': signature,
+            'X-DocuSign-Signature-Timestamp': timestamp,
+        }
+    return sign
+
 @pytest.fixture(scope="function")
 def docusign_auth_app(app):
     """Fixture de app con alcance function para tests de docusign_auth"""
@@ -1,10 +1,32 @@
 import pytest
-from flask import json, jsonify
+import time
+from flask import json
 from unittest.mock import patch, MagicMock
-from services.docusign_service import DocuSignService
+from flask_jwt_extended import create_access_token
+from models.database import db
+from models.user import User
+from services.blob_store import BlobStore
+
+@pytest.fixture
+def auth_headers(app, db_session, tmp_path):
+    """Cabecera JWT de un usuario nuevo y almacén de blobs temporal"""
+    previous = app.extensions.get('blob_store')
+    app.extensions['blob_store'] = BlobStore(str(tmp_path))
+    with app.app_context():
+        username = f"firmas_{time.time_ns()}"
+        user = User(
+            username=username, email=f"{username}@example.com", password_hash='x'
+        )
+        db.session.add(user)
+        db.session.commit()
+        yield {'Authorization': f"Bearer {create_access_token(identity=user.id)}"}
+    if previous is None:
+        app.extensions.pop('blob_store', None)
+    else:
+        app.extensions['blob_store'] = previous
 
 @patch('services.docusign_service.DocuSignService.create_instance')
-def test_send_for_signature(mock_create_instance, client, app):
+def test_send_for_signature(mock_create_instance, client, app, auth_headers):
     """Prueba el envío de documento para firma"""
     with app.test_request_context():
         # Configurar mock del servicio
@@ -23,28 +45,30 @@ def test_send_for_signature(mock_create_instance, client, app):
             "recipient_name": "John Doe"
         }
 
-        # Asegurarse de que la ruta use DocuSignService.create_instance()
+        # La ruta no debe llamar a DocuSign en línea
         response = client.post(
             '/api/docusign/send_for_signature',  # Actualizar la ruta
             json=test_data,
-            content_type='application/json'
+            content_type='application/json',
+            headers=auth_headers
         )
 
-        # Verificaciones
-        mock_create_instance.assert_called_once()
-        mock_service.send_document_for_signature.assert_called_once()
-        assert response.status_code == 200
+        # Verificaciones: el envío a DocuSign queda en el outbox
+        mock_create_instance.assert_not_called()
+        assert response.status_code == 202
         data = json.loads(response.data)
-        assert data["status"] == "success"
-        assert data["data"]["envelope_id"] == "test_env_123"
+        assert data["status"] == "queued"
+        assert data["data"]["document_id"] is not None
+        assert data["data"]["envelope_id"] is None
 
-def test_send_for_signature_invalid_data(client):
+def test_send_for_signature_invalid_data(client, auth_headers):
     """Prueba el envío con datos inválidos"""
     # Test con datos vacíos
     response = client.post(
         '/api/docusign/send_for_signature',  # Ruta corregida
         json={},
-        content_type='application/json'
+        content_type='application/json',
+        headers=auth_headers
     )
     assert response.status_code == 400
     data = json.loads(response.data)
@@ -55,16 +79,20 @@ def test_send_for_signature_invalid_data(client):
     response = client.post(
         '/api/docusign/send_for_signature',  # Ruta corregida
         json={"document_id": "test_123"},
-        content_type='application/json'
+        content_type='application/json',
+        headers=auth_headers
     )
     assert response.status_code == 400
     data = json.loads(response.data)
     assert "error" in data
     assert "details" in data
 
+
 @patch('services.docusign_service.DocuSignService.create_instance')
-def test_send_for_signature_service_error(mock_create_instance, client, app):
-    """Prueba manejo de error del servicio DocuSign"""
+def test_send_for_signature_service_error(
+    mock_create_instance, client, app, auth_headers
+):
+    """Un error de DocuSign no se propaga a la petición encolada"""
     with app.test_request_context():
         # Configurar mock para lanzar error
         mock_service = MagicMock()
@@ -80,14 +108,49 @@ def test_send_for_signature_service_error(mock_create_instance, client, app):
         response = client.post(
             '/api/docusign/send_for_signature',  # Ruta corregida
             json=test_data,
-            content_type='application/json'
+            content_type='application/json',
+            headers=auth_headers
         )
 
-        # Verificaciones
-        mock_create_instance.assert_called_once()
-        mock_service.send_document_for_signature.assert_called_once()
-        assert response.status_code == 500
+        # Verificaciones: un fallo de DocuSign no afecta a la petición
+        mock_create_instance.assert_not_called()
+        mock_service.send_document_for_signature.assert_not_called()
+        assert response.status_code == 202
         data = json.loads(response.data)
-        assert "error" in data
-        assert "details" in data
-        assert "DocuSign API Error" in str(data["details"])
+        assert data["status"] == "queued"
+
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_send_for_signature_never_dispatches_inline(
+    mock_create_instance, client, app, auth_headers
+):
+    """
+    Sin tareas en segundo plano la petición solo
+    encola; el envío lo hace `flask process-queues`
+    """
+    mock_service = MagicMock()
+    mock_service.send_document_for_signature.side_effect = lambda **kwargs: {
+        "envelope_id": f"env-{kwargs['document_name']}",
+        "status": "sent",
+        "status_datetime": "2024-03-14T12:00:00Z"
+    }
+    mock_create_instance.return_value = mock_service
+
+    title = f"Cron {time.time_ns()}"
+    assert not app.config['BACKGROUND_TASKS_ENABLED']
+    response = client.post(
+        '/api/docusign/send_for_signature',
+        json={"title": title, "recipient_email": "test@example.com",
+              "recipient_name": "John Doe"},
+        headers=auth_headers
+    )
+    assert response.status_code == 202
+    mock_service.send_document_for_signature.assert_not_called()
+
+    result = app.test_cli_runner().invoke(args=['process-queues'])
+    assert result.exit_code == 0, result.output
+    sent_titles = [
+        call.kwargs['document_name']
+        for call in mock_service.send_document_for_signature.call_args_list
+    ]
+    assert title in sent_titles
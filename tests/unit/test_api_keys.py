@@ -0,0 +1,143 @@
+import time
+import pytest
+from unittest.mock import patch
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from models.database import db
+from models.user import User
+
+@pytest.fixture
+def owner(client, app, db_session):
+    """Usuario con un token JWT para gestionar sus claves"""
+    with app.app_context():
+        username = f"integracion_{time.time_ns()}"
+        user = User(
+            username=username, email=f"{username}@example.com", password_hash='x'
+        )
+        db.session.add(user)
+        db.session.commit()
+        return {'Authorization': f"Bearer {create_access_token(identity=user.id)}"}
+
+@pytest.fixture
+def api_key_queries(app):
+    """Cuenta las consultas a la tabla api_key"""
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    def listener(conn, cursor, statement, *args):
+        if 'FROM api_key' in statement:
+            statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', listener)
+
+def _create_key(client, headers, **data):
+    data.setdefault('name', 'Back-office')
+    data.setdefault('scopes', ['webhooks:manage'])
+    response = client.post('/api/api-keys', json=data, headers=headers)
+    assert response.status_code == 201
+    return response.get_json()['data']
+
+def test_key_authenticates_without_password_checks(client, owner, api_key_queries):
+    """
+    La clave da acceso a las rutas de su permiso, sin PBKDF2 y con la búsqueda en caché
+    """
+    key = _create_key(client, owner)['key']
+    headers = {'X-API-Key': key}
+
+    del api_key_queries[:]
+    with patch.object(User, 'check_password', side_effect=AssertionError('sin PBKDF2')):
+        for _ in range(3):
+            response = client.get('/api/webhooks', headers=headers)
+            assert response.status_code == 200
+    assert len(api_key_queries) == 1
+
+    assert client.get('/api/documents/1/events', headers=headers).status_code == 403
+    assert (
+        client.get('/api/webhooks', headers={'X-API-Key': key[:-2] + 'xx'}).status_code
+        == 401
+    )
+    assert (
+        client.get(
+            '/api/webhooks', headers={'X-API-Key': 'no-es-una-clave'}
+        ).status_code
+        == 401
+    )
+
+def test_each_key_has_its_own_rate_limit(client, owner):
+    """Superado el límite de la clave se responde 429; otra clave no se ve afectada"""
+    limited = _create_key(client, owner, rate_limit='2 per minute')['key']
+    other = _create_key(client, owner)['key']
+
+    for _ in range(2):
+        assert (
+            client.get('/api/webhooks', headers={'X-API-Key': limited}).status_code
+            == 200
+        )
+    response = client.get('/api/webhooks', headers={'X-API-Key': limited})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+    assert client.get('/api/webhooks', headers={'X-API-Key': other}).status_code == 200
+
+def test_revoked_key_stops_working(client, owner):
+    """Una clave revocada deja de aceptarse y desaparece del listado"""
+    created = _create_key(client, owner)
+    headers = {'X-API-Key': created['key']}
+    assert client.get('/api/webhooks', headers=headers).status_code == 200
+
+    assert (
+        client.delete(f"/api/api-keys/{created['id']}", headers=owner).status_code
+        == 200
+    )
+    assert client.get('/api/webhooks', headers=headers).status_code == 401
+    listed = client.get('/api/api-keys', headers=owner).get_json()['data']
+    assert created['id'] not in [api_key['id'] for api_key in listed]
+
+def test_key_creation_is_validated(client, owner):
+    """Permisos y límites desconocidos se rechazan; una clave no puede crear claves"""
+    assert (
+        client.post(
+            '/api/api-keys', json={'name': 'x', 'scopes': ['admin']}, headers=owner
+        ).status_code
+        == 400
+    )
+    assert (
+        client.post(
+            '/api/api-keys',
+            json={'name': 'x', 'scopes': ['webhooks:manage'], 'rate_limit': 'mucho'},
+            headers=owner,
+        ).status_code
+        == 400
+    )
+    key = _create_key(client, owner)['key']
+    response = client.post(
+        '/api/api-keys',
+        json={'name': 'x', 'scopes': ['webhooks:manage']},
+        headers={'X-API-Key': key},
+    )
+    assert response.status_code == 401
+
+def test_only_valid_keys_skip_ip_limits(client, app, owner):
+    """
+    El filtro del limitador exime solo las claves
+    válidas y no se fabrica un contexto JWT
+    """
+    from flask import g, request
+    from flask_jwt_extended import get_jwt
+    from services.api_keys import is_api_key_request, get_current_identity
+    key = _create_key(client, owner)['key']
+
+    with app.test_request_context(
+        '/api/webhooks', headers={'X-API-Key': 'ssk_noexiste_secreto'}
+    ):
+        assert not is_api_key_request()
+    with app.test_request_context('/api/api-keys', headers={'X-API-Key': key}):
+        assert not is_api_key_request()
+    with app.test_request_context('/api/webhooks', headers={'X-API-Key': key}):
+        assert is_api_key_request()
+
+    with app.test_request_context('/api/webhooks', headers={'X-API-Key': key}):
+        assert app.view_functions[request.endpoint]()[1] == 200
+        assert get_current_identity() == g.api_key.user_id == g.api_key_user.id
+        with pytest.raises(RuntimeError):
+            get_jwt()
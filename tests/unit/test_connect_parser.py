@@ -0,0 +1,135 @@
+import base64
+import json
+import os
+import time
+import tracemalloc
+import pytest
+from models.database import db
+from models.document import Document
+from services.blob_store import BlobStore
+from services.local_store import LocalStore
+from services.webhook_queue import WebhookQueue, _SCHEMA
+from services.webhook_processor import process_webhook_events
+from services.connect_parser import (
+    parse_connect_payload,
+    envelope_fields,
+    embedded_documents,
+    signed_document_key,
+    ConnectPayloadError,
+)
+from tests.unit.test_webhook_queue import _document
+
+HMAC_KEY = 'webhook_test_key'
+
+def _connect_payload(envelope_id, pdf, event='envelope-completed'):
+    """Entrega de Connect 2.1 con el documento y el certificado embebidos"""
+    return {
+        "event": event,
+        "generatedDateTime": "2026-10-19T10:00:00.000Z",
+        "data": {
+            "envelopeId": envelope_id,
+            "envelopeSummary": {
+                "status": event.split('-', 1)[1],
+                "emailSubject": "Firma requerida: Split Sheet á\U0001F3B5",
+                "envelopeDocuments": [
+                    {"documentId": "1", "name": "split_sheet.pdf", "type": "content",
+                     "PDFBytes": base64.b64encode(pdf).decode()},
+                    {"documentId": "certificate", "name": "Summary", "type": "summary",
+                     "PDFBytes": base64.b64encode(b'%PDF-certificado').decode()},
+                ]
+            }
+        }
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / 'blobs'))
+
+def test_documents_are_streamed_to_blob_store(store):
+    """
+    Los documentos se decodifican al almacén aunque los bloques corten cadenas y escapes
+    """
+    pdf = os.urandom(10000)
+    # Algunos serializadores escapan '/' y los caracteres no ASCII
+    raw = json.dumps(_connect_payload("env-1", pdf)).replace('/', '\\/').encode()
+
+    data = parse_connect_payload(raw, store, chunk_size=7)
+
+    assert envelope_fields(data) == ("env-1", "completed")
+    assert data["data"]["envelopeSummary"]["emailSubject"].endswith("á\U0001F3B5")
+    documents = embedded_documents(data)
+    assert [document['documentId'] for document in documents] == ["1", "certificate"]
+    assert store.read(documents[0]['blob_key']) == pdf
+    assert signed_document_key(data) == documents[0]['blob_key']
+
+def test_peak_memory_does_not_grow_with_document_size(store, tmp_path):
+    """La memoria pico es la misma para un documento de 1 MiB que para uno de 8 MiB"""
+    peaks = []
+    for size in (1024 * 1024, 8 * 1024 * 1024):
+        path = tmp_path / f"payload-{size}.json"
+        path.write_bytes(
+            json.dumps(_connect_payload("env-m", os.urandom(size))).encode()
+        )
+        with open(path, 'rb') as stream:
+            tracemalloc.start()
+            parse_connect_payload(stream, store)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    assert peaks[1] < 1024 * 1024
+    assert peaks[1] < peaks[0] * 2
+
+
+@pytest.mark.parametrize(
+    "raw", [b'', b'{"a": }', b'{"a": 1} extra', b'[1, 2]', b'{"PDFBytes": "no*base64"}']
+)
+def test_invalid_payloads_are_rejected(store, raw):
+    """Un cuerpo que no es un objeto JSON válido se rechaza"""
+    with pytest.raises(ConnectPayloadError):
+        parse_connect_payload(raw, store)
+
+
+def test_completed_event_records_signed_document(
+    client, app, store, tmp_path, db_session, sign_webhook
+):
+    """El PDF firmado que trae Connect queda como copia local del documento"""
+    previous = {
+        name: app.extensions.get(name)
+        for name in ('blob_store', 'webhook_queue', 'webhook_dedup')
+    }
+    previous_key = app.config.get('DOCUSIGN_HMAC_KEY')
+    app.extensions['blob_store'] = store
+    app.extensions['webhook_queue'] = WebhookQueue(
+        LocalStore(str(tmp_path / 'webhooks.db'), schema=_SCHEMA)
+    )
+    app.extensions.pop('webhook_dedup', None)
+    app.config['DOCUSIGN_HMAC_KEY'] = HMAC_KEY
+    try:
+        with app.app_context():
+            envelope_id = f"env-p-{time.time_ns()}"
+            document_id = _document(envelope_id, status='sent')
+            pdf = os.urandom(300 * 1024)
+            body = json.dumps(_connect_payload(envelope_id, pdf)).encode()
+            response = client.post(
+                '/api/docusign/webhook',
+                data=body,
+                content_type='application/json',
+                headers=sign_webhook(HMAC_KEY, body),
+            )
+            assert response.status_code == 202
+            queued = app.extensions['webhook_queue'].claim(10)
+            assert len(queued[0].payload) < 2048
+            app.extensions['webhook_queue'].release([event.id for event in queued])
+
+            process_webhook_events()
+
+            db.session.expire_all()
+            document = Document.query.get(document_id)
+            assert document.status == 'completed'
+            assert store.read(document.signed_file_path) == pdf
+    finally:
+        app.config['DOCUSIGN_HMAC_KEY'] = previous_key
+        for name, value in previous.items():
+            if value is None:
+                app.extensions.pop(name, None)
+            else:
+                app.extensions[name] = value
@@ -0,0 +1,121 @@
+import pytest
+import time
+from datetime import datetime, timedelta
+from models.database import db
+from models.user import User
+from services.docusign_idempotency import (
+    normalize_recipients, claim_envelope_request, complete_envelope_request,
+    release_envelope_request, IdempotencyKeyConflict
+)
+
+@pytest.fixture
+def sender(app, db_session):
+    """Usuario que envía documentos a firmar"""
+    with app.app_context():
+        username = f"sender_{time.time_ns()}"
+        user = User(
+            username=username, email=f"{username}@example.com", password_hash='x'
+        )
+        db.session.add(user)
+        db.session.commit()
+        yield user.id
+
+RECIPIENTS = [
+    {"email": "Ana@Example.com", "name": "Ana  Pérez"},
+    {"email": "luis@example.com", "name": "Luis"}
+]
+
+def test_normalize_recipients_ignores_order_and_case():
+    """El orden, las mayúsculas y los espacios no cambian la normalización"""
+    reordered = [
+        {"email": "luis@example.com ", "name": "Luis"},
+        {"email": "ana@example.com", "name": "Ana Pérez"}
+    ]
+    assert normalize_recipients(RECIPIENTS) == normalize_recipients(reordered)
+
+def test_repeated_request_returns_existing_envelope(app, sender):
+    """Una segunda solicitud idéntica reutiliza el envelope creado"""
+    with app.app_context():
+        record, created = claim_envelope_request(sender, b"%PDF-1", RECIPIENTS)
+        assert created
+        complete_envelope_request(record, {"envelope_id": "env-1", "status": "sent"})
+
+        replay, created = claim_envelope_request(
+            sender, b"%PDF-1", list(reversed(RECIPIENTS))
+        )
+        assert not created
+        assert replay.envelope_id == "env-1"
+
+        other, created = claim_envelope_request(sender, b"%PDF-2", RECIPIENTS)
+        assert created
+        assert other.id != record.id
+
+def test_client_key_reused_with_other_payload_conflicts(app, sender):
+    """La Idempotency-Key del cliente no puede reutilizarse con otro documento"""
+    with app.app_context():
+        claim_envelope_request(sender, b"%PDF-A", RECIPIENTS, client_key="abc-123")
+        with pytest.raises(IdempotencyKeyConflict):
+            claim_envelope_request(sender, b"%PDF-B", RECIPIENTS, client_key="abc-123")
+
+def test_released_claim_allows_retry(app, sender):
+    """Tras un fallo de DocuSign la reserva se libera y el cliente puede reintentar"""
+    with app.app_context():
+        record, _ = claim_envelope_request(sender, b"%PDF-R", RECIPIENTS)
+        release_envelope_request(record)
+        _, created = claim_envelope_request(sender, b"%PDF-R", RECIPIENTS)
+        assert created
+
+def test_title_is_part_of_the_content_key(app, sender):
+    """El mismo PDF con otro título es otro documento"""
+    with app.app_context():
+        record, created = claim_envelope_request(
+            sender, b"%PDF-T", RECIPIENTS, title="Contrato A"
+        )
+        assert created
+        replay, created = claim_envelope_request(
+            sender, b"%PDF-T", RECIPIENTS, title="Contrato  A"
+        )
+        assert not created and replay.id == record.id
+        _, created = claim_envelope_request(
+            sender, b"%PDF-T", RECIPIENTS, title="Contrato B"
+        )
+        assert created
+
+def test_client_reference_is_part_of_the_content_key(app, sender):
+    """El mismo PDF con otra referencia del cliente es otro documento"""
+    with app.app_context():
+        record, created = claim_envelope_request(
+            sender, b"%PDF-D", RECIPIENTS, reference="doc-1"
+        )
+        assert created
+        replay, created = claim_envelope_request(
+            sender, b"%PDF-D", RECIPIENTS, reference="doc-1"
+        )
+        assert not created and replay.id == record.id
+        _, created = claim_envelope_request(
+            sender, b"%PDF-D", RECIPIENTS, reference="doc-2"
+        )
+        assert created
+
+def test_content_key_expires(app, sender):
+    """
+    Pasado el TTL el mismo contenido crea una
+    solicitud nueva; la clave del cliente no caduca
+    """
+    with app.app_context():
+        record, _ = claim_envelope_request(sender, b"%PDF-E", RECIPIENTS)
+        keyed, _ = claim_envelope_request(
+            sender, b"%PDF-E", RECIPIENTS, client_key="k-1"
+        )
+        old = datetime.utcnow() - timedelta(
+            seconds=app.config.get('DOCUSIGN_IDEMPOTENCY_TTL', 3600) + 1
+        )
+        record.created_at = keyed.created_at = old
+        db.session.commit()
+
+        renewed, created = claim_envelope_request(sender, b"%PDF-E", RECIPIENTS)
+        assert created and renewed.id != record.id
+        replay, created = claim_envelope_request(
+            sender, b"%PDF-E", RECIPIENTS, client_key="k-1"
+        )
+        assert not created and replay.id == keyed.id
@@ -0,0 +1,75 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+from docusign_esign import ApiClient
+from docusign_esign.client.api_exception import ApiException
+from services.docusign_lean import LeanEnvelopeReader, EnvelopeStatus, RecipientStatus
+
+def _reader(status=200, payload=None, headers=None):
+    api_client = ApiClient()
+    api_client.host = 'https://demo.docusign.net/restapi'
+    api_client.set_default_header('Authorization', 'Bearer test_token')
+    response = MagicMock(status=status, reason='OK', headers=headers or {})
+    response.data = json.dumps(payload or {}).encode('utf-8')
+    api_client.rest_client.pool_manager = MagicMock()
+    api_client.rest_client.pool_manager.request.return_value = response
+    return LeanEnvelopeReader(api_client, 'acc-1'), api_client.rest_client.pool_manager
+
+def test_envelope_status_reads_only_needed_fields():
+    """El estado se lee del JSON a un registro con __slots__"""
+    reader, pool = _reader(
+        payload={
+            'envelopeId': 'env-1',
+            'status': 'completed',
+            'createdDateTime': '2026-10-19T10:00:00Z',
+            'completedDateTime': '2026-10-19T11:00:00Z',
+            'emailSubject': 'ignorado',
+        }
+    )
+    result = reader.envelope_status('env-1')
+
+    assert isinstance(result, EnvelopeStatus)
+    assert not hasattr(result, '__dict__')
+    assert result.to_dict() == {
+        "status": "completed",
+        "completed_date": "2026-10-19T11:00:00Z",
+        "created_date": "2026-10-19T10:00:00Z"
+    }
+    method, url = pool.request.call_args.args
+    assert method == 'GET'
+    assert (
+        url == 'https://demo.docusign.net/restapi/v2.1/accounts/acc-1/envelopes/env-1'
+    )
+    assert (
+        pool.request.call_args.kwargs['headers']['Authorization'] == 'Bearer test_token'
+    )
+
+def test_recipient_statuses_skip_tabs():
+    """Los destinatarios se piden sin pestañas ni datos extendidos"""
+    reader, pool = _reader(
+        payload={
+            'signers': [
+                {
+                    'recipientId': '1',
+                    'email': 'ana@example.com',
+                    'name': 'Ana',
+                    'status': 'sent',
+                    'clientUserId': '1',
+                }
+            ]
+        }
+    )
+    recipients = reader.recipient_statuses('env-1')
+
+    assert [type(r) for r in recipients] == [RecipientStatus]
+    assert recipients[0].email == 'ana@example.com'
+    assert recipients[0].client_user_id == '1'
+    assert 'include_tabs=false' in pool.request.call_args.args[1]
+
+def test_error_status_raises_api_exception():
+    """Los errores HTTP se convierten en ApiException con sus cabeceras (para el 429)"""
+    reader, _ = _reader(status=429, headers={'X-RateLimit-Reset': '123'})
+    with pytest.raises(ApiException) as exc:
+        reader.envelope_status('env-1')
+    assert exc.value.status == 429
+    assert exc.value.headers['X-RateLimit-Reset'] == '123'
@@ -0,0 +1,72 @@
+import pytest
+import time
+from unittest.mock import patch
+from services.local_store import LocalStore
+from services.docusign_quota import (
+    DocuSignQuotaGovernor, DocuSignQuotaExceeded, INTERACTIVE, BACKGROUND, _SCHEMA
+)
+
+@pytest.fixture
+def governor(tmp_path):
+    """Gobernador con un bucket pequeño sobre un almacén temporal"""
+    store = LocalStore(str(tmp_path / 'quota.db'), schema=_SCHEMA)
+    return DocuSignQuotaGovernor(
+        store, hourly_limit=10, interactive_reserve=0.5, max_wait=0
+    )
+
+def test_interactive_calls_consume_bucket(governor):
+    """Las llamadas interactivas pueden agotar todo el bucket"""
+    for _ in range(10):
+        governor.acquire('acc', INTERACTIVE)
+
+    with pytest.raises(DocuSignQuotaExceeded) as exc:
+        governor.acquire('acc', INTERACTIVE)
+    assert exc.value.retry_after > 0
+    assert governor.remaining('acc') < 1
+
+def test_background_calls_respect_interactive_reserve(governor):
+    """El trabajo en segundo plano se difiere al llegar a la reserva interactiva"""
+    for _ in range(5):
+        governor.acquire('acc', BACKGROUND)
+
+    with pytest.raises(DocuSignQuotaExceeded):
+        governor.acquire('acc', BACKGROUND)
+
+    # La reserva sigue disponible para los usuarios
+    governor.acquire('acc', INTERACTIVE)
+
+def test_buckets_are_shared_between_instances(tmp_path):
+    """
+    Dos gobernadores sobre el mismo fichero comparten presupuesto (como dos workers)
+    """
+    path = str(tmp_path / 'quota.db')
+    first = DocuSignQuotaGovernor(
+        LocalStore(path, schema=_SCHEMA), hourly_limit=4, max_wait=0
+    )
+    second = DocuSignQuotaGovernor(
+        LocalStore(path, schema=_SCHEMA), hourly_limit=4, max_wait=0
+    )
+
+    first.acquire('acc')
+    first.acquire('acc')
+    second.acquire('acc')
+    second.acquire('acc')
+
+    with pytest.raises(DocuSignQuotaExceeded):
+        first.acquire('acc')
+
+def test_exhaust_blocks_until_refill(governor):
+    """Un 429 de DocuSign vacía el bucket durante el tiempo indicado"""
+    governor.exhaust('acc', retry_after=60)
+    granted, retry_after = governor.try_acquire('acc')
+    assert not granted
+    assert retry_after > 60
+
+def test_bucket_refills_over_time(governor):
+    """El bucket se rellena proporcionalmente al tiempo transcurrido"""
+    for _ in range(10):
+        governor.acquire('acc')
+
+    with patch('services.docusign_quota.time.time', return_value=time.time() + 720):
+        # 720 segundos = 2 llamadas con un límite de 10 por hora
+        assert governor.remaining('acc') == pytest.approx(2, abs=0.1)
@@ -0,0 +1,56 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from services.docusign_registry import DocuSignServiceRegistry, get_docusign_service
+from services.docusign_service import DocuSignService
+
+@pytest.fixture
+def registry_app(app, docusign_config):
+    """App de testing con un registro limpio"""
+    app.extensions.pop('docusign_services', None)
+    yield app
+    app.extensions.pop('docusign_services', None)
+
+def test_service_is_created_once(registry_app):
+    """Llamadas sucesivas reutilizan la misma instancia"""
+    with registry_app.app_context():
+        first = DocuSignService.create_instance()
+        second = DocuSignService.create_instance()
+    assert first is second
+
+def test_service_is_shared_between_threads(registry_app):
+    """Hilos concurrentes obtienen una única instancia"""
+    with patch(
+        'services.docusign_service.DocuSignService.__init__', return_value=None
+    ) as mock_init:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            services = list(
+                executor.map(lambda _: get_docusign_service(registry_app), range(32))
+            )
+
+    assert len({id(service) for service in services}) == 1
+    assert mock_init.call_count == 1
+
+def test_registry_keyed_by_account_and_base_url(registry_app):
+    """Cuentas o URLs base distintas obtienen instancias distintas"""
+    registry = DocuSignServiceRegistry()
+    with registry_app.app_context():
+        demo = registry.get(registry_app)
+        registry_app.config['DOCUSIGN_BASE_URL'] = 'https://eu.docusign.net/restapi'
+        try:
+            eu = registry.get(registry_app)
+        finally:
+            registry_app.config['DOCUSIGN_BASE_URL'] = (
+                'https://demo.docusign.net/restapi'
+            )
+        assert registry.get(registry_app) is demo
+    assert eu is not demo
+
+def test_registry_resets_after_fork(registry_app):
+    """Un proceso hijo no hereda los pools de conexiones del padre"""
+    registry = DocuSignServiceRegistry()
+    with registry_app.app_context():
+        parent = registry.get(registry_app)
+        with patch('services.docusign_registry.os.getpid', return_value=-1):
+            child = registry.get(registry_app)
+    assert child is not parent
@@ -0,0 +1,138 @@
+import time
+import requests
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+from models.database import db, save_docusign_tokens
+from models.user import User
+from services.docusign_token_refresher import refresh_expiring_tokens
+from services.docusign_service import DocuSignService
+from services.docusign_quota import DocuSignQuotaExceeded, BACKGROUND
+
+def _create_user(expires_in_seconds, refresh_token='old_refresh'):
+    username = f"ds_user_{time.time_ns()}"
+    user = User(username=username, email=f"{username}@example.com")
+    user.set_password('TestPass123')
+    user.docusign_access_token = 'old_access'
+    user.docusign_refresh_token = refresh_token
+    user.docusign_token_expires = datetime.utcnow() + timedelta(
+        seconds=expires_in_seconds
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def test_save_docusign_tokens_sets_expiry(app, db_session):
+    """save_docusign_tokens persiste la expiración calculada a partir de expires_in"""
+    with app.app_context():
+        user_id = _create_user(3600)
+        save_docusign_tokens(user_id, 'new_access', 'new_refresh', expires_in=3600)
+
+        user = User.query.get(user_id)
+        assert user.docusign_access_token == 'new_access'
+        assert user.docusign_refresh_token == 'new_refresh'
+        assert user.docusign_token_expires > datetime.utcnow() + timedelta(seconds=3500)
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_refresh_only_tokens_near_expiry(mock_create_instance, app, db_session):
+    """Solo se renuevan los tokens dentro de la ventana, en una única escritura"""
+    with app.app_context():
+        expiring_id = _create_user(60)
+        fresh_id = _create_user(7200)
+
+        service = MagicMock()
+        service.refresh_access_token.return_value = {
+            'access_token': 'refreshed_access',
+            'expires_in': 28800
+        }
+        mock_create_instance.return_value = service
+
+        updated = refresh_expiring_tokens(window=600)
+
+        assert updated >= 1
+        db.session.expire_all()
+        expiring = User.query.get(expiring_id)
+        fresh = User.query.get(fresh_id)
+        assert expiring.docusign_access_token == 'refreshed_access'
+        # Si DocuSign no rota el refresh token se conserva el anterior
+        assert expiring.docusign_refresh_token == 'old_refresh'
+        assert expiring.docusign_token_expires > datetime.utcnow() + timedelta(hours=7)
+        assert fresh.docusign_access_token == 'old_access'
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_default_token_lifetime(mock_create_instance, app, db_session, monkeypatch):
+    """Sin expires_in se asume la duración por defecto y el usuario sigue renovándose"""
+    with app.app_context():
+        monkeypatch.setitem(app.config, 'DOCUSIGN_TOKEN_DEFAULT_LIFETIME', 1800)
+        user_id = _create_user(60)
+        service = MagicMock()
+        service.refresh_access_token.return_value = {'access_token': 'no_expiry'}
+        mock_create_instance.return_value = service
+
+        refresh_expiring_tokens(window=600)
+
+        db.session.expire_all()
+        user = User.query.get(user_id)
+        assert user.docusign_access_token == 'no_expiry'
+        assert user.docusign_token_expires is not None
+        assert user.docusign_token_expires > datetime.utcnow() + timedelta(seconds=1700)
+
+        save_docusign_tokens(user_id, 'saved_access', 'saved_refresh')
+        user = User.query.get(user_id)
+        assert user.docusign_token_expires > datetime.utcnow() + timedelta(seconds=1700)
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_revoked_refresh_token_is_discarded(mock_create_instance, app, db_session):
+    """Un refresh token rechazado por DocuSign se elimina para no reintentarlo"""
+    with app.app_context():
+        user_id = _create_user(30, refresh_token='revoked_refresh')
+
+        response = MagicMock(status_code=400)
+        service = MagicMock()
+        service.refresh_access_token.side_effect = requests.exceptions.HTTPError(
+            response=response
+        )
+        mock_create_instance.return_value = service
+
+        refresh_expiring_tokens(window=600)
+
+        db.session.expire_all()
+        user = User.query.get(user_id)
+        assert user.docusign_refresh_token is None
+        assert user.docusign_token_expires is None
+
+@patch('services.docusign_service.requests.post')
+def test_refresh_uses_quota_and_timeout(mock_post, app, monkeypatch):
+    """
+    Cada renovación consume cuota con la prioridad indicada y no espera indefinidamente
+    """
+    with app.app_context():
+        monkeypatch.setitem(app.config, 'DOCUSIGN_CLIENT_SECRET', 'secret')
+        service = MagicMock(
+            token_url='https://auth/oauth/token', quota_account='cuenta'
+        )
+        mock_post.return_value.json.return_value = {'access_token': 'nuevo'}
+
+        assert DocuSignService.refresh_access_token(
+            service, 'rt', priority=BACKGROUND
+        ) == {'access_token': 'nuevo'}
+        service.quota.acquire.assert_called_once_with('cuenta', BACKGROUND)
+        assert (
+            mock_post.call_args.kwargs['timeout']
+            == app.config['DOCUSIGN_TOKEN_REFRESH_TIMEOUT']
+        )
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_refresh_without_quota_is_deferred(mock_create_instance, app, db_session):
+    """Sin cuota no se toca el token: se renueva en la siguiente ejecución"""
+    with app.app_context():
+        user_id = _create_user(30)
+        service = MagicMock()
+        service.refresh_access_token.side_effect = DocuSignQuotaExceeded(
+            'cuenta', BACKGROUND, 5
+        )
+        mock_create_instance.return_value = service
+
+        assert refresh_expiring_tokens(window=600) == 0
+        service.refresh_access_token.assert_any_call('old_refresh', priority=BACKGROUND)
+        db.session.expire_all()
+        assert User.query.get(user_id).docusign_refresh_token == 'old_refresh'
@@ -0,0 +1,140 @@
+import json
+import time
+from datetime import datetime, timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from models.database import db
+from models.document import Document
+from models.envelope_event import EnvelopeEvent
+from services.local_store import LocalStore
+from services.webhook_queue import WebhookQueue, _SCHEMA
+from services.webhook_processor import process_webhook_events
+from services.envelope_events import (
+    record_events,
+    envelope_timeline,
+    compact_envelope_events,
+    drop_expired_envelope_events,
+)
+from tests.unit.test_webhook_queue import _document
+
+@pytest.fixture
+def events_app(app, tmp_path):
+    """App de testing con cola y deduplicador propios"""
+    previous = {
+        name: app.extensions.get(name) for name in ('webhook_queue', 'webhook_dedup')
+    }
+    app.extensions['webhook_queue'] = WebhookQueue(
+        LocalStore(str(tmp_path / 'webhooks.db'), schema=_SCHEMA)
+    )
+    app.extensions.pop('webhook_dedup', None)
+    yield app
+    for name, value in previous.items():
+        if value is None:
+            app.extensions.pop(name, None)
+        else:
+            app.extensions[name] = value
+
+def _history(envelope_id, statuses, start):
+    """Eventos consecutivos, uno por minuto desde `start`"""
+    record_events(
+        [
+            {
+                'envelope_id': envelope_id,
+                'status': status,
+                'event': f"envelope-{status}",
+                'occurred_at': start + timedelta(minutes=index),
+                'received_at': start + timedelta(minutes=index),
+            }
+            for index, status in enumerate(statuses)
+        ]
+    )
+    db.session.commit()
+
+def test_every_applied_event_is_recorded(client, events_app, db_session):
+    """
+    El historial guarda también los eventos atrasados
+    y la API lo devuelve en orden cronológico
+    """
+    with events_app.app_context():
+        envelope_id = f"env-h-{time.time_ns()}"
+        document_id = _document(envelope_id, status='sent')
+        queue = events_app.extensions['webhook_queue']
+        for status, minute in (("completed", 5), ("delivered", 1)):
+            queue.enqueue(
+                json.dumps(
+                    {
+                        "event": f"envelope-{status}",
+                        "generatedDateTime": f"2026-10-19T10:0{minute}:00.0000000Z",
+                        "data": {
+                            "envelopeId": envelope_id,
+                            "envelopeSummary": {"status": status},
+                        },
+                    }
+                ).encode()
+            )
+
+        process_webhook_events()
+
+        assert [event.status for event in envelope_timeline(envelope_id)] == [
+            "delivered",
+            "completed",
+        ]
+        assert Document.query.get(document_id).status == 'completed'
+        token = create_access_token(identity=Document.query.get(document_id).user_id)
+
+    response = client.get(
+        f'/api/documents/{document_id}/events',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == 200
+    events = response.get_json()['data']['events']
+    assert [event['event'] for event in events] == [
+        "envelope-delivered",
+        "envelope-completed",
+    ]
+    assert events[0]['occurred_at'] == "2026-10-19T10:01:00"
+
+def test_compaction_keeps_only_transitions(events_app, db_session):
+    """Los días cerrados quedan reducidos a transiciones; los recientes no se tocan"""
+    with events_app.app_context():
+        envelope_id = f"env-k-{time.time_ns()}"
+        old = datetime.utcnow().replace(
+            hour=8, minute=0, second=0, microsecond=0
+        ) - timedelta(days=30)
+        _history(envelope_id, ["sent"], old - timedelta(days=1))
+        _history(
+            envelope_id,
+            ["sent", "delivered", "delivered", "completed", "completed"],
+            old,
+        )
+        _history(envelope_id, ["completed", "completed"], datetime.utcnow())
+
+        assert compact_envelope_events(after_days=7, max_days=1000) >= 3
+
+        timeline = envelope_timeline(envelope_id)
+        assert [event.status for event in timeline] == [
+            "sent",
+            "delivered",
+            "completed",
+            "completed",
+            "completed",
+        ]
+        assert all(event.compacted for event in timeline[:3])
+        assert compact_envelope_events(after_days=7, max_days=1000) == 0
+
+def test_retention_drops_whole_days(events_app, db_session):
+    """La retención borra los cubos diarios anteriores al límite"""
+    with events_app.app_context():
+        envelope_id = f"env-r-{time.time_ns()}"
+        _history(envelope_id, ["sent"], datetime.utcnow() - timedelta(days=400))
+        _history(envelope_id, ["delivered"], datetime.utcnow())
+
+        assert drop_expired_envelope_events(retention_days=0) == 0
+        assert drop_expired_envelope_events(retention_days=365) >= 1
+        assert [event.status for event in envelope_timeline(envelope_id)] == [
+            "delivered"
+        ]
+        assert (
+            EnvelopeEvent.query.filter(EnvelopeEvent.envelope_id == envelope_id).count()
+            == 1
+        )
@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import pytest
+from datetime import datetime
+from services.docusign_hmac import DocuSignHMACValidator, STREAM_THRESHOLD
+from services.local_store import LocalStore
+from services.webhook_queue import WebhookQueue, _SCHEMA
+
+OLD_KEY = 'clave_antigua'
+NEW_KEY = 'clave_nueva'
+
+def _signature(key, body):
+    return base64.b64encode(
+        hmac.new(key.encode(), body, hashlib.sha256).digest()
+    ).decode()
+
+@pytest.fixture
+def rotation_app(app, tmp_path):
+    """App de testing en plena rotación de claves HMAC"""
+    previous = {
+        name: app.config.get(name)
+        for name in ('DOCUSIGN_HMAC_KEY', 'DOCUSIGN_HMAC_KEYS')
+    }
+    previous_queue = app.extensions.get('webhook_queue')
+    app.config['DOCUSIGN_HMAC_KEY'] = NEW_KEY
+    app.config['DOCUSIGN_HMAC_KEYS'] = OLD_KEY
+    app.extensions['webhook_queue'] = WebhookQueue(
+        LocalStore(str(tmp_path / 'webhooks.db'), schema=_SCHEMA)
+    )
+    yield app
+    app.config.update(previous)
+    if previous_queue is None:
+        app.extensions.pop('webhook_queue', None)
+    else:
+        app.extensions['webhook_queue'] = previous_queue
+
+def test_any_signature_header_with_any_key_is_accepted():
+    """Durante una rotación basta con que una firma coincida con una de las claves"""
+    validator = DocuSignHMACValidator([OLD_KEY, NEW_KEY])
+    body = b'{"envelopeId": "env-1"}'
+
+    assert validator.verify(body, {'X-DocuSign-Signature-1': _signature(NEW_KEY, body)})
+    assert validator.verify(body, {'X-DocuSign-Signature-1': 'no-es-base64!',
+                                   'X-DocuSign-Signature-2': _signature(OLD_KEY, body)})
+    assert not validator.verify(
+        body, {'X-DocuSign-Signature-1': _signature('otra', body)}
+    )
+    assert not validator.verify(body, {})
+
+def test_timestamp_is_part_of_the_signed_message():
+    """
+    Con cabecera de timestamp se firma `timestamp\ncuerpo\n`:
+    cambiar el timestamp invalida la firma
+    """
+    validator = DocuSignHMACValidator(NEW_KEY)
+    body = b'{"envelopeId": "env-1"}'
+    timestamp = '2024-03-14T12:00:00Z'
+    signature = _signature(NEW_KEY, timestamp.encode() + b'\n' + body + b'\n')
+
+    assert validator.verify(body, {'X-DocuSign-Signature-1': signature,
+                                   'X-DocuSign-Signature-Timestamp': timestamp})
+    assert not validator.verify(
+        body,
+        {
+            'X-DocuSign-Signature-1': signature,
+            'X-DocuSign-Signature-Timestamp': '2024-03-14T12:05:00Z',
+        },
+    )
+    assert not validator.verify(
+        body,
+        {
+            'X-DocuSign-Signature-1': _signature(NEW_KEY, body),
+            'X-DocuSign-Signature-Timestamp': timestamp,
+        },
+    )
+    assert validator.verify_chunks(
+        [body[:5], body[5:]],
+        validator.signatures({'X-DocuSign-Signature-1': signature}),
+        timestamp,
+    )
+
+def test_chunked_verification_matches_whole_body():
+    """Verificar por bloques da el mismo resultado que sobre el cuerpo completo"""
+    validator = DocuSignHMACValidator(NEW_KEY)
+    body = os.urandom(200 * 1024)
+    signatures = validator.signatures(
+        {'X-DocuSign-Signature-1': _signature(NEW_KEY, body)}
+    )
+
+    chunks = [body[i:i + 4096] for i in range(0, len(body), 4096)]
+    assert validator.verify_chunks(chunks, signatures)
+    assert not validator.verify_chunks(chunks[:-1], signatures)
+
+def test_large_body_is_streamed_and_still_enqueued(client, rotation_app, sign_webhook):
+    """
+    Un cuerpo grande se verifica desde el stream
+    y el endpoint sigue encolándolo completo
+    """
+    body = json.dumps({"envelopeId": "env-big", "status": "sent",
+                       "padding": "x" * (2 * STREAM_THRESHOLD)}).encode()
+    headers = sign_webhook(NEW_KEY, body)
+    headers['X-DocuSign-Signature-2'] = sign_webhook(
+        OLD_KEY, body, headers['X-DocuSign-Signature-Timestamp']
+    )['X-DocuSign-Signature-1']
+
+    response = client.post(
+        '/api/docusign/webhook',
+        data=body,
+        content_type='application/json',
+        headers=headers,
+    )
+    assert response.status_code == 202
+    events = rotation_app.extensions['webhook_queue'].claim(10)
+    assert [event.json() for event in events] == [json.loads(body)]
+
+    response = client.post(
+        '/api/docusign/webhook',
+        data=body,
+        content_type='application/json',
+        headers=sign_webhook('otra', body),
+    )
+    assert response.status_code == 401
+
+def test_replay_window_requires_signed_timestamp(client, rotation_app, sign_webhook):
+    """
+    Con la ventana activa se rechaza una entrega
+    sin timestamp o con el timestamp cambiado
+    """
+    body = json.dumps({"envelopeId": "env-ts", "status": "sent"}).encode()
+
+    response = client.post(
+        '/api/docusign/webhook',
+        data=body,
+        content_type='application/json',
+        headers={'X-DocuSign-Signature-1': _signature(NEW_KEY, body)},
+    )
+    assert response.status_code == 400
+
+    headers = sign_webhook(NEW_KEY, body, '2024-03-14T12:00:00Z')
+    headers['X-DocuSign-Signature-Timestamp'] = datetime.utcnow().isoformat() + 'Z'
+    response = client.post(
+        '/api/docusign/webhook',
+        data=body,
+        content_type='application/json',
+        headers=headers,
+    )
+    assert response.status_code == 401
@@ -0,0 +1,131 @@
+import jwt as pyjwt
+import pytest
+from unittest.mock import patch
+from flask import Flask, jsonify
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_manager
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from routes.base import bp as base_bp
+from services.jwt_signing import CachingJWTManager
+
+def _write_private(path, key):
+    path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    return str(path)
+
+def _write_public(path, key):
+    path.write_bytes(
+        key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+    )
+    return str(path)
+
+def _signing_app(**config):
+    """App mínima con la firma asimétrica configurada y una ruta protegida"""
+    app = Flask(__name__)
+    app.config.update(JWT_ACCESS_TOKEN_EXPIRES=300, **config)
+    CachingJWTManager(app)
+    app.register_blueprint(base_bp)
+
+    @app.route('/protegida')
+    @jwt_required()
+    def protegida():
+        return jsonify(user=get_jwt_identity())
+    return app
+
+@pytest.fixture
+def eddsa_app(tmp_path):
+    return _signing_app(
+        JWT_ALGORITHM='EdDSA',
+        JWT_PRIVATE_KEY_FILE=_write_private(
+            tmp_path / 'ed.pem', ed25519.Ed25519PrivateKey.generate()
+        ),
+    )
+
+def test_other_services_verify_with_the_jwks(eddsa_app):
+    """Un token EdDSA se verifica con la clave publicada, sin el secreto"""
+    with eddsa_app.app_context():
+        token = create_access_token(identity='ana')
+    client = eddsa_app.test_client()
+    response = client.get('/.well-known/jwks.json')
+    assert response.status_code == 200
+    assert 'max-age' in response.headers['Cache-Control']
+    [jwk] = response.get_json()['keys']
+    assert 'd' not in jwk
+
+    header = pyjwt.get_unverified_header(token)
+    assert header['alg'] == 'EdDSA' and header['kid'] == jwk['kid']
+    claims = pyjwt.decode(token, OKPAlgorithm.from_jwk(jwk), algorithms=['EdDSA'])
+    assert claims['sub'] == 'ana'
+
+def test_verified_tokens_are_cached_by_signature(eddsa_app):
+    """
+    La firma se verifica una vez por token; un payload alterado no aprovecha la caché
+    """
+    with eddsa_app.app_context():
+        token = create_access_token(identity='ana')
+    client = eddsa_app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    with patch.object(
+        jwt_manager, '_decode_jwt', wraps=jwt_manager._decode_jwt
+    ) as decode:
+        for _ in range(3):
+            assert client.get('/protegida', headers=headers).get_json() == {
+                'user': 'ana'
+            }
+        assert decode.call_count == 1
+
+        header, payload, signature = token.split('.')
+        forged_payload = pyjwt.utils.base64url_encode(
+            pyjwt.utils.base64url_decode(payload).replace(b'"ana"', b'"eva"')).decode()
+        forged = f"{header}.{forged_payload}.{signature}"
+        response = client.get(
+            '/protegida', headers={'Authorization': f'Bearer {forged}'}
+        )
+        assert response.status_code == 422
+
+def test_rotated_keys_keep_validating(tmp_path):
+    """Los tokens de la clave anterior siguen valiendo y el JWKS publica ambas"""
+    old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    old_app = _signing_app(
+        JWT_ALGORITHM='RS256',
+        JWT_PRIVATE_KEY_FILE=_write_private(tmp_path / 'old.pem', old_key),
+    )
+    with old_app.app_context():
+        old_token = create_access_token(identity='ana')
+
+    new_app = _signing_app(
+        JWT_ALGORITHM='RS256',
+        JWT_PRIVATE_KEY_FILE=_write_private(
+            tmp_path / 'new.pem', rsa.generate_private_key(65537, 2048)
+        ),
+        JWT_PUBLIC_KEY_FILES=[_write_public(tmp_path / 'old.pub', old_key)],
+    )
+    client = new_app.test_client()
+    keys = client.get('/.well-known/jwks.json').get_json()['keys']
+    assert len(keys) == 2
+    assert (
+        pyjwt.decode(old_token, RSAAlgorithm.from_jwk(keys[1]), algorithms=['RS256'])[
+            'sub'
+        ]
+        == 'ana'
+    )
+    assert (
+        client.get(
+            '/protegida', headers={'Authorization': f'Bearer {old_token}'}
+        ).status_code
+        == 200
+    )
+
+def test_hmac_mode_publishes_no_keys(client):
+    """Con secreto compartido no hay JWKS"""
+    assert client.get('/.well-known/jwks.json').status_code == 404
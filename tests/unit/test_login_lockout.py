@@ -0,0 +1,113 @@
+import time
+import pytest
+from models.database import db
+from models.user import User
+from services.local_store import LocalStore
+from services.login_lockout import LoginLockout, _SCHEMA
+
+@pytest.fixture
+def lockout(tmp_path):
+    return LoginLockout(
+        LocalStore(str(tmp_path / 'lockout.db'), schema=_SCHEMA),
+        max_attempts=3,
+        window=60,
+        duration=60,
+        bucket_seconds=10,
+        max_entries=5,
+    )
+
+@pytest.fixture
+def lockout_app(app, lockout):
+    previous = app.extensions.get('login_lockout')
+    app.extensions['login_lockout'] = lockout
+    yield app
+    if previous is None:
+        app.extensions.pop('login_lockout', None)
+    else:
+        app.extensions['login_lockout'] = previous
+
+def _login(client, username, password):
+    # IP propia para no compartir el límite de 5 logins por minuto con otros tests
+    return client.post(
+        '/api/login',
+        json={'username': username, 'password': password},
+        environ_base={
+            'REMOTE_ADDR': f"10.48.{time.time_ns() % 250}.{time.time_ns() % 250 + 1}"
+        },
+    )
+
+def test_failures_lock_the_account_across_processes(tmp_path, lockout):
+    """Los fallos se comparten a través del almacén y caducan con la ventana"""
+    other_worker = LoginLockout(
+        LocalStore(str(tmp_path / 'lockout.db'), schema=_SCHEMA),
+        max_attempts=3,
+        window=60,
+        duration=60,
+        bucket_seconds=10,
+    )
+    assert not lockout.record_failure('ana')
+    assert not other_worker.record_failure('ana')
+    assert lockout.locked_for('ana') == 0
+    assert other_worker.record_failure('ana')
+    assert 0 < lockout.locked_for('ana') <= 60
+    assert lockout.locked_for('otra') == 0
+
+    lockout.reset('ana')
+    assert other_worker.locked_for('ana') == 0
+
+def test_failures_table_is_bounded_on_insert(lockout):
+    """
+    Sin purga, cada fallo nuevo descarta los cubos más antiguos por encima del máximo
+    """
+    conn = lockout.store.connection()
+    current = lockout._bucket(time.time())
+    conn.execute(
+        'INSERT INTO login_failures (key, bucket, count) VALUES (?, ?, 2)',
+        ('vieja', current - 1),
+    )
+    for i in range(8):
+        lockout.record_failure(f"usuario_{i}")
+
+    assert conn.execute('SELECT COUNT(*) FROM login_failures').fetchone()[0] == 5
+    assert (
+        conn.execute(
+            "SELECT COUNT(*) FROM login_failures WHERE key = 'vieja'"
+        ).fetchone()[0]
+        == 0
+    )
+
+def test_purge_expires_buckets_and_lockouts(lockout):
+    """La purga borra los cubos fuera de la ventana y los bloqueos vencidos"""
+    conn = lockout.store.connection()
+    current = lockout._bucket(time.time())
+    conn.execute(
+        'INSERT INTO login_failures (key, bucket, count) VALUES (?, ?, 2)',
+        ('vieja', current - 100),
+    )
+    lockout.record_failure('usuario')
+    conn.execute(
+        'INSERT INTO login_lockouts (key, locked_until) VALUES (?, ?)',
+        ('vencido', time.time() - 1),
+    )
+
+    assert lockout.purge() == 2
+    assert conn.execute('SELECT COUNT(*) FROM login_failures').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM login_lockouts').fetchone()[0] == 0
+
+def test_login_is_locked_after_repeated_failures(client, lockout_app, db_session):
+    """
+    Tras max_attempts fallos el login responde 429 aunque la contraseña sea correcta
+    """
+    with lockout_app.app_context():
+        username = f"bloqueo_{time.time_ns()}"
+        user = User(username=username, email=f"{username}@example.com")
+        user.set_password('Secreto123')
+        db.session.add(user)
+        db.session.commit()
+
+    assert _login(client, username, 'Secreto123').status_code == 200
+    for _ in range(3):
+        assert _login(client, username, 'incorrecta').status_code == 401
+    response = _login(client, username, 'Secreto123')
+    assert response.status_code == 429
+    assert response.get_json()['error'] == "Cuenta bloqueada temporalmente"
@@ -0,0 +1,320 @@
+import json
+import time
+from datetime import datetime
+import pytest
+import requests
+from unittest.mock import patch
+from flask_jwt_extended import create_access_token
+from models.database import db
+from models.document import Document
+from models.envelope_event import EnvelopeEvent
+from models.webhook_subscription import (
+    WebhookSubscription,
+    WebhookDelivery,
+    WebhookDeadLetter,
+)
+from services.local_store import LocalStore
+from services.webhook_queue import WebhookQueue, _SCHEMA
+from services.webhook_processor import process_webhook_events
+from services.outbound_webhooks import (
+    deliver_webhooks,
+    replay_dead_letters,
+    sign_payload,
+    PinnedAddressAdapter,
+    UnsafeDestination,
+)
+from tests.unit.test_webhook_queue import _document
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+class FakeSession:
+    """Sustituye a la sesión HTTP: responde según la URL y guarda lo enviado"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.sent = []
+
+    def post(self, url, data, timeout, allow_redirects, headers):
+        self.sent.append((url, data, headers))
+        return FakeResponse(self.responses.get(url, 200))
+
+@pytest.fixture
+def outbound_app(app, tmp_path):
+    """App de testing con cola propia y sesión HTTP sustituida"""
+    names = ('webhook_queue', 'webhook_dedup', 'outbound_webhook_session')
+    previous = {name: app.extensions.get(name) for name in names}
+    app.extensions['webhook_queue'] = WebhookQueue(
+        LocalStore(str(tmp_path / 'webhooks.db'), schema=_SCHEMA)
+    )
+    app.extensions.pop('webhook_dedup', None)
+    app.extensions['outbound_webhook_session'] = FakeSession({})
+    # Sin DNS en los tests: todos los hosts resuelven a una dirección pública
+    with patch(
+        'services.outbound_webhooks.resolve_host', return_value={'93.184.216.34'}
+    ):
+        yield app
+    for name, value in previous.items():
+        if value is None:
+            app.extensions.pop(name, None)
+        else:
+            app.extensions[name] = value
+
+def _subscribe(document_id, url, events=None):
+    subscription = WebhookSubscription(
+        user_id=Document.query.get(document_id).user_id,
+        url=url,
+        secret='clave',
+        events=events,
+    )
+    db.session.add(subscription)
+    db.session.commit()
+    return subscription
+
+def _connect_event(queue, envelope_id, status):
+    queue.enqueue(json.dumps({
+        "event": f"envelope-{status}",
+        "data": {"envelopeId": envelope_id, "envelopeSummary": {"status": status}}
+    }).encode())
+
+def _deliveries(subscription):
+    return (
+        WebhookDelivery.query.filter_by(subscription_id=subscription.id)
+        .order_by(WebhookDelivery.id)
+        .all()
+    )
+
+def test_applied_events_fan_out_to_subscriptions(outbound_app, db_session):
+    """Cada evento aplicado crea una entrega firmada por suscripción interesada"""
+    with outbound_app.app_context():
+        envelope_id = f"env-o-{time.time_ns()}"
+        document_id = _document(envelope_id, status='sent')
+        everything = _subscribe(document_id, f"https://a.example.com/{envelope_id}")
+        completed_only = _subscribe(
+            document_id, f"https://b.example.com/{envelope_id}", events='completed'
+        )
+        queue = outbound_app.extensions['webhook_queue']
+        _connect_event(queue, envelope_id, 'delivered')
+        _connect_event(queue, envelope_id, 'completed')
+
+        process_webhook_events()
+
+        assert len(_deliveries(everything)) == 2
+        assert len(_deliveries(completed_only)) == 1
+
+        deliver_webhooks(batch_size=1000)
+
+        session = outbound_app.extensions['outbound_webhook_session']
+        sent = [
+            (data, headers)
+            for url, data, headers in session.sent
+            if url == completed_only.url
+        ]
+        assert len(sent) == 1
+        data, headers = sent[0]
+        payload = json.loads(data)
+        assert payload['data'] == dict(
+            payload['data'], document_id=document_id, status='completed'
+        )
+        timestamp, signature = [
+            part.split('=', 1)[1] for part in headers['X-Webhook-Signature'].split(',')
+        ]
+        assert signature == sign_payload('clave', int(timestamp), data)
+        assert headers['X-Webhook-Id'] == payload['id']
+        assert _deliveries(everything) == [] and _deliveries(completed_only) == []
+
+def test_stale_events_are_not_forwarded(outbound_app, db_session):
+    """
+    Un evento atrasado queda en el historial pero no llega a los clientes como retroceso
+    """
+    with outbound_app.app_context():
+        envelope_id = f"env-s-{time.time_ns()}"
+        document_id = _document(envelope_id, status='sent')
+        subscription = _subscribe(document_id, f"https://a.example.com/{envelope_id}")
+        queue = outbound_app.extensions['webhook_queue']
+        _connect_event(queue, envelope_id, 'completed')
+        _connect_event(queue, envelope_id, 'delivered')
+        process_webhook_events()
+        _connect_event(queue, envelope_id, 'signed')
+        process_webhook_events()
+
+        forwarded = [
+            json.loads(delivery.payload)['data']['status']
+            for delivery in _deliveries(subscription)
+        ]
+        assert forwarded == ['completed']
+        assert Document.query.get(document_id).status == 'completed'
+        assert EnvelopeEvent.query.filter_by(envelope_id=envelope_id).count() == 3
+
+def test_failures_back_off_and_end_in_dead_letters(outbound_app, db_session):
+    """Un endpoint caído se reintenta con espera creciente y acaba en dead letters"""
+    outbound_app.config['OUTBOUND_WEBHOOK_MAX_ATTEMPTS'] = 2
+    try:
+        with outbound_app.app_context():
+            envelope_id = f"env-f-{time.time_ns()}"
+            document_id = _document(envelope_id, status='sent')
+            subscription = _subscribe(
+                document_id, f"https://down.example.com/{envelope_id}"
+            )
+            session = outbound_app.extensions['outbound_webhook_session']
+            session.responses[subscription.url] = 503
+            now = datetime.utcnow()
+            for index in range(3):
+                db.session.add(
+                    WebhookDelivery(
+                        subscription_id=subscription.id,
+                        event_id=f"evt{index}",
+                        payload='{}',
+                        next_attempt_at=now,
+                    )
+                )
+            db.session.commit()
+
+            deliver_webhooks(batch_size=1000)
+
+            # Solo se intenta la primera: las demás esperan sin consumir intentos
+            assert (
+                len([url for url, _, _ in session.sent if url == subscription.url]) == 1
+            )
+            first, *rest = _deliveries(subscription)
+            assert first.attempts == 1 and first.last_error == 'HTTP 503'
+            assert first.next_attempt_at > now
+            assert all(delivery.attempts == 0 for delivery in rest)
+
+            first.next_attempt_at = now
+            db.session.commit()
+            deliver_webhooks(batch_size=1000)
+
+            dead = WebhookDeadLetter.query.filter_by(
+                subscription_id=subscription.id
+            ).all()
+            assert [(letter.event_id, letter.attempts) for letter in dead] == [
+                ("evt0", 2)
+            ]
+
+            session.responses[subscription.url] = 200
+            assert replay_dead_letters(subscription) == 1
+            deliver_webhooks(batch_size=1000)
+            assert _deliveries(subscription) == []
+            assert (
+                WebhookDeadLetter.query.filter_by(
+                    subscription_id=subscription.id
+                ).count()
+                == 0
+            )
+    finally:
+        outbound_app.config['OUTBOUND_WEBHOOK_MAX_ATTEMPTS'] = 8
+
+def test_subscription_endpoints(client, outbound_app, db_session):
+    """Un usuario gestiona sus suscripciones; la clave de firma solo se ve al crearla"""
+    with outbound_app.app_context():
+        document_id = _document(f"env-w-{time.time_ns()}")
+        token = create_access_token(identity=Document.query.get(document_id).user_id)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.post(
+        '/api/webhooks', json={'url': 'ftp://example.com'}, headers=headers
+    )
+    assert response.status_code == 400
+    response = client.post(
+        '/api/webhooks',
+        json={'url': 'https://example.com/hook', 'events': ['firmado']},
+        headers=headers,
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        '/api/webhooks',
+        json={'url': 'https://example.com/hook?a=1&b=2', 'events': ['completed']},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    created = response.get_json()['data']
+    assert (
+        len(created['secret']) == 64
+        and created['url'] == 'https://example.com/hook?a=1&b=2'
+    )
+
+    listed = client.get('/api/webhooks', headers=headers).get_json()['data'][
+        'subscriptions'
+    ]
+    assert [item['id'] for item in listed] == [
+        created['id']
+    ] and 'secret' not in listed[0]
+
+    assert (
+        client.delete(f"/api/webhooks/{created['id']}", headers=headers).status_code
+        == 200
+    )
+    assert (
+        client.get('/api/webhooks', headers=headers).get_json()['data']['subscriptions']
+        == []
+    )
+    assert (
+        client.get(
+            f"/api/webhooks/{created['id']}/dead-letters", headers=headers
+        ).status_code
+        == 404
+    )
+
+
+@pytest.mark.parametrize(
+    'address', ['127.0.0.1', '169.254.169.254', '10.0.0.5', '::1', '::ffff:192.168.1.1']
+)
+def test_private_destinations_are_rejected(client, outbound_app, db_session, address):
+    """Una URL que resuelve a una dirección interna no se acepta ni recibe entregas"""
+    with outbound_app.app_context():
+        envelope_id = f"env-s-{time.time_ns()}"
+        document_id = _document(envelope_id, status='sent')
+        token = create_access_token(identity=Document.query.get(document_id).user_id)
+        subscription = _subscribe(
+            document_id, f"https://interno.example.com/{envelope_id}"
+        )
+
+    with patch(
+        'services.outbound_webhooks.resolve_host',
+        return_value={'93.184.216.34', address},
+    ):
+        response = client.post(
+            '/api/webhooks',
+            json={'url': 'https://interno.example.com/hook'},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        assert response.status_code == 400
+        assert address in response.get_json()['details']
+
+        # El DNS cambió después de crear la suscripción: la entrega falla sin enviarse
+        with outbound_app.app_context():
+            _connect_event(
+                outbound_app.extensions['webhook_queue'], envelope_id, 'completed'
+            )
+            process_webhook_events()
+            assert deliver_webhooks() == 0
+            session = outbound_app.extensions['outbound_webhook_session']
+            assert all(url != subscription.url for url, _, _ in session.sent)
+            [delivery] = _deliveries(subscription)
+            assert address in delivery.last_error
+
+def test_connections_are_pinned_to_the_vetted_address():
+    """
+    La conexión va a la IP validada y el nombre
+    del host solo viaja en Host, SNI y certificado
+    """
+    adapter = PinnedAddressAdapter()
+    with patch(
+        'services.outbound_webhooks.resolve_host',
+        return_value={'2606:2800:220:1::', '93.184.216.34'},
+    ):
+        pool = adapter.get_connection('https://hooks.example.com:8443/hook')
+    assert (pool.host, pool.port) == ('93.184.216.34', 8443)
+    assert pool.assert_hostname == 'hooks.example.com'
+    assert pool.conn_kw['server_hostname'] == 'hooks.example.com'
+
+    prepared = requests.Request('POST', 'https://hooks.example.com:8443/hook').prepare()
+    adapter.add_headers(prepared)
+    assert prepared.headers['Host'] == 'hooks.example.com:8443'
+
+    with patch('services.outbound_webhooks.resolve_host', return_value={'10.0.0.5'}):
+        with pytest.raises(UnsafeDestination):
+            adapter.get_connection('https://hooks.example.com/hook')
@@ -0,0 +1,94 @@
+import time
+import pytest
+from werkzeug.security import generate_password_hash
+from models.database import db
+from models.user import User
+from services.password_hashing import PasswordHasher, PasswordHashingBusy, hash_method
+
+@pytest.fixture
+def hasher_app(app):
+    """App de testing con su propio pool de hash"""
+    previous = app.extensions.get('password_hasher')
+    app.extensions['password_hasher'] = PasswordHasher(
+        hash_method(iterations=2000), workers=1
+    )
+    yield app
+    app.extensions['password_hasher'].shutdown()
+    if previous is None:
+        app.extensions.pop('password_hasher', None)
+    else:
+        app.extensions['password_hasher'] = previous
+
+def _login(client, username):
+    # IP propia para no compartir el límite de 5 logins por minuto con otros tests
+    return client.post(
+        '/api/login',
+        json={'username': username, 'password': 'Secreto123'},
+        environ_base={
+            'REMOTE_ADDR': f"10.43.{time.time_ns() % 250}.{time.time_ns() % 250 + 1}"
+        },
+    )
+
+def _user(password_hash):
+    username = f"hash_{time.time_ns()}"
+    user = User(
+        username=username, email=f"{username}@example.com", password_hash=password_hash
+    )
+    db.session.add(user)
+    db.session.commit()
+    return username
+
+def test_hash_and_verify_run_in_the_pool():
+    """El pool de procesos produce hashes con el factor de trabajo configurado"""
+    hasher = PasswordHasher(hash_method(iterations=1000), workers=1)
+    try:
+        pwhash = hasher.hash('Secreto123')
+        assert pwhash.startswith('pbkdf2:sha256:1000$')
+        assert hasher.verify(pwhash, 'Secreto123')
+        assert not hasher.verify(pwhash, 'otra')
+        assert not hasher.verify(None, 'Secreto123')
+        assert not hasher.needs_rehash(pwhash)
+        assert hasher.needs_rehash(
+            generate_password_hash('Secreto123', 'pbkdf2:sha256:500')
+        )
+    finally:
+        hasher.shutdown()
+
+def test_saturated_pool_fails_fast():
+    """Con el pool lleno la operación se rechaza en lugar de acumular espera"""
+    hasher = PasswordHasher(
+        hash_method(iterations=1000), workers=0, max_pending=1, wait_timeout=0
+    )
+    hasher._slots.acquire()
+    with pytest.raises(PasswordHashingBusy):
+        hasher.verify('pbkdf2:sha256:1000$a$b', 'x')
+    hasher._slots.release()
+    assert hasher.hash('x').startswith('pbkdf2:sha256:1000$')
+
+def test_login_upgrades_outdated_hash(client, hasher_app, db_session):
+    """Un login correcto con un hash antiguo lo actualiza al factor de trabajo actual"""
+    with hasher_app.app_context():
+        username = _user(generate_password_hash('Secreto123', 'pbkdf2:sha256:1000'))
+
+    response = _login(client, username)
+    assert response.status_code == 200
+
+    with hasher_app.app_context():
+        user = User.query.filter_by(username=username).first()
+        assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+        assert user.check_password('Secreto123')
+
+def test_login_returns_503_when_pool_is_saturated(client, hasher_app, db_session):
+    """El login responde 503 con Retry-After si no hay hueco en el pool"""
+    with hasher_app.app_context():
+        username = _user(generate_password_hash('Secreto123', 'pbkdf2:sha256:2000'))
+    busy = PasswordHasher(
+        hash_method(iterations=2000), workers=0, max_pending=1, wait_timeout=0
+    )
+    busy._slots.acquire()
+    hasher_app.extensions['password_hasher'] = busy
+
+    response = _login(client, username)
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    busy._slots.release()
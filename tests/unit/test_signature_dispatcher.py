@@ -0,0 +1,149 @@
+import pytest
+import time
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+from models.database import db
+from models.user import User
+from models.document import Document
+from models.envelope_request import EnvelopeRequest
+from models.signature_outbox import SignatureOutbox
+from services.blob_store import BlobStore
+from services.docusign_quota import DocuSignQuotaExceeded, BACKGROUND
+from services.signature_outbox import (
+    enqueue_signature_request,
+    dispatch_pending_signatures,
+)
+
+RECIPIENTS = [{"email": "firmante@example.com", "name": "Firmante"}]
+
+@pytest.fixture
+def outbox_app(app, db_session, tmp_path):
+    """App de testing con un almacén de blobs temporal"""
+    previous = app.extensions.get('blob_store')
+    app.extensions['blob_store'] = BlobStore(str(tmp_path))
+    yield app
+    app.extensions['blob_store'] = previous
+
+def _create_sender():
+    username = f"outbox_{time.time_ns()}"
+    user = User(username=username, email=f"{username}@example.com", password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def _enqueue(pdf_bytes):
+    record, created = enqueue_signature_request(
+        _create_sender(), "Split Sheet", pdf_bytes, RECIPIENTS
+    )
+    assert created
+    return SignatureOutbox.query.filter_by(envelope_request_id=record.id).one()
+
+def test_enqueue_writes_document_and_outbox(outbox_app):
+    """
+    La solicitud se registra sin llamar a DocuSign y los reintentos no duplican filas
+    """
+    with outbox_app.app_context():
+        user_id = _create_sender()
+        record, created = enqueue_signature_request(
+            user_id, "Split Sheet", b"%PDF-outbox", RECIPIENTS
+        )
+        assert created
+        assert record.status == 'queued'
+
+        document = Document.query.get(record.document_id)
+        assert document.status == 'queued'
+        assert (
+            outbox_app.extensions['blob_store'].read(document.file_path)
+            == b"%PDF-outbox"
+        )
+
+        replay, created = enqueue_signature_request(
+            user_id, "Split Sheet", b"%PDF-outbox", RECIPIENTS
+        )
+        assert not created
+        assert replay.id == record.id
+        assert SignatureOutbox.query.filter_by(document_id=document.id).count() == 1
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_dispatch_sends_and_completes(mock_create_instance, outbox_app):
+    """
+    El despachador crea el envelope con prioridad de fondo y actualiza todas las filas
+    """
+    with outbox_app.app_context():
+        entry_id = _enqueue(b"%PDF-send").id
+
+        service = MagicMock()
+        service.send_document_for_signature.return_value = {
+            "envelope_id": f"env-{entry_id}", "status": "sent", "status_datetime": None
+        }
+        mock_create_instance.return_value = service
+
+        assert dispatch_pending_signatures() >= 1
+        assert (
+            service.send_document_for_signature.call_args.kwargs['priority']
+            == BACKGROUND
+        )
+
+        db.session.expire_all()
+        entry = SignatureOutbox.query.get(entry_id)
+        assert entry.status == 'sent'
+        assert entry.claim_token is None
+        assert entry.document.status == 'sent'
+        assert entry.document.envelope_id == f"env-{entry_id}"
+        assert entry.envelope_request.envelope_id == f"env-{entry_id}"
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_dispatch_retries_then_fails(mock_create_instance, outbox_app):
+    """Los errores se reintentan con espera y al agotar intentos se libera la reserva"""
+    with outbox_app.app_context():
+        entry = _enqueue(b"%PDF-fail")
+        entry_id, document_id, request_id = (
+            entry.id,
+            entry.document_id,
+            entry.envelope_request_id,
+        )
+
+        service = MagicMock()
+        service.send_document_for_signature.side_effect = Exception(
+            "DocuSign API Error"
+        )
+        mock_create_instance.return_value = service
+
+        dispatch_pending_signatures()
+        db.session.expire_all()
+        entry = SignatureOutbox.query.get(entry_id)
+        assert entry.status == 'pending'
+        assert entry.attempts == 1
+        assert entry.next_attempt_at > datetime.utcnow()
+
+        # Forzar el último intento
+        entry.attempts = outbox_app.config['DOCUSIGN_OUTBOX_MAX_ATTEMPTS'] - 1
+        entry.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+
+        dispatch_pending_signatures()
+        db.session.expire_all()
+        entry = SignatureOutbox.query.get(entry_id)
+        assert entry.status == 'failed'
+        assert "DocuSign API Error" in entry.last_error
+        assert Document.query.get(document_id).status == 'error'
+        assert EnvelopeRequest.query.get(request_id) is None
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_dispatch_defers_without_quota(mock_create_instance, outbox_app):
+    """Sin cuota la entrada se reprograma sin consumir intentos"""
+    with outbox_app.app_context():
+        entry_id = _enqueue(b"%PDF-quota").id
+
+        service = MagicMock()
+        service.send_document_for_signature.side_effect = DocuSignQuotaExceeded(
+            'acc', BACKGROUND, 120
+        )
+        mock_create_instance.return_value = service
+
+        assert dispatch_pending_signatures() == 0
+        db.session.expire_all()
+        entry = SignatureOutbox.query.get(entry_id)
+        assert entry.status == 'pending'
+        assert entry.attempts == 0
+        assert entry.next_attempt_at > datetime.utcnow()
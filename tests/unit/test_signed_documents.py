@@ -0,0 +1,75 @@
+import pytest
+import time
+from unittest.mock import patch, MagicMock
+from flask_jwt_extended import create_access_token
+from models.database import db
+from models.user import User
+from models.document import Document
+from services.blob_store import BlobStore
+
+SIGNED_PDF = b"%PDF-1.4 firmado" * 1000
+
+@pytest.fixture
+def completed_document(app, db_session, tmp_path):
+    """Documento completado de un usuario con un almacén de blobs temporal"""
+    previous = app.extensions.get('blob_store')
+    app.extensions['blob_store'] = BlobStore(str(tmp_path))
+    with app.app_context():
+        username = f"signed_{time.time_ns()}"
+        user = User(
+            username=username, email=f"{username}@example.com", password_hash='x'
+        )
+        db.session.add(user)
+        db.session.flush()
+        document = Document(title="Split Sheet", user_id=user.id, status='completed',
+                            envelope_id=f"env-{username}")
+        db.session.add(document)
+        db.session.commit()
+        token = create_access_token(identity=user.id)
+        yield document.id, {'Authorization': f'Bearer {token}'}
+    app.extensions['blob_store'] = previous
+
+def _upstream():
+    upstream = MagicMock()
+    upstream.headers = {'Content-Length': str(len(SIGNED_PDF))}
+    upstream.stream.return_value = iter(
+        [SIGNED_PDF[i : i + 4096] for i in range(0, len(SIGNED_PDF), 4096)]
+    )
+    return upstream
+
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_first_download_streams_and_stores(
+    mock_create_instance, client, app, completed_document
+):
+    """La primera descarga se retransmite y las siguientes no llaman a DocuSign"""
+    document_id, headers = completed_document
+    service = MagicMock()
+    service.open_signed_document.return_value = upstream = _upstream()
+    mock_create_instance.return_value = service
+
+    response = client.get(f'/api/documents/{document_id}/signed', headers=headers)
+    assert response.status_code == 200
+    assert response.data == SIGNED_PDF
+    upstream.release_conn.assert_called_once()
+
+    with app.app_context():
+        assert Document.query.get(document_id).signed_file_path is not None
+
+    response = client.get(f'/api/documents/{document_id}/signed', headers=headers)
+    assert response.status_code == 200
+    assert response.data == SIGNED_PDF
+    response.close()
+    assert service.open_signed_document.call_count == 1
+
+
+def test_download_requires_completed_document(client, app, completed_document):
+    """Un documento sin completar no se puede descargar"""
+    document_id, headers = completed_document
+    with app.app_context():
+        document = Document.query.get(document_id)
+        document.status = 'sent'
+        db.session.commit()
+
+    response = client.get(f'/api/documents/{document_id}/signed', headers=headers)
+    assert response.status_code == 409
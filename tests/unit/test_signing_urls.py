@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from services.local_store import LocalStore
+from services.docusign_quota import DocuSignQuotaExceeded, BACKGROUND, INTERACTIVE
+from services.signing_urls import (
+    SigningUrlCache, prefetch_signing_urls, get_signing_url, _SCHEMA
+)
+
+RECIPIENTS = [
+    {"email": "Ana@example.com", "name": "Ana"},
+    {"email": "luis@example.com", "name": "Luis"}
+]
+
+@pytest.fixture
+def cache(tmp_path):
+    """Caché sobre un almacén temporal"""
+    return SigningUrlCache(
+        LocalStore(str(tmp_path / 'urls.db'), schema=_SCHEMA), ttl=60
+    )
+
+@pytest.fixture
+def embedded_app(app, cache):
+    """App de testing con firma embebida y la caché temporal"""
+    previous = app.extensions.get('signing_url_cache')
+    app.extensions['signing_url_cache'] = cache
+    app.config['DOCUSIGN_EMBEDDED_SIGNING'] = True
+    yield app
+    app.config['DOCUSIGN_EMBEDDED_SIGNING'] = False
+    app.extensions['signing_url_cache'] = previous
+
+def test_urls_are_single_use(cache):
+    """Una URL servida desde caché no vuelve a servirse"""
+    cache.put('env-1', 'Ana@example.com', 'https://demo.docusign.net/signing/1')
+    assert (
+        cache.pop('env-1', 'ana@example.com') == 'https://demo.docusign.net/signing/1'
+    )
+    assert cache.pop('env-1', 'ana@example.com') is None
+
+def test_expired_urls_are_not_served(cache):
+    """Las URLs fuera de su ventana de validez se descartan"""
+    cache.put('env-1', 'ana@example.com', 'https://demo.docusign.net/signing/1')
+    with patch('services.signing_urls.time.time', return_value=10 ** 12):
+        assert cache.pop('env-1', 'ana@example.com') is None
+        cache.put('env-2', 'luis@example.com', 'https://demo.docusign.net/signing/2')
+    assert cache.purge_expired() == 0
+
+def test_prefetch_skips_cached_and_stops_without_quota(embedded_app, cache):
+    """La pregeneración no repite URLs vigentes y se detiene sin cuota de fondo"""
+    with embedded_app.app_context():
+        service = MagicMock()
+        service.create_recipient_view.return_value = (
+            'https://demo.docusign.net/signing/x'
+        )
+        assert prefetch_signing_urls('env-1', RECIPIENTS, service=service) == 2
+        assert service.create_recipient_view.call_args.kwargs['priority'] == BACKGROUND
+
+        assert prefetch_signing_urls('env-1', RECIPIENTS, service=service) == 0
+        assert service.create_recipient_view.call_count == 2
+
+        service.create_recipient_view.side_effect = DocuSignQuotaExceeded(
+            'acc', BACKGROUND, 30
+        )
+        assert prefetch_signing_urls('env-2', RECIPIENTS, service=service) == 0
+        assert service.create_recipient_view.call_count == 3
+
+
+@patch('services.docusign_service.DocuSignService.create_instance')
+def test_get_signing_url_falls_back_to_live_call(
+    mock_create_instance, embedded_app, cache
+):
+    """Un acierto no llama a DocuSign; un fallo genera la URL en línea"""
+    service = MagicMock()
+    service.create_recipient_view.return_value = (
+        'https://demo.docusign.net/signing/live'
+    )
+    mock_create_instance.return_value = service
+    recipient = {"email": "ana@example.com", "name": "Ana", "client_user_id": "1"}
+
+    with embedded_app.app_context():
+        cache.put(
+            'env-1', 'ana@example.com', 'https://demo.docusign.net/signing/cached'
+        )
+        assert get_signing_url('env-1', recipient) == (
+            'https://demo.docusign.net/signing/cached',
+            True,
+        )
+        service.create_recipient_view.assert_not_called()
+
+        assert get_signing_url('env-1', recipient) == (
+            'https://demo.docusign.net/signing/live',
+            False,
+        )
+        assert service.create_recipient_view.call_args.kwargs['priority'] == INTERACTIVE
@@ -0,0 +1,138 @@
+import time
+from datetime import datetime
+import pytest
+from flask_jwt_extended import create_access_token
+from models.database import db
+from models.document import Document
+from services.envelope_events import record_events
+from services.status_stream import StatusBroker, StatusChange
+from tests.unit.test_webhook_queue import _document
+
+def _change(event_id, user_id, document_id=1, status='delivered'):
+    return StatusChange(
+        event_id,
+        str(user_id),
+        document_id,
+        f"env-{document_id}",
+        status,
+        datetime.utcnow(),
+    )
+
+@pytest.fixture
+def broker(app):
+    """Broker propio sin sondeo automático durante el test"""
+    previous = app.extensions.get('status_broker')
+    broker = app.extensions['status_broker'] = StatusBroker(
+        app, buffer_size=3, poll_interval=3600, subscription_capacity=3
+    )
+    broker._ensure_running = lambda: None
+    yield broker
+    if previous is None:
+        app.extensions.pop('status_broker', None)
+    else:
+        app.extensions['status_broker'] = previous
+
+def test_changes_reach_only_the_owner(broker):
+    """Cada cambio llega solo a las conexiones de su usuario y sin repetir estados"""
+    mine, _, _ = broker.subscribe(1)
+    other, _, _ = broker.subscribe(2)
+
+    broker.publish([_change(10, 1), _change(11, 1), _change(12, 1, status='completed')])
+
+    assert [change.id for change in mine.wait(0)] == [10, 12]
+    assert other.wait(0) == []
+    mine.close()
+    other.close()
+    assert broker._subscribers == {}
+
+def test_slow_client_is_asked_to_resync(broker):
+    """Un cliente que no lee no acumula cambios sin límite"""
+    subscription, _, _ = broker.subscribe(1)
+    broker.publish(
+        [_change(event_id, 1, document_id=event_id) for event_id in (1, 2, 3, 4)]
+    )
+
+    assert subscription.overflowed
+    assert len(subscription.wait(0)) == 3
+    subscription.close()
+
+def test_reconnect_replays_from_ring_buffer(broker):
+    """
+    Al reconectar se reenvía lo perdido si sigue
+    en el buffer; si no, se pide resincronizar
+    """
+    # Otra conexión abierta mantiene el buffer: sin conexiones se descarta
+    keeper, _, resync = broker.subscribe(2)
+    assert resync
+    broker.watermark.reset(0)
+    broker.publish(
+        [_change(event_id, 1, document_id=event_id) for event_id in (5, 6, 7, 8)]
+    )
+    broker.watermark.reset(8)
+
+    subscription, replay, resync = broker.subscribe(1, last_event_id=6)
+    assert [change.id for change in replay] == [7, 8] and not resync
+    subscription.close()
+
+    subscription, replay, resync = broker.subscribe(1, last_event_id=2)
+    assert replay == [] and resync
+    subscription.close()
+    keeper.close()
+    assert broker.watermark.last_id is None and not broker._recent
+
+def test_poll_publishes_current_document_status(app, broker, db_session):
+    """El hilo del broker lee el historial y publica el estado actual del documento"""
+    with app.app_context():
+        envelope_id = f"env-s-{time.time_ns()}"
+        document_id = _document(envelope_id, status='sent')
+        user_id = Document.query.get(document_id).user_id
+        subscription, _, _ = broker.subscribe(user_id)
+
+        Document.query.get(document_id).status = 'completed'
+        now = datetime.utcnow()
+        record_events(
+            [
+                {
+                    'envelope_id': envelope_id,
+                    'status': 'completed',
+                    'event': 'envelope-completed',
+                    'occurred_at': now,
+                    'received_at': now,
+                }
+            ]
+        )
+        db.session.commit()
+
+        assert broker.poll() >= 1
+        changes = [
+            change
+            for change in subscription.wait(0)
+            if change.document_id == document_id
+        ]
+        assert [change.status for change in changes] == ['completed']
+        subscription.close()
+
+def test_stream_endpoint(client, app, broker, db_session):
+    """El endpoint abre un stream SSE y entrega los cambios del usuario"""
+    with app.app_context():
+        document_id = _document(f"env-e-{time.time_ns()}")
+        user_id = Document.query.get(document_id).user_id
+        token = create_access_token(identity=user_id)
+
+    response = client.get(
+        '/api/documents/stream',
+        headers={'Authorization': f'Bearer {token}'},
+        buffered=False,
+    )
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    # Conexión nueva: el cliente recarga una vez lo ocurrido desde que cargó la página
+    assert next(chunks).startswith(b'event: resync')
+
+    broker.publish([_change(99, user_id, document_id=document_id, status='completed')])
+    chunk = next(chunks)
+    assert chunk.startswith(b'id: 99\nevent: status\n')
+    response.close()
+    assert broker._subscribers == {}
@@ -0,0 +1,168 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
+from models.database import db
+from models.revoked_token import RevokedToken
+from models.user import User
+from services.auth_service import AuthService
+from services.token_revocation import (
+    TokenRevocationStore,
+    purge_revoked_tokens,
+    get_revocation_store,
+)
+
+@pytest.fixture
+def count_queries(app):
+    """Cuenta las sentencias SQL ejecutadas"""
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', listener)
+
+def test_revocation_reaches_other_workers(app, db_session, count_queries):
+    """
+    Una revocación se ve en otro worker tras
+    sincronizar; entre sincronizaciones no hay I/O
+    """
+    with app.app_context():
+        worker_a = TokenRevocationStore(sync_interval=3600)
+        worker_b = TokenRevocationStore(sync_interval=3600)
+        assert not worker_b.is_revoked('nada')
+        jti = str(uuid.uuid4())
+
+        assert worker_a.revoke(
+            jti, datetime.utcnow() + timedelta(hours=1), token_type='access', identity=1
+        )
+        assert not worker_a.revoke(jti, datetime.utcnow() + timedelta(hours=1))
+        assert worker_a.is_revoked(jti)
+
+        del count_queries[:]
+        assert not worker_b.is_revoked(jti)
+        assert count_queries == []
+
+        assert worker_b.sync() >= 1
+        assert worker_b.is_revoked(jti)
+
+def test_expired_revocations_are_purged(app, db_session):
+    """Las revocaciones de tokens ya expirados salen de la tabla y de la memoria"""
+    with app.app_context():
+        expired, valid = str(uuid.uuid4()), str(uuid.uuid4())
+        store = TokenRevocationStore(sync_interval=0)
+        store.revoke(valid, datetime.utcnow() + timedelta(hours=1))
+        store.revoke(expired, datetime.utcnow() - timedelta(seconds=1))
+
+        assert not store.is_revoked(expired)
+        assert store.is_revoked(valid)
+        assert purge_revoked_tokens() >= 1
+        assert RevokedToken.query.filter_by(jti=expired).count() == 0
+        assert RevokedToken.query.filter_by(jti=valid).count() == 1
+
+def test_logout_revokes_the_token(client, app, db_session):
+    """Tras el logout el token deja de ser aceptado"""
+    with app.app_context():
+        username = f"logout_{time.time_ns()}"
+        user = User(
+            username=username, email=f"{username}@example.com", password_hash='x'
+        )
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=user.id)
+        refresh_token = create_refresh_token(identity=user.id)
+        refresh_jti = decode_token(refresh_token)['jti']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    assert client.get('/api/test_protected', headers=headers).status_code == 200
+    response = client.post(
+        '/api/logout', json={'refresh_token': refresh_token}, headers=headers
+    )
+    assert response.status_code == 200
+    assert client.get('/api/test_protected', headers=headers).status_code == 401
+    with app.app_context():
+        assert get_revocation_store().is_revoked(refresh_jti)
+
+def test_refresh_rotates_and_detects_reuse(client, app, db_session):
+    """Cada refresh rota el token; reutilizar uno rotado revoca la sesión entera"""
+    with app.app_context():
+        username = f"refresh_{time.time_ns()}"
+        user = User(
+            username=username, email=f"{username}@example.com", password_hash='x'
+        )
+        db.session.add(user)
+        db.session.commit()
+        _, first_refresh = AuthService.issue_tokens(user.id)
+
+    response = client.post(
+        '/api/refresh', headers={'Authorization': f'Bearer {first_refresh}'}
+    )
+    assert response.status_code == 200
+    rotated = response.get_json()
+    access = {'Authorization': f"Bearer {rotated['access_token']}"}
+    assert client.get('/api/test_protected', headers=access).status_code == 200
+    with app.app_context():
+        assert (
+            decode_token(rotated['refresh_token'])['fam']
+            == decode_token(first_refresh)['fam']
+        )
+
+    # El token original ya se usó: quien lo presente de nuevo pierde la sesión
+    assert (
+        client.post(
+            '/api/refresh', headers={'Authorization': f'Bearer {first_refresh}'}
+        ).status_code
+        == 401
+    )
+    second = {'Authorization': f"Bearer {rotated['refresh_token']}"}
+    assert client.post('/api/refresh', headers=second).status_code == 401
+    assert client.get('/api/test_protected', headers=access).status_code == 401
+
+def test_revoking_purges_expired_rows_without_background_tasks(app, db_session):
+    """
+    Sin tareas en segundo plano la revocación borra las
+    filas caducadas, como mucho una vez por intervalo
+    """
+    with app.app_context():
+        store = TokenRevocationStore(sync_interval=3600, purge_interval=3600)
+        expired = str(uuid.uuid4())
+        store.revoke(expired, datetime.utcnow() - timedelta(seconds=1))
+        assert RevokedToken.query.filter_by(jti=expired).count() == 0
+
+        later = str(uuid.uuid4())
+        store.revoke(later, datetime.utcnow() - timedelta(seconds=1))
+        assert RevokedToken.query.filter_by(jti=later).count() == 1
+
+        store._purged_at -= 3600
+        store.revoke(str(uuid.uuid4()), datetime.utcnow() + timedelta(hours=1))
+        assert RevokedToken.query.filter_by(jti=later).count() == 0
+        assert (
+            get_revocation_store().purge_interval
+            == app.config['JWT_REVOCATION_PURGE_INTERVAL']
+        )
+
+def test_out_of_order_commits_are_not_missed(app, db_session):
+    """
+    Una revocación con un id menor confirmada después
+    de otra se lee en la siguiente sincronización
+    """
+    with app.app_context():
+        worker = TokenRevocationStore(sync_interval=3600)
+        worker.sync()
+        top = worker.watermark.last_id
+        late, early = str(uuid.uuid4()), str(uuid.uuid4())
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+
+        db.session.add(RevokedToken(id=top + 2, jti=early, expires_at=expires_at))
+        db.session.commit()
+        worker.sync()
+        assert worker.is_revoked(early) and not worker.is_revoked(late)
+
+        db.session.add(RevokedToken(id=top + 1, jti=late, expires_at=expires_at))
+        db.session.commit()
+        worker.sync()
+        assert worker.is_revoked(late)
+        assert worker.watermark.gaps() == []
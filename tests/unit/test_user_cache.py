@@ -0,0 +1,82 @@
+import time
+import pytest
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from models.database import db
+from models.user import User
+from services.user_cache import UserCache, get_user_cache
+
+@pytest.fixture
+def user_queries(app):
+    """Cuenta las consultas a la tabla user"""
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    def listener(conn, cursor, statement, *args):
+        if 'FROM user' in statement:
+            statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', listener)
+
+def _user():
+    username = f"cache_{time.time_ns()}"
+    user = User(username=username, email=f"{username}@example.com", password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_hot_route_stops_querying_users(client, app, db_session, user_queries):
+    """Tras la primera petición el usuario sale de la caché"""
+    with app.app_context():
+        user = _user()
+        token = create_access_token(identity=user.id)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    del user_queries[:]
+    for _ in range(3):
+        response = client.get('/api/test_protected', headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()['username'] == user.username
+    assert len(user_queries) == 1
+
+def test_changes_invalidate_the_entry(app, db_session):
+    """Un cambio confirmado en el usuario descarta la copia en caché"""
+    with app.app_context():
+        user = _user()
+        cache = get_user_cache()
+        assert cache.get(user.id).email == user.email
+
+        user.email = f"nuevo_{user.email}"
+        db.session.commit()
+        assert cache.get(user.id).email == user.email
+
+        User.query.filter(User.id == user.id).update({'email': f"masivo_{user.email}"},
+                                                     synchronize_session=False)
+        db.session.commit()
+        # db_session desactiva expire_on_commit; en
+        # producción la sesión es nueva por petición
+        db.session.expire_all()
+        assert cache.get(user.id).email.startswith('masivo_')
+
+def test_entries_expire_and_capacity_is_bounded(app, db_session):
+    """Las entradas caducan con el TTL y la caché no crece sin límite"""
+    with app.app_context():
+        users = [_user() for _ in range(3)]
+        cache = UserCache(ttl=0, capacity=2)
+        for user in users:
+            cache.get(user.id)
+        assert len(cache._entries) == 2
+
+def test_deleted_user_token_is_rejected(client, app, db_session):
+    """El token de un usuario que ya no existe no pasa la verificación"""
+    with app.app_context():
+        user = _user()
+        token = create_access_token(identity=user.id)
+        db.session.delete(user)
+        db.session.commit()
+
+    response = client.get(
+        '/api/test_protected', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == 401
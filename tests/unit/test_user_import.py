@@ -0,0 +1,125 @@
+import json
+import time
+import pytest
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from werkzeug.security import check_password_hash
+from models.database import db
+from models.user import User
+from services.password_hashing import PasswordHasher, hash_method
+
+@pytest.fixture
+def import_app(app):
+    """App con un administrador de altas y un pool de hash propio"""
+    previous = app.extensions.get('user_import_hasher')
+    previous_admins = app.config.get('USER_IMPORT_ADMINS')
+    app.extensions['user_import_hasher'] = PasswordHasher(
+        hash_method(iterations=1000), workers=2
+    )
+    with app.app_context():
+        admin = _user('admin')
+        app.config['USER_IMPORT_ADMINS'] = [admin.username]
+        app.admin_headers = {
+            'Authorization': f"Bearer {create_access_token(identity=admin.id)}"
+        }
+    yield app
+    app.extensions['user_import_hasher'].shutdown()
+    app.config['USER_IMPORT_ADMINS'] = previous_admins
+    if previous is None:
+        app.extensions.pop('user_import_hasher', None)
+    else:
+        app.extensions['user_import_hasher'] = previous
+
+@pytest.fixture
+def statements(app):
+    """Sentencias SQL ejecutadas y si fueron executemany"""
+    executed = []
+    with app.app_context():
+        engine = db.engine
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, executemany))
+    event.listen(engine, 'before_cursor_execute', listener)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', listener)
+
+def _user(prefix):
+    username = f"{prefix}_{time.time_ns()}"
+    user = User(username=username, email=f"{username}@example.com", password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_csv_import_reports_errors_per_row(client, import_app, db_session):
+    """Las filas válidas se crean y cada fila inválida informa de su línea"""
+    with import_app.app_context():
+        existing = _user('existente')
+    tag = time.time_ns()
+    body = "\n".join([
+        "username,password,email",
+        f"nuevo_a_{tag},Secreto123,a_{tag}@example.com",
+        f"{existing.username},Secreto123,otro_{tag}@example.com",
+        f"nuevo_b_{tag},Secreto123,a_{tag}@example.com",
+        f"nuevo_c_{tag},Secreto123,no-es-un-email",
+        f"nuevo_d_{tag},Secreto456,d_{tag}@example.com",
+    ])
+
+    response = client.post('/api/users/import', data=body, content_type='text/csv',
+                           headers=import_app.admin_headers)
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['created'] == 2
+    assert [(error['line'], error['error']) for error in report['errors']] == [
+        (3, "Nombre de usuario ya existe"),
+        (4, "Email repetido en el fichero"),
+        (5, "El formato del email es inválido"),
+    ]
+    with import_app.app_context():
+        created = User.query.filter_by(username=f"nuevo_d_{tag}").one()
+        assert created.password_hash.startswith('pbkdf2:sha256:1000$')
+        assert check_password_hash(created.password_hash, 'Secreto456')
+
+def test_ndjson_import_is_set_based(client, import_app, db_session, statements):
+    """Una consulta de conflictos y un único executemany para todo el bloque"""
+    tag = time.time_ns()
+    lines = [json.dumps({'username': f"lote_{tag}_{i}", 'password': 'Secreto123',
+                         'email': f"lote_{tag}_{i}@example.com"}) for i in range(20)]
+    lines.insert(5, '{roto')
+
+    del statements[:]
+    response = client.post(
+        '/api/users/import',
+        data="\n".join(lines),
+        content_type='application/x-ndjson',
+        headers=import_app.admin_headers,
+    )
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['created'] == 20
+    assert report['errors'] == [{'line': 6, 'username': None, 'error': "JSON inválido"}]
+
+    inserts = [
+        executemany
+        for statement, executemany in statements
+        if statement.startswith('INSERT INTO user ')
+    ]
+    assert inserts == [True]
+    conflict_queries = [
+        s for s, _ in statements if s.startswith('SELECT') and 'user.email IN' in s
+    ]
+    assert len(conflict_queries) == 1
+
+def test_import_requires_an_authorized_user(client, import_app, db_session):
+    """Solo los usuarios de USER_IMPORT_ADMINS pueden dar de alta usuarios"""
+    with import_app.app_context():
+        token = create_access_token(identity=_user('ajeno').id)
+    response = client.post(
+        '/api/users/import',
+        data="username,password,email\n",
+        content_type='text/csv',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == 403
+
+    response = client.post('/api/users/import', data="a,b\n", content_type='text/plain',
+                           headers=import_app.admin_headers)
+    assert response.status_code == 400
@@ -0,0 +1,160 @@
+import json
+import time
+from datetime import datetime, timedelta
+import pytest
+from models.database import db
+from models.document import Document
+from models.processed_webhook_event import ProcessedWebhookEvent
+from services.local_store import LocalStore
+from services.webhook_queue import WebhookQueue, _SCHEMA
+from services.webhook_processor import process_webhook_events
+from services.webhook_dedup import (
+    WebhookDeduplicator, dedup_key, within_replay_window, purge_processed_webhook_events
+)
+from tests.unit.test_webhook_queue import _document
+
+HMAC_KEY = 'webhook_test_key'
+
+@pytest.fixture
+def dedup_app(app, tmp_path):
+    """App de testing con cola y deduplicador propios"""
+    previous = {
+        name: app.extensions.get(name) for name in ('webhook_queue', 'webhook_dedup')
+    }
+    previous_key = app.config.get('DOCUSIGN_HMAC_KEY')
+    app.extensions['webhook_queue'] = WebhookQueue(
+        LocalStore(str(tmp_path / 'webhooks.db'), schema=_SCHEMA)
+    )
+    app.extensions['webhook_dedup'] = WebhookDeduplicator(capacity=100, ttl=3600)
+    app.config['DOCUSIGN_HMAC_KEY'] = HMAC_KEY
+    yield app
+    app.config['DOCUSIGN_HMAC_KEY'] = previous_key
+    for name, value in previous.items():
+        if value is None:
+            app.extensions.pop(name, None)
+        else:
+            app.extensions[name] = value
+
+def test_dedup_key_prefers_event_id():
+    """El ID de Connect identifica el evento; sin él se usa solo el hash del payload"""
+    assert dedup_key(b'{}', {"eventId": "abc"}) == "evt:abc"
+    first = dedup_key(b'{"a": 1}', {"a": 1})
+    assert first.startswith("sha:")
+    assert first == dedup_key(b'{"a": 1}', {"a": 1})
+    assert first != dedup_key(b'{"a": 2}', {"a": 2})
+
+def test_replay_window():
+    """Se aceptan timestamps recientes en ISO 8601 o epoch y se rechazan los antiguos"""
+    now = datetime.utcnow()
+    assert not within_replay_window(None, 300)
+    assert within_replay_window(None, 0)
+    assert within_replay_window(now.isoformat() + 'Z', 300)
+    assert within_replay_window(str(time.time()), 300)
+    assert not within_replay_window((now - timedelta(hours=1)).isoformat() + 'Z', 300)
+    assert not within_replay_window('no es una fecha', 300)
+
+def test_retried_event_is_applied_once(dedup_app, db_session):
+    """
+    Un reintento de Connect no vuelve a aplicarse, ni desde la LRU ni desde la tabla
+    """
+    with dedup_app.app_context():
+        envelope_id = f"env-d-{time.time_ns()}"
+        document_id = _document(envelope_id, status='sent')
+        queue = dedup_app.extensions['webhook_queue']
+        body = json.dumps(
+            {"eventId": envelope_id, "envelopeId": envelope_id, "status": "delivered"}
+        ).encode()
+        queue.enqueue(body)
+        queue.enqueue(body)
+        process_webhook_events()
+
+        rows = ProcessedWebhookEvent.query.filter_by(
+            dedup_key=f"evt:{envelope_id}"
+        ).all()
+        assert len(rows) == 1
+
+        # Tras reiniciar el worker la LRU está vacía:
+        # la tabla sigue filtrando el reintento
+        dedup_app.extensions['webhook_dedup'] = WebhookDeduplicator(
+            capacity=100, ttl=3600
+        )
+        fresh, _ = dedup_app.extensions['webhook_dedup'].filter_new(
+            [(f"evt:{envelope_id}", envelope_id, "delivered")]
+        )
+        assert fresh == []
+        db.session.rollback()
+
+        db.session.expire_all()
+        assert Document.query.get(document_id).status == 'delivered'
+        assert queue.stats()[0] == 0
+
+def test_expired_key_not_yet_purged_is_replaced(dedup_app, db_session):
+    """
+    Una redelivery tras el TTL pero antes de la
+    purga se aplica sin chocar con el índice único
+    """
+    with dedup_app.app_context():
+        envelope_id = f"env-x-{time.time_ns()}"
+        document_id = _document(envelope_id, status='sent')
+        db.session.add(
+            ProcessedWebhookEvent(
+                dedup_key=f"evt:{envelope_id}",
+                envelope_id=envelope_id,
+                expires_at=datetime.utcnow() - timedelta(seconds=1),
+            )
+        )
+        db.session.commit()
+        queue = dedup_app.extensions['webhook_queue']
+        queue.enqueue(
+            json.dumps(
+                {
+                    "eventId": envelope_id,
+                    "envelopeId": envelope_id,
+                    "status": "delivered",
+                }
+            ).encode()
+        )
+
+        assert process_webhook_events() == 1
+        assert queue.stats()[0] == 0
+        [row] = ProcessedWebhookEvent.query.filter_by(
+            dedup_key=f"evt:{envelope_id}"
+        ).all()
+        assert row.expires_at > datetime.utcnow()
+        assert Document.query.get(document_id).status == 'delivered'
+
+def test_purge_removes_expired_keys(dedup_app, db_session):
+    """La purga borra las claves caducadas y conserva las vigentes"""
+    with dedup_app.app_context():
+        now = datetime.utcnow()
+        suffix = time.time_ns()
+        db.session.add_all(
+            [
+                ProcessedWebhookEvent(
+                    dedup_key=f"evt:old-{suffix}", expires_at=now - timedelta(seconds=1)
+                ),
+                ProcessedWebhookEvent(
+                    dedup_key=f"evt:new-{suffix}", expires_at=now + timedelta(hours=1)
+                ),
+            ]
+        )
+        db.session.commit()
+
+        assert purge_processed_webhook_events() >= 1
+        keys = {row.dedup_key for row in ProcessedWebhookEvent.query.all()}
+        assert f"evt:old-{suffix}" not in keys
+        assert f"evt:new-{suffix}" in keys
+
+def test_endpoint_rejects_stale_timestamp(client, dedup_app, sign_webhook):
+    """Una entrega firmada fuera de la ventana se rechaza sin encolarla"""
+    body = json.dumps({"envelopeId": "env-r", "status": "completed"}).encode()
+    stale = (datetime.utcnow() - timedelta(hours=1)).isoformat() + 'Z'
+
+    response = client.post(
+        '/api/docusign/webhook',
+        data=body,
+        content_type='application/json',
+        headers=sign_webhook(HMAC_KEY, body, stale),
+    )
+    assert response.status_code == 400
+    assert dedup_app.extensions['webhook_queue'].stats()[0] == 0
@@ -0,0 +1,167 @@
+import json
+import time
+import pytest
+from unittest.mock import patch
+from models.database import db
+from models.user import User
+from models.document import Document
+from services.local_store import LocalStore
+from services.webhook_queue import WebhookQueue, _SCHEMA
+from services.webhook_processor import process_webhook_events, coalesce
+
+HMAC_KEY = 'webhook_test_key'
+
+@pytest.fixture
+def queue(tmp_path):
+    """Cola sobre un almacén temporal"""
+    return WebhookQueue(
+        LocalStore(str(tmp_path / 'webhooks.db'), schema=_SCHEMA), lease=30
+    )
+
+@pytest.fixture
+def webhook_app(app, queue):
+    """App de testing con la cola temporal y una clave HMAC conocida"""
+    previous_queue = app.extensions.get('webhook_queue')
+    previous_key = app.config.get('DOCUSIGN_HMAC_KEY')
+    app.extensions['webhook_queue'] = queue
+    app.config['DOCUSIGN_HMAC_KEY'] = HMAC_KEY
+    yield app
+    app.config['DOCUSIGN_HMAC_KEY'] = previous_key
+    app.extensions['webhook_queue'] = previous_queue
+
+def _document(envelope_id, status='sent'):
+    username = f"webhook_{time.time_ns()}"
+    user = User(username=username, email=f"{username}@example.com", password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    document = Document(
+        title="Split Sheet", user_id=user.id, status=status, envelope_id=envelope_id
+    )
+    db.session.add(document)
+    db.session.commit()
+    return document.id
+
+def test_claimed_events_return_after_lease(queue):
+    """Un lote reclamado y no confirmado vuelve a la cola al caducar el lease"""
+    first = queue.enqueue(b'{"a": 1}')
+    queue.enqueue(b'{"a": 2}')
+
+    claimed = queue.claim(1)
+    assert [event.id for event in claimed] == [first]
+    assert [event.id for event in queue.claim(10)] == [first + 1]
+    assert queue.claim(10) == []
+
+    with patch('services.webhook_queue.time.time', return_value=time.time() + 60):
+        again = queue.claim(10)
+    assert sorted(event.id for event in again) == [first, first + 1]
+    assert all(event.attempts == 2 for event in again)
+
+    queue.ack([event.id for event in again])
+    assert queue.stats() == (0, 0.0)
+
+def test_endpoint_enqueues_and_returns_202(client, webhook_app, queue, sign_webhook):
+    """El endpoint solo verifica la firma y encola el evento"""
+    body = json.dumps({"envelopeId": "env-q", "status": "completed"}).encode()
+
+    response = client.post(
+        '/api/docusign/webhook',
+        data=body,
+        content_type='application/json',
+        headers=sign_webhook(HMAC_KEY, body),
+    )
+    assert response.status_code == 202
+    events = queue.claim(10)
+    assert [event.json() for event in events] == [json.loads(body)]
+
+    response = client.post(
+        '/api/docusign/webhook',
+        data=body,
+        content_type='application/json',
+        headers={'X-DocuSign-Signature-1': 'invalida'},
+    )
+    assert response.status_code == 401
+
+
+def test_endpoint_never_processes_inline(
+    client, webhook_app, queue, db_session, sign_webhook
+):
+    """
+    Sin tareas en segundo plano el endpoint solo
+    encola; el evento lo aplica `flask process-queues`
+    """
+    with webhook_app.app_context():
+        envelope_id = f"env-i-{time.time_ns()}"
+        document_id = _document(envelope_id)
+    body = json.dumps({"envelopeId": envelope_id, "status": "completed"}).encode()
+
+    assert not webhook_app.config['BACKGROUND_TASKS_ENABLED']
+    response = client.post(
+        '/api/docusign/webhook',
+        data=body,
+        content_type='application/json',
+        headers=sign_webhook(HMAC_KEY, body),
+    )
+    assert response.status_code == 202
+    assert queue.stats()[0] == 1
+
+    with patch('services.outbound_webhooks.deliver_webhooks', return_value=0):
+        result = webhook_app.test_cli_runner().invoke(args=['process-queues'])
+    assert result.exit_code == 0, result.output
+    assert queue.stats()[0] == 0
+    with webhook_app.app_context():
+        db.session.expire_all()
+        assert Document.query.get(document_id).status == 'completed'
+
+
+def test_worker_applies_batch(webhook_app, queue, db_session):
+    """El worker aplica el lote, descarta eventos inválidos y vacía la cola"""
+    with webhook_app.app_context():
+        suffix = time.time_ns()
+        first_id = _document(f"env-a-{suffix}")
+        second_id = _document(f"env-b-{suffix}")
+        queue.enqueue(
+            json.dumps(
+                {"envelopeId": f"env-a-{suffix}", "status": "delivered"}
+            ).encode()
+        )
+        queue.enqueue(
+            json.dumps(
+                {"envelopeId": f"env-b-{suffix}", "status": "Completed"}
+            ).encode()
+        )
+        queue.enqueue(b'no es json')
+
+        with patch(
+            'services.webhook_processor.db.session.commit', wraps=db.session.commit
+        ) as commit:
+            assert process_webhook_events() == 3
+        assert commit.call_count == 1
+
+        db.session.expire_all()
+        assert Document.query.get(first_id).status == 'delivered'
+        assert Document.query.get(second_id).status == 'completed'
+        assert queue.stats()[0] == 0
+
+def test_coalesce_keeps_most_advanced_status():
+    """Varios eventos de un envelope se reducen al estado más avanzado"""
+    by_status = coalesce([
+        ("env-1", "sent"), ("env-1", "completed"), ("env-1", "delivered"),
+        ("env-2", "delivered"), ("env-2", "desconocido")
+    ])
+    assert dict(by_status) == {"completed": ["env-1"], "delivered": ["env-2"]}
+
+def test_out_of_order_event_does_not_regress(webhook_app, queue, db_session):
+    """Un delivered atrasado no sobrescribe un completed ya aplicado"""
+    with webhook_app.app_context():
+        envelope_id = f"env-c-{time.time_ns()}"
+        document_id = _document(envelope_id, status='completed')
+        for status in ("sent", "delivered", "delivered"):
+            queue.enqueue(
+                json.dumps({"envelopeId": envelope_id, "status": status}).encode()
+            )
+
+        process_webhook_events()
+
+        db.session.expire_all()
+        assert Document.query.get(document_id).status == 'completed'
+        assert queue.stats()[0] == 0